@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+"""
+COI aggregation - clusters overlapping submissions about the same community
+and computes a consensus boundary for each cluster.
+
+Submissions are linked when their geometries overlap and their community
+name/description text is similar (MinHash); linked submissions are merged
+with union-find. Each cluster's polygons are rasterized onto a shared grid,
+and the consensus boundary is the outline of the cells drawn by at least
+`--level` of the members.
+
+Runs offline over the stored geojson / all_coordinates; the heavy kernels
+(signatures, pair scoring, rasterization) are vectorized with NumPy.
+
+    uv run python aggregate.py --out consensus.geojson --state California
+    uv run python aggregate.py --out mission.geojson --zipcode 94110 --level 0.6
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from dotenv import load_dotenv
+from loguru import logger
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+load_dotenv()
+
+from dedup import normalize_name, shingles
+from export import build_filters
+from spatial_index import SubmissionIndex, _extract_ring, _is_polygon, _rings_intersect
+from supabase_backend import iter_submissions
+
+SOURCE_COLUMNS = "id,created_at,community_name,community_description,geojson,all_coordinates"
+
+NUM_PERM = 64
+SIGNATURE_CHUNK_ROWS = 2000
+
+# A pair is linked when GEO_WEIGHT * overlap + TEXT_WEIGHT * text >= LINK_THRESHOLD,
+# where overlap is bbox intersection over the smaller bbox and text is MinHash similarity.
+GEO_WEIGHT = 0.6
+TEXT_WEIGHT = 0.4
+LINK_THRESHOLD = 0.5
+MIN_OVERLAP = 0.2
+
+# Point-only submissions get a small box (~150 m) so they can still be clustered
+POINT_PAD_DEG = 0.0015
+
+DEFAULT_CELL_METERS = 100.0
+MAX_GRID_CELLS = 512  # per side; coarser cells are used for very large clusters
+DEFAULT_LEVEL = 0.5
+DEFAULT_MIN_SIZE = 3
+
+METERS_PER_DEG_LAT = 111_320.0
+_MASK32 = np.uint64(0xFFFFFFFF) if np is not None else None
+# Signature value of rows without tokens (real minima are below it almost surely)
+_EMPTY_HASH = 0xFFFFFFFF
+
+
+def _require_numpy():
+    if np is None:
+        raise SystemExit("Aggregation requires numpy: uv pip install numpy")
+
+
+# ============================================================================
+# Text signatures
+# ============================================================================
+
+
+def _perm_params(n: int):
+    # Odd multipliers make (a * h + b) mod 2^32 a permutation of 32-bit hashes
+    raw = hashlib.blake2b(b"aggregate-minhash", digest_size=64).digest()
+    seed = int.from_bytes(raw[:8], "big")
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 1 << 32, size=n, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 1 << 32, size=n, dtype=np.uint64)
+    return a, b
+
+
+def _token_hash(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode(), digest_size=4).digest(), "big")
+
+
+def signatures(texts: list[str]) -> "np.ndarray":
+    """MinHash signatures (rows x NUM_PERM, uint64) for a list of texts.
+
+    Rows with no tokens get an all-max signature; see has_tokens().
+    """
+    _require_numpy()
+    a, b = _perm_params(NUM_PERM)
+    out = np.full((len(texts), NUM_PERM), np.uint64(_EMPTY_HASH), dtype=np.uint64)
+
+    for start in range(0, len(texts), SIGNATURE_CHUNK_ROWS):
+        chunk = texts[start : start + SIGNATURE_CHUNK_ROWS]
+        hashes, owners = [], []
+        for i, text in enumerate(chunk):
+            for token in shingles(text):
+                hashes.append(_token_hash(token))
+                owners.append(i)
+        if not hashes:
+            continue
+        h = np.asarray(hashes, dtype=np.uint64)
+        owner = np.asarray(owners, dtype=np.int64)
+        # (tokens x perms) permuted hashes, reduced to a per-row minimum
+        permuted = (h[:, None] * a[None, :] + b[None, :]) & _MASK32
+        starts = np.flatnonzero(np.r_[True, owner[1:] != owner[:-1]])
+        out[start + owner[starts]] = np.minimum.reduceat(permuted, starts, axis=0)
+    return out
+
+
+def has_tokens(sigs: "np.ndarray") -> "np.ndarray":
+    """Which signature rows came from text with tokens (blank rows match nothing)."""
+    return (sigs != np.uint64(_EMPTY_HASH)).any(axis=1)
+
+
+def text_similarity(sigs: "np.ndarray", i: int, j: "np.ndarray") -> "np.ndarray":
+    """MinHash similarity of row i to rows j; 0 when either side has no tokens."""
+    similarity = (sigs[j] == sigs[i]).mean(axis=1)
+    if not has_tokens(sigs[i : i + 1])[0]:
+        return np.zeros(len(j))
+    return np.where(has_tokens(sigs[j]), similarity, 0.0)
+
+
+# ============================================================================
+# Clustering
+# ============================================================================
+
+
+@dataclass
+class Item:
+    id: str
+    name: str
+    ring: list[tuple[float, float]]
+    polygon: bool
+    bbox: tuple[float, float, float, float]
+
+
+@dataclass
+class Cluster:
+    members: list[Item]
+    names: list[tuple[str, int]] = field(default_factory=list)
+
+
+def _item(row: dict) -> Item | None:
+    geometry = row.get("geojson") or row.get("all_coordinates")
+    ring = _extract_ring(geometry)
+    if not ring:
+        return None
+    lngs = [p[0] for p in ring]
+    lats = [p[1] for p in ring]
+    polygon = _is_polygon(ring)
+    pad = 0.0 if polygon else POINT_PAD_DEG
+    bbox = (min(lngs) - pad, min(lats) - pad, max(lngs) + pad, max(lats) + pad)
+    return Item(row["id"], row.get("community_name") or "", ring, polygon, bbox)
+
+
+def _find(parent: list[int], i: int) -> int:
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def cluster(rows: list[dict], min_size: int = DEFAULT_MIN_SIZE) -> list[Cluster]:
+    """Group rows about the same community. Returns clusters of at least min_size, largest first."""
+    _require_numpy()
+    items = [item for item in map(_item, rows) if item is not None]
+    if not items:
+        return []
+    text_by_id = {
+        row["id"]: f"{row.get('community_name') or ''} {row.get('community_description') or ''}" for row in rows
+    }
+    sigs = signatures([text_by_id[item.id] for item in items])
+    bboxes = np.array([item.bbox for item in items], dtype=np.float64)
+    areas = np.maximum((bboxes[:, 2] - bboxes[:, 0]) * (bboxes[:, 3] - bboxes[:, 1]), 1e-12)
+
+    index = SubmissionIndex()
+    position = {}
+    for i, item in enumerate(items):
+        index.add(item.id, {"type": "Polygon", "coordinates": [[list(p) for p in item.ring]]})
+        position[item.id] = i
+
+    parent = list(range(len(items)))
+    links = 0
+    for i, item in enumerate(items):
+        hits = [position[sid] for sid in index.query_bbox(*item.bbox) if position.get(sid, -1) > i]
+        if not hits:
+            continue
+        j = np.asarray(hits)
+
+        ix = np.minimum(bboxes[j, 2], bboxes[i, 2]) - np.maximum(bboxes[j, 0], bboxes[i, 0])
+        iy = np.minimum(bboxes[j, 3], bboxes[i, 3]) - np.maximum(bboxes[j, 1], bboxes[i, 1])
+        overlap = np.clip(ix, 0, None) * np.clip(iy, 0, None) / np.minimum(areas[j], areas[i])
+        text = text_similarity(sigs, i, j)
+        score = GEO_WEIGHT * np.minimum(overlap, 1.0) + TEXT_WEIGHT * text
+
+        for k in np.flatnonzero((overlap >= MIN_OVERLAP) & (score >= LINK_THRESHOLD)):
+            other = items[j[k]]
+            # Boxes can overlap while the polygons don't; confirm before linking
+            if item.polygon and other.polygon and not _rings_intersect(item.ring, other.ring):
+                continue
+            ri, rj = _find(parent, i), _find(parent, int(j[k]))
+            if ri != rj:
+                parent[rj] = ri
+                links += 1
+
+    groups: dict[int, list[Item]] = {}
+    for i, item in enumerate(items):
+        groups.setdefault(_find(parent, i), []).append(item)
+
+    clusters = []
+    for members in groups.values():
+        if len(members) < min_size:
+            continue
+        names = Counter(normalize_name(m.name) for m in members if normalize_name(m.name))
+        clusters.append(Cluster(members, names=names.most_common(5)))
+    clusters.sort(key=lambda c: -len(c.members))
+    logger.info(f"{len(items)} submissions, {links} links, {len(clusters)} clusters of {min_size}+")
+    return clusters
+
+
+# ============================================================================
+# Consensus boundaries
+# ============================================================================
+
+
+def _grid(members: list[Item], cell_meters: float):
+    min_lng = min(m.bbox[0] for m in members)
+    min_lat = min(m.bbox[1] for m in members)
+    max_lng = max(m.bbox[2] for m in members)
+    max_lat = max(m.bbox[3] for m in members)
+
+    dlat = cell_meters / METERS_PER_DEG_LAT
+    dlng = dlat / max(math.cos(math.radians((min_lat + max_lat) / 2)), 1e-6)
+    # Keep the raster bounded for very large clusters
+    scale = max(1.0, (max_lng - min_lng) / dlng / MAX_GRID_CELLS, (max_lat - min_lat) / dlat / MAX_GRID_CELLS)
+    dlng *= scale
+    dlat *= scale
+    cols = max(1, math.ceil((max_lng - min_lng) / dlng))
+    rows = max(1, math.ceil((max_lat - min_lat) / dlat))
+    return min_lng, min_lat, dlng, dlat, rows, cols
+
+
+def rasterize(ring: list[tuple[float, float]], origin: tuple[float, float], cell: tuple[float, float], shape) -> "np.ndarray":
+    """Boolean mask of grid cells whose centers fall inside the ring (even-odd rule)."""
+    min_lng, min_lat = origin
+    dlng, dlat = cell
+    rows, cols = shape
+    mask = np.zeros(shape, dtype=bool)
+
+    pts = np.asarray(ring, dtype=np.float64)
+    xs = (pts[:, 0] - min_lng) / dlng
+    ys = (pts[:, 1] - min_lat) / dlat
+    # Only touch the rows/cols inside the ring's own box
+    r0 = max(0, int(math.floor(ys.min())))
+    r1 = min(rows, int(math.ceil(ys.max())) + 1)
+    c0 = max(0, int(math.floor(xs.min())))
+    c1 = min(cols, int(math.ceil(xs.max())) + 1)
+    if r0 >= r1 or c0 >= c1:
+        return mask
+
+    cy = np.arange(r0, r1) + 0.5
+    cx = np.arange(c0, c1) + 0.5
+    window = mask[r0:r1, c0:c1]
+    for x1, y1, x2, y2 in zip(xs[:-1], ys[:-1], xs[1:], ys[1:]):
+        crosses = (y1 > cy) != (y2 > cy)
+        if not crosses.any():
+            continue
+        xint = x1 + (cy[crosses] - y1) * (x2 - x1) / (y2 - y1)
+        window[crosses] ^= cx[None, :] < xint[:, None]
+    return mask
+
+
+def _signed_area(ring: list[tuple[float, float]]) -> float:
+    return sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in zip(ring, ring[1:])) / 2
+
+
+def _drop_collinear(ring: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    pts = ring[:-1]
+    keep = []
+    n = len(pts)
+    for k in range(n):
+        (ax, ay), (bx, by), (cx, cy) = pts[k - 1], pts[k], pts[(k + 1) % n]
+        if (bx - ax) * (cy - by) != (by - ay) * (cx - bx):
+            keep.append(pts[k])
+    return keep + keep[:1]
+
+
+def trace(mask: "np.ndarray") -> list[list[list[tuple[int, int]]]]:
+    """Outline a boolean mask as polygons in grid-corner coordinates.
+
+    Returns [[exterior, hole, ...], ...] with counter-clockwise exteriors and
+    clockwise holes, each ring closed and without collinear vertices.
+    """
+    padded = np.pad(mask, 1)
+    inner = padded[1:-1, 1:-1]
+    edges: dict[tuple[int, int], list[tuple[int, int]]] = {}
+
+    # Each boundary edge keeps the counter-clockwise orientation of its cell,
+    # so outlines come out CCW and holes CW.
+    sides = (
+        (~padded[:-2, 1:-1], (0, 0), (1, 0)),  # below
+        (~padded[1:-1, 2:], (1, 0), (1, 1)),  # right
+        (~padded[2:, 1:-1], (1, 1), (0, 1)),  # above
+        (~padded[1:-1, :-2], (0, 1), (0, 0)),  # left
+    )
+    for open_side, (ax, ay), (bx, by) in sides:
+        for r, c in zip(*np.nonzero(inner & open_side)):
+            edges.setdefault((int(c) + ax, int(r) + ay), []).append((int(c) + bx, int(r) + by))
+
+    rings = []
+    while edges:
+        start = next(iter(edges))
+        ring = [start]
+        point = start
+        while True:
+            nexts = edges[point]
+            nxt = nexts.pop()
+            if not nexts:
+                del edges[point]
+            ring.append(nxt)
+            point = nxt
+            if point == start:
+                break
+        rings.append(_drop_collinear(ring))
+
+    exteriors = [[r] for r in rings if _signed_area(r) > 0]
+    for hole in (r for r in rings if _signed_area(r) < 0):
+        hx, hy = hole[0]
+        for polygon in exteriors:
+            if _point_in_grid_ring(hx + 0.5, hy + 0.5, polygon[0]) or _point_in_grid_ring(hx - 0.5, hy - 0.5, polygon[0]):
+                polygon.append(hole)
+                break
+    return exteriors
+
+
+def _point_in_grid_ring(x: float, y: float, ring: list[tuple[int, int]]) -> bool:
+    inside = False
+    for (x1, y1), (x2, y2) in zip(ring, ring[1:]):
+        if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+    return inside
+
+
+def consensus(members: list[Item], level: float = DEFAULT_LEVEL, cell_meters: float = DEFAULT_CELL_METERS) -> dict:
+    """Overlap frequency of a cluster's polygons and the outline where it reaches `level`."""
+    polygons = [m for m in members if m.polygon]
+    if not polygons:
+        return {"geometry": None, "peak_agreement": 0.0, "drawn_by": 0}
+
+    min_lng, min_lat, dlng, dlat, rows, cols = _grid(polygons, cell_meters)
+    counts = np.zeros((rows, cols), dtype=np.uint16)
+    for m in polygons:
+        counts += rasterize(m.ring, (min_lng, min_lat), (dlng, dlat), (rows, cols))
+
+    freq = counts / len(polygons)
+    outlines = trace(freq >= level)
+
+    def to_lnglat(ring):
+        return [[round(min_lng + x * dlng, 6), round(min_lat + y * dlat, 6)] for x, y in ring]
+
+    geometry = None
+    if outlines:
+        geometry = {
+            "type": "MultiPolygon",
+            "coordinates": [[to_lnglat(ring) for ring in polygon] for polygon in outlines],
+        }
+    return {
+        "geometry": geometry,
+        "peak_agreement": round(float(freq.max()), 3),
+        "drawn_by": len(polygons),
+    }
+
+
+# ============================================================================
+# Pipeline
+# ============================================================================
+
+
+async def load_rows(filters: dict) -> list[dict]:
+    # Flagged duplicates would double-count the same caller in the consensus
+    params = {**filters, "duplicate_of": "is.null"}
+    rows = []
+    async for page in iter_submissions(select=SOURCE_COLUMNS, filters=params):
+        rows.extend(page)
+    logger.info(f"Loaded {len(rows)} submissions")
+    return rows
+
+
+def aggregate(
+    rows: list[dict],
+    level: float = DEFAULT_LEVEL,
+    min_size: int = DEFAULT_MIN_SIZE,
+    cell_meters: float = DEFAULT_CELL_METERS,
+) -> dict:
+    """Cluster rows and return a FeatureCollection with one consensus feature per cluster."""
+    features = []
+    for n, c in enumerate(cluster(rows, min_size)):
+        result = consensus(c.members, level, cell_meters)
+        features.append({
+            "type": "Feature",
+            "id": n,
+            "geometry": result["geometry"],
+            "properties": {
+                "name": c.names[0][0] if c.names else None,
+                "names": [{"name": name, "count": count} for name, count in c.names],
+                "submissions": len(c.members),
+                "drawn_by": result["drawn_by"],
+                "level": level,
+                "peak_agreement": result["peak_agreement"],
+                "submission_ids": [m.id for m in c.members],
+            },
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cluster submissions into consensus communities of interest")
+    parser.add_argument("--out", required=True, type=Path)
+    parser.add_argument("--zipcode")
+    parser.add_argument("--state", help="Full state name, e.g. California")
+    parser.add_argument("--since", help="Only rows created at or after this ISO date/time")
+    parser.add_argument("--until", help="Only rows created before this ISO date/time")
+    parser.add_argument("--level", type=float, default=DEFAULT_LEVEL, help="Share of members that must draw a cell")
+    parser.add_argument("--min-size", type=int, default=DEFAULT_MIN_SIZE, help="Smallest cluster to output")
+    parser.add_argument("--cell-meters", type=float, default=DEFAULT_CELL_METERS, help="Consensus grid resolution")
+    args = parser.parse_args()
+    _require_numpy()
+
+    filters = build_filters(args.zipcode, args.state, args.since, args.until)
+    rows = asyncio.run(load_rows(filters))
+    collection = aggregate(rows, args.level, args.min_size, args.cell_meters)
+    args.out.write_text(json.dumps(collection))
+    print(f"Wrote {len(collection['features'])} consensus communities to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark the production geocode path (GeocodePipeline.geocode) against a
+simulated Geocoding API with fixed latency. No API key or network needed.
+
+    uv run python benchmarks/bench_geocode.py --calls 50 --latency-ms 80
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import httpx
+
+from geocoding import GeocodeCache, GeocodePipeline, RateLimiter
+
+BOUNDARIES = "Bernal, SOMA, Hayes, Castro are neighboring. Market St is also a barrier"
+PLACES = "Mission Dolores Park, the school next to it, Mission St, 24th and Mission"
+
+
+def fake_api(latency_ms: float) -> httpx.AsyncBaseTransport:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency_ms / 1000)
+        address = request.url.params["address"]
+        geometry = {
+            "location": {"lat": 37.75 + random.uniform(-0.01, 0.01), "lng": -122.415 + random.uniform(-0.01, 0.01)},
+            "location_type": "GEOMETRIC_CENTER",
+            "viewport": {"northeast": {"lat": 37.77, "lng": -122.40}, "southwest": {"lat": 37.73, "lng": -122.43}},
+        }
+        return httpx.Response(
+            200, json={"status": "OK", "results": [{"geometry": geometry, "formatted_address": address}]}
+        )
+
+    return httpx.MockTransport(handler)
+
+
+async def run(calls: int, latency_ms: float) -> None:
+    pipeline = GeocodePipeline(
+        cache=GeocodeCache(),
+        limiter=RateLimiter(rate=1000, concurrency=50),
+        transport=fake_api(latency_ms),
+    )
+
+    start = time.perf_counter()
+    await pipeline.geocode("24th and Mission", "94110", BOUNDARIES, PLACES)
+    cold = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(pipeline.geocode(f"{i} Valencia St", "94110", BOUNDARIES, PLACES) for i in range(calls))
+    )
+    warm = time.perf_counter() - start
+    await pipeline.aclose()
+
+    print(f"cold call:               {cold * 1000:.1f} ms ({latency_ms:.0f} ms simulated API latency)")
+    print(f"{calls} concurrent calls:    {warm * 1000:.1f} ms total, landmarks served from cache")
+    print(f"API requests:            {pipeline.limiter.used}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark GeocodePipeline against a simulated API")
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=80.0)
+    args = parser.parse_args()
+    asyncio.run(run(args.calls, args.latency_ms))
+
+
+if __name__ == "__main__":
+    main()
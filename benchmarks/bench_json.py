@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark fastjson against stdlib json on the payloads the agent actually
+moves: a submission row, a bulk upsert page, a Geocoding API response and a
+record_answer tool result.
+
+    uv run python benchmarks/bench_json.py
+    uv pip install orjson && uv run python benchmarks/bench_json.py  # compare backends
+"""
+
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import fastjson
+from main import DEMO_ANSWERS
+
+POINTS = [
+    {"lat": 37.752 + i * 0.0013, "lng": -122.418 + i * 0.0009, "formatted_address": f"{2800 + i} Mission St, San Francisco, CA 94110, USA"}
+    for i in range(11)
+]
+
+SUBMISSION_ROW = {
+    **DEMO_ANSWERS,
+    "geographic_summary": "Centered around 24th St & Mission St — roughly 1.8 square miles — bounded by Market St, Bernal, SOMA, Castro",
+    "primary_address": "24th St & Mission St, San Francisco, CA 94110, USA",
+    "geocoded_landmarks": "; ".join(p["formatted_address"] for p in POINTS[:6]),
+    "all_coordinates": POINTS,
+    "geojson": {
+        "type": "Feature",
+        "properties": {"name": "Mission District", "caller": "Lauren James"},
+        "geometry": {"type": "Polygon", "coordinates": [[[p["lng"], p["lat"]] for p in POINTS] + [[POINTS[0]["lng"], POINTS[0]["lat"]]]]},
+    },
+    "map_image_url": "https://example.supabase.co/storage/v1/object/public/map-images/3f2a9c0d4b.png",
+    "centroid_geohash": "9q8yy4mz1",
+    "cover_gh5": ["9q8yy", "9q8yv"],
+    "cover_gh6": [f"9q8yy{c}" for c in "0123456789bcdefg"],
+    "cover_gh7": [f"9q8yy4{c}" for c in "0123456789bcdefghjkmnpqrstuvwxyz"],
+}
+
+BULK_PAGE = [dict(SUBMISSION_ROW, id=f"00000000-0000-0000-0000-{i:012d}") for i in range(200)]
+
+GEOCODE_RESPONSE = json.dumps({
+    "status": "OK",
+    "results": [
+        {
+            "address_components": [
+                {"long_name": name, "short_name": name[:3], "types": ["neighborhood", "political"]}
+                for name in ("Mission District", "San Francisco", "San Francisco County", "California", "United States")
+            ],
+            "formatted_address": p["formatted_address"],
+            "geometry": {
+                "location": {"lat": p["lat"], "lng": p["lng"]},
+                "location_type": "GEOMETRIC_CENTER",
+                "viewport": {
+                    "northeast": {"lat": p["lat"] + 0.001, "lng": p["lng"] + 0.001},
+                    "southwest": {"lat": p["lat"] - 0.001, "lng": p["lng"] - 0.001},
+                },
+            },
+            "place_id": "ChIJ" + "x" * 23,
+            "types": ["intersection"],
+        }
+        for p in POINTS[:5]
+    ],
+}).encode()
+
+TOOL_RESULT = {
+    "success": True,
+    "completed": DEMO_ANSWERS,
+    "remaining": ["other_considerations", "phone_number"],
+    "next_question": "Is there anything else you'd like the commission to know about your community?",
+    "is_complete": False,
+}
+
+STDLIB = {
+    "dumps": lambda obj: json.dumps(obj).encode(),
+    "loads": json.loads,
+}
+FAST = {
+    "dumps": fastjson.dumps,
+    "loads": fastjson.loads,
+}
+
+CASES = [
+    ("submission row", "dumps", SUBMISSION_ROW),
+    ("bulk page (200 rows)", "dumps", BULK_PAGE),
+    ("bulk page (200 rows)", "loads", json.dumps(BULK_PAGE).encode()),
+    ("geocode response", "loads", GEOCODE_RESPONSE),
+    ("record_answer result", "dumps", TOOL_RESULT),
+]
+
+
+def bench(fn, arg) -> float:
+    """Best-of-5 microseconds per call."""
+    timer = timeit.Timer(lambda: fn(arg))
+    number, _ = timer.autorange()
+    return min(timer.repeat(5, number)) / number * 1e6
+
+
+def main():
+    print(f"fastjson backend: {fastjson.BACKEND}\n")
+    print(f"{'payload':<24}{'op':<7}{'stdlib µs':>11}{'fast µs':>10}{'speedup':>9}")
+    for name, op, payload in CASES:
+        slow = bench(STDLIB[op], payload)
+        fast = bench(FAST[op], payload)
+        print(f"{name:<24}{op:<7}{slow:>11.1f}{fast:>10.1f}{slow / fast:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
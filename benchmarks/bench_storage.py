@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark submission writes through PostgREST (httpx) against the direct
+asyncpg backend (prepared inserts and COPY), in rows/sec.
+
+Needs SUPABASE_URL / SUPABASE_SERVICE_KEY and DATABASE_URL for the same
+database. Rows are written with a unique caller_name and deleted afterwards;
+point it at a staging project, not production.
+
+    uv run python benchmarks/bench_storage.py --rows 500 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import fastjson
+import geocells
+import pg_backend
+import supabase_backend
+from main import DEMO_ANSWERS
+
+POINTS = [
+    {"lat": 37.752 + i * 0.0013, "lng": -122.418 + i * 0.0009, "formatted_address": f"{2800 + i} Mission St, San Francisco, CA 94110, USA"}
+    for i in range(11)
+]
+
+
+def make_row(tag: str) -> dict:
+    ring = [[p["lng"], p["lat"]] for p in POINTS] + [[POINTS[0]["lng"], POINTS[0]["lat"]]]
+    geojson = {"type": "Feature", "properties": {}, "geometry": {"type": "Polygon", "coordinates": [ring]}}
+    return {
+        **DEMO_ANSWERS,
+        "caller_name": tag,
+        "geographic_summary": "Centered around 24th St & Mission St — roughly 1.8 square miles",
+        "primary_address": "24th St & Mission St, San Francisco, CA 94110, USA",
+        "geocoded_landmarks": "; ".join(p["formatted_address"] for p in POINTS[:6]),
+        "all_coordinates": POINTS,
+        "geojson": geojson,
+        "map_image_url": None,
+        **geocells.cell_columns(POINTS, geojson),
+    }
+
+
+async def timed(label: str, n: int, coro) -> None:
+    start = time.perf_counter()
+    await coro
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {n / elapsed:>9.0f} rows/s  ({elapsed * 1000:.0f} ms for {n})")
+
+
+async def gather_limited(factories, concurrency: int) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(factory):
+        async with semaphore:
+            await factory()
+
+    await asyncio.gather(*(one(f) for f in factories))
+
+
+async def postgrest_bulk(rows: list[dict]) -> None:
+    async with httpx.AsyncClient(timeout=60.0) as client:
+        resp = await client.post(
+            f"{supabase_backend.SUPABASE_URL}/rest/v1/submissions",
+            headers={**supabase_backend._headers(), "Prefer": "return=minimal"},
+            content=fastjson.dumps(rows),
+        )
+    resp.raise_for_status()
+
+
+async def run(n: int, concurrency: int) -> None:
+    tag = f"bench-{uuid.uuid4().hex[:8]}"
+    rows = [make_row(tag) for _ in range(n)]
+    split = supabase_backend.SUBMISSIONS_LAYOUT == "split"
+
+    try:
+        supabase_backend.STORAGE_BACKEND = "postgrest"
+        await timed(
+            "PostgREST, row per request",
+            n,
+            gather_limited([lambda r=r: supabase_backend._insert_submission(r) for r in rows], concurrency),
+        )
+        if not split:
+            await timed("PostgREST, one bulk request", n, postgrest_bulk(rows))
+
+        await timed(
+            "asyncpg, prepared insert",
+            n,
+            gather_limited([lambda r=r: pg_backend.insert_submission(r) for r in rows], concurrency),
+        )
+        await timed("asyncpg, COPY", n, pg_backend.copy_submissions(rows))
+    finally:
+        pool = await pg_backend.get_pool()
+        deleted = await pool.execute("delete from submissions where caller_name = $1", tag)
+        print(f"cleanup: {deleted}")
+        await pg_backend.close_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PostgREST vs asyncpg submission writes")
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8, help="In-flight single-row writes")
+    args = parser.parse_args()
+    asyncio.run(run(args.rows, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
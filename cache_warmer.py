@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Geocode cache warmer.
+
+Mines stored submissions for the landmarks and addresses callers mention most
+in each zipcode, then resolves the top N per zip (plus the zip itself) into the
+geocode cache, so the first calls after a deploy hit the cache instead of the
+API. Given a region's zip list it warms those zips before an outreach
+campaign, including zips nobody has called from yet (their centroids at least).
+
+Mentions come from geocoded_landmarks (the landmark text of lookups that
+succeeded, weighted highest) and from key_places, community_boundaries and
+address run through the same landmark extraction the call path uses, so the
+warmed cache keys are exactly the queries a call would send. The most
+mentioned queries across all zips go first. Lookups run in the quota
+scheduler's prefetch class: behind live calls, ahead of batch jobs, and
+leaving room in the shared bucket for calls in progress (see
+QUOTA_STATE_PATH). --budget caps the API requests it may spend.
+Already-cached queries are free.
+
+Needs GEOCODE_CACHE_PATH pointing at the cache file the agent uses.
+
+    GEOCODE_CACHE_PATH=geocode_cache.db uv run python cache_warmer.py --top 20 --budget 5000
+    GEOCODE_CACHE_PATH=geocode_cache.db uv run python cache_warmer.py --zips-file campaign_zips.txt --state Arizona
+"""
+
+import argparse
+import asyncio
+import re
+from collections import Counter
+from pathlib import Path
+from typing import AsyncIterator
+
+from dotenv import load_dotenv
+from loguru import logger
+
+load_dotenv()
+
+import geocoding
+import landmarks as landmark_parser
+import quota
+from export import build_filters
+from geocoding import GeocodePipeline
+from supabase_backend import iter_submissions
+
+SOURCE_COLUMNS = "zipcode,address,key_places,community_boundaries,geocoded_landmarks"
+
+# A landmark that already geocoded once counts for more than a raw mention
+GEOCODED_WEIGHT = 3
+MENTION_WEIGHT = 1
+
+# Per-field cap on extracted landmarks, generous next to the call path's caps
+MAX_QUERIES_PER_FIELD = 12
+
+_GEOCODED = re.compile(r"^(.*?) \((.*)\)$")
+
+
+def mentions(row: dict) -> Counter:
+    """Weighted landmark/address queries mentioned in one submission."""
+    counts: Counter = Counter()
+    for entry in (row.get("geocoded_landmarks") or "").split("; "):
+        m = _GEOCODED.match(entry.strip())
+        if m:
+            counts[m.group(1)] += GEOCODED_WEIGHT
+    for field in ("key_places", "community_boundaries"):
+        for query in landmark_parser.queries(row.get(field) or "", MAX_QUERIES_PER_FIELD):
+            counts[query] += MENTION_WEIGHT
+    address = (row.get("address") or "").strip()
+    if address:
+        counts[address] += MENTION_WEIGHT
+    return counts
+
+
+async def mine(pages: AsyncIterator[list[dict]], zipcodes: set[str] | None = None) -> dict[str, Counter]:
+    """Mention counts per zipcode over every page of submissions."""
+    by_zip: dict[str, Counter] = {}
+    rows = 0
+    async for page in pages:
+        for row in page:
+            zipcode = (row.get("zipcode") or "").strip()
+            if not zipcode or (zipcodes is not None and zipcode not in zipcodes):
+                continue
+            by_zip.setdefault(zipcode, Counter()).update(mentions(row))
+        rows += len(page)
+        logger.info(f"Mined {rows} submissions across {len(by_zip)} zipcodes")
+    return by_zip
+
+
+def plan(by_zip: dict[str, Counter], top: int, zipcodes: list[str] | None = None) -> list[tuple[str, str | None]]:
+    """(zipcode, query) lookups in warming order; a None query is the zip itself.
+
+    Zip areas come first (every landmark lookup needs its zip's area), then
+    each zip's top queries, most mentioned across all zips first.
+    """
+    zips = list(dict.fromkeys([*(zipcodes or []), *sorted(by_zip, key=lambda z: -sum(by_zip[z].values()))]))
+    ranked = [
+        (count, zipcode, query)
+        for zipcode, counts in by_zip.items()
+        for query, count in counts.most_common(top)
+    ]
+    ranked.sort(key=lambda item: -item[0])
+    return [(z, None) for z in zips] + [(zipcode, query) for _, zipcode, query in ranked]
+
+
+def cache_key(zipcode: str, query: str | None) -> str:
+    """The string the call path caches this lookup under."""
+    return f"{zipcode}, USA" if query is None else f"{query}, {zipcode}"
+
+
+class _Refusals:
+    """A lookup's view of the limiter that remembers whether acquire() refused it."""
+
+    def __init__(self, limiter):
+        self.limiter = limiter
+        self.refused = False
+
+    async def acquire(self) -> bool:
+        granted = await self.limiter.acquire()
+        self.refused = self.refused or not granted
+        return granted
+
+    def release(self) -> None:
+        self.limiter.release()
+
+
+async def warm(
+    lookups: list[tuple[str, str | None]],
+    pipeline: GeocodePipeline,
+    concurrency: int = 8,
+) -> dict:
+    """Resolve lookups into the pipeline's cache. Returns run stats."""
+    stats = {"lookups": len(lookups), "already_cached": 0, "resolved": 0, "unresolved": 0, "over_budget": 0}
+    limiter = pipeline.limiter
+    used_before = limiter.used
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(zipcode: str, query: str | None) -> None:
+        if pipeline.cache.get(cache_key(zipcode, query))[0]:
+            stats["already_cached"] += 1
+            return
+        lane = _Refusals(limiter)
+        async with semaphore:
+            if query is None:
+                found = await geocoding.zip_area(pipeline.client, zipcode, pipeline.cache, lane)
+            else:
+                found = await pipeline.lookup(query, zipcode, limiter=lane)
+        if found:
+            stats["resolved"] += 1
+        else:
+            stats["over_budget" if lane.refused else "unresolved"] += 1
+
+    # Zip areas first so landmark lookups find them cached
+    zip_lookups = [lookup for lookup in lookups if lookup[1] is None]
+    await asyncio.gather(*(one(*lookup) for lookup in zip_lookups))
+    await asyncio.gather(*(one(*lookup) for lookup in lookups if lookup[1] is not None))
+    stats["api_requests"] = limiter.used - used_before
+    return stats
+
+
+def read_zipcodes(values: list[str], path: Path | None) -> list[str]:
+    zipcodes = [z.strip() for value in values for z in value.split(",") if z.strip()]
+    if path:
+        zipcodes += [line.strip() for line in path.read_text().splitlines() if line.strip()]
+    return list(dict.fromkeys(zipcodes))
+
+
+async def run(
+    filters: dict,
+    zipcodes: list[str],
+    top: int,
+    budget: int | None,
+    qps: float,
+    concurrency: int,
+    page_size: int,
+) -> dict:
+    if not geocoding.GEOCODE_CACHE_PATH:
+        logger.warning("GEOCODE_CACHE_PATH is not set; warmed entries only live as long as this process")
+
+    pages = iter_submissions(select=SOURCE_COLUMNS, page_size=page_size, filters=filters)
+    by_zip = await mine(pages, set(zipcodes) if zipcodes else None)
+    lookups = plan(by_zip, top, zipcodes)
+    logger.info(f"Warming {len(lookups)} lookups across {len({z for z, _ in lookups})} zipcodes")
+
+    limiter = quota.QuotaScheduler(rate=qps, concurrency=concurrency).lane(quota.PREFETCH, budget=budget)
+    pipeline = GeocodePipeline(limiter=limiter, priority=quota.PREFETCH)
+    try:
+        return await warm(lookups, pipeline, concurrency)
+    finally:
+        await pipeline.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-resolve frequently mentioned landmarks into the geocode cache")
+    parser.add_argument("--zipcodes", action="append", default=[], help="Comma-separated zips to warm (repeatable)")
+    parser.add_argument("--zips-file", type=Path, help="File with one zipcode per line (e.g. a campaign region)")
+    parser.add_argument("--state", help="Only mine submissions from this state (full name)")
+    parser.add_argument("--since", help="Only mine submissions created at or after this ISO date/time")
+    parser.add_argument("--top", type=int, default=20, help="Queries to warm per zipcode")
+    parser.add_argument("--budget", type=int, help="Stop spending API requests after this many")
+    parser.add_argument("--qps", type=float, default=10.0, help="Max geocode requests per second")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--page-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    zipcodes = read_zipcodes(args.zipcodes, args.zips_file)
+    filters = build_filters(state=args.state, since=args.since)
+    if zipcodes:
+        filters["zipcode"] = f"in.({','.join(zipcodes)})"
+
+    stats = asyncio.run(run(filters, zipcodes, args.top, args.budget, args.qps, args.concurrency, args.page_size))
+    print(
+        f"Cache warm: {stats['lookups']} lookups, {stats['already_cached']} already cached, "
+        f"{stats['resolved']} resolved, {stats['unresolved']} unresolved, "
+        f"{stats['over_budget']} skipped over budget, {stats['api_requests']} API requests"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Call supervisor - ties the work started by a call's background tools to the
+call's lifecycle.
+
+Background loopback tools run in shielded tasks that outlive the turn (and the
+call) that started them, so a caller hanging up mid-lookup would otherwise
+leave the rest of the geocode requests running against the quota. Each call
+gets a CallSupervisor; tools run their work through run(), which applies a
+per-tool deadline and tracks the task. When the call ends:
+
+- non-essential work (geocoding) is cancelled straight away
+- essential work (saving a consented submission) is left to finish, still
+  bounded by its deadline. If it doesn't make it the session journal is
+  left unfinished, so the answers aren't lost.
+
+Cancellations and missed deadlines are counted in metrics, per tool and in total.
+"""
+
+import asyncio
+import os
+import time
+import weakref
+from collections.abc import Awaitable
+
+from line.events import CallEnded
+from loguru import logger
+
+import metrics
+
+# Per-tool deadlines in seconds; tools not listed get DEFAULT_TOOL_DEADLINE
+TOOL_DEADLINES = {
+    "geocode_community": float(os.getenv("GEOCODE_DEADLINE_SECONDS", "45")),
+    "save_submission_tool": float(os.getenv("SAVE_DEADLINE_SECONDS", "30")),
+    "run_demo": float(os.getenv("DEMO_DEADLINE_SECONDS", "90")),
+}
+DEFAULT_TOOL_DEADLINE = 60.0
+
+metrics.describe("tool_cancelled", "Background tool work cancelled because the call ended")
+metrics.describe("tool_deadline_exceeded", "Background tool work abandoned at its per-tool deadline")
+metrics.describe("tool_finished_after_hangup", "Essential tool work that completed after the caller hung up")
+
+
+# Supervisors of calls still in progress; a call that drops without CallEnded
+# falls out when its agent is garbage collected
+_ACTIVE: weakref.WeakSet = weakref.WeakSet()
+
+
+def active_calls() -> int:
+    return len(_ACTIVE)
+
+
+class CallHungUp(Exception):
+    """Raised from CallSupervisor.run when non-essential work is cancelled by the end of the call."""
+
+
+class CallSupervisor:
+    def __init__(self, call_id: str):
+        self.call_id = call_id
+        self.ended = False
+        self._tasks: dict[asyncio.Task, tuple[str, bool]] = {}  # task -> (tool, essential)
+        _ACTIVE.add(self)
+
+    async def run(self, tool: str, work: Awaitable, essential: bool = False):
+        """Await one piece of a tool's work under the tool's deadline.
+
+        Raises CallHungUp if the call ends first (or has already ended) and the
+        work isn't essential, and TimeoutError past the deadline. Essential
+        work is shielded: it keeps running even if the awaiting tool is cancelled.
+        """
+        if self.ended and not essential:
+            if asyncio.iscoroutine(work):
+                work.close()
+            self._count("tool_cancelled", tool)
+            raise CallHungUp(tool)
+
+        task = asyncio.ensure_future(self._with_deadline(tool, work))
+        self._tasks[task] = (tool, essential)
+        task.add_done_callback(self._forget)
+        try:
+            return await (asyncio.shield(task) if essential else task)
+        except asyncio.CancelledError:
+            if self.ended and task.cancelled():
+                raise CallHungUp(tool) from None
+            raise
+
+    async def _with_deadline(self, tool: str, work: Awaitable):
+        deadline = TOOL_DEADLINES.get(tool, DEFAULT_TOOL_DEADLINE)
+        try:
+            return await asyncio.wait_for(work, deadline)
+        except asyncio.TimeoutError:
+            # Before Python 3.11 asyncio.TimeoutError isn't the builtin callers catch
+            self._count("tool_deadline_exceeded", tool)
+            logger.warning(f"[{self.call_id}] {tool} missed its {deadline:g}s deadline")
+            raise TimeoutError(f"{tool} missed its {deadline:g}s deadline") from None
+
+    def _forget(self, task: asyncio.Task) -> None:
+        self._tasks.pop(task, None)
+
+    def _count(self, name: str, tool: str) -> None:
+        metrics.incr(name)
+        metrics.incr(f"{name}_{tool}")
+
+    async def end(self) -> None:
+        """The caller hung up: cancel non-essential work and wait out the essential work."""
+        if self.ended:
+            return
+        self.ended = True
+        _ACTIVE.discard(self)
+        essential, cancelled = [], 0
+        for task, (tool, is_essential) in list(self._tasks.items()):
+            if is_essential:
+                essential.append((task, tool))
+            else:
+                task.cancel()
+                cancelled += 1
+                self._count("tool_cancelled", tool)
+        if cancelled:
+            logger.info(f"[{self.call_id}] Call ended, cancelled {cancelled} background task(s)")
+        if not essential:
+            return
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(task for task, _ in essential), return_exceptions=True)
+        for (_, tool), result in zip(essential, results):
+            if not isinstance(result, BaseException):
+                self._count("tool_finished_after_hangup", tool)
+        logger.info(
+            f"[{self.call_id}] Waited {time.perf_counter() - started:.1f}s for "
+            f"{len(essential)} essential task(s) after hangup"
+        )
+
+    def wrap(self, agent):
+        """An agent whose CallEnded handling runs end() before the agent's own cleanup."""
+
+        async def process(env, event):
+            if isinstance(event, CallEnded):
+                await self.end()
+            async for output in agent.process(env, event):
+                yield output
+
+        return process
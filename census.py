@@ -0,0 +1,537 @@
+#!/usr/bin/env python3
+"""
+Census-geography intersection - which blocks, tracts and districts each
+submitted community covers, with area weights.
+
+Geography comes from local TIGER/Line files: shapefiles (with the "census"
+extra) or GeoJSON, e.g. tl_2020_06_tabblock20.shp for California's blocks.
+Each layer is packed into flat NumPy arrays (vertices, ring and feature
+offsets) with a grid index over the feature boxes, and can be cached as .npz
+so later runs skip parsing.
+
+For a submission polygon, candidate features come from the grid; their rings
+are then clipped in one batch against a triangle fan of the polygon (each
+triangle is convex, so Sutherland-Hodgman applies, and signed triangles add up
+to the exact polygon even when it isn't convex). Every clip step is a handful
+of array operations over all candidate vertices at once. Submissions with
+fewer than three points are located with a batched point-in-polygon test
+(grid lookup included).
+
+Results are stored in submission_census (migrations/003_submission_census.sql)
+or written to NDJSON with --out.
+
+    uv run python census.py --layer block=tl_2020_06_tabblock20.shp --layer tract=tl_2020_06_tract.shp \\
+        --layer cd=tl_2024_06_cd119.shp --state California --cache-dir .census_cache
+    uv run python census.py --layer tract=tracts.geojson:GEOID --zipcode 94110 --out mission.ndjson
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+from loguru import logger
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import shapefile
+except ImportError:
+    shapefile = None
+
+load_dotenv()
+
+from export import build_filters
+from spatial_index import _extract_ring, _is_polygon
+from supabase_backend import iter_submissions, replace_submission_census
+
+SOURCE_COLUMNS = "id,created_at,zipcode,geojson,all_coordinates"
+
+# Feature id properties tried in order when a layer doesn't name one
+ID_FIELDS = ("GEOID20", "GEOID", "GEOID10", "GEOIDFQ", "BLOCKID10")
+
+# Features spanning more grid cells than this are checked against every query instead
+MAX_CELLS_PER_FEATURE = 256
+
+# Overlaps smaller than this share of both the feature and the COI are dropped (slivers)
+MIN_SHARE = 1e-4
+
+# Upper bound on (point, edge) pairs evaluated at once by locate()
+PIP_CHUNK_EDGES = 4_000_000
+
+SQ_MILES_PER_SQ_DEG_LAT = 69.0 * 69.0
+
+
+def _require_numpy():
+    if np is None:
+        raise SystemExit("Census intersection requires numpy: uv pip install numpy")
+
+
+# ============================================================================
+# Packed geography layers
+# ============================================================================
+
+
+def _polygons(geometry: dict) -> list[list]:
+    """The polygons (lists of rings) of a GeoJSON Polygon/MultiPolygon."""
+    if geometry.get("type") == "Polygon":
+        return [geometry["coordinates"]]
+    if geometry.get("type") == "MultiPolygon":
+        return geometry["coordinates"]
+    return []
+
+
+def _ring_offsets(counts) -> "np.ndarray":
+    return np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+
+class Layer:
+    """One geography's polygons packed into flat arrays, with a grid index.
+
+    Vertices of all rings sit back to back in xs/ys (rings unclosed). Rings of a
+    feature are contiguous; ring_sign is +1 for outer rings and -1 for holes.
+    """
+
+    def __init__(self, name: str, ids: list[str], xs, ys, ring_starts, ring_signs, feature_rings):
+        self.name = name
+        self.ids = np.asarray(ids, dtype=object)
+        self.xs = np.asarray(xs, dtype=np.float64)
+        self.ys = np.asarray(ys, dtype=np.float64)
+        self.ring_starts = np.asarray(ring_starts, dtype=np.int64)  # len rings + 1
+        self.ring_signs = np.asarray(ring_signs, dtype=np.int8)
+        self.feature_rings = np.asarray(feature_rings, dtype=np.int64)  # len features + 1
+
+        # Previous vertex of each vertex within its ring (edges are prev -> cur)
+        self.prev = np.arange(len(self.xs), dtype=np.int64) - 1
+        self.prev[self.ring_starts[:-1]] = self.ring_starts[1:] - 1
+
+        vstarts = self.ring_starts[self.feature_rings[:-1]]
+        self.bounds = np.stack([
+            np.minimum.reduceat(self.xs, vstarts),
+            np.minimum.reduceat(self.ys, vstarts),
+            np.maximum.reduceat(self.xs, vstarts),
+            np.maximum.reduceat(self.ys, vstarts),
+        ], axis=1)
+        self._build_grid()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def from_features(cls, name: str, features) -> "Layer":
+        """Pack (id, GeoJSON geometry) pairs."""
+        ids, xs, ys, counts, signs, rings_per_feature = [], [], [], [], [], []
+        for feature_id, geometry in features:
+            n = 0
+            for polygon in _polygons(geometry):
+                for k, ring in enumerate(polygon):
+                    if len(ring) > 1 and ring[0] == ring[-1]:
+                        ring = ring[:-1]
+                    if len(ring) < 3:
+                        continue
+                    xs.extend(p[0] for p in ring)
+                    ys.extend(p[1] for p in ring)
+                    counts.append(len(ring))
+                    signs.append(1 if k == 0 else -1)
+                    n += 1
+            if n:
+                ids.append(str(feature_id))
+                rings_per_feature.append(n)
+        if not ids:
+            raise ValueError(f"Layer {name} has no polygons")
+        return cls(name, ids, xs, ys, _ring_offsets(counts), signs, _ring_offsets(rings_per_feature))
+
+    @classmethod
+    def read(cls, name: str, path: Path, id_field: str | None = None) -> "Layer":
+        """Load a shapefile (.shp) or GeoJSON FeatureCollection."""
+        if path.suffix.lower() == ".shp":
+            if shapefile is None:
+                raise SystemExit("Reading shapefiles requires pyshp: uv pip install pyshp")
+            reader = shapefile.Reader(str(path))
+            fields = [f[0] for f in reader.fields[1:]]
+            field = id_field or next((f for f in ID_FIELDS if f in fields), None)
+            if field is None:
+                raise SystemExit(f"{path}: no id field among {', '.join(ID_FIELDS)}; give one as {name}={path}:FIELD")
+            features = ((sr.record[field], sr.shape.__geo_interface__) for sr in reader.iterShapeRecords())
+            return cls.from_features(name, features)
+
+        collection = json.loads(path.read_text())
+        props = collection["features"][0].get("properties") or {} if collection.get("features") else {}
+        field = id_field or next((f for f in ID_FIELDS if f in props), None)
+        features = (
+            (f["properties"][field] if field else f.get("id", i), f["geometry"] or {})
+            for i, f in enumerate(collection.get("features", []))
+        )
+        return cls.from_features(name, features)
+
+    def save(self, path: Path) -> None:
+        np.savez(
+            path, ids=self.ids.astype(str), xs=self.xs, ys=self.ys, ring_starts=self.ring_starts,
+            ring_signs=self.ring_signs, feature_rings=self.feature_rings,
+        )
+
+    @classmethod
+    def load(cls, name: str, path: Path) -> "Layer":
+        data = np.load(path)
+        return cls(
+            name, data["ids"].tolist(), data["xs"], data["ys"], data["ring_starts"],
+            data["ring_signs"], data["feature_rings"],
+        )
+
+    # ---------------------------------------------------------------- grid
+
+    def _build_grid(self) -> None:
+        """Sorted (cell key, feature) pairs; cells are sized to the median feature."""
+        b = self.bounds
+        extent = np.maximum(b[:, 2] - b[:, 0], b[:, 3] - b[:, 1])
+        self.cell = float(max(np.median(extent), 1e-5))
+        self.origin = (float(b[:, 0].min()), float(b[:, 1].min()))
+        c0, r0, c1, r1 = self._cells(b[:, 0], b[:, 1], b[:, 2], b[:, 3])
+        self.cols = int(c1.max()) + 1
+        spans = (c1 - c0 + 1) * (r1 - r0 + 1)
+
+        big = spans > MAX_CELLS_PER_FEATURE
+        self.overflow = np.flatnonzero(big)
+        small = np.flatnonzero(~big)
+        owner = np.repeat(small, spans[small])
+        # Position of each entry within its feature's cell range
+        k = np.arange(len(owner)) - np.repeat(_ring_offsets(spans[small])[:-1], spans[small])
+        width = (c1 - c0 + 1)[owner]
+        keys = (r0[owner] + k // width) * self.cols + c0[owner] + k % width
+        order = np.argsort(keys, kind="stable")
+        self.cell_keys = keys[order]
+        self.cell_features = owner[order]
+
+    def _cells(self, min_x, min_y, max_x, max_y):
+        ox, oy = self.origin
+        to = lambda v, o: np.floor((np.asarray(v) - o) / self.cell).astype(np.int64)
+        return np.maximum(to(min_x, ox), 0), np.maximum(to(min_y, oy), 0), to(max_x, ox), to(max_y, oy)
+
+    def candidates(self, min_x: float, min_y: float, max_x: float, max_y: float) -> "np.ndarray":
+        """Indexes of features whose boxes intersect the given box."""
+        c0, r0, c1, r1 = (int(v) for v in self._cells(min_x, min_y, max_x, max_y))
+        c1 = min(c1, self.cols - 1)
+        found = [self.overflow]
+        if c0 <= c1 and r0 <= r1:
+            rows = np.arange(r0, r1 + 1)
+            keys = (rows[:, None] * self.cols + np.arange(c0, c1 + 1)[None, :]).ravel()
+            lo = np.searchsorted(self.cell_keys, keys, "left")
+            hi = np.searchsorted(self.cell_keys, keys, "right")
+            n = hi - lo
+            if n.sum():
+                idx = np.repeat(lo, n) + np.arange(n.sum()) - np.repeat(_ring_offsets(n)[:-1], n)
+                found.append(self.cell_features[idx])
+        cand = np.unique(np.concatenate(found))
+        b = self.bounds[cand]
+        keep = (b[:, 0] <= max_x) & (b[:, 2] >= min_x) & (b[:, 1] <= max_y) & (b[:, 3] >= min_y)
+        return cand[keep]
+
+    # ---------------------------------------------------------------- queries
+
+    def locate(self, lng, lat) -> "np.ndarray":
+        """Index of the feature containing each point (-1 if none), in one batch."""
+        px, py = np.asarray(lng, dtype=np.float64), np.asarray(lat, dtype=np.float64)
+        result = np.full(len(px), -1, dtype=np.int64)
+        point_of, feature_of = self._point_candidates(px, py)
+        if not len(point_of):
+            return result
+
+        vstart = self.ring_starts[self.feature_rings[feature_of]]
+        edges = self.ring_starts[self.feature_rings[feature_of + 1]] - vstart
+        start = 0
+        while start < len(point_of):
+            # Chunk pairs so (pair x edge) arrays stay bounded
+            stop = start + max(1, int(np.searchsorted(np.cumsum(edges[start:]), PIP_CHUNK_EDGES)))
+            n = edges[start:stop]
+            pair = np.repeat(np.arange(start, stop), n)
+            v = np.repeat(vstart[start:stop], n) + np.arange(n.sum()) - np.repeat(_ring_offsets(n)[:-1], n)
+            u = self.prev[v]
+            x, y = px[point_of[pair]], py[point_of[pair]]
+            y1, y2 = self.ys[u], self.ys[v]
+            straddles = (y1 > y) != (y2 > y)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                xint = self.xs[u] + (y - y1) * (self.xs[v] - self.xs[u]) / (y2 - y1)
+            crossings = np.bincount(pair - start, weights=straddles & (x < xint), minlength=stop - start)
+            inside = np.flatnonzero(crossings.astype(np.int64) % 2 == 1) + start
+            # First containing feature wins (blocks don't overlap)
+            for p, f in zip(point_of[inside][::-1], feature_of[inside][::-1]):
+                result[p] = f
+            start = stop
+        return result
+
+    def _point_candidates(self, px, py) -> tuple["np.ndarray", "np.ndarray"]:
+        """(point, feature) pairs whose feature box contains the point, for all points at once."""
+        ox, oy = self.origin
+        cols = np.floor((px - ox) / self.cell).astype(np.int64)
+        rows = np.floor((py - oy) / self.cell).astype(np.int64)
+        on_grid = np.flatnonzero((cols >= 0) & (cols < self.cols) & (rows >= 0))
+        keys = rows[on_grid] * self.cols + cols[on_grid]
+        lo = np.searchsorted(self.cell_keys, keys, "left")
+        n = np.searchsorted(self.cell_keys, keys, "right") - lo
+        idx = np.repeat(lo, n) + np.arange(n.sum()) - np.repeat(_ring_offsets(n)[:-1], n)
+        point_of = np.concatenate([np.repeat(on_grid, n), np.repeat(np.arange(len(px)), len(self.overflow))])
+        feature_of = np.concatenate([self.cell_features[idx], np.tile(self.overflow, len(px))])
+        b = self.bounds[feature_of]
+        x, y = px[point_of], py[point_of]
+        keep = (b[:, 0] <= x) & (b[:, 2] >= x) & (b[:, 1] <= y) & (b[:, 3] >= y)
+        return point_of[keep], feature_of[keep]
+
+    def intersect(self, ring: list[tuple[float, float]]) -> list[tuple[int, float, float]]:
+        """(feature, overlap area, feature area) for features overlapping a polygon ring.
+
+        Areas are in square degrees around the ring's centroid (x not scaled by cos(lat)).
+        """
+        pts = np.asarray(ring[:-1] if ring[0] == ring[-1] else ring, dtype=np.float64)
+        cand = self.candidates(pts[:, 0].min(), pts[:, 1].min(), pts[:, 0].max(), pts[:, 1].max())
+        if not len(cand):
+            return []
+        center = pts.mean(axis=0)
+        pts = pts - center
+        if _ring_areas(pts[:, 0], pts[:, 1], np.array([0, len(pts)]))[0] < 0:
+            pts = pts[::-1]  # the fan's signs assume a counter-clockwise ring
+
+        # Gather the candidates' rings into one batch, shifted to the local origin
+        first, last = self.feature_rings[cand], self.feature_rings[cand + 1]
+        nrings = last - first
+        ring_ids = np.repeat(first, nrings) + np.arange(nrings.sum()) - np.repeat(_ring_offsets(nrings)[:-1], nrings)
+        ring_owner = np.repeat(np.arange(len(cand)), nrings)
+        counts = self.ring_starts[ring_ids + 1] - self.ring_starts[ring_ids]
+        v = np.repeat(self.ring_starts[ring_ids], counts) + np.arange(counts.sum()) - np.repeat(_ring_offsets(counts)[:-1], counts)
+        xs, ys = self.xs[v] - center[0], self.ys[v] - center[1]
+        starts = _ring_offsets(counts)
+        signs = self.ring_signs[ring_ids].astype(np.float64)
+
+        feature_area = np.bincount(ring_owner, weights=signs * np.abs(_ring_areas(xs, ys, starts)), minlength=len(cand))
+        rbox = np.stack([
+            np.minimum.reduceat(xs, starts[:-1]), np.minimum.reduceat(ys, starts[:-1]),
+            np.maximum.reduceat(xs, starts[:-1]), np.maximum.reduceat(ys, starts[:-1]),
+        ], axis=1)
+
+        overlap = np.zeros(len(cand))
+        origin = np.zeros(2)
+        for a, b in zip(pts, np.roll(pts, -1, axis=0)):
+            orient = a[0] * b[1] - a[1] * b[0]
+            if abs(orient) < 1e-18:
+                continue
+            tri = (origin, a, b) if orient > 0 else (origin, b, a)
+            lo, hi = np.minimum.reduce(tri), np.maximum.reduce(tri)
+            hit = np.flatnonzero((rbox[:, 0] <= hi[0]) & (rbox[:, 2] >= lo[0]) & (rbox[:, 1] <= hi[1]) & (rbox[:, 3] >= lo[1]))
+            if not len(hit):
+                continue
+            cx, cy, cstarts = _take_rings(xs, ys, starts, hit)
+            for p, q in zip(tri, (tri[1], tri[2], tri[0])):
+                cx, cy, cstarts = _clip_halfplane(cx, cy, cstarts, p, q)
+            areas = np.abs(_ring_areas(cx, cy, cstarts)) * signs[hit]
+            overlap += math.copysign(1.0, orient) * np.bincount(ring_owner[hit], weights=areas, minlength=len(cand))
+
+        # Triangles sharing an edge with a feature leave rounding-error slivers
+        return [(int(f), float(o), float(fa)) for f, o, fa in zip(cand, overlap, feature_area) if o > 1e-9 * fa]
+
+
+def _ring_areas(xs, ys, starts) -> "np.ndarray":
+    """Signed shoelace area of each ring in a flat batch (counter-clockwise positive)."""
+    n = np.diff(starts)
+    if not len(xs):
+        return np.zeros(len(n))
+    ring_of = np.repeat(np.arange(len(n)), n)
+    nxt = np.arange(len(xs)) + 1
+    nonempty = n > 0
+    nxt[starts[1:][nonempty] - 1] = starts[:-1][nonempty]
+    cross = xs * ys[nxt] - xs[nxt] * ys
+    return np.bincount(ring_of, weights=cross, minlength=len(n)) / 2
+
+
+def _take_rings(xs, ys, starts, rings):
+    counts = starts[rings + 1] - starts[rings]
+    v = np.repeat(starts[rings], counts) + np.arange(counts.sum()) - np.repeat(_ring_offsets(counts)[:-1], counts)
+    return xs[v], ys[v], _ring_offsets(counts)
+
+
+def _clip_halfplane(xs, ys, starts, p, q):
+    """Clip every ring in a flat batch to the left of the directed line p -> q (one Sutherland-Hodgman step)."""
+    n = np.diff(starts)
+    if not len(xs):
+        return xs, ys, starts
+    ring_of = np.repeat(np.arange(len(n)), n)
+    prev = np.arange(len(xs)) - 1
+    nonempty = n > 0
+    prev[starts[:-1][nonempty]] = starts[1:][nonempty] - 1
+
+    d = (q[0] - p[0]) * (ys - p[1]) - (q[1] - p[1]) * (xs - p[0])
+    inside = d >= 0
+    crosses = inside != inside[prev]
+    # Edge prev -> cur emits its crossing point (if any), then cur (if inside)
+    emit = crosses.astype(np.int64) + inside
+    pos = np.cumsum(emit) - emit
+    out_x = np.empty(int(emit.sum()))
+    out_y = np.empty_like(out_x)
+
+    c = np.flatnonzero(crosses)
+    u = prev[c]
+    t = d[u] / (d[u] - d[c])
+    out_x[pos[c]] = xs[u] + t * (xs[c] - xs[u])
+    out_y[pos[c]] = ys[u] + t * (ys[c] - ys[u])
+    k = np.flatnonzero(inside)
+    out_x[pos[k] + crosses[k]] = xs[k]
+    out_y[pos[k] + crosses[k]] = ys[k]
+    return out_x, out_y, _ring_offsets(np.bincount(ring_of, weights=emit, minlength=len(n)).astype(np.int64))
+
+
+# ============================================================================
+# Submissions
+# ============================================================================
+
+
+def census_rows(layers: list[Layer], rows: list[dict]) -> list[dict]:
+    """submission_census rows for a page of submissions."""
+    out = []
+    point_owners, point_lng, point_lat, point_totals = [], [], [], {}
+    for row in rows:
+        ring = _extract_ring(row.get("geojson"))
+        if not _is_polygon(ring):
+            ring = _extract_ring(row.get("all_coordinates"))
+            if len(ring) >= 3:
+                ring = _star_ring(ring)
+        if _is_polygon(ring):
+            coi_area = abs(_ring_areas(*_as_batch(ring))[0])
+            if coi_area > 0:
+                out.extend(_area_rows(layers, row["id"], ring, coi_area))
+                continue
+        # Too few points for an area: weight by where the points fall
+        for lng, lat in ring:
+            point_owners.append(row["id"])
+            point_lng.append(lng)
+            point_lat.append(lat)
+        point_totals[row["id"]] = len(ring)
+
+    for layer in layers:
+        if not point_owners:
+            break
+        found = layer.locate(point_lng, point_lat)
+        shares: dict[tuple[str, int], int] = {}
+        for owner, feature in zip(point_owners, found):
+            if feature >= 0:
+                shares[(owner, int(feature))] = shares.get((owner, int(feature)), 0) + 1
+        for (owner, feature), hits in shares.items():
+            out.append({
+                "submission_id": owner, "layer": layer.name, "geoid": layer.ids[feature], "method": "point",
+                "overlap_sq_miles": 0.0, "feature_share": None, "submission_share": hits / point_totals[owner],
+            })
+    return out
+
+
+def _as_batch(ring):
+    pts = np.asarray(ring[:-1], dtype=np.float64)
+    pts = pts - pts.mean(axis=0)
+    return pts[:, 0], pts[:, 1], np.array([0, len(pts)])
+
+
+def _star_ring(points: list[tuple[float, float]]) -> list[tuple[float, float]]:
+    """Points ordered by angle around their center and closed, as supabase_backend._build_geojson does."""
+    cx = sum(x for x, _ in points) / len(points)
+    cy = sum(y for _, y in points) / len(points)
+    ordered = sorted(points, key=lambda p: math.atan2(p[1] - cy, p[0] - cx))
+    return ordered + [ordered[0]]
+
+
+def _area_rows(layers: list[Layer], submission_id: str, ring, coi_area: float) -> list[dict]:
+    lat = sum(y for _, y in ring[:-1]) / (len(ring) - 1)
+    sq_miles = SQ_MILES_PER_SQ_DEG_LAT * math.cos(math.radians(lat))
+    out = []
+    for layer in layers:
+        for feature, overlap, feature_area in layer.intersect(ring):
+            feature_share = min(overlap / feature_area, 1.0) if feature_area > 0 else None
+            submission_share = min(overlap / coi_area, 1.0)
+            if submission_share < MIN_SHARE and (feature_share or 0) < MIN_SHARE:
+                continue
+            out.append({
+                "submission_id": submission_id, "layer": layer.name, "geoid": layer.ids[feature], "method": "area",
+                "overlap_sq_miles": round(overlap * sq_miles, 6),
+                "feature_share": round(feature_share, 6) if feature_share is not None else None,
+                "submission_share": round(submission_share, 6),
+            })
+    return out
+
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+
+def load_layer(spec: str, cache_dir: Path | None) -> Layer:
+    """NAME=PATH[:ID_FIELD], loaded from the .npz cache when the source is unchanged."""
+    name, _, source = spec.partition("=")
+    path, _, id_field = source.partition(":")
+    path = Path(path)
+    if not name or not path.exists():
+        raise SystemExit(f"Bad --layer {spec!r}: expected NAME=PATH[:ID_FIELD] with an existing file")
+
+    cached = None
+    if cache_dir:
+        stat = path.stat()
+        key = hashlib.sha1(f"{path.resolve()}|{stat.st_size}|{stat.st_mtime}|{id_field}".encode()).hexdigest()[:12]
+        cached = cache_dir / f"{name}-{key}.npz"
+        if cached.exists():
+            layer = Layer.load(name, cached)
+            logger.info(f"Loaded {len(layer)} {name} features from {cached}")
+            return layer
+
+    started = time.perf_counter()
+    layer = Layer.read(name, path, id_field or None)
+    logger.info(f"Packed {len(layer)} {name} features ({len(layer.xs)} vertices) in {time.perf_counter() - started:.1f}s")
+    if cached:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        layer.save(cached)
+    return layer
+
+
+async def run(layers: list[Layer], filters: dict, out: Path | None, page_size: int) -> dict:
+    stats = {"submissions": 0, "rows": 0}
+    sink = open(out, "w", encoding="utf-8") if out else None
+    started = time.perf_counter()
+    try:
+        async for page in iter_submissions(select=SOURCE_COLUMNS, page_size=page_size, filters=filters):
+            rows = await asyncio.to_thread(census_rows, layers, page)
+            if sink:
+                sink.writelines(json.dumps(r) + "\n" for r in rows)
+            else:
+                await replace_submission_census([r["id"] for r in page], rows)
+            stats["submissions"] += len(page)
+            stats["rows"] += len(rows)
+            elapsed = time.perf_counter() - started
+            logger.info(f"{stats['submissions']} submissions, {stats['rows']} census rows ({stats['submissions'] / elapsed:.0f}/s)")
+    finally:
+        if sink:
+            sink.close()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Intersect submissions with census blocks, tracts and districts")
+    parser.add_argument("--layer", action="append", required=True, help="NAME=PATH[:ID_FIELD] (.shp or .geojson); repeatable")
+    parser.add_argument("--zipcode")
+    parser.add_argument("--state", help="Full state name, e.g. California")
+    parser.add_argument("--since", help="Only rows created at or after this ISO date/time")
+    parser.add_argument("--until", help="Only rows created before this ISO date/time")
+    parser.add_argument("--out", type=Path, help="Write NDJSON here instead of the submission_census table")
+    parser.add_argument("--cache-dir", type=Path, help="Keep packed layers here (.npz) for faster reruns")
+    parser.add_argument("--page-size", type=int, default=500)
+    args = parser.parse_args()
+    _require_numpy()
+
+    layers = [load_layer(spec, args.cache_dir) for spec in args.layer]
+    filters = build_filters(args.zipcode, args.state, args.since, args.until)
+    stats = asyncio.run(run(layers, filters, args.out, args.page_size))
+    target = args.out or "submission_census"
+    print(f"Intersected {stats['submissions']} submissions: {stats['rows']} rows written to {target}")
+
+
+if __name__ == "__main__":
+    main()
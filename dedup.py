@@ -0,0 +1,256 @@
+"""
+Duplicate detection - flags repeat and near-duplicate submissions at save time.
+
+Each submission is fingerprinted by normalized phone number and caller name,
+a MinHash signature of its free-text answers and its geohash cover cells.
+Candidates come from exact phone/name lookups and MinHash LSH buckets, so a
+lookup touches only a handful of rows no matter how large the table is.
+"""
+
+import asyncio
+import hashlib
+import re
+from dataclasses import dataclass
+
+from loguru import logger
+
+TEXT_FIELDS = (
+    "community_name",
+    "community_description",
+    "key_places",
+    "community_boundaries",
+    "cultural_interests",
+    "economic_interests",
+    "community_activities",
+)
+
+FINGERPRINT_COLUMNS = "id,created_at,phone_number,caller_name,cover_gh6," + ",".join(TEXT_FIELDS)
+
+NUM_PERM = 64
+LSH_BANDS = 16  # 16 bands x 4 rows: pairs above ~0.5 Jaccard collide with high probability
+SHINGLE_SIZE = 3  # word 3-grams
+
+# Score weights and thresholds. Text plus geo alone (TEXT + GEO = 0.65) can
+# cross the threshold, so a neighbor's near-verbatim copy of a community is
+# flagged even with a different phone and name; a shared phone and name alone
+# (0.35) is not enough.
+PHONE_WEIGHT = 0.25
+NAME_WEIGHT = 0.1
+TEXT_WEIGHT = 0.45
+GEO_WEIGHT = 0.2
+DUPLICATE_THRESHOLD = 0.6
+
+_PRIME = (1 << 61) - 1
+
+
+def _perm_params(n: int) -> list[tuple[int, int]]:
+    # Deterministic so signatures are comparable across processes and restarts
+    params = []
+    for i in range(n):
+        digest = hashlib.blake2b(f"minhash-{i}".encode(), digest_size=16).digest()
+        a = int.from_bytes(digest[:8], "big") % (_PRIME - 1) + 1
+        b = int.from_bytes(digest[8:], "big") % _PRIME
+        params.append((a, b))
+    return params
+
+
+_PERMS = _perm_params(NUM_PERM)
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def normalize_phone(phone: str | None) -> str:
+    """Last 10 digits of a phone number ('' if there aren't at least 7)."""
+    digits = re.sub(r"\D", "", phone or "")
+    return digits[-10:] if len(digits) >= 7 else ""
+
+
+def normalize_name(name: str | None) -> str:
+    """Lowercased caller name with punctuation and extra spaces removed."""
+    words = _WORD.findall((name or "").lower())
+    if not words or words in (["unknown"], ["skipped"], ["anonymous"]):
+        return ""
+    return " ".join(words)
+
+
+def shingles(text: str) -> set[str]:
+    words = _WORD.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i : i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def minhash(tokens: set[str]) -> tuple[int, ...]:
+    """MinHash signature of a shingle set (empty tuple for empty input)."""
+    if not tokens:
+        return ()
+    hashes = [int.from_bytes(hashlib.blake2b(t.encode(), digest_size=8).digest(), "big") for t in tokens]
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMS)
+
+
+def _similarity(a: tuple[int, ...], b: tuple[int, ...]) -> float:
+    if not a or not b:
+        return 0.0
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+@dataclass
+class Fingerprint:
+    phone: str
+    name: str
+    signature: tuple[int, ...]
+    cells: frozenset[str]
+
+
+def fingerprint(row: dict) -> Fingerprint:
+    """Fingerprint a submission row (or the answers dict passed to save_submission)."""
+    text = " ".join(str(row.get(f) or "") for f in TEXT_FIELDS)
+    return Fingerprint(
+        phone=normalize_phone(row.get("phone_number")),
+        name=normalize_name(row.get("caller_name")),
+        signature=minhash(shingles(text)),
+        cells=frozenset(row.get("cover_gh6") or ()),
+    )
+
+
+@dataclass
+class Match:
+    submission_id: str
+    score: float
+    reasons: list[str]
+
+
+class DedupIndex:
+    """Phone, name and MinHash-LSH lookups over submission fingerprints."""
+
+    def __init__(self):
+        self._entries: dict[str, Fingerprint] = {}
+        self._by_phone: dict[str, set[str]] = {}
+        self._by_name: dict[str, set[str]] = {}
+        self._buckets: dict[tuple[int, int], set[str]] = {}
+        self._rows_per_band = NUM_PERM // LSH_BANDS
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _band_keys(self, signature: tuple[int, ...]) -> list[tuple[int, int]]:
+        r = self._rows_per_band
+        return [(band, hash(signature[band * r : (band + 1) * r])) for band in range(LSH_BANDS)] if signature else []
+
+    def add(self, submission_id: str, fp: Fingerprint) -> None:
+        self._entries[submission_id] = fp
+        if fp.phone:
+            self._by_phone.setdefault(fp.phone, set()).add(submission_id)
+        if fp.name:
+            self._by_name.setdefault(fp.name, set()).add(submission_id)
+        for key in self._band_keys(fp.signature):
+            self._buckets.setdefault(key, set()).add(submission_id)
+
+    def add_rows(self, rows: list[dict]) -> None:
+        for row in rows:
+            self.add(row["id"], fingerprint(row))
+
+    def score(self, fp: Fingerprint, other: Fingerprint) -> tuple[float, list[str]]:
+        """Weighted duplicate score in [0, 1] with the signals that contributed."""
+        score = 0.0
+        reasons = []
+        if fp.phone and fp.phone == other.phone:
+            score += PHONE_WEIGHT
+            reasons.append("phone")
+        if fp.name and fp.name == other.name:
+            score += NAME_WEIGHT
+            reasons.append("name")
+        text = _similarity(fp.signature, other.signature)
+        if text > 0:
+            score += TEXT_WEIGHT * text
+            reasons.append(f"text={text:.2f}")
+        if fp.cells and other.cells:
+            geo = len(fp.cells & other.cells) / len(fp.cells | other.cells)
+            if geo > 0:
+                score += GEO_WEIGHT * geo
+                reasons.append(f"geo={geo:.2f}")
+        return round(score, 3), reasons
+
+    def find(self, fp: Fingerprint, exclude: str | None = None) -> list[Match]:
+        """Scored candidate duplicates, best first."""
+        candidates: set[str] = set()
+        if fp.phone:
+            candidates |= self._by_phone.get(fp.phone, set())
+        if fp.name:
+            candidates |= self._by_name.get(fp.name, set())
+        for key in self._band_keys(fp.signature):
+            candidates |= self._buckets.get(key, set())
+        candidates.discard(exclude)
+
+        matches = []
+        for sid in candidates:
+            score, reasons = self.score(fp, self._entries[sid])
+            matches.append(Match(sid, score, reasons))
+        matches.sort(key=lambda m: -m.score)
+        return matches
+
+    def best_duplicate(self, fp: Fingerprint, threshold: float = DUPLICATE_THRESHOLD) -> Match | None:
+        matches = self.find(fp)
+        if matches and matches[0].score >= threshold:
+            return matches[0]
+        return None
+
+
+# Process-wide index, loaded in the background and kept current by save_submission
+_INDEX: DedupIndex | None = None
+_LOAD_LOCK: asyncio.Lock | None = None
+_LOAD_TASK: asyncio.Task | None = None
+# Saves made while ensure_loaded() pages through the table, applied once it finishes
+_PENDING: dict[str, Fingerprint] | None = None
+
+
+def current_index() -> DedupIndex | None:
+    """The loaded process-wide index, or None if it hasn't finished loading."""
+    return _INDEX
+
+
+def add_submission(submission_id: str, fp: Fingerprint) -> None:
+    """Add a saved submission to the process-wide index, or queue it while the index loads."""
+    if _INDEX is not None:
+        _INDEX.add(submission_id, fp)
+    elif _PENDING is not None:
+        _PENDING[submission_id] = fp
+
+
+async def ensure_loaded() -> DedupIndex | None:
+    """Load the process-wide index from the submissions table once. Safe to call per call.
+
+    Submissions saved while the pages load (add_submission) are applied at the end.
+    """
+    global _INDEX, _LOAD_LOCK, _PENDING
+    if _INDEX is not None:
+        return _INDEX
+    if _LOAD_LOCK is None:
+        _LOAD_LOCK = asyncio.Lock()
+
+    async with _LOAD_LOCK:
+        if _INDEX is not None:
+            return _INDEX
+        from supabase_backend import iter_submissions
+
+        index = DedupIndex()
+        _PENDING = {}
+        try:
+            async for page in iter_submissions(select=FINGERPRINT_COLUMNS):
+                index.add_rows(page)
+            for submission_id, fp in _PENDING.items():
+                index.add(submission_id, fp)
+        except Exception as e:
+            logger.error(f"Dedup index load failed: {e}")
+            return None
+        finally:
+            _PENDING = None
+        _INDEX = index
+        logger.info(f"Dedup index loaded with {len(index)} submissions")
+        return _INDEX
+
+
+def start_loading() -> None:
+    """Kick off ensure_loaded() in the background if the index isn't loaded yet."""
+    global _LOAD_TASK
+    if _INDEX is None and (_LOAD_TASK is None or _LOAD_TASK.done()):
+        _LOAD_TASK = asyncio.get_running_loop().create_task(ensure_loaded())
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Export submissions to GeoJSON, NDJSON or Parquet.
+
+Streams pages from /rest/v1/submissions (keyset pagination on created_at/id)
+through a generator pipeline into the output file, so memory stays constant
+regardless of table size. Progress is checkpointed after every page (every
+part file for Parquet); re-running the same command resumes where an
+interrupted export stopped.
+
+    uv run python export.py --format geojson --out mission.geojson --zipcode 94110
+    uv run python export.py --format parquet --out ca.parquet --state California --since 2026-01-01
+"""
+
+import argparse
+import asyncio
+import json
+import os
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import AsyncIterator, Iterable, Iterator
+
+from dotenv import load_dotenv
+from loguru import logger
+
+load_dotenv()
+
+from supabase_backend import _ZIP_TO_STATE, _init_zip_to_state, iter_submissions
+
+FORMATS = ("geojson", "ndjson", "parquet")
+
+# Caller contact details are left out of exports unless explicitly requested
+CONTACT_COLUMNS = ("phone_number",)
+
+GEOMETRY_COLUMNS = ("geojson",)
+
+# Parquet output is rolled into part files of this many pages each
+PARQUET_PAGES_PER_PART = 100
+
+# Parquet column types for submission columns that aren't plain text
+# ("json" columns are nested payloads; see ParquetWriter._arrow_type)
+PARQUET_COLUMN_TYPES = {
+    "created_at": "timestamp",
+    "consent": "bool",
+    "duplicate_score": "float",
+    "all_coordinates": "json",
+    "geojson": "json",
+    "cover_gh5": "text[]",
+    "cover_gh6": "text[]",
+    "cover_gh7": "text[]",
+}
+
+
+def build_filters(
+    zipcode: str | None = None,
+    state: str | None = None,
+    since: str | None = None,
+    until: str | None = None,
+) -> dict:
+    """Translate export filters into PostgREST query params."""
+    conditions = []
+    if zipcode:
+        conditions.append(f"zipcode.eq.{zipcode}")
+    if since:
+        conditions.append(f'created_at.gte."{since}"')
+    if until:
+        conditions.append(f'created_at.lt."{until}"')
+    if state:
+        _init_zip_to_state()
+        prefixes = sorted(p for p, s in _ZIP_TO_STATE.items() if s.lower() == state.lower())
+        if not prefixes:
+            raise ValueError(f"Unknown state: {state}")
+        conditions.append("or(" + ",".join(f"zipcode.like.{p}*" for p in prefixes) + ")")
+
+    if not conditions:
+        return {}
+    return {"and": f"({','.join(conditions)})"}
+
+
+async def stream_rows(
+    filters: dict,
+    after: tuple[str, str] | None,
+    page_size: int,
+) -> AsyncIterator[list[dict]]:
+    """Yield pages of submission rows after the given keyset cursor."""
+    async for page in iter_submissions(page_size=page_size, after=after, filters=filters):
+        yield page
+
+
+def strip_columns(rows: Iterable[dict], drop: tuple[str, ...]) -> Iterator[dict]:
+    for row in rows:
+        yield {k: v for k, v in row.items() if k not in drop}
+
+
+def to_features(rows: Iterable[dict]) -> Iterator[dict]:
+    """Convert submission rows into GeoJSON Features (polygon geometry, other columns as properties)."""
+    for row in rows:
+        feature = row.get("geojson") or {}
+        properties = {k: v for k, v in row.items() if k not in GEOMETRY_COLUMNS}
+        yield {
+            "type": "Feature",
+            "id": row["id"],
+            "geometry": feature.get("geometry"),
+            "properties": properties,
+        }
+
+
+class _TextWriter(ABC):
+    """Shared append/truncate handling for the line-oriented formats."""
+
+    def __init__(self, path: Path, offset: int | None):
+        self.path = path
+        if offset is None:
+            self.fh = open(path, "w", encoding="utf-8")
+            self.start()
+        else:
+            self.fh = open(path, "r+", encoding="utf-8")
+            # Drop anything written after the last checkpoint
+            self.fh.truncate(offset)
+            self.fh.seek(offset)
+
+    def start(self):
+        pass
+
+    @abstractmethod
+    def write_page(self, rows: list[dict]) -> None:
+        """Append one page of rows."""
+
+    def sealed(self) -> bool:
+        return True
+
+    def offset(self) -> int:
+        self.fh.flush()
+        os.fsync(self.fh.fileno())
+        return self.fh.tell()
+
+    def finish(self) -> None:
+        self.fh.close()
+
+
+class NdjsonWriter(_TextWriter):
+    def write_page(self, rows: list[dict]) -> None:
+        self.fh.writelines(json.dumps(row, default=str) + "\n" for row in rows)
+
+
+class GeoJsonWriter(_TextWriter):
+    """Writes a FeatureCollection one feature at a time; the closing bracket is written on finish."""
+
+    def __init__(self, path: Path, offset: int | None):
+        super().__init__(path, offset)
+        self.first = offset is None or offset <= len(self._header())
+
+    @staticmethod
+    def _header() -> str:
+        return '{"type": "FeatureCollection", "features": [\n'
+
+    def start(self):
+        self.fh.write(self._header())
+
+    def write_page(self, rows: list[dict]) -> None:
+        for feature in to_features(rows):
+            if not self.first:
+                self.fh.write(",\n")
+            self.fh.write(json.dumps(feature, default=str))
+            self.first = False
+
+    def finish(self) -> None:
+        self.fh.write("\n]}\n")
+        self.fh.close()
+
+
+class ParquetWriter:
+    """Columnar output via pyarrow, one row group per page.
+
+    Parquet files can't be appended to, so output is rolled into numbered part
+    files (out-00000.parquet, out-00001.parquet, ...) and a checkpoint is only
+    taken when a part is sealed. A resumed export rewrites the unsealed part.
+    """
+
+    def __init__(self, path: Path, part: int, pages_per_part: int = PARQUET_PAGES_PER_PART):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquet export requires pyarrow: uv pip install pyarrow")
+
+        self.pa = pa
+        self.pq = pq
+        self.base = path
+        self.part = part
+        self.pages_per_part = pages_per_part
+        self.pages = 0
+        self.schema = None
+        self.writer = None
+
+    def _part_path(self) -> Path:
+        return self.base.with_name(f"{self.base.stem}-{self.part:05d}{self.base.suffix or '.parquet'}")
+
+    def _arrow_type(self, kind: str):
+        pa = self.pa
+        if kind == "timestamp":
+            return pa.timestamp("us", tz="UTC")
+        if kind == "bool":
+            return pa.bool_()
+        if kind == "int":
+            return pa.int64()
+        if kind == "float":
+            return pa.float64()
+        if kind == "text[]":
+            return pa.list_(pa.string())
+        if kind == "json":
+            # Parquet's JSON logical type (pyarrow 19+); plain text before that
+            return pa.json_(pa.string()) if hasattr(pa, "json_") else pa.string()
+        return pa.string()
+
+    @staticmethod
+    def _infer_kind(values: list) -> str:
+        """Column kind for columns not in PARQUET_COLUMN_TYPES, from the first non-null value."""
+        value = next((v for v in values if v is not None), None)
+        if isinstance(value, bool):
+            return "bool"
+        if isinstance(value, int):
+            return "int"
+        if isinstance(value, float):
+            return "float"
+        if isinstance(value, (dict, list)):
+            return "json"
+        return "text"
+
+    def _schema(self, rows: list[dict]):
+        pa = self.pa
+        fields = []
+        for name in rows[0]:
+            kind = PARQUET_COLUMN_TYPES.get(name) or self._infer_kind([row.get(name) for row in rows])
+            fields.append(pa.field(name, self._arrow_type(kind)))
+        return pa.schema(fields)
+
+    def _column(self, field, values: list):
+        pa = self.pa
+        if pa.types.is_timestamp(field.type):
+            # PostgREST returns ISO 8601 text; arrow parses the offsets
+            return pa.array([None if v is None else str(v) for v in values], pa.string()).cast(field.type)
+        if field.type in (pa.string(), self._arrow_type("json")):
+            values = [v if v is None or isinstance(v, str) else json.dumps(v, default=str) for v in values]
+        elif pa.types.is_floating(field.type):
+            values = [None if v is None else float(v) for v in values]
+        return pa.array(values, field.type)
+
+    def write_page(self, rows: list[dict]) -> None:
+        if self.schema is None:
+            self.schema = self._schema(rows)
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(str(self._part_path()), self.schema, compression="zstd")
+
+        columns = [self._column(field, [row.get(field.name) for row in rows]) for field in self.schema]
+        self.writer.write_table(self.pa.Table.from_arrays(columns, schema=self.schema))
+
+        self.pages += 1
+        if self.pages >= self.pages_per_part:
+            self.writer.close()
+            self.writer = None
+            self.pages = 0
+            self.part += 1
+
+    def sealed(self) -> bool:
+        return self.writer is None
+
+    def offset(self) -> int:
+        return 0
+
+    def finish(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+
+
+def _checkpoint_path(out: Path) -> Path:
+    return out.with_name(out.name + ".checkpoint.json")
+
+
+async def export(
+    out: Path,
+    fmt: str,
+    filters: dict,
+    include_contact: bool = False,
+    page_size: int = 1000,
+) -> int:
+    """Run (or resume) an export. Returns the total number of rows written."""
+    checkpoint_file = _checkpoint_path(out)
+    checkpoint = None
+    if checkpoint_file.exists():
+        checkpoint = json.loads(checkpoint_file.read_text())
+        if checkpoint.get("format") != fmt or checkpoint.get("filters") != filters:
+            raise SystemExit(f"{checkpoint_file} belongs to a different export; delete it to start over")
+        logger.info(f"Resuming export after {checkpoint['count']} rows")
+
+    after = tuple(checkpoint["after"]) if checkpoint and checkpoint.get("after") else None
+    count = checkpoint["count"] if checkpoint else 0
+
+    if fmt == "parquet":
+        writer = ParquetWriter(out, part=checkpoint["part"] if checkpoint else 0)
+    elif fmt == "geojson":
+        writer = GeoJsonWriter(out, checkpoint["offset"] if checkpoint else None)
+    else:
+        writer = NdjsonWriter(out, checkpoint["offset"] if checkpoint else None)
+
+    drop = () if include_contact else CONTACT_COLUMNS
+    async for page in stream_rows(filters, after, page_size):
+        writer.write_page(list(strip_columns(page, drop)))
+        count += len(page)
+        if not writer.sealed():
+            continue
+        checkpoint_file.write_text(json.dumps({
+            "format": fmt,
+            "filters": filters,
+            "after": [page[-1]["created_at"], page[-1]["id"]],
+            "count": count,
+            "offset": writer.offset(),
+            "part": getattr(writer, "part", 0),
+        }))
+        logger.info(f"Exported {count} rows")
+
+    writer.finish()
+    checkpoint_file.unlink(missing_ok=True)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export submissions to GeoJSON, NDJSON or Parquet")
+    parser.add_argument("--format", choices=FORMATS, default="geojson")
+    parser.add_argument("--out", required=True, type=Path)
+    parser.add_argument("--zipcode")
+    parser.add_argument("--state", help="Full state name, e.g. California")
+    parser.add_argument("--since", help="Only rows created at or after this ISO date/time")
+    parser.add_argument("--until", help="Only rows created before this ISO date/time")
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--include-contact", action="store_true", help="Include caller phone numbers")
+    args = parser.parse_args()
+
+    filters = build_filters(args.zipcode, args.state, args.since, args.until)
+    total = asyncio.run(export(args.out, args.format, filters, args.include_contact, args.page_size))
+    print(f"Exported {total} submissions to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
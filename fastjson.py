@@ -0,0 +1,85 @@
+"""
+Fast JSON - one encode/decode entry point for request bodies, API responses,
+tool results and local stores.
+
+Uses orjson or msgspec when installed (the "fast" extra) and falls back to
+the stdlib json module otherwise; FASTJSON_BACKEND=orjson|msgspec|json picks
+one explicitly. All backends produce compact UTF-8 JSON; objects with a
+to_dict() (e.g. GeoPoint) are encoded through it and anything else unknown is
+encoded as str(). msgspec encodes dataclasses natively, so with msgspec
+objects with a to_dict() are converted before encoding.
+"""
+
+import json
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+_AVAILABLE = {"orjson": orjson is not None, "msgspec": msgspec is not None, "json": True}
+
+BACKEND = os.getenv("FASTJSON_BACKEND", "")
+if not _AVAILABLE.get(BACKEND):
+    BACKEND = next(name for name, available in _AVAILABLE.items() if available)
+
+_SCALARS = (str, int, float, bool, type(None))
+
+
+def _default(value):
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    return str(value)
+
+
+def _to_dicts(value):
+    """`value` with every object that has a to_dict() replaced by its dict."""
+    if isinstance(value, _SCALARS):
+        return value
+    if isinstance(value, dict):
+        return {k: _to_dicts(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_dicts(v) for v in value]
+    if hasattr(value, "to_dict"):
+        return _to_dicts(value.to_dict())
+    return value
+
+
+if BACKEND == "orjson":
+    _ORJSON_OPTS = orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTS)
+
+    def loads(data: bytes | str):
+        return orjson.loads(data)
+
+elif BACKEND == "msgspec":
+    _ENCODER = msgspec.json.Encoder(enc_hook=_default)
+    _DECODER = msgspec.json.Decoder()
+
+    def dumps(obj) -> bytes:
+        return _ENCODER.encode(_to_dicts(obj))
+
+    def loads(data: bytes | str):
+        return _DECODER.decode(data)
+
+else:
+    _ENCODER = json.JSONEncoder(default=_default, separators=(",", ":"), ensure_ascii=False)
+
+    def dumps(obj) -> bytes:
+        return _ENCODER.encode(obj).encode()
+
+    def loads(data: bytes | str):
+        return json.loads(data)
+
+
+def dumps_str(obj) -> str:
+    """dumps() as text, for SQLite columns and tool results."""
+    return dumps(obj).decode()
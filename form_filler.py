@@ -10,13 +10,16 @@ import yaml
 
 from line.llm_agent import ToolEnv, loopback_tool
 
+import fastjson
+
 
 class FormFiller:
     """Loads questions from YAML and provides a loopback tool for recording answers."""
 
-    def __init__(self, form_path: str, system_prompt: str):
+    def __init__(self, form_path: str, system_prompt: str, session=None):
         self.form_path = form_path
         self.system_prompt = system_prompt
+        self.session = session
         self._config = self._load_config()
         self._questions = self._flatten_questions(self._config["questionnaire"]["questions"])
         self._answers: dict = {}
@@ -39,6 +42,19 @@ class FormFiller:
                 flattened.append(q)
         return flattened
 
+    def restore(self, answers: dict, current_index: int) -> None:
+        """Resume from a saved session (see session_store)."""
+        self._answers = dict(answers)
+        self._current_index = min(current_index, len(self._questions))
+        logger.info(f"FormFiller restored with {len(self._answers)} answers")
+
+    def set_answers(self, answers: dict) -> None:
+        """Fill in many answers at once and mark the form complete (used by the demo)."""
+        self._answers.update(answers)
+        self._current_index = len(self._questions)
+        if self.session:
+            self.session.record_answers(answers, self._current_index)
+
     def _should_show_question(self, question: dict) -> bool:
         if "dependsOn" not in question:
             return True
@@ -135,7 +151,8 @@ class FormFiller:
             Do NOT call if the user said something unrelated or unclear.
             """
 
-            return form._record_answer(answer)
+            # Encoded once here; the LLM layer would otherwise re-encode the dict on every later turn
+            return fastjson.dumps_str(form._record_answer(answer))
 
         return record_answer
 
@@ -239,6 +256,8 @@ You are conducting a questionnaire to collect information from the user.
 
         self._answers[q["id"]] = processed
         self._current_index += 1
+        if self.session:
+            self.session.record_answer(q["id"], processed, self._current_index)
         logger.info(f"Recorded '{q['id']}': {processed}")
 
         next_q = self._get_current_question()
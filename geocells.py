@@ -0,0 +1,152 @@
+"""
+Geocells - hierarchical geohash cell IDs for submissions.
+
+Each submission is tagged with the geohash of its centroid and the set of cells
+its polygon covers at a few resolutions, so heat maps and density queries can
+run as indexed GROUP BY queries instead of decoding all_coordinates JSON.
+"""
+
+from spatial_index import _extract_ring, _is_polygon, _point_in_ring, _rings_intersect
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_DECODE = {c: i for i, c in enumerate(_BASE32)}
+
+# Resolutions stored per submission: ~4.9km, ~1.2km and ~150m cells
+COVER_PRECISIONS = (5, 6, 7)
+
+# Skip a cover resolution rather than store a huge array for very large
+# polygons. Finer cells get more room: a ~3km neighborhood is ~18 gh6 cells
+# but ~500 gh7 cells, and gh7 holds up to a ~6km square.
+MAX_COVER_CELLS = {5: 512, 6: 1024, 7: 2048}
+
+
+def encode(lat: float, lng: float, precision: int = 9) -> str:
+    """Encode a point as a geohash string."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            if lng >= mid:
+                value = (value << 1) | 1
+                lng_lo = mid
+            else:
+                value <<= 1
+                lng_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                value = (value << 1) | 1
+                lat_lo = mid
+            else:
+                value <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+
+def bounds(geohash: str) -> tuple[float, float, float, float]:
+    """Return (min_lng, min_lat, max_lng, max_lat) of a geohash cell."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    even = True
+    for ch in geohash:
+        value = _DECODE[ch]
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            if even:
+                mid = (lng_lo + lng_hi) / 2
+                if bit:
+                    lng_lo = mid
+                else:
+                    lng_hi = mid
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                if bit:
+                    lat_lo = mid
+                else:
+                    lat_hi = mid
+            even = not even
+    return lng_lo, lat_lo, lng_hi, lat_hi
+
+
+def cell_size(precision: int) -> tuple[float, float]:
+    """(width, height) of a cell in degrees at the given precision."""
+    lng_bits = (5 * precision + 1) // 2
+    lat_bits = (5 * precision) // 2
+    return 360.0 / (1 << lng_bits), 180.0 / (1 << lat_bits)
+
+
+def cover(geometry, precision: int, max_cells: int | None = None) -> list[str]:
+    """Geohash cells at `precision` intersecting a polygon (or containing its points).
+
+    Returns an empty list if the cover would exceed `max_cells` (by default
+    MAX_COVER_CELLS for the precision).
+    """
+    if max_cells is None:
+        max_cells = MAX_COVER_CELLS.get(precision, 512)
+    ring = _extract_ring(geometry)
+    if not ring:
+        return []
+
+    if not _is_polygon(ring):
+        cells = {encode(lat, lng, precision) for lng, lat in ring}
+        return sorted(cells) if len(cells) <= max_cells else []
+
+    width, height = cell_size(precision)
+    lngs = [p[0] for p in ring]
+    lats = [p[1] for p in ring]
+    # Snap the scan origin to the cell grid so each step lands on one cell
+    x0 = (min(lngs) + 180.0) // width * width - 180.0
+    y0 = (min(lats) + 90.0) // height * height - 90.0
+    nx = int((max(lngs) - x0) // width) + 1
+    ny = int((max(lats) - y0) // height) + 1
+    if nx * ny > max_cells * 4:
+        return []
+
+    cells = []
+    for i in range(nx):
+        for j in range(ny):
+            cx = x0 + (i + 0.5) * width
+            cy = y0 + (j + 0.5) * height
+            if _point_in_ring(cx, cy, ring):
+                cells.append(encode(cy, cx, precision))
+            else:
+                lo_x, lo_y = cx - width / 2, cy - height / 2
+                box = [(lo_x, lo_y), (lo_x + width, lo_y), (lo_x + width, lo_y + height), (lo_x, lo_y + height), (lo_x, lo_y)]
+                if _rings_intersect(ring, box):
+                    cells.append(encode(cy, cx, precision))
+            if len(cells) > max_cells:
+                return []
+    return sorted(cells)
+
+
+def cell_columns(coordinates: list[dict] | None, geojson: dict | None) -> dict:
+    """Geohash columns for a submission row, computed from its points and polygon."""
+    columns: dict = {"centroid_geohash": None}
+    for precision in COVER_PRECISIONS:
+        columns[f"centroid_gh{precision}"] = None
+        columns[f"cover_gh{precision}"] = None
+
+    if not coordinates:
+        return columns
+
+    lat = sum(c["lat"] for c in coordinates) / len(coordinates)
+    lng = sum(c["lng"] for c in coordinates) / len(coordinates)
+    centroid = encode(lat, lng, 9)
+    columns["centroid_geohash"] = centroid
+
+    geometry = geojson or coordinates
+    for precision in COVER_PRECISIONS:
+        columns[f"centroid_gh{precision}"] = centroid[:precision]
+        columns[f"cover_gh{precision}"] = cover(geometry, precision) or None
+    return columns
@@ -3,8 +3,15 @@ Geocoding tool - converts verbal community boundary descriptions into geographic
 using the Google Maps Geocoding API during a live voice call.
 """
 
+import asyncio
+import json
 import os
 import math
+import sqlite3
+import statistics
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from typing import Annotated
 
 import httpx
@@ -12,31 +19,262 @@ from loguru import logger
 
 from line.llm_agent import ToolEnv, loopback_tool
 
+import fastjson
+import landmarks as landmark_parser
+import metrics
+import quota
+import traces
+
 GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY", "")
 GEOCODE_URL = "https://maps.googleapis.com/maps/api/geocode/json"
 
+# Optional SQLite file so cached geocodes survive restarts and are shared with batch jobs
+GEOCODE_CACHE_PATH = os.getenv("GEOCODE_CACHE_PATH", "")
+
+# Caps on landmarks geocoded per call to limit API usage (most geocodable first)
+MAX_BOUNDARY_LANDMARKS = 6
+MAX_KEY_PLACES = 4
+
+# Candidate scoring: results are rated by location_type, penalized for partial
+# matches and for distance from the zip centroid, and dropped entirely beyond
+# AREA_RADIUS_FACTOR zip radii (landmarks like "Castro" also exist elsewhere).
+MAX_CANDIDATES = 5
+LOCATION_TYPE_SCORES = {
+    "ROOFTOP": 1.0,
+    "RANGE_INTERPOLATED": 0.9,
+    "GEOMETRIC_CENTER": 0.8,
+    "APPROXIMATE": 0.6,
+}
+PARTIAL_MATCH_FACTOR = 0.7
+AREA_RADIUS_FACTOR = 3.0
+MIN_AREA_RADIUS_MILES = 3.0
+MIN_CANDIDATE_SCORE = 0.2
+
+# Median-absolute-deviation outlier filter over a call's geocoded points
+MAD_MIN_POINTS = 4
+MAD_THRESHOLD = 3.0
+MAD_FLOOR_MILES = 0.75  # neighborhoods a mile or two apart are normal
+
+metrics.describe("geocode_requests", "Geocoding API requests sent")
+metrics.describe("geocode_cache_hits", "Geocode lookups answered from the cache")
+metrics.describe("geocode_rejected", "Lookups whose candidates all scored too low or were too far from the zip")
+metrics.describe("geocode_no_result", "Lookups with no candidates")
+metrics.describe("geocode_outliers", "Points dropped by the MAD outlier filter")
+metrics.describe("geocode_score", "Score of accepted geocode candidates")
+
+
+class GeocodeCache:
+    """Geocode results keyed by normalized query string.
+
+    Keeps an LRU in memory and, if a path is given, persists entries to SQLite.
+    Misses (None results) are cached too so junk fragments aren't re-queried.
+    """
+
+    def __init__(self, path: str | None = None, max_entries: int = 50_000):
+        self.max_entries = max_entries
+        self._mem: OrderedDict[str, dict | None] = OrderedDict()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("pragma journal_mode=wal")
+            self._db.execute(
+                "create table if not exists geocode_cache (query text primary key, result text, updated_at real)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def _key(address: str) -> str:
+        return " ".join(address.lower().split())
+
+    def get(self, address: str) -> tuple[bool, dict | None]:
+        """Return (hit, result)."""
+        key = self._key(address)
+        if key in self._mem:
+            self._mem.move_to_end(key)
+            return True, self._mem[key]
+        if self._db is not None:
+            row = self._db.execute("select result from geocode_cache where query = ?", (key,)).fetchone()
+            if row is not None:
+                result = fastjson.loads(row[0]) if row[0] else None
+                self._remember(key, result)
+                return True, result
+        return False, None
+
+    def put(self, address: str, result: dict | None) -> None:
+        key = self._key(address)
+        self._remember(key, result)
+        if self._db is not None:
+            self._db.execute(
+                "insert or replace into geocode_cache values (?, ?, ?)",
+                (key, fastjson.dumps_str(result) if result else None, time.time()),
+            )
+            self._db.commit()
+
+    def _remember(self, key: str, result: dict | None) -> None:
+        self._mem[key] = result
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+
+class RateLimiter:
+    """Token bucket limiting outbound geocode requests.
+
+    A standalone limiter for benchmarks and tests; the pipelines share
+    quota.QuotaScheduler so live calls and batch jobs draw on one budget.
+
+    `rate` is requests per second, `concurrency` caps requests in flight and
+    `budget` (optional) is the total number of requests allowed before
+    acquire() starts returning False.
+    """
+
+    def __init__(self, rate: float = 50.0, concurrency: int = 10, budget: int | None = None):
+        self.rate = rate
+        self.budget = budget
+        self.used = 0
+        self.waiting = 0  # requests queued for a token or an in-flight slot
+        self._tokens = rate
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self._inflight = asyncio.Semaphore(concurrency)
+
+    async def acquire(self) -> bool:
+        self.waiting += 1
+        try:
+            async with self._lock:
+                if self.budget is not None and self.used >= self.budget:
+                    return False
+                while True:
+                    now = time.monotonic()
+                    self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        break
+                    await asyncio.sleep((1 - self._tokens) / self.rate)
+                self.used += 1
+            await self._inflight.acquire()
+            return True
+        finally:
+            self.waiting -= 1
+
+    def release(self) -> None:
+        self._inflight.release()
+
+
+_CACHE = GeocodeCache(GEOCODE_CACHE_PATH or None)
+
+
+@dataclass(slots=True)
+class GeoPoint:
+    """A geocoded location. Slotted: a call creates a dozen of these, a batch run millions."""
+
+    lat: float
+    lng: float
+    formatted_address: str = ""
+    score: float | None = None
+
+    def to_dict(self) -> dict:
+        """The stored {lat, lng, formatted_address} form."""
+        return {"lat": self.lat, "lng": self.lng, "formatted_address": self.formatted_address}
+
+
+def as_points(value) -> list[GeoPoint]:
+    """GeoPoints from a list of GeoPoints or stored coordinate dicts (or a legacy JSON string of them)."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            return []
+    return [
+        p if isinstance(p, GeoPoint) else GeoPoint(p["lat"], p["lng"], p.get("formatted_address", ""))
+        for p in value
+    ]
+
 
-async def _geocode(client: httpx.AsyncClient, address: str) -> dict | None:
-    """Geocode a single address string. Returns {lat, lng, formatted_address} or None."""
+def _parse_candidates(data: dict) -> list[dict] | None:
+    """All results of a geocode response as {lat, lng, formatted_address, location_type, partial_match}.
+
+    ZERO_RESULTS is a real answer ([]); any other non-OK status (OVER_QUERY_LIMIT,
+    REQUEST_DENIED, UNKNOWN_ERROR, ...) is a failed request and returns None.
+    """
+    status = data.get("status")
+    if status == "ZERO_RESULTS":
+        return []
+    if status != "OK":
+        metrics.incr("geocode_errors")
+        logger.warning(f"Geocode request failed with status {status}: {data.get('error_message', '')}")
+        return None
+    candidates = []
+    for result in data.get("results", [])[:MAX_CANDIDATES]:
+        geometry = result["geometry"]
+        loc = geometry["location"]
+        candidate = {
+            "lat": loc["lat"],
+            "lng": loc["lng"],
+            "formatted_address": result["formatted_address"],
+            "location_type": geometry.get("location_type", "APPROXIMATE"),
+            "partial_match": bool(result.get("partial_match")),
+        }
+        viewport = geometry.get("bounds") or geometry.get("viewport")
+        if viewport:
+            candidate["viewport"] = viewport
+        candidates.append(candidate)
+    return candidates
+
+
+async def _geocode_candidates(
+    client: httpx.AsyncClient,
+    address: str,
+    area: dict | None = None,
+) -> list[dict] | None:
+    """All candidate results for an address, biased towards `area` if given.
+
+    Returns None (not []) when the request itself failed so failures aren't cached.
+    """
+    params = {"address": address, "key": GOOGLE_MAPS_API_KEY}
+    if area:
+        params["bounds"] = "{south},{west}|{north},{east}".format(**area["bounds"])
+    metrics.incr("geocode_requests")
     try:
-        resp = await client.get(
-            GEOCODE_URL,
-            params={"address": address, "key": GOOGLE_MAPS_API_KEY},
-        )
-        data = resp.json()
-        if data.get("status") == "OK" and data.get("results"):
-            result = data["results"][0]
-            loc = result["geometry"]["location"]
-            return {
-                "lat": loc["lat"],
-                "lng": loc["lng"],
-                "formatted_address": result["formatted_address"],
-            }
+        resp = await client.get(GEOCODE_URL, params=params)
+        return _parse_candidates(fastjson.loads(resp.content))
     except Exception as e:
+        metrics.incr("geocode_errors")
         logger.warning(f"Geocode failed for '{address}': {e}")
     return None
 
 
+def _score_candidate(candidate: dict, area: dict | None) -> float:
+    """Quality score in [0, 1]; 0 means the candidate should be discarded."""
+    score = LOCATION_TYPE_SCORES.get(candidate.get("location_type"), 0.5)
+    if candidate.get("partial_match"):
+        score *= PARTIAL_MATCH_FACTOR
+    if area:
+        dist = _haversine_miles(area["lat"], area["lng"], candidate["lat"], candidate["lng"])
+        limit = max(area["radius_miles"] * AREA_RADIUS_FACTOR, MIN_AREA_RADIUS_MILES)
+        if dist > limit:
+            return 0.0
+        score *= 1 - 0.5 * dist / limit
+    return round(score, 3)
+
+
+def best_candidate(candidates: list[dict], area: dict | None = None) -> GeoPoint | None:
+    """Highest-scoring candidate, or None if none pass."""
+    best, best_score = None, 0.0
+    for candidate in candidates:
+        score = _score_candidate(candidate, area)
+        if score > best_score:
+            best, best_score = candidate, score
+    if best is None or best_score < MIN_CANDIDATE_SCORE:
+        metrics.incr("geocode_rejected" if candidates else "geocode_no_result")
+        return None
+    metrics.observe("geocode_score", best_score)
+    return GeoPoint(best["lat"], best["lng"], best["formatted_address"], best_score)
+
+
 def _haversine_miles(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
     """Great-circle distance between two points in miles."""
     R = 3958.8  # Earth radius in miles
@@ -51,24 +289,339 @@ def _haversine_miles(lat1: float, lng1: float, lat2: float, lng2: float) -> floa
     return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
 
 
-def _bounding_box_area_sq_miles(points: list[dict]) -> float:
+def _bounding_box_area_sq_miles(points: list[GeoPoint]) -> float:
     """Rough area from bounding box of geocoded points."""
     if len(points) < 2:
         return 0.0
-    lats = [p["lat"] for p in points]
-    lngs = [p["lng"] for p in points]
+    lats = [p.lat for p in points]
+    lngs = [p.lng for p in points]
     width = _haversine_miles(min(lats), min(lngs), min(lats), max(lngs))
     height = _haversine_miles(min(lats), min(lngs), max(lats), min(lngs))
     return round(width * height, 2)
 
 
-def _center_point(points: list[dict]) -> dict:
+def _center_point(points: list[GeoPoint]) -> dict:
     """Average lat/lng of a set of points."""
-    avg_lat = sum(p["lat"] for p in points) / len(points)
-    avg_lng = sum(p["lng"] for p in points) / len(points)
+    avg_lat = sum(p.lat for p in points) / len(points)
+    avg_lng = sum(p.lng for p in points) / len(points)
     return {"lat": round(avg_lat, 6), "lng": round(avg_lng, 6)}
 
 
+async def _geocode_cached(
+    client: httpx.AsyncClient,
+    address: str,
+    cache: GeocodeCache | None = None,
+    limiter: RateLimiter | quota.Lane | None = None,
+    area: dict | None = None,
+) -> GeoPoint | None:
+    """Best candidate for an address, with candidates fetched behind the cache and rate limiter.
+
+    Returns None if nothing scores well enough or the quota budget is spent.
+    """
+    candidates = await _cached_candidates(client, address, cache, limiter, area)
+    return best_candidate(candidates or [], area)
+
+
+async def _cached_candidates(
+    client: httpx.AsyncClient,
+    address: str,
+    cache: GeocodeCache | None = None,
+    limiter: RateLimiter | quota.Lane | None = None,
+    area: dict | None = None,
+) -> list[dict] | None:
+    """Candidates for an address through the cache. None (and nothing cached) if the
+    request failed or the quota budget is spent."""
+    cache = cache or _CACHE
+    hit, cached = cache.get(address)
+    if hit:
+        metrics.incr("geocode_cache_hits")
+        traces.record_cache_hit(address, cached)
+        if cached is None:
+            return []
+        # Entries written before candidates were cached hold a single result
+        return cached["candidates"] if "candidates" in cached else [cached]
+
+    limiter = limiter or get_pipeline().limiter
+    if not await limiter.acquire():
+        metrics.incr("geocode_budget_skips")
+        logger.warning(f"Geocode budget exhausted, skipping '{address}'")
+        return None
+    try:
+        candidates = await _geocode_candidates(client, address, area)
+    finally:
+        limiter.release()
+
+    if candidates is not None:
+        cache.put(address, {"candidates": candidates} if candidates else None)
+    return candidates
+
+
+async def zip_area(
+    client: httpx.AsyncClient,
+    zip_code: str,
+    cache: GeocodeCache | None = None,
+    limiter: RateLimiter | quota.Lane | None = None,
+) -> dict | None:
+    """Centroid, bounds and rough radius of a zip code, used to bias and vet landmark lookups."""
+    if not zip_code:
+        return None
+    candidates = await _cached_candidates(client, f"{zip_code}, USA", cache, limiter)
+    return _area_from_candidates(candidates)
+
+
+def _area_from_candidates(candidates: list[dict] | None) -> dict | None:
+    zips = [c for c in candidates or [] if "viewport" in c]
+    if not zips:
+        return None
+    zone = zips[0]
+    ne, sw = zone["viewport"]["northeast"], zone["viewport"]["southwest"]
+    return {
+        "lat": zone["lat"],
+        "lng": zone["lng"],
+        "bounds": {"south": sw["lat"], "west": sw["lng"], "north": ne["lat"], "east": ne["lng"]},
+        "radius_miles": _haversine_miles(sw["lat"], sw["lng"], ne["lat"], ne["lng"]) / 2,
+    }
+
+
+def drop_outliers(points: list[GeoPoint], keep: int = 0) -> list[int]:
+    """Indexes of points to keep after a median-absolute-deviation filter on distance
+    from the median center. The first `keep` points are always kept.
+    """
+    if len(points) < MAD_MIN_POINTS:
+        return list(range(len(points)))
+    lats = sorted(p.lat for p in points)
+    lngs = sorted(p.lng for p in points)
+    mid_lat, mid_lng = lats[len(lats) // 2], lngs[len(lngs) // 2]
+    dists = [_haversine_miles(mid_lat, mid_lng, p.lat, p.lng) for p in points]
+    med = statistics.median(dists)
+    mad = max(statistics.median(abs(d - med) for d in dists), MAD_FLOOR_MILES)
+    limit = med + MAD_THRESHOLD * mad
+    kept = [i for i, d in enumerate(dists) if i < keep or d <= limit]
+    if len(kept) < len(points):
+        metrics.incr("geocode_outliers", len(points) - len(kept))
+    return kept
+
+
+async def geocode_places(
+    client: httpx.AsyncClient,
+    address: str,
+    zip_code: str,
+    boundary_description: str,
+    key_places: str,
+    cache: GeocodeCache | None = None,
+    limiter: RateLimiter | quota.Lane | None = None,
+) -> tuple[GeoPoint | None, list[GeoPoint], list[str], int]:
+    """Geocode the primary address, boundary landmarks and key places concurrently.
+
+    Returns (primary, all_points, geocoded_landmarks, failed) with points in
+    primary / landmark / place order. `failed` counts lookups (including the
+    zip area) that got no answer because the request failed or the quota
+    budget was spent, as opposed to lookups that found nothing.
+    """
+    landmarks = landmark_parser.queries(boundary_description, MAX_BOUNDARY_LANDMARKS)
+    places = landmark_parser.queries(key_places, MAX_KEY_PLACES)
+    queries = [address] + landmarks + places
+
+    failed = 0
+    area = None
+    if zip_code:
+        zip_candidates = await _cached_candidates(client, f"{zip_code}, USA", cache, limiter)
+        failed += zip_candidates is None
+        area = _area_from_candidates(zip_candidates)
+    found_candidates = await asyncio.gather(
+        *(_cached_candidates(client, f"{q}, {zip_code}", cache, limiter, area) for q in queries)
+    )
+    failed += sum(c is None for c in found_candidates)
+    results = [best_candidate(c or [], area) for c in found_candidates]
+
+    # Points that survive scoring but sit far from the rest would still blow up the area
+    found = [(i, r) for i, r in enumerate(results) if r]
+    kept = drop_outliers([r for _, r in found], keep=1 if results[0] else 0)
+    survivors = {found[k][0] for k in kept}
+    results = [r if i in survivors else None for i, r in enumerate(results)]
+
+    primary = results[0]
+    all_points = [r for r in results if r]
+    geocoded_landmarks = [
+        f"{landmark} ({geo.formatted_address})"
+        for landmark, geo in zip(landmarks, results[1 : 1 + len(landmarks)])
+        if geo
+    ]
+    return primary, all_points, geocoded_landmarks, failed
+
+
+def summarize_geography(primary: GeoPoint | None, all_points: list[GeoPoint], geocoded_landmarks: list[str]) -> str:
+    """One-line geographic summary read back to the caller."""
+    area = _bounding_box_area_sq_miles(all_points)
+    summary_parts = []
+    if primary:
+        summary_parts.append(f"Centered around {primary.formatted_address}")
+    if area > 0:
+        summary_parts.append(f"roughly {area} square miles")
+    if geocoded_landmarks:
+        summary_parts.append(f"bounded by {', '.join(geocoded_landmarks[:4])}")
+    return " — ".join(summary_parts) if summary_parts else "Location identified"
+
+
+def build_geo_data(primary: GeoPoint | None, all_points: list[GeoPoint], geocoded_landmarks: list[str]) -> dict:
+    """Geo fields saved alongside the form answers by save_submission.
+
+    all_coordinates stays a list of GeoPoints; it's encoded once, when the row is written.
+    """
+    return {
+        "geographic_summary": summarize_geography(primary, all_points, geocoded_landmarks),
+        "primary_address": primary.formatted_address if primary else "",
+        "geocoded_landmarks": "; ".join(geocoded_landmarks),
+        "all_coordinates": list(all_points),
+    }
+
+
+@dataclass(slots=True)
+class GeocodeResult:
+    """Outcome of geocoding one caller's description."""
+
+    primary: GeoPoint | None
+    points: list[GeoPoint]
+    landmarks: list[str]
+    zip_only: bool = False  # only the zip centroid was resolved (overload fallback)
+    failed_lookups: int = 0  # lookups lost to request errors or the quota budget
+
+    @property
+    def summary(self) -> str:
+        return summarize_geography(self.primary, self.points, self.landmarks)
+
+    def geo_data(self) -> dict:
+        return build_geo_data(self.primary, self.points, self.landmarks)
+
+    def reply(self, brief: bool = False) -> str:
+        """What the geocode tools hand back to the LLM; `brief` trims it to the essentials."""
+        if not self.points:
+            if brief:
+                return "Couldn't pinpoint the location; carry on with the verbal description."
+            return (
+                "I wasn't able to pinpoint the exact location from the description. "
+                "That's okay though — the verbal description you gave is still really valuable."
+            )
+        if brief:
+            return f"Geographic summary: {self.summary}. Read it back briefly and ask if it's right."
+        if self.zip_only:
+            return (
+                f"Geographic summary: {self.summary}. Only the general zip code area could be mapped "
+                "right now, not the individual landmarks. Let the caller know their description is "
+                "recorded as they gave it, and ask if that's the right general area."
+            )
+        return (
+            f"Geographic summary: {self.summary}. "
+            f"I mapped {len(self.points)} locations from your description. "
+            "Read this summary back to the caller naturally and ask if it sounds like "
+            "the right area. If they correct anything, note it but continue with the form."
+        )
+
+
+class GeocodePipeline:
+    """The one geocoding path used by the call tools, the demo, batch jobs and tests.
+
+    Owns a pooled HTTP client and the geocode cache, and draws on the shared
+    quota scheduler in its priority class, so every caller gets connection
+    reuse, caching, zip biasing, candidate scoring and concurrent lookups.
+    Clients and limiters are bound to an event loop and are recreated if the
+    pipeline is used from a new one (e.g. successive asyncio.run calls).
+    """
+
+    def __init__(
+        self,
+        cache: GeocodeCache | None = None,
+        limiter: RateLimiter | quota.Lane | None = None,
+        timeout: float = 10.0,
+        transport: httpx.AsyncBaseTransport | None = None,
+        priority: int = quota.LIVE,
+    ):
+        self.cache = cache or _CACHE
+        self.priority = priority
+        self._fixed_limiter = limiter
+        self._limiter: quota.Lane | None = None
+        self._timeout = timeout
+        self._transport = transport
+        self._client: httpx.AsyncClient | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def _bind(self) -> None:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._client = None
+            self._limiter = None
+
+    @property
+    def limiter(self) -> RateLimiter | quota.Lane:
+        if self._fixed_limiter is not None:
+            return self._fixed_limiter
+        self._bind()
+        if self._limiter is None:
+            self._limiter = quota.get_scheduler().lane(self.priority)
+        return self._limiter
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        self._bind()
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self._timeout,
+                transport=self._transport,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            )
+        return self._client
+
+    async def lookup(
+        self, address: str, zip_code: str = "", limiter: RateLimiter | quota.Lane | None = None
+    ) -> GeoPoint | None:
+        """Geocode a single address or landmark, biased to the zip code if given.
+
+        limiter overrides the pipeline's own for this lookup.
+        """
+        limiter = limiter or self.limiter
+        area = await zip_area(self.client, zip_code, self.cache, limiter) if zip_code else None
+        query = f"{address}, {zip_code}" if zip_code else address
+        return await _geocode_cached(self.client, query, self.cache, limiter, area)
+
+    async def geocode(
+        self,
+        address: str,
+        zip_code: str,
+        boundary_description: str,
+        key_places: str,
+    ) -> GeocodeResult:
+        """Geocode a caller's address, boundary description and key places."""
+        primary, points, landmarks, failed = await geocode_places(
+            self.client, address, zip_code, boundary_description, key_places, self.cache, self.limiter
+        )
+        return GeocodeResult(primary, points, landmarks, failed_lookups=failed)
+
+    async def geocode_zip(self, zip_code: str) -> GeocodeResult:
+        """The zip centroid alone: one (usually cached) request instead of a dozen."""
+        area = await zip_area(self.client, zip_code, self.cache, self.limiter)
+        if area is None:
+            return GeocodeResult(None, [], [], zip_only=True)
+        primary = GeoPoint(area["lat"], area["lng"], f"the {zip_code} zip code area")
+        return GeocodeResult(primary, [primary], [], zip_only=True)
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+_PIPELINE: GeocodePipeline | None = None
+
+
+def get_pipeline() -> GeocodePipeline:
+    """The process-wide geocode pipeline."""
+    global _PIPELINE
+    if _PIPELINE is None:
+        _PIPELINE = GeocodePipeline()
+    return _PIPELINE
+
+
 @loopback_tool(is_background=True)
 async def geocode_community(
     ctx: ToolEnv,
@@ -89,108 +642,10 @@ async def geocode_community(
     """
     yield "Looking up the geographic details for your community now..."
 
-    all_points: list[dict] = []
-    geocoded_landmarks: list[str] = []
-
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        # 1. Geocode the primary address
-        primary = await _geocode(client, f"{address}, {zip_code}")
-        if primary:
-            all_points.append(primary)
-            logger.info(f"Primary address geocoded: {primary['formatted_address']}")
-
-        # 2. Parse boundary landmarks and geocode each
-        #    Split on common delimiters people use when describing boundaries
-        boundary_parts = [
-            part.strip()
-            for part in boundary_description.replace(" and ", ", ")
-            .replace(" to ", ", ")
-            .replace(";", ",")
-            .split(",")
-            if part.strip() and len(part.strip()) > 2 and not part.strip().startswith("the ")
-        ]
-
-        for landmark in boundary_parts[:6]:  # cap at 6 to limit API calls
-            geo = await _geocode(client, f"{landmark}, {zip_code}")
-            if geo:
-                all_points.append(geo)
-                geocoded_landmarks.append(
-                    f"{landmark} ({geo['formatted_address']})"
-                )
-                logger.info(f"Boundary landmark geocoded: {landmark} -> {geo['formatted_address']}")
-
-        # 3. Geocode key community places
-        place_parts = [
-            part.strip()
-            for part in key_places.replace(" and ", ", ")
-            .replace(";", ",")
-            .split(",")
-            if part.strip() and len(part.strip()) > 2
-        ]
-
-        for place in place_parts[:4]:  # cap at 4
-            geo = await _geocode(client, f"{place}, {zip_code}")
-            if geo:
-                all_points.append(geo)
-                logger.info(f"Key place geocoded: {place} -> {geo['formatted_address']}")
-
-    # Build result summary
-    if not all_points:
-        yield (
-            "I wasn't able to pinpoint the exact location from the description. "
-            "That's okay though — the verbal description you gave is still really valuable."
-        )
-        return
-
-    center = _center_point(all_points)
-    area = _bounding_box_area_sq_miles(all_points)
-
-    summary_parts = []
-
-    if primary:
-        summary_parts.append(
-            f"Centered around {primary['formatted_address']}"
+    result = await get_pipeline().geocode(address, zip_code, boundary_description, key_places)
+    if result.points:
+        logger.info(
+            f"Geocoding complete: {len(result.points)} points, center {_center_point(result.points)}, "
+            f"~{_bounding_box_area_sq_miles(result.points)} sq mi"
         )
-
-    if area > 0:
-        summary_parts.append(f"roughly {area} square miles")
-
-    if geocoded_landmarks:
-        boundary_str = ", ".join(geocoded_landmarks[:4])
-        summary_parts.append(f"bounded by {boundary_str}")
-
-    geographic_summary = " — ".join(summary_parts) if summary_parts else "Location identified"
-
-    result = {
-        "center": center,
-        "approximate_area_sq_miles": area,
-        "num_points_geocoded": len(all_points),
-        "geocoded_landmarks": geocoded_landmarks,
-        "primary_address": primary["formatted_address"] if primary else None,
-        "summary": geographic_summary,
-        "coordinates": {
-            "type": "FeatureCollection",
-            "features": [
-                {
-                    "type": "Feature",
-                    "geometry": {
-                        "type": "Point",
-                        "coordinates": [point["lng"], point["lat"]],
-                    },
-                    "properties": {
-                        "formatted_address": point["formatted_address"],
-                    },
-                }
-                for point in all_points
-            ],
-        },
-    }
-
-    logger.info(f"Geocoding complete: {result}")
-
-    yield (
-        f"Geographic summary: {geographic_summary}. "
-        f"I mapped {len(all_points)} locations from your description. "
-        "Read this summary back to the caller naturally and ask if it sounds like "
-        "the right area. If they correct anything, note it but continue with the form."
-    )
+    yield result.reply()
@@ -0,0 +1,191 @@
+"""
+Landmark extraction - turns a caller's verbal boundary description or list of
+key places into geocodable queries, best first.
+
+Recognizes intersections ("24th and Mission"), "between X and Y" spans,
+street names ("Market St"), named features ("Dolores Park") and entries of an
+optional gazetteer, strips conversational filler ("is also a barrier",
+"are neighboring"), and drops fragments that can't be geocoded ("the school
+next to it") before any API quota is spent on them.
+
+All patterns are compiled once at import time.
+"""
+
+import os
+import re
+from dataclasses import dataclass
+
+# Optional newline-separated list of local place names (neighborhoods, parks, ...)
+GAZETTEER_PATH = os.getenv("LANDMARK_GAZETTEER", "")
+
+# Fragments scoring below this are never geocoded
+MIN_SCORE = 0.3
+
+# Scores by how a fragment was recognized — roughly the odds it geocodes to the right place
+SCORES = {
+    "intersection": 1.0,
+    "gazetteer": 0.95,
+    "street": 0.9,
+    "feature": 0.85,
+    "proper": 0.7,
+    "phrase": 0.4,
+}
+
+_STREET_SUFFIXES = (
+    "st|street|ave|avenue|blvd|boulevard|rd|road|way|dr|drive|ln|lane|pl|place|ct|court|ter|terrace|"
+    "hwy|highway|fwy|freeway|expy|expressway|pkwy|parkway|cir|circle|sq|square"
+)
+_FEATURE_WORDS = (
+    "park|playground|school|elementary|high school|college|university|church|cathedral|temple|mosque|"
+    "synagogue|library|station|hospital|clinic|market|center|centre|plaza|mall|bridge|creek|river|lake|"
+    "hill|hills|heights|beach|bay|pier|stadium|field|museum|airport|cemetery|district|village|valley"
+)
+_ORDINAL = r"\d+(?:st|nd|rd|th)"
+_NAME = r"(?:[A-Z][\w'.-]*|" + _ORDINAL + r")"
+_NAME_RUN = _NAME + r"(?:\s+" + _NAME + r"){0,3}"
+
+_BETWEEN = re.compile(r"\bbetween\s+(.+?)\s+(?:and|&)\s+(.+?)(?=\s*(?:[,.;]|\bto\b|$))", re.IGNORECASE)
+_INTERSECTION = re.compile(
+    r"\b(" + _NAME_RUN + r")(?:\s+(?:" + _STREET_SUFFIXES + r")\.?)?\s+(?:and|&|at)\s+(" + _NAME_RUN + r")"
+    r"(?:\s+(?:" + _STREET_SUFFIXES + r")\.?)?(?=\W|$)"
+)
+_STREET = re.compile(r"\b(" + _NAME_RUN + r")\s+(?:" + _STREET_SUFFIXES + r")\b\.?", re.IGNORECASE)
+_FEATURE = re.compile(r"\b(?:" + _FEATURE_WORDS + r")\b", re.IGNORECASE)
+_PROPER = re.compile(r"^" + _NAME_RUN + r"$")
+
+# Conversational tails and heads around the actual place name
+_TAIL = re.compile(
+    r"(?:^|\s+)(?:is|are|was|were|has|have|borders?|bordering|neighbou?ring|nearby|too|as well|also|"
+    r"kind of|sort of|on the \w+ side|side)\b.*$",
+    re.IGNORECASE,
+)
+_HEAD = re.compile(
+    r"^(?:(?:and|also|like|maybe|probably|basically|just|then|plus|up to|down to|over to|all the way to|"
+    r"near|around|by|from|to|past|along|across|over)\s+)+",
+    re.IGNORECASE,
+)
+# Deictic / relative phrasing that can't be resolved without context
+_UNRESOLVABLE = re.compile(r"\b(?:it|there|here|this|that|them|my|our|his|her|their|next to|nearby|somewhere)\b", re.IGNORECASE)
+_SPLIT = re.compile(r"\s*(?:[,;.!?\n]|\band\b|(?<!next )(?<!close )\bto\b|&)\s*", re.IGNORECASE)
+_STOPWORDS = frozenset("a an the of in on at is are and or but also just very".split())
+
+
+@dataclass
+class Landmark:
+    text: str
+    kind: str
+    score: float
+
+
+class _Trie:
+    """Token trie over lowercased gazetteer names for longest-match lookup."""
+
+    def __init__(self, names: list[str] = ()):
+        self.root: dict = {}
+        for name in names:
+            self.add(name)
+
+    def add(self, name: str) -> None:
+        node = self.root
+        for token in name.lower().split():
+            node = node.setdefault(token, {})
+        node[""] = name
+
+    def find_all(self, text: str) -> list[str]:
+        """Longest gazetteer names occurring in text, in order of appearance."""
+        tokens = re.findall(r"[\w'.-]+", text.lower())
+        found = []
+        i = 0
+        while i < len(tokens):
+            node, match, end = self.root, None, i
+            for j in range(i, len(tokens)):
+                node = node.get(tokens[j])
+                if node is None:
+                    break
+                if "" in node:
+                    match, end = node[""], j + 1
+            if match:
+                found.append(match)
+                i = end
+            else:
+                i += 1
+        return found
+
+
+def _load_gazetteer(path: str) -> _Trie:
+    if not path or not os.path.exists(path):
+        return _Trie()
+    with open(path, encoding="utf-8") as fh:
+        return _Trie([line.strip() for line in fh if line.strip() and not line.startswith("#")])
+
+
+_GAZETTEER = _load_gazetteer(GAZETTEER_PATH)
+
+
+def _clean(fragment: str) -> str:
+    fragment = fragment.strip(" \t\"'()-")
+    fragment = _HEAD.sub("", fragment)
+    fragment = _TAIL.sub("", fragment)
+    return fragment.strip(" \t\"'()-")
+
+
+def _classify(fragment: str) -> Landmark | None:
+    words = fragment.split()
+    if not words or all(w.lower() in _STOPWORDS for w in words) or len(fragment) <= 2:
+        return None
+    if _UNRESOLVABLE.search(fragment):
+        return Landmark(fragment, "phrase", 0.1)
+    if _STREET.fullmatch(fragment):
+        return Landmark(fragment, "street", SCORES["street"])
+    if _FEATURE.search(fragment) and any(w[:1].isupper() for w in words):
+        return Landmark(fragment, "feature", SCORES["feature"])
+    if _PROPER.match(fragment.removeprefix("the ").removeprefix("The ")):
+        return Landmark(fragment, "proper", SCORES["proper"])
+    # Lowercase phrases with no number ("the bay", "the north side") rarely geocode usefully
+    if len(words) > 4 or not re.search(r"[A-Z0-9]", fragment):
+        return Landmark(fragment, "phrase", 0.2)
+    return Landmark(fragment, "phrase", SCORES["phrase"])
+
+
+def extract(text: str, gazetteer: _Trie | None = None) -> list[Landmark]:
+    """Candidate landmarks in `text`, highest score first (ties keep their spoken order)."""
+    if not text:
+        return []
+    gazetteer = gazetteer or _GAZETTEER
+    found: list[Landmark] = []
+
+    # Structured patterns first; their spans are blanked so the fallback split doesn't repeat them
+    rest = text
+    for m in _BETWEEN.finditer(text):
+        for part in m.groups():
+            found.extend(extract(part, gazetteer))
+        rest = rest.replace(m.group(0), ",")
+    for m in _INTERSECTION.finditer(rest):
+        a, b = m.group(1), m.group(2)
+        # "Bernal and Castro" is two neighborhoods, not a corner; require a street-ish side
+        if re.fullmatch(_ORDINAL, a.split()[-1]) or re.fullmatch(_ORDINAL, b.split()[-1]) or _STREET.search(m.group(0)):
+            found.append(Landmark(_clean(m.group(0)), "intersection", SCORES["intersection"]))
+            rest = rest.replace(m.group(0), ",")
+    for name in gazetteer.find_all(rest):
+        found.append(Landmark(name, "gazetteer", SCORES["gazetteer"]))
+        rest = re.sub(re.escape(name), ",", rest, flags=re.IGNORECASE)
+
+    for fragment in _SPLIT.split(rest):
+        landmark = _classify(_clean(fragment))
+        if landmark:
+            found.append(landmark)
+
+    seen = set()
+    unique = []
+    for landmark in found:
+        key = landmark.text.lower()
+        if key not in seen:
+            seen.add(key)
+            unique.append(landmark)
+    unique.sort(key=lambda lm: -lm.score)
+    return unique
+
+
+def queries(text: str, limit: int) -> list[str]:
+    """The `limit` most geocodable landmark strings in text."""
+    return [lm.text for lm in extract(text) if lm.score >= MIN_SCORE][:limit]
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Local mirror - incremental copy of submissions and redistricting_criteria in a
+local SQLite file (or DuckDB, for a .duckdb path) for ad-hoc analysis.
+
+Each sync pulls only rows after the (created_at, id) watermark stored in the
+mirror, adding derived columns (state, point count, area, centroid) on the way
+in. Rows changed after they were mirrored (re-geocodes, merges) are only
+picked up by a --full resync, which pulls everything into a staging table
+and swaps it in at the end, so a failed resync leaves the old mirror intact.
+redistricting_criteria is small and is replaced on every sync.
+
+    uv run python local_mirror.py sync --db mirror.sqlite
+    uv run python local_mirror.py query counts_by_state --db mirror.sqlite
+    uv run python local_mirror.py keywords --field cultural_interests --limit 25
+    uv run python local_mirror.py sql "select zipcode, avg(area_sq_miles) from submissions group by 1"
+    uv run python local_mirror.py sync --db mirror.duckdb  # needs the "mirror" extra (duckdb)
+"""
+
+import argparse
+import asyncio
+import math
+import re
+import sqlite3
+from collections import Counter
+from pathlib import Path
+
+from dotenv import load_dotenv
+from loguru import logger
+
+load_dotenv()
+
+import fastjson
+from dedup import TEXT_FIELDS
+from report import format_table
+from spatial_index import _extract_ring, _is_polygon
+from supabase_backend import _zip_to_state, iter_submissions, list_redistricting_criteria
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+DEFAULT_DB = Path("mirror.sqlite")
+
+SOURCE_COLUMNS = (
+    "id,created_at,caller_name,consent,zipcode,address,community_name,community_description,key_places,"
+    "community_boundaries,cultural_interests,economic_interests,community_activities,other_considerations,"
+    "geographic_summary,primary_address,geocoded_landmarks,all_coordinates,geojson,map_image_url,"
+    "centroid_gh5,centroid_gh6,centroid_gh7,duplicate_of,duplicate_score"
+)
+CONTACT_COLUMN = "phone_number"
+JSON_COLUMNS = ("all_coordinates", "geojson")
+
+STAGING_TABLE = "submissions_staging"
+
+SUBMISSIONS_SCHEMA = """
+create table if not exists {table} (
+  id text primary key,
+  created_at text not null,
+  caller_name text,
+  phone_number text,
+  consent boolean,
+  zipcode text,
+  address text,
+  community_name text,
+  community_description text,
+  key_places text,
+  community_boundaries text,
+  cultural_interests text,
+  economic_interests text,
+  community_activities text,
+  other_considerations text,
+  geographic_summary text,
+  primary_address text,
+  geocoded_landmarks text,
+  all_coordinates text,
+  geojson text,
+  map_image_url text,
+  centroid_gh5 text,
+  centroid_gh6 text,
+  centroid_gh7 text,
+  duplicate_of text,
+  duplicate_score double,
+  state text,
+  point_count integer,
+  area_sq_miles double,
+  centroid_lat double,
+  centroid_lng double
+)
+"""
+
+SCHEMA = SUBMISSIONS_SCHEMA.format(table="submissions") + """;
+create table if not exists redistricting_criteria (
+  state text primary key,
+  coi_required boolean,
+  notes text
+);
+create table if not exists mirror_state (
+  key text primary key,
+  value text
+);
+"""
+
+MIRROR_COLUMNS = [
+    "id", "created_at", "caller_name", "phone_number", "consent", "zipcode", "address", "community_name",
+    "community_description", "key_places", "community_boundaries", "cultural_interests", "economic_interests",
+    "community_activities", "other_considerations", "geographic_summary", "primary_address",
+    "geocoded_landmarks", "all_coordinates", "geojson", "map_image_url", "centroid_gh5", "centroid_gh6",
+    "centroid_gh7", "duplicate_of", "duplicate_score", "state", "point_count", "area_sq_miles",
+    "centroid_lat", "centroid_lng",
+]
+
+# Prebuilt reports; the SQL runs unchanged on SQLite and DuckDB.
+# Flagged duplicates are left out of every count.
+QUERIES = {
+    "counts_by_zipcode": """
+        select zipcode, state, count(*) as submissions
+        from submissions where duplicate_of is null
+        group by zipcode, state order by submissions desc, zipcode
+    """,
+    "counts_by_state": """
+        select s.state, count(*) as submissions, count(distinct s.zipcode) as zipcodes,
+          coalesce(max(r.coi_required), false) as coi_required
+        from submissions s left join redistricting_criteria r on r.state = s.state
+        where s.duplicate_of is null
+        group by s.state order by submissions desc, s.state
+    """,
+    "counts_by_month": """
+        select substr(created_at, 1, 7) as month, count(*) as submissions
+        from submissions where duplicate_of is null
+        group by month order by month
+    """,
+    "area_distribution": """
+        select bucket, count(*) as submissions, round(avg(area_sq_miles), 2) as avg_sq_miles
+        from (
+          select area_sq_miles, case
+            when area_sq_miles is null then 'no polygon'
+            when area_sq_miles < 0.25 then '< 0.25 sq mi'
+            when area_sq_miles < 1 then '0.25-1 sq mi'
+            when area_sq_miles < 4 then '1-4 sq mi'
+            when area_sq_miles < 16 then '4-16 sq mi'
+            when area_sq_miles < 64 then '16-64 sq mi'
+            else '64+ sq mi' end as bucket
+          from submissions where duplicate_of is null
+        ) b
+        group by bucket order by min(coalesce(area_sq_miles, 1e9))
+    """,
+    "area_by_state": """
+        select state, count(area_sq_miles) as polygons, round(min(area_sq_miles), 2) as min_sq_miles,
+          round(avg(area_sq_miles), 2) as avg_sq_miles, round(max(area_sq_miles), 2) as max_sq_miles
+        from submissions where duplicate_of is null
+        group by state order by polygons desc, state
+    """,
+    "coi_required_states": """
+        select r.state, r.coi_required, count(s.id) as submissions, r.notes
+        from redistricting_criteria r
+        left join submissions s on s.state = r.state and s.duplicate_of is null
+        group by r.state, r.coi_required, r.notes order by submissions desc, r.state
+    """,
+}
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have i in is it its like lot lots many more most of on or our "
+    "so that the their there they this to very was we were with you your also just really some all".split()
+)
+_WORD = re.compile(r"[a-z][a-z'-]{2,}")
+
+# Miles per degree of latitude
+MILES_PER_DEGREE = 69.0
+
+
+def _area_sq_miles(ring: list[tuple[float, float]]) -> float:
+    """Shoelace area of a (lng, lat) ring, projected equirectangularly around its mean latitude."""
+    lat0 = math.radians(sum(lat for _, lat in ring) / len(ring))
+    kx = MILES_PER_DEGREE * math.cos(lat0)
+    pts = [(lng * kx, lat * MILES_PER_DEGREE) for lng, lat in ring]
+    return abs(sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in zip(pts, pts[1:]))) / 2
+
+
+def derive(row: dict) -> dict:
+    """Mirror row for a submission: JSON columns as text plus derived analysis columns."""
+    out = {col: row.get(col) for col in MIRROR_COLUMNS}
+    for col in JSON_COLUMNS:
+        if out[col] is not None and not isinstance(out[col], str):
+            out[col] = fastjson.dumps_str(out[col])
+
+    out["state"] = _zip_to_state(row.get("zipcode") or "")
+    points = _extract_ring(row.get("all_coordinates"))
+    out["point_count"] = len(points)
+    if points:
+        out["centroid_lng"] = round(sum(p[0] for p in points) / len(points), 6)
+        out["centroid_lat"] = round(sum(p[1] for p in points) / len(points), 6)
+    ring = _extract_ring(row.get("geojson"))
+    out["area_sq_miles"] = round(_area_sq_miles(ring), 4) if _is_polygon(ring) else None
+    return out
+
+
+class Mirror:
+    """A local SQLite / DuckDB database holding the mirrored tables."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        if path.suffix == ".duckdb":
+            if duckdb is None:
+                raise SystemExit("DuckDB mirrors require duckdb: uv pip install duckdb")
+            self.conn = duckdb.connect(str(path))
+        else:
+            self.conn = sqlite3.connect(path, isolation_level=None)
+            self.conn.execute("pragma journal_mode=wal")
+        for statement in SCHEMA.split(";"):
+            if statement.strip():
+                self.conn.execute(statement)
+
+    def query(self, sql: str, params: tuple = ()) -> list[dict]:
+        cursor = self.conn.execute(sql, params)
+        columns = [d[0] for d in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    @property
+    def watermark(self) -> tuple[str, str] | None:
+        rows = self.query("select value from mirror_state where key = 'watermark'")
+        return tuple(fastjson.loads(rows[0]["value"])) if rows else None
+
+    def _set_watermark(self, created_at: str, row_id: str) -> None:
+        self.conn.execute(
+            "insert or replace into mirror_state (key, value) values ('watermark', ?)",
+            (fastjson.dumps_str([created_at, row_id]),),
+        )
+
+    def add_page(self, rows: list[dict], staging: bool = False) -> None:
+        """Upsert one page of source rows and advance the watermark, atomically.
+
+        With staging, the rows go to the staging table of a full resync and the
+        watermark is left alone until swap_staging().
+        """
+        table = STAGING_TABLE if staging else "submissions"
+        placeholders = ", ".join("?" for _ in MIRROR_COLUMNS)
+        values = [tuple(r[c] for c in MIRROR_COLUMNS) for r in map(derive, rows)]
+        self.conn.execute("begin transaction")
+        self.conn.executemany(
+            f"insert or replace into {table} ({', '.join(MIRROR_COLUMNS)}) values ({placeholders})", values
+        )
+        if not staging:
+            self._set_watermark(rows[-1]["created_at"], rows[-1]["id"])
+        self.conn.execute("commit")
+
+    def replace_criteria(self, rows: list[dict]) -> None:
+        self.conn.execute("begin transaction")
+        self.conn.execute("delete from redistricting_criteria")
+        self.conn.executemany(
+            "insert into redistricting_criteria (state, coi_required, notes) values (?, ?, ?)",
+            [(r["state"], r.get("coi_required", False), r.get("notes")) for r in rows],
+        )
+        self.conn.execute("commit")
+
+    def start_staging(self) -> None:
+        """Start a full resync with an empty staging table (dropping any left by a failed one)."""
+        self.conn.execute(f"drop table if exists {STAGING_TABLE}")
+        self.conn.execute(SUBMISSIONS_SCHEMA.format(table=STAGING_TABLE))
+
+    def swap_staging(self, watermark: tuple[str, str] | None) -> None:
+        """Replace the mirrored submissions with the staged ones in one transaction."""
+        self.conn.execute("begin transaction")
+        self.conn.execute("delete from submissions")
+        self.conn.execute(f"insert into submissions select * from {STAGING_TABLE}")
+        self.conn.execute("delete from mirror_state where key = 'watermark'")
+        if watermark:
+            self._set_watermark(*watermark)
+        self.conn.execute("commit")
+        self.conn.execute(f"drop table {STAGING_TABLE}")
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+async def sync(mirror: Mirror, include_contact: bool = False, full: bool = False, page_size: int = 1000) -> int:
+    """Pull new submissions and the criteria table into the mirror. Returns rows added.
+
+    A full resync stages every row and only replaces the mirrored ones once the
+    pull has finished.
+    """
+    if full:
+        mirror.start_staging()
+    select = SOURCE_COLUMNS + (f",{CONTACT_COLUMN}" if include_contact else "")
+    added = 0
+    after = None if full else mirror.watermark
+    async for page in iter_submissions(select=select, page_size=page_size, after=after):
+        mirror.add_page(page, staging=full)
+        after = (page[-1]["created_at"], page[-1]["id"])
+        added += len(page)
+        logger.info(f"Mirrored {added} {'staged' if full else 'new'} submissions")
+    if full:
+        mirror.swap_staging(after)
+    mirror.replace_criteria(await list_redistricting_criteria())
+    return added
+
+
+def keyword_frequencies(mirror: Mirror, field: str, limit: int = 30) -> list[dict]:
+    """Most common words in a free-text answer across non-duplicate submissions."""
+    if field not in TEXT_FIELDS:
+        raise ValueError(f"Unknown text field: {field}")
+    counts: Counter = Counter()
+    docs: Counter = Counter()
+    for row in mirror.query(f"select {field} as text from submissions where duplicate_of is null"):
+        words = [w for w in _WORD.findall((row["text"] or "").lower()) if w not in STOPWORDS]
+        counts.update(words)
+        docs.update(set(words))
+    return [{"word": w, "count": n, "submissions": docs[w]} for w, n in counts.most_common(limit)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mirror submissions into a local SQLite/DuckDB file and query it")
+    parser.add_argument("--db", type=Path, default=DEFAULT_DB, help="Mirror file (.sqlite, or .duckdb for DuckDB)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sync_parser = sub.add_parser("sync", help="Pull new rows from Supabase")
+    sync_parser.add_argument("--full", action="store_true", help="Resync everything, replacing mirrored submissions once done")
+    sync_parser.add_argument("--include-contact", action="store_true", help="Also mirror phone numbers")
+    sync_parser.add_argument("--page-size", type=int, default=1000)
+
+    query_parser = sub.add_parser("query", help="Run a prebuilt report")
+    query_parser.add_argument("name", choices=sorted(QUERIES))
+
+    keywords_parser = sub.add_parser("keywords", help="Word frequencies in a free-text answer")
+    keywords_parser.add_argument("--field", choices=TEXT_FIELDS, default="community_description")
+    keywords_parser.add_argument("--limit", type=int, default=30)
+
+    sql_parser = sub.add_parser("sql", help="Run arbitrary SQL against the mirror")
+    sql_parser.add_argument("statement")
+
+    args = parser.parse_args()
+    mirror = Mirror(args.db)
+    try:
+        if args.command == "sync":
+            added = asyncio.run(sync(mirror, args.include_contact, args.full, args.page_size))
+            print(f"Added {added} submissions to {args.db}")
+            return
+        if args.command == "query":
+            rows = mirror.query(QUERIES[args.name])
+        elif args.command == "keywords":
+            rows = keyword_frequencies(mirror, args.field, args.limit)
+        else:
+            rows = mirror.query(args.statement)
+        print(format_table(rows, list(rows[0]) if rows else []))
+    finally:
+        mirror.close()
+
+
+if __name__ == "__main__":
+    main()
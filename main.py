@@ -1,15 +1,24 @@
 import os
+import uuid
 from pathlib import Path
 from typing import Annotated
 
 from dotenv import load_dotenv
-import httpx
+from fastapi.responses import PlainTextResponse
 from loguru import logger
 
 load_dotenv()
 
+import dedup
+import metrics
+import overload
+import quota
+import spatial_index
+import traces
+from call_supervisor import CallHungUp, CallSupervisor
 from form_filler import FormFiller
-from geocoding import _geocode, _center_point, _bounding_box_area_sq_miles
+from geocoding import GeocodePipeline, get_pipeline
+from session_store import open_session
 from supabase_backend import check_coi_requirement, save_submission
 from line.llm_agent import ToolEnv, loopback_tool
 from line.llm_agent import LlmAgent, LlmConfig, end_call
@@ -111,14 +120,38 @@ Process (consent declined):
 2. Call end_call immediately (do NOT call save_submission_tool)"""
 
 
-async def get_agent(env: AgentEnv, call_request: CallRequest):
-    logger.info(f"Starting community form call: {call_request.call_id}")
+def build_call(call_id: str, trace: traces.CallTrace | None = None, pipeline: GeocodePipeline | None = None):
+    """The per-call state and tools of one call: (tools, supervisor, form, resumed session state).
 
-    form = FormFiller(str(FORM_PATH), system_prompt=SYSTEM_PROMPT)
+    With a trace, the tools record their invocations in it (see traces.py;
+    replay.py builds calls this way too, each with its own `pipeline`).
+    """
+    pipeline = pipeline or get_pipeline()
+    # Answers and geo results are journaled per call so a reconnect after a worker restart can resume
+    # (calls without an id get a throwaway session that can never be resumed)
+    resumable = call_id != "unknown"
+    session = open_session(call_id if resumable else uuid.uuid4().hex)
+    form = FormFiller(str(FORM_PATH), system_prompt=SYSTEM_PROMPT, session=session)
 
     # Shared dict for geocoding results — written by geocode_community, read by save_submission_tool
     geo_data: dict = {}
 
+    # Background tool work is cancelled at hangup unless it's saving a consented submission
+    supervisor = CallSupervisor(call_id)
+
+    resumed = session.load() if resumable else None
+    if resumed:
+        form.restore(resumed.answers, resumed.current_index)
+        geo_data.update(resumed.geo_data)
+        logger.info(f"Resuming call {call_id} with {len(resumed.answers)} answers")
+
+    async def save_and_finish(answers: dict) -> str:
+        # Runs to completion even after a hangup; an unsaved session stays in the journal
+        result = await save_submission(answers)
+        if result.startswith("Saved"):
+            session.finish()
+        return result
+
     @loopback_tool(is_background=True)
     async def geocode_community(
         ctx: ToolEnv,
@@ -137,139 +170,69 @@ async def get_agent(env: AgentEnv, call_request: CallRequest):
         Call this AFTER recording the community_boundaries answer."""
         yield "Looking up the geographic details for your community now..."
 
-        all_points: list[dict] = []
-        geocoded_landmarks: list[str] = []
-
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            primary = await _geocode(client, f"{address}, {zip_code}")
-            if primary:
-                all_points.append(primary)
-
-            boundary_parts = [
-                part.strip()
-                for part in boundary_description.replace(" and ", ", ")
-                .replace(" to ", ", ")
-                .replace(";", ",")
-                .split(",")
-                if part.strip() and len(part.strip()) > 2
-            ]
-            for landmark in boundary_parts[:6]:
-                geo = await _geocode(client, f"{landmark}, {zip_code}")
-                if geo:
-                    all_points.append(geo)
-                    geocoded_landmarks.append(f"{landmark} ({geo['formatted_address']})")
-
-            place_parts = [
-                part.strip()
-                for part in key_places.replace(" and ", ", ")
-                .replace(";", ",")
-                .split(",")
-                if part.strip() and len(part.strip()) > 2
-            ]
-            for place in place_parts[:4]:
-                geo = await _geocode(client, f"{place}, {zip_code}")
-                if geo:
-                    all_points.append(geo)
-
-        if not all_points:
+        # Under heavy load only the zip centroid is looked up
+        if overload.degraded(overload.ZIP_ONLY):
+            work = pipeline.geocode_zip(zip_code)
+        else:
+            work = pipeline.geocode(address, zip_code, boundary_description, key_places)
+        try:
+            result = await supervisor.run("geocode_community", work)
+        except CallHungUp:
+            return
+        except TimeoutError:
             yield (
-                "I wasn't able to pinpoint the exact location from the description. "
-                "That's okay though — the verbal description you gave is still really valuable."
+                "The map lookup is taking too long, so skip the geographic summary "
+                "and carry on using the caller's own description of the area."
             )
             return
-
-        import json
-        center = _center_point(all_points)
-        area = _bounding_box_area_sq_miles(all_points)
-
-        summary_parts = []
-        if primary:
-            summary_parts.append(f"Centered around {primary['formatted_address']}")
-        if area > 0:
-            summary_parts.append(f"roughly {area} square miles")
-        if geocoded_landmarks:
-            summary_parts.append(f"bounded by {', '.join(geocoded_landmarks[:4])}")
-
-        geographic_summary = " — ".join(summary_parts) if summary_parts else "Location identified"
-
-        # Store geo results so save_submission_tool can access them directly
-        coords = [{"lat": p["lat"], "lng": p["lng"], "formatted_address": p["formatted_address"]} for p in all_points]
-        geo_data["geographic_summary"] = geographic_summary
-        geo_data["primary_address"] = primary["formatted_address"] if primary else ""
-        geo_data["geocoded_landmarks"] = "; ".join(geocoded_landmarks)
-        geo_data["all_coordinates"] = json.dumps(coords)
-
-        logger.info(f"Geocoding complete, stored {len(coords)} coordinates")
-
-        yield (
-            f"Geographic summary: {geographic_summary}. "
-            f"I mapped {len(all_points)} locations from your description. "
-            "Read this summary back to the caller naturally and ask if it sounds like "
-            "the right area. If they correct anything, note it but continue with the form."
-        )
+        if result.points:
+            # Store geo results so save_submission_tool can access them directly
+            geo_data.update(result.geo_data())
+            session.record_geo(result.geo_data())
+            logger.info(f"Geocoding complete, stored {len(result.points)} coordinates")
+        yield result.reply(brief=overload.degraded(overload.BRIEF_REPLIES))
 
     @loopback_tool(is_background=True)
     async def run_demo(ctx: ToolEnv):
         """Run a demo with sample Mission District data. Call this when the caller says 'demo' or 'run demo'.
         This autopopulates the form, geocodes, and saves to the database. No arguments needed."""
-        import json
-
         yield "Running the demo now — one moment while I set everything up."
 
         # Populate form answers
-        for key, value in DEMO_ANSWERS.items():
-            form._answers[key] = value
-        form._current_index = len(form._questions)
+        form.set_answers(DEMO_ANSWERS)
         logger.info(f"Demo: populated {len(DEMO_ANSWERS)} answers")
 
-        # Run geocoding
-        all_points: list[dict] = []
-        geocoded_landmarks: list[str] = []
-        zip_code = DEMO_ANSWERS["zipcode"]
-        address = DEMO_ANSWERS["address"]
-
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            primary = await _geocode(client, f"{address}, {zip_code}")
-            if primary:
-                all_points.append(primary)
-
-            for landmark in ["Market St", "Bernal Heights", "SOMA", "Castro"]:
-                geo = await _geocode(client, f"{landmark}, {zip_code}")
-                if geo:
-                    all_points.append(geo)
-                    geocoded_landmarks.append(f"{landmark} ({geo['formatted_address']})")
-
-            for place in ["Mission Dolores Park", "24th and Mission"]:
-                geo = await _geocode(client, f"{place}, {zip_code}")
-                if geo:
-                    all_points.append(geo)
-
         geographic_summary = "Location identified"
-        if all_points:
-            area = _bounding_box_area_sq_miles(all_points)
-            summary_parts = []
-            if primary:
-                summary_parts.append(f"Centered around {primary['formatted_address']}")
-            if area > 0:
-                summary_parts.append(f"roughly {area} square miles")
-            if geocoded_landmarks:
-                summary_parts.append(f"bounded by {', '.join(geocoded_landmarks[:4])}")
-            geographic_summary = " — ".join(summary_parts) if summary_parts else geographic_summary
-
-            coords = [{"lat": p["lat"], "lng": p["lng"], "formatted_address": p["formatted_address"]} for p in all_points]
-            geo_data["geographic_summary"] = geographic_summary
-            geo_data["primary_address"] = primary["formatted_address"] if primary else ""
-            geo_data["geocoded_landmarks"] = "; ".join(geocoded_landmarks)
-            geo_data["all_coordinates"] = json.dumps(coords)
-            logger.info(f"Demo: geocoded {len(coords)} points")
+        try:
+            result = await supervisor.run(
+                "run_demo",
+                pipeline.geocode(
+                    DEMO_ANSWERS["address"],
+                    DEMO_ANSWERS["zipcode"],
+                    DEMO_ANSWERS["community_boundaries"],
+                    DEMO_ANSWERS["key_places"],
+                ),
+            )
+        except CallHungUp:
+            return
+        except TimeoutError:
+            result = None
+        if result and result.points:
+            geographic_summary = result.summary
+            geo_data.update(result.geo_data())
+            session.record_geo(result.geo_data())
+            logger.info(f"Demo: geocoded {len(result.points)} points")
 
         # Save to database
         answers = dict(form._answers)
         answers.update(geo_data)
-        result = await save_submission(answers)
+        try:
+            saved = await supervisor.run("run_demo", save_and_finish(answers), essential=True)
+        except TimeoutError:
+            saved = "Error saving: the database didn't respond in time"
 
         yield (
-            f"Demo complete! {result}. "
+            f"Demo complete! {saved}. "
             f"Submitted for Lauren James from the Mission District (94110). "
             f"Community is majority Latino with churches. "
             f"{geographic_summary}. "
@@ -289,25 +252,71 @@ async def get_agent(env: AgentEnv, call_request: CallRequest):
         answers = dict(form._answers)
         answers.update(geo_data)
 
-        result = await save_submission(answers)
+        try:
+            result = await supervisor.run(
+                "save_submission_tool", save_and_finish(answers), essential=bool(answers.get("consent"))
+            )
+        except CallHungUp:
+            return
+        except TimeoutError:
+            result = "Error saving: the database didn't respond in time"
         yield result
 
+    tools = [form.record_answer_tool, geocode_community, check_coi_requirement, save_submission_tool, run_demo, end_call]
+    if trace:
+        tools = trace.instrument(tools)
+    return tools, supervisor, form, resumed
+
+
+async def get_agent(env: AgentEnv, call_request: CallRequest):
+    logger.info(f"Starting community form call: {call_request.call_id}")
+
+    # Duplicate lookups and overlap queries at save time need the in-process
+    # indexes; each loads once per process
+    dedup.start_loading()
+    spatial_index.start_loading()
+    overload.start()
+    quota.start_publisher()
+
+    # Opt-in call recording for replay (TRACE_DIR)
+    trace = traces.start(call_request.call_id)
+    tools, supervisor, form, resumed = build_call(call_request.call_id, trace)
+
     first_question = form.get_current_question_text()
+    if resumed:
+        introduction = (
+            "Welcome back! It looks like we got cut off, so let's pick up where we left off. "
+            f"{first_question or 'I have everything I need, so let me go over what you shared.'}"
+        )
+    else:
+        introduction = f"Hi! Thanks for calling in. I'm here to help you share information about your community for the redistricting process. It'll just take a few minutes. {first_question}"
 
-    return LlmAgent(
+    agent = LlmAgent(
         model="anthropic/claude-haiku-4-5-20251001",
         api_key=os.getenv("ANTHROPIC_API_KEY"),
-        tools=[form.record_answer_tool, geocode_community, check_coi_requirement, save_submission_tool, run_demo, end_call],
+        tools=tools,
         config=LlmConfig(
             system_prompt=form.get_system_prompt(),
-            introduction=f"Hi! Thanks for calling in. I'm here to help you share information about your community for the redistricting process. It'll just take a few minutes. {first_question}",
+            introduction=introduction,
             max_tokens=4096,
         ),
     )
+    process = supervisor.wrap(agent)
+    if trace:
+        process = trace.wrap(process, lambda: form._answers)
+    return process
 
 
 app = VoiceAgentApp(get_agent=get_agent)
 
+
+async def metrics_endpoint() -> PlainTextResponse:
+    """Prometheus scrape endpoint (geocode quality counters etc.)."""
+    return PlainTextResponse(metrics.render_prometheus())
+
+
+app.fastapi_app.add_api_route("/metrics", metrics_endpoint, methods=["GET"])
+
 if __name__ == "__main__":
     print("Starting app")
     app.run()
@@ -0,0 +1,403 @@
+"""
+Map renderer - draws submission polygons and markers to compact PNG/WebP
+images locally instead of building Google Static Maps URLs.
+
+Images are content-addressed by a hash of the geometry, so identical
+submissions share one stored image and the URL is known before the image is
+rendered. Rendering and upload happen off the call path: save_submission
+stores the URL immediately and schedule_render() does the work in the
+background, retrying a few times and clearing the stored URL (via the
+caller's on_failure hook) if the image never makes it to storage.
+
+With Pillow installed and MAP_TILE_URL set (e.g. an OpenStreetMap-compatible
+https://.../{z}/{x}/{y}.png server), the polygon is drawn over cached base
+tiles. Otherwise a pure-Python renderer draws it on a plain projected canvas.
+"""
+
+import asyncio
+import hashlib
+import io
+import math
+import os
+import struct
+import zlib
+from pathlib import Path
+from typing import Awaitable, Callable
+
+import httpx
+from loguru import logger
+
+MAP_IMAGE_BUCKET = os.getenv("MAP_IMAGE_BUCKET", "map-images")
+MAP_IMAGE_FORMAT = os.getenv("MAP_IMAGE_FORMAT", "png")  # "webp" needs Pillow
+MAP_TILE_URL = os.getenv("MAP_TILE_URL", "")
+MAP_TILE_CACHE_DIR = Path(os.getenv("MAP_TILE_CACHE_DIR", ".map_tile_cache"))
+
+WIDTH = 600
+HEIGHT = 400
+PADDING_PX = 40
+TILE_SIZE = 256
+
+# Bump when the drawing style changes so new renders get new content hashes
+STYLE_VERSION = 1
+
+BACKGROUND = (242, 239, 233)
+FILL = (66, 133, 244)
+FILL_ALPHA = 0.27
+OUTLINE = (66, 133, 244)
+MARKER = (219, 68, 55)
+MARKER_BORDER = (255, 255, 255)
+
+try:
+    from PIL import Image, ImageDraw
+except ImportError:
+    Image = None
+
+# Concurrent renders (CPU-bound, run in threads)
+MAX_CONCURRENT_RENDERS = 4
+
+# Background renders are retried with exponential backoff before giving up
+RENDER_ATTEMPTS = 3
+RENDER_RETRY_SECONDS = 2.0
+
+# Called when a scheduled image can't be stored, e.g. to clear the row's URL
+OnFailure = Callable[[], Awaitable[None]]
+
+# Digests known to be stored, so repeated geometries skip render and upload
+_stored: set[str] = set()
+_pending: set[asyncio.Task] = set()
+_render_slots: asyncio.Semaphore | None = None
+_render_slots_loop: asyncio.AbstractEventLoop | None = None
+
+# While the overload controller has renders deferred, schedule_render queues
+# geometries here instead of starting them (oldest dropped beyond the cap)
+MAX_DEFERRED_RENDERS = 5000
+_deferring = False
+_deferred: list[tuple[list[dict], OnFailure | None]] = []
+
+
+def _image_format() -> str:
+    return "webp" if MAP_IMAGE_FORMAT == "webp" and Image is not None else "png"
+
+
+def _sorted_ring(coordinates: list[dict]) -> list[tuple[float, float]]:
+    """(lng, lat) polygon ring ordered by angle around the centroid, as _build_geojson does."""
+    center_lat = sum(c["lat"] for c in coordinates) / len(coordinates)
+    center_lng = sum(c["lng"] for c in coordinates) / len(coordinates)
+    ordered = sorted(coordinates, key=lambda c: math.atan2(c["lat"] - center_lat, c["lng"] - center_lng))
+    return [(c["lng"], c["lat"]) for c in ordered]
+
+
+def geometry_digest(coordinates: list[dict]) -> str:
+    """Content hash of the rendered geometry (rounded to ~10cm) plus render settings."""
+    canonical = ";".join(f"{c['lat']:.6f},{c['lng']:.6f}" for c in sorted(coordinates, key=lambda c: (c["lat"], c["lng"])))
+    payload = f"v{STYLE_VERSION}|{WIDTH}x{HEIGHT}|{bool(MAP_TILE_URL and Image)}|{canonical}"
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def _object_name(digest: str) -> str:
+    return f"{digest}.{_image_format()}"
+
+
+def map_image_url(coordinates: list[dict] | None) -> str | None:
+    """Public URL the rendered image for these coordinates will be stored at."""
+    supabase_url = os.getenv("SUPABASE_URL", "")
+    if not coordinates or len(coordinates) < 3 or not supabase_url:
+        return None
+    name = _object_name(geometry_digest(coordinates))
+    return f"{supabase_url}/storage/v1/object/public/{MAP_IMAGE_BUCKET}/{name}"
+
+
+# ------------------------------------------------------------
+# Projection
+# ------------------------------------------------------------
+
+
+def _world_px(lng: float, lat: float, zoom: float) -> tuple[float, float]:
+    scale = TILE_SIZE * 2**zoom
+    lat_rad = math.radians(max(min(lat, 85.0511), -85.0511))
+    x = (lng + 180.0) / 360.0 * scale
+    y = (1 - math.log(math.tan(lat_rad) + 1 / math.cos(lat_rad)) / math.pi) / 2 * scale
+    return x, y
+
+
+def _fit(points: list[tuple[float, float]], integer_zoom: bool) -> tuple[float, float, float]:
+    """Zoom and top-left world pixel offset that fit the points into the image."""
+    lngs = [p[0] for p in points]
+    lats = [p[1] for p in points]
+    x0, y0 = _world_px(min(lngs), max(lats), 0)
+    x1, y1 = _world_px(max(lngs), min(lats), 0)
+    span_x = max(x1 - x0, 1e-9)
+    span_y = max(y1 - y0, 1e-9)
+    zoom = min(math.log2((WIDTH - 2 * PADDING_PX) / span_x), math.log2((HEIGHT - 2 * PADDING_PX) / span_y), 18)
+    if integer_zoom:
+        zoom = math.floor(zoom)
+
+    cx, cy = _world_px((min(lngs) + max(lngs)) / 2, (min(lats) + max(lats)) / 2, zoom)
+    return zoom, cx - WIDTH / 2, cy - HEIGHT / 2
+
+
+# ------------------------------------------------------------
+# Pure-Python canvas (no dependencies)
+# ------------------------------------------------------------
+
+
+class _Canvas:
+    def __init__(self, width: int, height: int, background: tuple[int, int, int]):
+        self.width = width
+        self.height = height
+        self.pixels = bytearray(bytes(background) * (width * height))
+
+    def blend(self, x: int, y: int, color: tuple[int, int, int], alpha: float = 1.0) -> None:
+        if 0 <= x < self.width and 0 <= y < self.height:
+            i = (y * self.width + x) * 3
+            px = self.pixels
+            for k in range(3):
+                px[i + k] = int(px[i + k] * (1 - alpha) + color[k] * alpha)
+
+    def fill_polygon(self, pts: list[tuple[float, float]], color, alpha: float) -> None:
+        """Even-odd scanline fill."""
+        ys = [p[1] for p in pts]
+        edges = list(zip(pts, pts[1:] + pts[:1]))
+        for y in range(max(0, int(min(ys))), min(self.height, int(max(ys)) + 1)):
+            sy = y + 0.5
+            xs = sorted(
+                x1 + (sy - y1) * (x2 - x1) / (y2 - y1)
+                for (x1, y1), (x2, y2) in edges
+                if (y1 <= sy < y2) or (y2 <= sy < y1)
+            )
+            for left, right in zip(xs[::2], xs[1::2]):
+                for x in range(max(0, int(left + 0.5)), min(self.width, int(right + 0.5))):
+                    self.blend(x, y, color, alpha)
+
+    def disc(self, cx: float, cy: float, r: float, color) -> None:
+        for y in range(int(cy - r), int(cy + r) + 1):
+            for x in range(int(cx - r), int(cx + r) + 1):
+                if (x - cx) ** 2 + (y - cy) ** 2 <= r * r:
+                    self.blend(x, y, color)
+
+    def line(self, a: tuple[float, float], b: tuple[float, float], color, width: float) -> None:
+        steps = int(max(abs(b[0] - a[0]), abs(b[1] - a[1]))) + 1
+        for s in range(steps + 1):
+            t = s / steps
+            self.disc(a[0] + (b[0] - a[0]) * t, a[1] + (b[1] - a[1]) * t, width / 2, color)
+
+    def to_png(self) -> bytes:
+        row_len = self.width * 3
+        raw = b"".join(
+            b"\x00" + bytes(self.pixels[y * row_len : (y + 1) * row_len]) for y in range(self.height)
+        )
+
+        def chunk(kind: bytes, data: bytes) -> bytes:
+            return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+        header = struct.pack(">IIBBBBB", self.width, self.height, 8, 2, 0, 0, 0)
+        return (
+            b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", header)
+            + chunk(b"IDAT", zlib.compress(raw, 9))
+            + chunk(b"IEND", b"")
+        )
+
+
+def _render_plain(ring: list[tuple[float, float]], markers: list[tuple[float, float]]) -> bytes:
+    zoom, ox, oy = _fit(ring, integer_zoom=False)
+
+    def project(p):
+        x, y = _world_px(p[0], p[1], zoom)
+        return x - ox, y - oy
+
+    canvas = _Canvas(WIDTH, HEIGHT, BACKGROUND)
+    pts = [project(p) for p in ring]
+    canvas.fill_polygon(pts, FILL, FILL_ALPHA)
+    for a, b in zip(pts, pts[1:] + pts[:1]):
+        canvas.line(a, b, OUTLINE, 2)
+    for m in markers:
+        x, y = project(m)
+        canvas.disc(x, y, 5, MARKER_BORDER)
+        canvas.disc(x, y, 3.5, MARKER)
+    return canvas.to_png()
+
+
+# ------------------------------------------------------------
+# Pillow renderer over cached base tiles
+# ------------------------------------------------------------
+
+
+def _base_tile(client: httpx.Client, z: int, x: int, y: int):
+    path = MAP_TILE_CACHE_DIR / str(z) / str(x) / f"{y}.png"
+    if not path.exists():
+        resp = client.get(MAP_TILE_URL.format(z=z, x=x % 2**z, y=y))
+        resp.raise_for_status()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(resp.content)
+    return Image.open(path).convert("RGB")
+
+
+def _render_tiles(ring: list[tuple[float, float]], markers: list[tuple[float, float]]) -> bytes:
+    zoom, ox, oy = _fit(ring, integer_zoom=True)
+    zoom = int(zoom)
+    image = Image.new("RGB", (WIDTH, HEIGHT), BACKGROUND)
+
+    with httpx.Client(timeout=10.0, headers={"User-Agent": "redistricting-agent map renderer"}) as client:
+        for tx in range(int(ox // TILE_SIZE), int((ox + WIDTH) // TILE_SIZE) + 1):
+            for ty in range(int(oy // TILE_SIZE), int((oy + HEIGHT) // TILE_SIZE) + 1):
+                if 0 <= ty < 2**zoom:
+                    image.paste(_base_tile(client, zoom, tx, ty), (int(tx * TILE_SIZE - ox), int(ty * TILE_SIZE - oy)))
+
+    def project(p):
+        x, y = _world_px(p[0], p[1], zoom)
+        return x - ox, y - oy
+
+    pts = [project(p) for p in ring]
+    overlay = Image.new("RGBA", image.size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(overlay)
+    draw.polygon(pts, fill=FILL + (int(255 * FILL_ALPHA),))
+    draw.line(pts + pts[:1], fill=OUTLINE + (255,), width=2)
+    for m in markers:
+        x, y = project(m)
+        draw.ellipse((x - 5, y - 5, x + 5, y + 5), fill=MARKER + (255,), outline=MARKER_BORDER + (255,), width=2)
+    image = Image.alpha_composite(image.convert("RGBA"), overlay).convert("RGB")
+
+    out = io.BytesIO()
+    if _image_format() == "webp":
+        image.save(out, format="WEBP", quality=80, method=6)
+    else:
+        image.quantize(colors=64).save(out, format="PNG", optimize=True)
+    return out.getvalue()
+
+
+def render(coordinates: list[dict]) -> bytes:
+    """Render the polygon and point markers for a set of geocoded coordinates."""
+    ring = _sorted_ring(coordinates)
+    markers = [(c["lng"], c["lat"]) for c in coordinates]
+    if Image is not None and MAP_TILE_URL:
+        try:
+            return _render_tiles(ring, markers)
+        except Exception as e:
+            logger.warning(f"Base tile render failed, using plain canvas: {e}")
+    if Image is not None and _image_format() == "webp":
+        image = Image.open(io.BytesIO(_render_plain(ring, markers)))
+        out = io.BytesIO()
+        image.save(out, format="WEBP", quality=80, method=6)
+        return out.getvalue()
+    return _render_plain(ring, markers)
+
+
+# ------------------------------------------------------------
+# Storage (Supabase Storage, content-addressed)
+# ------------------------------------------------------------
+
+
+async def _store(client: httpx.AsyncClient, name: str, body: bytes) -> None:
+    supabase_url = os.getenv("SUPABASE_URL", "")
+    service_key = os.getenv("SUPABASE_SERVICE_KEY", "")
+    resp = await client.post(
+        f"{supabase_url}/storage/v1/object/{MAP_IMAGE_BUCKET}/{name}",
+        headers={
+            "apikey": service_key,
+            "Authorization": f"Bearer {service_key}",
+            "Content-Type": f"image/{_image_format()}",
+            "Cache-Control": "public, max-age=31536000, immutable",
+        },
+        content=body,
+    )
+    # 409 / "Duplicate" means an identical geometry was already stored
+    if resp.status_code not in (200, 201, 409) and "Duplicate" not in resp.text:
+        raise RuntimeError(f"Storage upload failed: {resp.status_code} {resp.text}")
+
+
+async def ensure_rendered(coordinates: list[dict]) -> str | None:
+    """Render and upload the image for these coordinates unless it's already stored."""
+    url = map_image_url(coordinates)
+    if url is None:
+        return None
+    digest = geometry_digest(coordinates)
+    if digest in _stored:
+        return url
+
+    async with _slots(), httpx.AsyncClient(timeout=15.0) as client:
+        if digest in _stored:
+            return url
+        head = await client.head(url)
+        if head.status_code != 200:
+            body = await asyncio.to_thread(render, coordinates)
+            await _store(client, _object_name(digest), body)
+            logger.info(f"Rendered map image {digest} ({len(body)} bytes)")
+
+    _stored.add(digest)
+    return url
+
+
+def _slots() -> asyncio.Semaphore:
+    """The render semaphore for the running event loop."""
+    global _render_slots, _render_slots_loop
+    loop = asyncio.get_running_loop()
+    if _render_slots_loop is not loop:
+        _render_slots_loop = loop
+        _render_slots = asyncio.Semaphore(MAX_CONCURRENT_RENDERS)
+    return _render_slots
+
+
+def _track(coro) -> None:
+    task = asyncio.get_running_loop().create_task(coro)
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
+
+
+async def _give_up(on_failure: OnFailure | None) -> None:
+    if on_failure is None:
+        return
+    try:
+        await on_failure()
+    except Exception as e:
+        logger.error(f"Map image failure handler failed: {e}")
+
+
+def schedule_render(coordinates: list[dict] | None, on_failure: OnFailure | None = None) -> None:
+    """Render/upload in the background (write-behind); errors are logged, not raised.
+
+    Failed renders are retried; `on_failure` is awaited if every attempt fails
+    (or the render is dropped from the overload queue).
+    """
+    if not coordinates or len(coordinates) < 3:
+        return
+    if _deferring:
+        _deferred.append((coordinates, on_failure))
+        if len(_deferred) > MAX_DEFERRED_RENDERS:
+            _, dropped = _deferred.pop(0)
+            if dropped is not None:
+                _track(_give_up(dropped))
+        return
+
+    async def _run():
+        for attempt in range(RENDER_ATTEMPTS):
+            try:
+                await ensure_rendered(coordinates)
+                return
+            except Exception as e:
+                logger.warning(f"Map image render failed (attempt {attempt + 1}/{RENDER_ATTEMPTS}): {e}")
+            if attempt + 1 < RENDER_ATTEMPTS:
+                await asyncio.sleep(RENDER_RETRY_SECONDS * 2**attempt)
+        logger.error(f"Giving up on map image {geometry_digest(coordinates)}")
+        await _give_up(on_failure)
+
+    _track(_run())
+
+
+def set_deferred(deferring: bool) -> None:
+    """Hold new renders (under overload), or schedule everything held so far."""
+    global _deferring
+    _deferring = deferring
+    if deferring or not _deferred:
+        return
+    held = list(_deferred)
+    _deferred.clear()
+    logger.info(f"Rendering {len(held)} deferred map image(s)")
+    for coordinates, on_failure in held:
+        schedule_render(coordinates, on_failure)
+
+
+async def drain() -> None:
+    """Wait for scheduled renders to finish (for batch jobs before exit)."""
+    while _pending:
+        await asyncio.gather(*list(_pending), return_exceptions=True)
@@ -0,0 +1,82 @@
+"""
+Metrics - process-wide counters and summaries.
+
+Counters are plain integers keyed by name; summaries keep a count and sum so
+averages can be derived; gauges hold the last value set. Everything is exported in the Prometheus text format
+from the agent's /metrics endpoint, and snapshot() is handy for logs and tests.
+"""
+
+import threading
+
+_LOCK = threading.Lock()
+_COUNTERS: dict[str, int] = {}
+_SUMMARIES: dict[str, list[float]] = {}  # name -> [count, sum]
+_GAUGES: dict[str, float] = {}
+_HELP: dict[str, str] = {}
+
+
+def describe(name: str, help_text: str) -> None:
+    """Register help text shown in the Prometheus export."""
+    _HELP[name] = help_text
+
+
+def incr(name: str, n: int = 1) -> None:
+    with _LOCK:
+        _COUNTERS[name] = _COUNTERS.get(name, 0) + n
+
+
+def observe(name: str, value: float) -> None:
+    with _LOCK:
+        summary = _SUMMARIES.setdefault(name, [0, 0.0])
+        summary[0] += 1
+        summary[1] += value
+
+
+def gauge(name: str, value: float) -> None:
+    with _LOCK:
+        _GAUGES[name] = value
+
+
+def get(name: str) -> int:
+    return _COUNTERS.get(name, 0)
+
+
+def snapshot() -> dict:
+    """Current counters and gauges, plus <name>_count / <name>_sum for each summary."""
+    with _LOCK:
+        out: dict = {**_COUNTERS, **_GAUGES}
+        for name, (count, total) in _SUMMARIES.items():
+            out[f"{name}_count"] = count
+            out[f"{name}_sum"] = round(total, 6)
+    return out
+
+
+def reset() -> None:
+    with _LOCK:
+        _COUNTERS.clear()
+        _SUMMARIES.clear()
+        _GAUGES.clear()
+
+
+def render_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    with _LOCK:
+        for name in sorted(_COUNTERS):
+            if name in _HELP:
+                lines.append(f"# HELP {name} {_HELP[name]}")
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name} {_COUNTERS[name]}")
+        for name in sorted(_GAUGES):
+            if name in _HELP:
+                lines.append(f"# HELP {name} {_HELP[name]}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {_GAUGES[name]}")
+        for name in sorted(_SUMMARIES):
+            count, total = _SUMMARIES[name]
+            if name in _HELP:
+                lines.append(f"# HELP {name} {_HELP[name]}")
+            lines.append(f"# TYPE {name} summary")
+            lines.append(f"{name}_count {count}")
+            lines.append(f"{name}_sum {total}")
+    return "\n".join(lines) + "\n"
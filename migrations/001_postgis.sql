@@ -0,0 +1,118 @@
+-- PostGIS geometry columns for submissions (opt-in)
+-- Run after supabase_schema.sql, then set POSTGIS_MODE=on for the agent so
+-- save_submission and regeocode.py write geom/centroid directly as EWKT.
+-- Safe to re-run.
+
+create extension if not exists postgis;
+
+-- ============================================================
+-- Columns
+-- ============================================================
+alter table submissions add column if not exists geom geometry(Polygon, 4326);      -- polygon from geojson
+alter table submissions add column if not exists centroid geometry(Point, 4326);    -- mean of all_coordinates
+
+-- ============================================================
+-- Indexes
+-- ============================================================
+-- Overlap / containment: geom && / ST_Intersects / ST_Contains
+create index if not exists idx_submissions_geom on submissions using gist (geom);
+create index if not exists idx_submissions_centroid on submissions using gist (centroid);
+-- Radius queries in meters go through geography
+create index if not exists idx_submissions_centroid_geog on submissions using gist ((centroid::geography));
+
+-- ============================================================
+-- Backfill rows saved before this migration
+-- Updates at most batch_size rows per call and returns how many it touched;
+-- call repeatedly until it returns 0 so large tables aren't locked in one
+-- long transaction:
+--   select backfill_submission_geometry();
+-- ============================================================
+create or replace function backfill_submission_geometry(batch_size integer default 5000)
+returns integer
+language plpgsql
+set search_path = public
+as $$
+declare
+  updated integer;
+begin
+  with batch as (
+    select s.id
+    from submissions s
+    where (s.geom is null and s.geojson -> 'geometry' ->> 'type' = 'Polygon')
+       or (s.centroid is null and jsonb_array_length(coalesce(s.all_coordinates, '[]'::jsonb)) > 0)
+    limit batch_size
+  )
+  update submissions s
+  set
+    geom = coalesce(
+      s.geom,
+      case when s.geojson -> 'geometry' ->> 'type' = 'Polygon'
+        then ST_SetSRID(ST_GeomFromGeoJSON(s.geojson -> 'geometry'), 4326)
+      end
+    ),
+    centroid = coalesce(
+      s.centroid,
+      (select ST_SetSRID(ST_MakePoint(avg((c ->> 'lng')::float8), avg((c ->> 'lat')::float8)), 4326)
+       from jsonb_array_elements(s.all_coordinates) c
+       having count(*) > 0)
+    )
+  from batch
+  where s.id = batch.id;
+
+  get diagnostics updated = row_count;
+  return updated;
+end;
+$$;
+
+revoke execute on function backfill_submission_geometry(integer) from public, anon, authenticated;
+
+-- Backfill by calling the function until it returns 0, one statement (and
+-- so one commit) per batch; a loop inside one DO block would run every batch
+-- in a single transaction and hold the row locks until the end. From a shell:
+--   until [ "$(psql "$DATABASE_URL" -Atc 'select backfill_submission_geometry()')" = 0 ]; do :; done
+
+-- ============================================================
+-- Spatial queries, called over PostgREST RPC (see supabase_backend.py)
+-- All use the GiST indexes above and skip flagged duplicates.
+-- ============================================================
+
+-- Submissions whose polygon overlaps a GeoJSON geometry
+create or replace function submissions_intersecting(geometry jsonb, max_rows integer default 1000)
+returns table (id uuid, created_at timestamptz, zipcode text, community_name text)
+language sql stable
+as $$
+  select s.id, s.created_at, s.zipcode, s.community_name
+  from submissions s
+  where s.geom && ST_SetSRID(ST_GeomFromGeoJSON(geometry), 4326)
+    and ST_Intersects(s.geom, ST_SetSRID(ST_GeomFromGeoJSON(geometry), 4326))
+    and s.duplicate_of is null
+  order by s.created_at desc
+  limit max_rows
+$$;
+
+-- Submissions whose polygon contains a point
+create or replace function submissions_containing(lat float8, lng float8, max_rows integer default 1000)
+returns table (id uuid, created_at timestamptz, zipcode text, community_name text)
+language sql stable
+as $$
+  select s.id, s.created_at, s.zipcode, s.community_name
+  from submissions s
+  where ST_Contains(s.geom, ST_SetSRID(ST_MakePoint(lng, lat), 4326))
+    and s.duplicate_of is null
+  order by s.created_at desc
+  limit max_rows
+$$;
+
+-- Submissions centered within `meters` of a point, nearest first
+create or replace function submissions_within(lat float8, lng float8, meters float8, max_rows integer default 1000)
+returns table (id uuid, created_at timestamptz, zipcode text, community_name text, distance_m float8)
+language sql stable
+as $$
+  select s.id, s.created_at, s.zipcode, s.community_name,
+    ST_Distance(s.centroid::geography, ST_SetSRID(ST_MakePoint(lng, lat), 4326)::geography) as distance_m
+  from submissions s
+  where ST_DWithin(s.centroid::geography, ST_SetSRID(ST_MakePoint(lng, lat), 4326)::geography, meters)
+    and s.duplicate_of is null
+  order by distance_m
+  limit max_rows
+$$;
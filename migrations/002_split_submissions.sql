@@ -0,0 +1,369 @@
+-- Lean, time-partitioned submissions with the geo payload in a side table
+-- Run after supabase_schema.sql (and 001_postgis.sql, if you use it), then set
+-- SUBMISSIONS_LAYOUT=split for the agent and scripts and
+-- NEXT_PUBLIC_SUBMISSIONS_LAYOUT=split for the dashboard.
+--
+-- Layout after this migration:
+--   submissions        answers, summary text, centroid geohashes, map URL;
+--                      range-partitioned by created_at month
+--   submission_geo     all_coordinates, geojson, cover_gh5/6/7 (and geom/centroid
+--                      with PostGIS), one row per submission
+--   submissions_full   read-only view joining the two, for exports and scripts
+--                      that need geometry
+-- Writes go through insert_submission() / update_submissions() so both tables
+-- change in one transaction.
+--
+-- The old table is kept as submissions_legacy; drop it once the copy is verified.
+-- Run once.
+
+-- ============================================================
+-- Move the old table aside
+-- ============================================================
+alter table submissions rename to submissions_legacy;
+alter index if exists submissions_pkey rename to submissions_legacy_pkey;
+
+-- Index names are global; free the ones recreated below
+alter index if exists idx_submissions_zipcode rename to idx_submissions_legacy_zipcode;
+alter index if exists idx_submissions_created_at rename to idx_submissions_legacy_created_at;
+alter index if exists idx_submissions_centroid_gh5 rename to idx_submissions_legacy_centroid_gh5;
+alter index if exists idx_submissions_centroid_gh6 rename to idx_submissions_legacy_centroid_gh6;
+alter index if exists idx_submissions_centroid_gh7 rename to idx_submissions_legacy_centroid_gh7;
+alter index if exists idx_submissions_centroid_geohash rename to idx_submissions_legacy_centroid_geohash;
+alter index if exists idx_submissions_cover_gh5 rename to idx_submissions_legacy_cover_gh5;
+alter index if exists idx_submissions_cover_gh6 rename to idx_submissions_legacy_cover_gh6;
+alter index if exists idx_submissions_cover_gh7 rename to idx_submissions_legacy_cover_gh7;
+alter index if exists idx_submissions_duplicate_of rename to idx_submissions_legacy_duplicate_of;
+alter index if exists idx_submissions_geom rename to idx_submissions_legacy_geom;
+alter index if exists idx_submissions_centroid rename to idx_submissions_legacy_centroid;
+alter index if exists idx_submissions_centroid_geog rename to idx_submissions_legacy_centroid_geog;
+
+-- ============================================================
+-- Table: submissions (lean, partitioned by month)
+-- The primary key has to include the partition key. duplicate_of can no
+-- longer be a foreign key (it would need created_at too); dedup.py only
+-- ever writes ids it has just read.
+-- ============================================================
+create table submissions (
+  id uuid default gen_random_uuid() not null,
+  created_at timestamptz default now() not null,
+
+  caller_name text,
+  phone_number text,
+  consent boolean default false not null,
+  zipcode text,
+  address text,
+
+  community_name text,
+  community_description text,
+  key_places text,
+  community_boundaries text,
+  cultural_interests text,
+  economic_interests text,
+  community_activities text,
+  other_considerations text,
+
+  geographic_summary text,
+  primary_address text,
+  geocoded_landmarks text,
+  map_image_url text,
+
+  centroid_geohash text,
+  centroid_gh5 text,
+  centroid_gh6 text,
+  centroid_gh7 text,
+
+  duplicate_of uuid,
+  duplicate_score real,
+
+  primary key (id, created_at)
+) partition by range (created_at);
+
+-- Rows outside every monthly partition land here instead of failing the insert
+create table submissions_default partition of submissions default;
+
+-- Monthly partitions from from_month through months_ahead months from now.
+-- Returns how many were created. Keep it ahead of the calendar (e.g. monthly
+-- with pg_cron: select cron.schedule('0 0 1 * *', 'select create_submission_partitions()');)
+-- since a month can't be split out of the default partition once it has rows.
+create or replace function create_submission_partitions(from_month date default current_date, months_ahead integer default 3)
+returns integer
+language plpgsql
+set search_path = public
+as $$
+declare
+  cur date := date_trunc('month', from_month)::date;
+  last_month date := (date_trunc('month', now()) + make_interval(months => months_ahead))::date;
+  partition_name text;
+  created integer := 0;
+begin
+  while cur <= last_month loop
+    partition_name := 'submissions_' || to_char(cur, 'YYYY_MM');
+    if to_regclass(partition_name) is null then
+      execute format(
+        'create table %I partition of submissions for values from (%L) to (%L)',
+        partition_name, cur::timestamptz, (cur + interval '1 month')::timestamptz
+      );
+      created := created + 1;
+    end if;
+    cur := (cur + interval '1 month')::date;
+  end loop;
+  return created;
+end;
+$$;
+
+revoke execute on function create_submission_partitions(date, integer) from public, anon, authenticated;
+
+select create_submission_partitions(coalesce((select min(created_at)::date from submissions_legacy), current_date));
+
+-- ============================================================
+-- Table: submission_geo (heavy geo payload, 1:1 with submissions)
+-- ============================================================
+create table submission_geo (
+  submission_id uuid primary key,
+  created_at timestamptz not null,
+  all_coordinates jsonb,       -- array of {lat, lng, formatted_address}
+  geojson jsonb,               -- GeoJSON Feature with polygon
+  cover_gh5 text[],            -- geohash cells covered by the polygon (see geocells.py)
+  cover_gh6 text[],
+  cover_gh7 text[],
+  foreign key (submission_id, created_at) references submissions (id, created_at) on delete cascade
+);
+
+-- ============================================================
+-- Copy existing rows
+-- ============================================================
+insert into submissions (
+  id, created_at, caller_name, phone_number, consent, zipcode, address,
+  community_name, community_description, key_places, community_boundaries,
+  cultural_interests, economic_interests, community_activities, other_considerations,
+  geographic_summary, primary_address, geocoded_landmarks, map_image_url,
+  centroid_geohash, centroid_gh5, centroid_gh6, centroid_gh7, duplicate_of, duplicate_score
+)
+select
+  id, created_at, caller_name, phone_number, consent, zipcode, address,
+  community_name, community_description, key_places, community_boundaries,
+  cultural_interests, economic_interests, community_activities, other_considerations,
+  geographic_summary, primary_address, geocoded_landmarks, map_image_url,
+  centroid_geohash, centroid_gh5, centroid_gh6, centroid_gh7, duplicate_of, duplicate_score
+from submissions_legacy;
+
+insert into submission_geo (submission_id, created_at, all_coordinates, geojson, cover_gh5, cover_gh6, cover_gh7)
+select id, created_at, all_coordinates, geojson, cover_gh5, cover_gh6, cover_gh7
+from submissions_legacy;
+
+-- ============================================================
+-- PostGIS columns (only if 001_postgis.sql was applied)
+-- ============================================================
+do $$
+begin
+  if not exists (
+    select 1 from information_schema.columns
+    where table_name = 'submissions_legacy' and column_name = 'geom'
+  ) then
+    return;
+  end if;
+
+  alter table submission_geo add column geom geometry(Polygon, 4326);
+  alter table submission_geo add column centroid geometry(Point, 4326);
+  update submission_geo g set geom = l.geom, centroid = l.centroid
+  from submissions_legacy l
+  where l.id = g.submission_id;
+
+  create index idx_submission_geo_geom on submission_geo using gist (geom);
+  create index idx_submission_geo_centroid on submission_geo using gist (centroid);
+  create index idx_submission_geo_centroid_geog on submission_geo using gist ((centroid::geography));
+
+  -- Backfill is done; new rows get geom/centroid from the agent
+  drop function if exists backfill_submission_geometry(integer);
+
+  create or replace function submissions_intersecting(geometry jsonb, max_rows integer default 1000)
+  returns table (id uuid, created_at timestamptz, zipcode text, community_name text)
+  language sql stable
+  as $f$
+    select s.id, s.created_at, s.zipcode, s.community_name
+    from submission_geo g
+    join submissions s on s.id = g.submission_id and s.created_at = g.created_at
+    where g.geom && ST_SetSRID(ST_GeomFromGeoJSON(geometry), 4326)
+      and ST_Intersects(g.geom, ST_SetSRID(ST_GeomFromGeoJSON(geometry), 4326))
+      and s.duplicate_of is null
+    order by s.created_at desc
+    limit max_rows
+  $f$;
+
+  create or replace function submissions_containing(lat float8, lng float8, max_rows integer default 1000)
+  returns table (id uuid, created_at timestamptz, zipcode text, community_name text)
+  language sql stable
+  as $f$
+    select s.id, s.created_at, s.zipcode, s.community_name
+    from submission_geo g
+    join submissions s on s.id = g.submission_id and s.created_at = g.created_at
+    where ST_Contains(g.geom, ST_SetSRID(ST_MakePoint(lng, lat), 4326))
+      and s.duplicate_of is null
+    order by s.created_at desc
+    limit max_rows
+  $f$;
+
+  create or replace function submissions_within(lat float8, lng float8, meters float8, max_rows integer default 1000)
+  returns table (id uuid, created_at timestamptz, zipcode text, community_name text, distance_m float8)
+  language sql stable
+  as $f$
+    select s.id, s.created_at, s.zipcode, s.community_name,
+      ST_Distance(g.centroid::geography, ST_SetSRID(ST_MakePoint(lng, lat), 4326)::geography) as distance_m
+    from submission_geo g
+    join submissions s on s.id = g.submission_id and s.created_at = g.created_at
+    where ST_DWithin(g.centroid::geography, ST_SetSRID(ST_MakePoint(lng, lat), 4326)::geography, meters)
+      and s.duplicate_of is null
+    order by distance_m
+    limit max_rows
+  $f$;
+end;
+$$;
+
+-- ============================================================
+-- Indexes
+-- Created on the parent, so every partition (including future ones) gets them.
+-- The covering indexes answer the dashboard's list queries (latest first,
+-- optionally for one zipcode) with index-only scans.
+-- ============================================================
+create index idx_submissions_created_at on submissions (created_at desc)
+  include (id, zipcode, community_name, duplicate_of);
+create index idx_submissions_zipcode on submissions (zipcode, created_at desc)
+  include (id, community_name, duplicate_of);
+create index idx_submissions_centroid_gh5 on submissions (centroid_gh5);
+create index idx_submissions_centroid_gh6 on submissions (centroid_gh6);
+create index idx_submissions_centroid_gh7 on submissions (centroid_gh7);
+create index idx_submissions_centroid_geohash on submissions (centroid_geohash text_pattern_ops);
+create index idx_submissions_duplicate_of on submissions (duplicate_of) where duplicate_of is not null;
+
+create index idx_submission_geo_cover_gh5 on submission_geo using gin (cover_gh5);
+create index idx_submission_geo_cover_gh6 on submission_geo using gin (cover_gh6);
+create index idx_submission_geo_cover_gh7 on submission_geo using gin (cover_gh7);
+
+-- ============================================================
+-- View: submissions_full (the pre-split row shape, read-only)
+-- ============================================================
+create view submissions_full with (security_invoker = true) as
+select s.*, g.all_coordinates, g.geojson, g.cover_gh5, g.cover_gh6, g.cover_gh7
+from submissions s
+left join submission_geo g on g.submission_id = s.id and g.created_at = s.created_at;
+
+-- ============================================================
+-- Writes
+-- Both take the flat pre-split row as jsonb; jsonb_populate_record routes
+-- each key to whichever table has that column and ignores the rest.
+-- ============================================================
+create or replace function insert_submission(submission jsonb)
+returns table (id uuid, created_at timestamptz)
+language plpgsql
+set search_path = public
+as $$
+declare
+  new_id uuid := coalesce((submission ->> 'id')::uuid, gen_random_uuid());
+  new_created_at timestamptz := coalesce((submission ->> 'created_at')::timestamptz, now());
+  keys jsonb := jsonb_build_object('id', new_id, 'created_at', new_created_at, 'submission_id', new_id);
+begin
+  insert into submissions
+  select * from jsonb_populate_record(null::submissions, jsonb_build_object('consent', false) || submission || keys);
+  insert into submission_geo
+  select * from jsonb_populate_record(null::submission_geo, submission || keys);
+  return query select new_id, new_created_at;
+end;
+$$;
+
+-- Partial updates keyed by "id": only the supplied columns change. Rows are
+-- updated in place, so concurrent patches to one id wait on its row lock and
+-- apply one after the other; the column lists come from the catalog so they
+-- aren't hardcoded. Returns the number of submissions found.
+create or replace function update_submissions(patches jsonb)
+returns integer
+language plpgsql
+set search_path = public
+as $$
+declare
+  patch jsonb;
+  lean_columns text;
+  geo_columns text;
+  found_id uuid;
+  found_created_at timestamptz;
+  geo_rows integer;
+  updated integer := 0;
+begin
+  select string_agg(quote_ident(attname), ', ' order by attnum) into lean_columns
+  from pg_attribute
+  where attrelid = 'submissions'::regclass and attnum > 0 and not attisdropped
+    and attname not in ('id', 'created_at');
+  select string_agg(quote_ident(attname), ', ' order by attnum) into geo_columns
+  from pg_attribute
+  where attrelid = 'submission_geo'::regclass and attnum > 0 and not attisdropped
+    and attname not in ('submission_id', 'created_at');
+
+  for patch in select * from jsonb_array_elements(patches) loop
+    execute format(
+      'update submissions s set (%1$s) = (select %1$s from jsonb_populate_record(s, $1))
+       where s.id = $2 returning s.id, s.created_at',
+      lean_columns
+    ) into found_id, found_created_at using patch - 'id' - 'created_at', (patch ->> 'id')::uuid;
+    if found_id is null then
+      continue;
+    end if;
+
+    execute format(
+      'update submission_geo g set (%1$s) = (select %1$s from jsonb_populate_record(g, $1))
+       where g.submission_id = $2',
+      geo_columns
+    ) using patch - 'id' - 'created_at' - 'submission_id', found_id;
+    get diagnostics geo_rows = row_count;
+    if geo_rows = 0 then
+      insert into submission_geo select * from jsonb_populate_record(
+        null::submission_geo,
+        patch || jsonb_build_object('submission_id', found_id, 'created_at', found_created_at)
+      );
+    end if;
+    updated := updated + 1;
+  end loop;
+  return updated;
+end;
+$$;
+
+revoke execute on function insert_submission(jsonb) from public, anon, authenticated;
+revoke execute on function update_submissions(jsonb) from public, anon, authenticated;
+
+-- ============================================================
+-- Row-level security
+-- ============================================================
+alter table submissions enable row level security;
+alter table submission_geo enable row level security;
+
+create policy "Public read submissions"
+  on submissions for select
+  using (true);
+
+create policy "Service insert submissions"
+  on submissions for insert
+  with check (true);
+
+create policy "Public read submission_geo"
+  on submission_geo for select
+  using (true);
+
+create policy "Service insert submission_geo"
+  on submission_geo for insert
+  with check (true);
+
+-- ============================================================
+-- Read-side aggregates (supabase_schema.sql)
+-- The materialized view is bound to the old table; rebuild it on the new one.
+-- ============================================================
+drop materialized view if exists submission_daily_counts;
+
+create materialized view submission_daily_counts as
+select
+  (created_at at time zone 'utc')::date as day,
+  coalesce(zipcode, '') as zipcode,
+  coalesce(zip_state(zipcode), 'Unknown') as state,
+  count(*) as submissions,
+  count(*) filter (where duplicate_of is null) as unique_submissions
+from submissions
+group by 1, 2, 3;
+
+create unique index idx_submission_daily_counts on submission_daily_counts (day, zipcode);
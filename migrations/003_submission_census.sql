@@ -0,0 +1,58 @@
+-- Census geography covered by each submission (filled by census.py)
+-- Run after supabase_schema.sql (works with either submissions layout).
+--
+-- One row per (submission, layer, geography): layer is whatever census.py
+-- was given, e.g. 'block', 'tract', 'cd' (congressional district), 'sldu'.
+--   feature_share      fraction of the block/tract/district the COI covers
+--   submission_share   fraction of the COI that falls in it (for submissions
+--                      with fewer than three points: share of their points)
+-- census.py replaces a submission's rows wholesale on every run, so reruns
+-- with new geography vintages are safe.
+--
+-- No foreign key: in the split layout submissions is keyed by (id, created_at).
+
+create table if not exists submission_census (
+  submission_id uuid not null,
+  layer text not null,
+  geoid text not null,
+  method text not null default 'area',  -- 'area' (polygon clip) or 'point'
+  overlap_sq_miles double precision not null default 0,
+  feature_share double precision,
+  submission_share double precision not null,
+  computed_at timestamptz not null default now(),
+  primary key (submission_id, layer, geoid)
+);
+
+-- "Which COIs touch tract X" / "all submissions in district 12"
+create index if not exists idx_submission_census_geoid on submission_census (layer, geoid) include (submission_share);
+
+-- ============================================================
+-- Writes: replace every row of the given submissions in one transaction
+-- ============================================================
+create or replace function replace_submission_census(submission_ids uuid[], census jsonb)
+returns integer
+language plpgsql
+set search_path = public
+as $$
+declare
+  inserted integer;
+begin
+  delete from submission_census c where c.submission_id = any(submission_ids);
+  insert into submission_census (submission_id, layer, geoid, method, overlap_sq_miles, feature_share, submission_share)
+  select r.submission_id, r.layer, r.geoid, r.method, r.overlap_sq_miles, r.feature_share, r.submission_share
+  from jsonb_populate_recordset(null::submission_census, census) r;
+  get diagnostics inserted = row_count;
+  return inserted;
+end;
+$$;
+
+revoke execute on function replace_submission_census(uuid[], jsonb) from public, anon, authenticated;
+
+-- ============================================================
+-- Row-level security
+-- ============================================================
+alter table submission_census enable row level security;
+
+create policy "Public read submission_census"
+  on submission_census for select
+  using (true);
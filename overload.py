@@ -0,0 +1,133 @@
+"""
+Overload control - steps the call tools down to cheaper modes when the agent
+process is saturated, and back up once it recovers.
+
+A sampler task watches three signals every SAMPLE_INTERVAL seconds: calls in
+progress, geocode requests queued behind the rate limiter, and event-loop lag
+(how late a sleep wakes up). Pressure is the worst of them as a fraction of its
+limit, and each level below kicks in at its LEVEL_THRESHOLDS entry:
+
+1. defer_maps     map images aren't rendered at save time; the geometries are
+                  held and rendered once the process is back to normal
+2. brief_replies  tool results handed to the LLM are trimmed to the essentials,
+                  so every turn carries fewer tokens
+3. zip_only       geocode_community resolves just the zip centroid (one cached
+                  request) instead of the address, landmarks and key places
+
+Levels step up as soon as pressure crosses a threshold, and step down one at a
+time after pressure has stayed under RECOVERY_MARGIN of the current level's
+threshold for RECOVERY_SECONDS, so a brief lull doesn't flap between modes.
+Every transition is logged and counted, and the level and signals are gauges.
+"""
+
+import asyncio
+import os
+import time
+
+from loguru import logger
+
+import call_supervisor
+import map_render
+import metrics
+from geocoding import get_pipeline
+
+# "on" or "off"
+OVERLOAD_CONTROL = os.getenv("OVERLOAD_CONTROL", "on")
+
+# Limits for each signal; pressure 1.0 means one of them is at its limit
+MAX_CALLS = int(os.getenv("OVERLOAD_MAX_CALLS", "40"))
+MAX_GEOCODE_QUEUE = int(os.getenv("OVERLOAD_MAX_GEOCODE_QUEUE", "50"))
+MAX_LOOP_LAG_MS = float(os.getenv("OVERLOAD_MAX_LOOP_LAG_MS", "100"))
+
+NORMAL, DEFER_MAPS, BRIEF_REPLIES, ZIP_ONLY = range(4)
+MODES = ("normal", "defer_maps", "brief_replies", "zip_only")
+LEVEL_THRESHOLDS = (1.0, 1.5, 2.0)  # pressure at which DEFER_MAPS, BRIEF_REPLIES, ZIP_ONLY start
+
+RECOVERY_MARGIN = 0.8
+RECOVERY_SECONDS = 30.0
+SAMPLE_INTERVAL = 0.5
+LAG_SMOOTHING = 0.3  # weight of the newest loop-lag sample
+
+metrics.describe("overload_level", "Current degradation level (0 normal, 1 defer_maps, 2 brief_replies, 3 zip_only)")
+metrics.describe("overload_transitions", "Degradation level changes")
+metrics.describe("overload_pressure", "Worst overload signal as a fraction of its limit")
+metrics.describe("overload_active_calls", "Calls in progress")
+metrics.describe("overload_geocode_queue", "Geocode requests waiting on the rate limiter")
+metrics.describe("overload_loop_lag_ms", "Smoothed event-loop lag")
+
+
+class OverloadController:
+    def __init__(self):
+        self.level = NORMAL
+        self.pressure = 0.0
+        self.loop_lag_ms = 0.0
+        self._calm_since: float | None = None
+
+    def update(self, calls: int, geocode_queue: int, loop_lag_ms: float, now: float | None = None) -> int:
+        """Fold one sample of the signals into the level; returns the new level."""
+        now = time.monotonic() if now is None else now
+        self.pressure = max(calls / MAX_CALLS, geocode_queue / MAX_GEOCODE_QUEUE, loop_lag_ms / MAX_LOOP_LAG_MS)
+        metrics.gauge("overload_pressure", round(self.pressure, 3))
+        metrics.gauge("overload_active_calls", calls)
+        metrics.gauge("overload_geocode_queue", geocode_queue)
+        metrics.gauge("overload_loop_lag_ms", round(loop_lag_ms, 1))
+
+        target = sum(self.pressure >= t for t in LEVEL_THRESHOLDS)
+        if target > self.level:
+            self._calm_since = None
+            self._set_level(target)
+        elif self.level > NORMAL and self.pressure < LEVEL_THRESHOLDS[self.level - 1] * RECOVERY_MARGIN:
+            if self._calm_since is None:
+                self._calm_since = now
+            elif now - self._calm_since >= RECOVERY_SECONDS:
+                self._calm_since = now
+                self._set_level(self.level - 1)
+        else:
+            self._calm_since = None
+        return self.level
+
+    def _set_level(self, level: int) -> None:
+        previous, self.level = self.level, level
+        logger.warning(
+            f"Overload: {MODES[previous]} -> {MODES[level]} "
+            f"(pressure {self.pressure:.2f}, loop lag {self.loop_lag_ms:.0f} ms)"
+        )
+        metrics.incr("overload_transitions")
+        metrics.incr(f"overload_entered_{MODES[level]}")
+        metrics.gauge("overload_level", level)
+        map_render.set_deferred(level >= DEFER_MAPS)
+
+    async def run(self) -> None:
+        """Sample the signals until cancelled."""
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(SAMPLE_INTERVAL)
+            lag_ms = max(0.0, (loop.time() - started - SAMPLE_INTERVAL) * 1000)
+            self.loop_lag_ms += LAG_SMOOTHING * (lag_ms - self.loop_lag_ms)
+            try:
+                self.update(call_supervisor.active_calls(), get_pipeline().limiter.waiting, self.loop_lag_ms)
+            except Exception as e:
+                logger.error(f"Overload sampler failed: {e}")
+
+
+_CONTROLLER = OverloadController()
+_SAMPLER: asyncio.Task | None = None
+
+
+def start() -> None:
+    """Start the sampler on the running loop (once per loop); a no-op with OVERLOAD_CONTROL=off."""
+    global _SAMPLER
+    if OVERLOAD_CONTROL == "off":
+        return
+    if _SAMPLER is None or _SAMPLER.done() or _SAMPLER.get_loop() is not asyncio.get_running_loop():
+        _SAMPLER = asyncio.get_running_loop().create_task(_CONTROLLER.run())
+
+
+def level() -> int:
+    return _CONTROLLER.level
+
+
+def degraded(mode: int) -> bool:
+    """True while the controller is at `mode` or a more degraded level."""
+    return OVERLOAD_CONTROL != "off" and _CONTROLLER.level >= mode
@@ -0,0 +1,246 @@
+"""
+Postgres backend - writes submissions straight to Postgres over a pooled
+asyncpg connection instead of through the PostgREST HTTP API.
+
+Selected with STORAGE_BACKEND=postgres; supabase_backend routes its writes
+here and keeps using PostgREST for reads. DATABASE_URL must be a session-mode
+connection (Supabase's direct connection or session pooler on port 5432) —
+the transaction pooler can't hold prepared statements.
+
+Single inserts and updates run as prepared statements (asyncpg prepares each
+distinct query once per connection and caches it). Bulk loads and bulk updates
+stream rows with binary COPY, into the table itself or into a temp staging
+table that is then merged in one statement. Both table layouts are supported
+(see SUBMISSIONS_LAYOUT).
+"""
+
+import asyncio
+import os
+import re
+import struct
+import uuid
+from datetime import datetime, timezone
+
+from loguru import logger
+
+import fastjson
+import supabase_backend
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+DATABASE_URL = os.getenv("DATABASE_URL", "")
+POOL_SIZE = int(os.getenv("PG_POOL_SIZE", "10"))
+
+_EWKT = re.compile(r"SRID=(\d+);(POINT|POLYGON)\s*\((.*)\)$", re.IGNORECASE)
+
+
+def _require_asyncpg():
+    if asyncpg is None:
+        raise SystemExit("STORAGE_BACKEND=postgres requires asyncpg: uv pip install asyncpg")
+
+
+# ============================================================
+# Codecs
+# ============================================================
+
+
+def _encode_jsonb(value) -> bytes:
+    # jsonb binary format: version byte, then the JSON text
+    return b"\x01" + fastjson.dumps(value)
+
+
+def _decode_jsonb(data: bytes):
+    return fastjson.loads(data[1:])
+
+
+def ewkb(value: str | bytes) -> bytes:
+    """EWKB for the EWKT points and polygons supabase_backend writes (geom/centroid)."""
+    if isinstance(value, bytes):
+        return value
+    m = _EWKT.match(value.strip())
+    if not m:
+        raise ValueError(f"Unsupported geometry: {value[:40]}")
+    srid, kind, body = int(m.group(1)), m.group(2).upper(), m.group(3)
+    if kind == "POINT":
+        x, y = map(float, body.split())
+        return struct.pack("<BIIdd", 1, 0x20000001, srid, x, y)
+    ring = [tuple(map(float, pair.split())) for pair in body.strip("()").split(",")]
+    header = struct.pack("<BIIII", 1, 0x20000003, srid, 1, len(ring))
+    return header + b"".join(struct.pack("<dd", x, y) for x, y in ring)
+
+
+async def _init_connection(conn) -> None:
+    await conn.set_type_codec(
+        "jsonb", schema="pg_catalog", encoder=_encode_jsonb, decoder=_decode_jsonb, format="binary"
+    )
+    try:
+        await conn.set_type_codec(
+            "geometry", schema="public", encoder=ewkb, decoder=bytes, format="binary"
+        )
+    except ValueError:
+        pass  # PostGIS not installed
+
+
+# ============================================================
+# Pool
+# ============================================================
+
+_POOL = None  # asyncio.Task resolving to the pool, shared by concurrent first callers
+_POOL_LOOP: asyncio.AbstractEventLoop | None = None
+
+
+async def _create_pool():
+    if not DATABASE_URL:
+        raise RuntimeError("DATABASE_URL must be set in environment for STORAGE_BACKEND=postgres")
+    pool = await asyncpg.create_pool(DATABASE_URL, min_size=1, max_size=POOL_SIZE, init=_init_connection)
+    logger.info(f"Opened Postgres pool (max {POOL_SIZE} connections)")
+    return pool
+
+
+async def get_pool():
+    """The process-wide connection pool, opened on first use in each event loop."""
+    global _POOL, _POOL_LOOP
+    _require_asyncpg()
+    loop = asyncio.get_running_loop()
+    if _POOL_LOOP is not loop:
+        _POOL_LOOP = loop
+        _POOL = loop.create_task(_create_pool())
+    try:
+        return await _POOL
+    except Exception:
+        _POOL_LOOP = None
+        raise
+
+
+async def close_pool() -> None:
+    global _POOL, _POOL_LOOP
+    if _POOL is not None and _POOL_LOOP is asyncio.get_running_loop() and _POOL.done() and not _POOL.exception():
+        await _POOL.result().close()
+    _POOL = _POOL_LOOP = None
+
+
+# ============================================================
+# Writes
+# ============================================================
+
+
+def _split(row: dict) -> tuple[dict, dict]:
+    """(submissions columns, submission_geo columns) of a flat row in the split layout."""
+    lean = {k: v for k, v in row.items() if k not in supabase_backend.GEO_PAYLOAD_COLUMNS}
+    geo = {k: v for k, v in row.items() if k in supabase_backend.GEO_PAYLOAD_COLUMNS}
+    return lean, geo
+
+
+async def insert_submission(row: dict) -> str:
+    """Insert one submission and return its id."""
+    pool = await get_pool()
+    if supabase_backend.SUBMISSIONS_LAYOUT == "split":
+        row_id = await pool.fetchval("select id from insert_submission($1::jsonb)", row)
+    else:
+        columns = list(row)
+        placeholders = ", ".join(f"${i}" for i in range(1, len(columns) + 1))
+        row_id = await pool.fetchval(
+            f"insert into submissions ({', '.join(columns)}) values ({placeholders}) returning id",
+            *row.values(),
+        )
+    return str(row_id)
+
+
+async def update_submission(submission_id: str, row: dict) -> None:
+    """Overwrite the supplied columns of one submission."""
+    pool = await get_pool()
+    if supabase_backend.SUBMISSIONS_LAYOUT == "split":
+        await pool.execute("select update_submissions($1::jsonb)", [{"id": submission_id, **row}])
+        return
+    assignments = ", ".join(f"{col} = ${i}" for i, col in enumerate(row, start=2))
+    await pool.execute(f"update submissions set {assignments} where id = $1", submission_id, *row.values())
+
+
+async def copy_submissions(rows: list[dict]) -> int:
+    """Bulk-load new submissions with COPY. Every row must carry the same keys.
+
+    Ids and created_at are assigned here when missing so the split layout can
+    load both tables in one transaction. Returns the number of rows loaded.
+    """
+    if not rows:
+        return 0
+    now = datetime.now(timezone.utc)
+    rows = [{"id": uuid.uuid4(), "created_at": now, **row} for row in rows]
+    pool = await get_pool()
+    async with pool.acquire() as conn, conn.transaction():
+        if supabase_backend.SUBMISSIONS_LAYOUT == "split":
+            lean_columns = list(_split(rows[0])[0])
+            geo_columns = list(_split(rows[0])[1])
+            await conn.copy_records_to_table(
+                "submissions", columns=lean_columns, records=[[r[c] for c in lean_columns] for r in rows]
+            )
+            await conn.copy_records_to_table(
+                "submission_geo",
+                columns=["submission_id", "created_at"] + geo_columns,
+                records=[[r["id"], r["created_at"]] + [r[c] for c in geo_columns] for r in rows],
+            )
+        else:
+            columns = list(rows[0])
+            await conn.copy_records_to_table(
+                "submissions", columns=columns, records=[[r[c] for c in columns] for r in rows]
+            )
+    return len(rows)
+
+
+async def bulk_update_submissions(rows: list[dict]) -> int:
+    """Apply partial rows keyed by id (bulk_upsert_submissions semantics) via a COPY-filled staging table.
+
+    Every row must carry the same keys. Returns the number of rows sent.
+    """
+    if not rows:
+        return 0
+    columns = list(rows[0])
+    if "id" not in columns:
+        raise ValueError("bulk updates are keyed by id")
+    split = supabase_backend.SUBMISSIONS_LAYOUT == "split"
+
+    pool = await get_pool()
+    async with pool.acquire() as conn, conn.transaction():
+        # Staging columns take their types from whichever table holds them
+        types = dict(
+            await conn.fetch(
+                "select a.attname, format_type(a.atttypid, a.atttypmod) from pg_attribute a "
+                "where a.attrelid = any($1::text[]::regclass[]) and a.attname = any($2::text[]) and a.attnum > 0",
+                ["submissions", "submission_geo"] if split else ["submissions"],
+                columns,
+            )
+        )
+        missing = [c for c in columns if c not in types]
+        if missing:
+            raise ValueError(f"Unknown submission columns: {', '.join(missing)}")
+        definition = ", ".join(f"{c} {types[c]}" for c in columns)
+        await conn.execute(f"create temp table _submission_updates ({definition}) on commit drop")
+        await conn.copy_records_to_table("_submission_updates", columns=columns, records=[[r[c] for c in columns] for r in rows])
+
+        if split:
+            # geometry goes through jsonb as hex EWKB text, not PostGIS's GeoJSON cast
+            fields = ", ".join(
+                f"'{c}', u.{c}::text" if types[c].startswith("geometry") else f"'{c}', u.{c}" for c in columns
+            )
+            await conn.execute(
+                f"select update_submissions(jsonb_agg(jsonb_build_object({fields}))) from _submission_updates u"
+            )
+        else:
+            names = ", ".join(columns)
+            updates = ", ".join(f"{c} = excluded.{c}" for c in columns if c != "id")
+            await conn.execute(
+                f"insert into submissions ({names}) select {names} from _submission_updates "
+                f"on conflict (id) do update set {updates}"
+            )
+    return len(rows)
+
+
+async def replace_submission_census(submission_ids: list[str], rows: list[dict]) -> int:
+    """Replace all census rows of these submissions in one transaction."""
+    pool = await get_pool()
+    return await pool.fetchval(
+        "select replace_submission_census($1::uuid[], $2::jsonb)", [uuid.UUID(i) for i in submission_ids], rows
+    )
@@ -0,0 +1,334 @@
+"""
+Quota scheduler - one outbound geocode budget shared by live calls,
+speculative prefetches and batch jobs, handed out by priority.
+
+Every request takes a token from a single bucket (QUOTA_QPS) and an in-flight
+slot (QUOTA_CONCURRENCY). Waiters queue by class and the highest class is
+always served first, so a live call's lookup jumps ahead of everything a batch
+job has queued (work already in flight is never interrupted).
+
+Batch work additionally draws from its own bucket, whose rate follows demand:
+the full budget at night (QUOTA_NIGHT_HOURS, local time) when nobody is on a
+call, BATCH_DAY_SHARE of it during the day, and whatever is left after
+reserving LIVE_QPS_PER_CALL for each call in progress (never below
+BATCH_MIN_SHARE) as soon as calls come in.
+
+Batch jobs usually run in their own process. Set QUOTA_STATE_PATH to a SQLite
+file every process can reach (agents and batch jobs, all with the same
+QUOTA_QPS) and the token bucket itself lives there: each grant also takes a
+token from the shared bucket, which refills at QUOTA_QPS, so all processes
+together stay within QUOTA_QPS. A job's own rate (e.g. regeocode.py --qps)
+only caps its local bucket. Prefetch and batch grants leave
+LIVE_QPS_PER_CALL tokens in the shared bucket for every call in progress, so
+a live burst is never starved. The agent also
+publishes its call count there, so a nightly re-geocode backs off when the
+phones start ringing.
+"""
+
+import asyncio
+import heapq
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from loguru import logger
+
+import call_supervisor
+import metrics
+
+QUOTA_QPS = float(os.getenv("QUOTA_QPS", "50"))
+QUOTA_CONCURRENCY = int(os.getenv("QUOTA_CONCURRENCY", "10"))
+
+# Shared file for the cross-process token bucket and call count (unset: this process only)
+QUOTA_STATE_PATH = os.getenv("QUOTA_STATE_PATH", "")
+
+# "22-6" = from 22:00 until 06:00 local time ("0-0" never counts as night)
+QUOTA_NIGHT_HOURS = os.getenv("QUOTA_NIGHT_HOURS", "22-6")
+
+LIVE, PREFETCH, BATCH = range(3)
+CLASSES = ("live", "prefetch", "batch")
+
+BATCH_DAY_SHARE = 0.5
+BATCH_MIN_SHARE = 0.05
+LIVE_QPS_PER_CALL = 5.0  # a call's geocode burst is about a dozen requests
+
+HEARTBEAT_SECONDS = 2.0
+HEARTBEAT_STALE_SECONDS = 10.0
+
+for _name in CLASSES:
+    metrics.describe(f"quota_granted_{_name}", f"Geocode requests granted to {_name} work")
+    metrics.describe(f"quota_wait_seconds_{_name}", f"Time {_name} requests waited for quota")
+metrics.describe("quota_batch_rate", "Requests per second currently allowed for batch work")
+
+
+def is_night(now: datetime | None = None) -> bool:
+    start, end = (int(h) for h in QUOTA_NIGHT_HOURS.split("-"))
+    hour = (now or datetime.now()).hour
+    return start <= hour < end if start <= end else hour >= start or hour < end
+
+
+# ============================================================
+# Call count shared between processes
+# ============================================================
+
+_HEARTBEAT_DB: sqlite3.Connection | None = None
+_DB_LOCK = threading.Lock()  # the connection is shared by to_thread workers
+_remote_calls: tuple[float, int] = (0.0, 0)  # (read at, calls)
+
+
+def _heartbeat_db() -> sqlite3.Connection:
+    global _HEARTBEAT_DB
+    if _HEARTBEAT_DB is None:
+        _HEARTBEAT_DB = sqlite3.connect(QUOTA_STATE_PATH, check_same_thread=False, timeout=1.0)
+        _HEARTBEAT_DB.execute("pragma journal_mode=wal")
+        _HEARTBEAT_DB.execute(
+            "create table if not exists quota_heartbeat (pid integer primary key, live_calls integer, updated_at real)"
+        )
+        _HEARTBEAT_DB.execute(
+            "create table if not exists quota_bucket (id integer primary key check (id = 1), tokens real, updated_at real)"
+        )
+        _HEARTBEAT_DB.commit()
+    return _HEARTBEAT_DB
+
+
+def publish_live_calls(calls: int) -> None:
+    with _DB_LOCK:
+        db = _heartbeat_db()
+        db.execute("insert or replace into quota_heartbeat values (?, ?, ?)", (os.getpid(), calls, time.time()))
+        db.commit()
+
+
+def take_shared_token(rate: float, reserve: float = 0.0) -> float:
+    """Take one token from the cross-process bucket (QUOTA_STATE_PATH), keeping `reserve` back.
+
+    The bucket refills at `rate` and holds one second's worth. Returns 0 if a
+    token was taken, otherwise the seconds until one could be.
+    """
+    now = time.time()
+    with _DB_LOCK:
+        db = _heartbeat_db()
+        db.execute("begin immediate")
+        try:
+            row = db.execute("select tokens, updated_at from quota_bucket where id = 1").fetchone()
+            tokens = rate if row is None else min(rate, row[0] + max(0.0, now - row[1]) * rate)
+            wait = 0.0
+            if tokens - reserve >= 1:
+                tokens -= 1
+            else:
+                wait = (1 + reserve - tokens) / rate
+            db.execute("insert or replace into quota_bucket values (1, ?, ?)", (tokens, now))
+            db.commit()
+        except BaseException:
+            db.rollback()
+            raise
+    return wait
+
+
+def live_calls() -> int:
+    """Calls in progress in this process plus, with QUOTA_STATE_PATH, in other agent processes."""
+    global _remote_calls
+    calls = call_supervisor.active_calls()
+    if not QUOTA_STATE_PATH:
+        return calls
+    read_at, remote = _remote_calls
+    if time.monotonic() - read_at > 1.0:
+        try:
+            with _DB_LOCK:
+                remote = _heartbeat_db().execute(
+                    "select coalesce(sum(live_calls), 0) from quota_heartbeat where pid != ? and updated_at > ?",
+                    (os.getpid(), time.time() - HEARTBEAT_STALE_SECONDS),
+                ).fetchone()[0]
+        except sqlite3.Error as e:
+            logger.warning(f"Could not read quota heartbeat: {e}")
+        _remote_calls = (time.monotonic(), remote)
+    return calls + remote
+
+
+async def _publish_forever() -> None:
+    while True:
+        try:
+            await asyncio.to_thread(publish_live_calls, call_supervisor.active_calls())
+        except sqlite3.Error as e:
+            logger.warning(f"Could not publish quota heartbeat: {e}")
+        await asyncio.sleep(HEARTBEAT_SECONDS)
+
+
+_PUBLISHER: asyncio.Task | None = None
+
+
+def start_publisher() -> None:
+    """Publish this process's call count for batch jobs (needs QUOTA_STATE_PATH); once per loop."""
+    global _PUBLISHER
+    if not QUOTA_STATE_PATH:
+        return
+    if _PUBLISHER is None or _PUBLISHER.done() or _PUBLISHER.get_loop() is not asyncio.get_running_loop():
+        _PUBLISHER = asyncio.get_running_loop().create_task(_publish_forever())
+
+
+# ============================================================
+# Scheduler
+# ============================================================
+
+
+class QuotaScheduler:
+    """Priority token bucket. Bound to the event loop it is first used on."""
+
+    def __init__(
+        self,
+        rate: float = QUOTA_QPS,
+        concurrency: int = QUOTA_CONCURRENCY,
+        calls=live_calls,
+        shared: bool | None = None,
+    ):
+        self.rate = rate
+        self.concurrency = concurrency
+        self._calls = calls
+        self.shared = bool(QUOTA_STATE_PATH) if shared is None else shared
+        self._tokens = rate
+        self._batch_tokens = 1.0
+        self._updated = time.monotonic()
+        self._inflight = 0
+        self._queue: list[tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._wake = asyncio.Event()
+        self._pump: asyncio.Task | None = None
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for _, _, fut in self._queue if not fut.done())
+
+    def batch_rate(self) -> float:
+        calls = self._calls()
+        if calls:
+            rate = max(self.rate * BATCH_MIN_SHARE, self.rate - calls * LIVE_QPS_PER_CALL)
+        else:
+            rate = self.rate if is_night() else self.rate * BATCH_DAY_SHARE
+        metrics.gauge("quota_batch_rate", round(rate, 2))
+        return rate
+
+    async def _take_shared(self, priority: int) -> float:
+        """Seconds to wait before the shared bucket has a token for `priority` (0: taken).
+
+        The shared bucket always runs at QUOTA_QPS, whatever this scheduler's
+        own (local) rate is, so every process sizes it the same way.
+        """
+        if not self.shared:
+            return 0.0
+        reserve = 0.0 if priority == LIVE else min(QUOTA_QPS - 1, self._calls() * LIVE_QPS_PER_CALL)
+        try:
+            return await asyncio.to_thread(take_shared_token, QUOTA_QPS, max(0.0, reserve))
+        except sqlite3.Error as e:
+            logger.warning(f"Could not use shared quota bucket, using the local one: {e}")
+            return 0.0
+
+    def lane(self, priority: int, budget: int | None = None) -> "Lane":
+        return Lane(self, priority, budget)
+
+    async def acquire(self, priority: int = LIVE) -> None:
+        """Wait for a token and an in-flight slot; pair with release()."""
+        started = time.monotonic()
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._seq), fut))
+        self._wake.set()
+        if self._pump is None or self._pump.done():
+            self._pump = asyncio.get_running_loop().create_task(self._run())
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release()  # granted just as the waiter was cancelled
+            raise
+        metrics.incr(f"quota_granted_{CLASSES[priority]}")
+        metrics.observe(f"quota_wait_seconds_{CLASSES[priority]}", time.monotonic() - started)
+
+    def release(self) -> None:
+        self._inflight -= 1
+        self._wake.set()
+
+    async def _run(self) -> None:
+        """Grant waiters in priority order as tokens and slots allow; exits when the queue drains."""
+        while True:
+            while self._queue and self._queue[0][2].done():
+                heapq.heappop(self._queue)
+            if not self._queue:
+                return
+
+            batch_rate = self.batch_rate()
+            now = time.monotonic()
+            elapsed, self._updated = now - self._updated, now
+            self._tokens = min(self.rate, self._tokens + elapsed * self.rate)
+            self._batch_tokens = min(max(batch_rate, 1.0), self._batch_tokens + elapsed * batch_rate)
+
+            priority, _, fut = self._queue[0]
+            delay = None  # None: wait for a release or a new waiter
+            if self._inflight >= self.concurrency:
+                pass
+            elif self._tokens < 1:
+                delay = (1 - self._tokens) / self.rate
+            elif priority == BATCH and self._batch_tokens < 1:
+                delay = min((1 - self._batch_tokens) / batch_rate, 1.0)
+            elif (wait := await self._take_shared(priority)) > 0:
+                delay = min(wait, 1.0)
+            else:
+                while self._queue and self._queue[0][2].done():
+                    heapq.heappop(self._queue)  # cancelled while we asked the shared bucket
+                if not self._queue:
+                    return
+                priority, _, fut = heapq.heappop(self._queue)
+                self._tokens -= 1
+                if priority == BATCH:
+                    self._batch_tokens -= 1
+                self._inflight += 1
+                fut.set_result(None)
+                continue
+
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+
+class Lane:
+    """One priority class's view of a scheduler, with an optional request budget.
+
+    Has the acquire() -> bool / release() interface the geocoder expects;
+    acquire() returns False once the budget is spent.
+    """
+
+    def __init__(self, scheduler: QuotaScheduler, priority: int, budget: int | None = None):
+        self.scheduler = scheduler
+        self.priority = priority
+        self.budget = budget
+        self.used = 0
+
+    @property
+    def waiting(self) -> int:
+        return self.scheduler.waiting
+
+    async def acquire(self) -> bool:
+        if self.budget is not None and self.used >= self.budget:
+            return False
+        self.used += 1
+        await self.scheduler.acquire(self.priority)
+        return True
+
+    def release(self) -> None:
+        self.scheduler.release()
+
+
+_SCHEDULER: QuotaScheduler | None = None
+_SCHEDULER_LOOP: asyncio.AbstractEventLoop | None = None
+
+
+def get_scheduler() -> QuotaScheduler:
+    """The process-wide scheduler for the running event loop."""
+    global _SCHEDULER, _SCHEDULER_LOOP
+    loop = asyncio.get_running_loop()
+    if _SCHEDULER_LOOP is not loop:
+        _SCHEDULER_LOOP = loop
+        _SCHEDULER = QuotaScheduler()
+    return _SCHEDULER
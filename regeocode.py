@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Batch re-geocoding job.
+
+Re-runs geocoding over the stored address, community_boundaries and key_places
+of selected submissions, recomputes the polygon, map image and geohash cells,
+and writes back only rows whose geo data changed (one bulk upsert per page).
+
+Lookups go through the shared geocode cache and the quota scheduler's batch
+class, with a total request budget, so a nightly run can be sized to the API
+quota. Batch lookups run at the full --qps at night and back off while calls
+are in progress (see quota.py; set QUOTA_STATE_PATH to see the agent's calls). Progress is
+checkpointed after every page; re-running resumes. The budget is checked per
+row before its lookups start, so a run that runs out writes the rows it could
+afford, stops, and continues from the next row the next night.
+
+Rows where a lookup failed (API error or spent budget) and that would end up
+with fewer points than are stored are never written, so a quota problem can't
+wipe out good geometry.
+
+    uv run python regeocode.py --dry-run --report diff.ndjson --zipcode 94110
+    GEOCODE_CACHE_PATH=geocode_cache.db uv run python regeocode.py --qps 20 --budget 400000
+"""
+
+import argparse
+import asyncio
+import json
+from pathlib import Path
+
+from dotenv import load_dotenv
+from loguru import logger
+
+load_dotenv()
+
+import geocells
+import landmarks
+import map_render
+import metrics
+import quota
+from export import build_filters
+from geocoding import MAX_BOUNDARY_LANDMARKS, MAX_KEY_PLACES, GeocodePipeline
+from supabase_backend import (
+    MAP_RENDERER,
+    _build_geojson,
+    _map_failure_handler,
+    _map_image_url,
+    _postgis_columns,
+    bulk_upsert_submissions,
+    iter_submissions,
+)
+
+SOURCE_COLUMNS = (
+    "id,created_at,caller_name,zipcode,address,community_name,community_boundaries,key_places,"
+    "geographic_summary,primary_address,geocoded_landmarks,all_coordinates,geojson,map_image_url"
+)
+
+GEO_COLUMNS = (
+    "geographic_summary",
+    "primary_address",
+    "geocoded_landmarks",
+    "all_coordinates",
+    "geojson",
+    "map_image_url",
+)
+
+
+async def regeocode_row(pipeline: GeocodePipeline, row: dict) -> tuple[dict, int]:
+    """Recompute all geo columns for one stored submission.
+
+    Returns (columns, failed_lookups).
+    """
+    result = await pipeline.geocode(
+        row.get("address") or "",
+        row.get("zipcode") or "",
+        row.get("community_boundaries") or "",
+        row.get("key_places") or "",
+    )
+
+    answers = dict(row)
+    answers.update(result.geo_data())
+    coordinates = [p.to_dict() for p in result.points] or None
+    geojson = _build_geojson(answers, result.points)
+
+    return {
+        "geographic_summary": answers["geographic_summary"],
+        "primary_address": answers["primary_address"],
+        "geocoded_landmarks": answers["geocoded_landmarks"],
+        "all_coordinates": coordinates,
+        "geojson": geojson,
+        "map_image_url": _map_image_url(answers, coordinates, result.points),
+        **geocells.cell_columns(coordinates, geojson),
+        **_postgis_columns(result.points, geojson),
+    }, result.failed_lookups
+
+
+def lookups_needed(row: dict) -> int:
+    """Most API requests re-geocoding a row can make (every lookup a cache miss)."""
+    return (
+        1
+        + bool(row.get("zipcode"))
+        + len(landmarks.queries(row.get("community_boundaries") or "", MAX_BOUNDARY_LANDMARKS))
+        + len(landmarks.queries(row.get("key_places") or "", MAX_KEY_PLACES))
+    )
+
+
+def affordable(page: list[dict], remaining: int) -> int:
+    """How many leading rows of a page fit in the remaining request budget."""
+    for i, row in enumerate(page):
+        remaining -= lookups_needed(row)
+        if remaining < 0:
+            return i
+    return len(page)
+
+
+def lost_points(old: dict, new: dict, failed_lookups: int) -> bool:
+    """True if failed lookups left the new result with fewer points than the stored row."""
+    return failed_lookups > 0 and len(new.get("all_coordinates") or []) < len(old.get("all_coordinates") or [])
+
+
+def diff_row(old: dict, new: dict) -> list[str]:
+    """Names of geo columns whose value changed."""
+    return [col for col in GEO_COLUMNS if (old.get(col) or None) != (new.get(col) or None)]
+
+
+def _report_entry(old: dict, new: dict, changed: list[str]) -> dict:
+    old_points = old.get("all_coordinates") or []
+    new_points = new.get("all_coordinates") or []
+    return {
+        "id": old["id"],
+        "changed": changed,
+        "points": [len(old_points), len(new_points)],
+        "summary": [old.get("geographic_summary"), new.get("geographic_summary")],
+    }
+
+
+async def run(
+    filters: dict,
+    checkpoint_path: Path,
+    report_path: Path | None,
+    dry_run: bool,
+    qps: float,
+    concurrency: int,
+    budget: int | None,
+    page_size: int,
+) -> dict:
+    """Process every matching submission after the checkpoint. Returns run stats."""
+    state = {"after": None, "processed": 0, "changed": 0, "written": 0, "kept": 0}
+    if checkpoint_path.exists():
+        state.update(json.loads(checkpoint_path.read_text()))
+        logger.info(f"Resuming after {state['processed']} rows")
+
+    limiter = quota.QuotaScheduler(rate=qps, concurrency=concurrency).lane(quota.BATCH, budget=budget)
+    pipeline = GeocodePipeline(limiter=limiter, priority=quota.BATCH)
+    report = open(report_path, "a", encoding="utf-8") if report_path else None
+    after = tuple(state["after"]) if state["after"] else None
+    finished = False
+
+    try:
+        async for page in iter_submissions(select=SOURCE_COLUMNS, page_size=page_size, after=after, filters=filters):
+            budget_hit = False
+            if limiter.budget is not None:
+                # Only start rows whose lookups the budget is sure to cover; the
+                # rest are picked up from the checkpoint next run
+                take = affordable(page, limiter.budget - limiter.used)
+                budget_hit = take < len(page)
+                page = page[:take]
+            results = await asyncio.gather(*(regeocode_row(pipeline, row) for row in page))
+
+            updates = []
+            for old, (new, failed) in zip(page, results):
+                if lost_points(old, new, failed):
+                    state["kept"] += 1
+                    logger.warning(f"Keeping stored geometry for {old['id']}: {failed} lookups failed")
+                    continue
+                changed = diff_row(old, new)
+                if not changed:
+                    continue
+                updates.append({"id": old["id"], **new})
+                if report:
+                    report.write(json.dumps(_report_entry(old, new, changed)) + "\n")
+
+            if updates and not dry_run:
+                state["written"] += await bulk_upsert_submissions(updates)
+                if MAP_RENDERER != "google":
+                    for update in updates:
+                        map_render.schedule_render(update["all_coordinates"], _map_failure_handler(update["id"]))
+
+            if page:
+                state["processed"] += len(page)
+                state["changed"] += len(updates)
+                state["after"] = [page[-1]["created_at"], page[-1]["id"]]
+                checkpoint_path.write_text(json.dumps(state))
+            if report:
+                report.flush()
+            logger.info(
+                f"Processed {state['processed']} rows, {state['changed']} changed, "
+                f"{limiter.used} API requests this run"
+            )
+            if budget_hit:
+                logger.warning(f"Geocode budget of {budget} requests reached, stopping")
+                break
+        else:
+            finished = True
+    finally:
+        if report:
+            report.close()
+        await pipeline.aclose()
+        await map_render.drain()
+
+    if finished:
+        checkpoint_path.unlink(missing_ok=True)
+    state["api_requests"] = limiter.used
+    state["metrics"] = metrics.snapshot()
+    state["finished"] = finished
+    return state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-geocode stored submissions and rebuild their geometry")
+    parser.add_argument("--zipcode")
+    parser.add_argument("--state", help="Full state name, e.g. California")
+    parser.add_argument("--since", help="Only rows created at or after this ISO date/time")
+    parser.add_argument("--until", help="Only rows created before this ISO date/time")
+    parser.add_argument("--dry-run", action="store_true", help="Compute and report changes without writing")
+    parser.add_argument("--report", type=Path, help="Append a per-row diff report (NDJSON) here")
+    parser.add_argument("--checkpoint", type=Path, help="Checkpoint file (default depends on --dry-run)")
+    parser.add_argument("--qps", type=float, default=20.0, help="Max geocode requests per second")
+    parser.add_argument("--concurrency", type=int, default=10, help="Max geocode requests in flight")
+    parser.add_argument("--budget", type=int, help="Stop after this many geocode API requests")
+    parser.add_argument("--page-size", type=int, default=200)
+    args = parser.parse_args()
+
+    filters = build_filters(args.zipcode, args.state, args.since, args.until)
+    # Dry runs keep their own cursor so they never advance a real run's progress
+    checkpoint = args.checkpoint or Path(
+        "regeocode.dry-run.checkpoint.json" if args.dry_run else "regeocode.checkpoint.json"
+    )
+    stats = asyncio.run(
+        run(
+            filters,
+            checkpoint,
+            args.report,
+            args.dry_run,
+            args.qps,
+            args.concurrency,
+            args.budget,
+            args.page_size,
+        )
+    )
+    mode = "dry run" if args.dry_run else "applied"
+    print(
+        f"Re-geocode {mode}: {stats['processed']} rows processed, {stats['changed']} changed, "
+        f"{stats['written']} written, {stats['api_requests']} API requests"
+    )
+    if stats["kept"]:
+        print(f"{stats['kept']} rows kept their stored geometry because lookups failed")
+    quality = stats["metrics"]
+    print(
+        f"Geocode quality: {quality.get('geocode_rejected', 0)} lookups rejected, "
+        f"{quality.get('geocode_outliers', 0)} outlier points dropped"
+    )
+    if not stats["finished"]:
+        print(f"Stopped early; run again to resume from {checkpoint}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Replay recorded call traces (see traces.py) against the current code and
+compare latency and output with the recording, or between two releases.
+
+A replay calls the recorded tools with their recorded arguments, in their
+recorded order and spacing (--speed 10 runs ten times faster, --speed 0 back
+to back). Every HTTP response comes from the trace, and each replay gets its
+own geocode pipeline whose cache holds just the lookups the recording answered
+from cache, so replays don't depend on each other's order. The replay forces a
+throwaway environment, so it never reaches Google, Supabase or a shared cache
+or session store, whatever .env says. Each replay is written as a trace of
+its own, and a per-tool latency and output report is printed against the
+recording:
+
+    uv run python replay.py run traces/*.json --speed 10 --out-dir replays/v2
+    uv run python replay.py compare replays/v1 replays/v2
+
+compare pairs traces by file name, so two replays of the same recordings
+(one per release, at the same speed) line up call for call.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Replays never touch real services or shared state
+REPLAY_ENV = {
+    "TRACE_DIR": "",
+    "GEOCODE_CACHE_PATH": "",
+    "SESSION_STORE": "memory",
+    "STORAGE_BACKEND": "postgrest",
+    "OVERLOAD_CONTROL": "off",
+    "QUOTA_STATE_PATH": "",
+    "SUPABASE_URL": "http://replay.invalid",
+    "SUPABASE_SERVICE_KEY": "replay",
+    "GOOGLE_MAPS_API_KEY": "replay",
+}
+os.environ.update(REPLAY_ENV)
+
+from loguru import logger
+
+import traces
+from geocoding import GeocodeCache, GeocodePipeline
+from main import build_call
+from report import format_table
+
+
+def pipeline_for(trace: traces.CallTrace) -> GeocodePipeline:
+    """A geocode pipeline of the replay's own, its cache seeded with the recording's cache hits."""
+    cache = GeocodeCache()
+    for query, result in trace.player.cached:
+        cache.put(query, result)
+    return GeocodePipeline(cache=cache)
+
+
+async def replay(recorded: dict, speed: float) -> dict:
+    pipelines = []
+
+    def build(trace: traces.CallTrace):
+        pipelines.append(pipeline_for(trace))
+        tools, supervisor, _, _ = build_call(trace.call_id, trace, pipelines[-1])
+        return tools, supervisor
+
+    try:
+        return await traces.replay(recorded, build, speed)
+    finally:
+        for pipeline in pipelines:
+            await pipeline.aclose()
+
+
+def read_traces(paths: list[Path]) -> dict[str, dict]:
+    """Traces by file name; directories contribute every .json inside."""
+    files = [f for p in paths for f in (sorted(p.glob("*.json")) if p.is_dir() else [p])]
+    return {f.name: json.loads(f.read_text()) for f in files}
+
+
+async def run(recorded: dict[str, dict], speed: float, out_dir: Path | None) -> list[tuple[dict, dict]]:
+    pairs = []
+    for name, trace in recorded.items():
+        replayed = await replay(trace, speed)
+        if replayed["unmatched_http"]:
+            logger.warning(f"{name}: {len(replayed['unmatched_http'])} request(s) had no recorded response")
+        if out_dir:
+            out_dir.mkdir(parents=True, exist_ok=True)
+            (out_dir / name).write_text(json.dumps(replayed, indent=1))
+        pairs.append((trace, replayed))
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded call traces and compare latency and output")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="Replay traces against the current code")
+    run_parser.add_argument("traces", nargs="+", type=Path, help="Trace files or directories")
+    run_parser.add_argument("--speed", type=float, default=1.0, help="Pace multiplier (0: no waiting)")
+    run_parser.add_argument("--out-dir", type=Path, help="Write each replay's trace here")
+    run_parser.add_argument("--json", action="store_true", help="Print raw JSON rows")
+
+    compare_parser = sub.add_parser("compare", help="Compare two sets of traces of the same calls")
+    compare_parser.add_argument("before", type=Path)
+    compare_parser.add_argument("after", type=Path)
+    compare_parser.add_argument("--json", action="store_true", help="Print raw JSON rows")
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        pairs = asyncio.run(run(read_traces(args.traces), args.speed, args.out_dir))
+    else:
+        before, after = read_traces([args.before]), read_traces([args.after])
+        missing = sorted(set(before) ^ set(after))
+        if missing:
+            logger.warning(f"{len(missing)} trace(s) only on one side: {', '.join(missing[:5])}")
+        pairs = [(before[name], after[name]) for name in sorted(set(before) & set(after))]
+
+    rows = traces.compare(pairs)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print(format_table(rows, list(rows[0]) if rows else []))
+
+
+if __name__ == "__main__":
+    main()
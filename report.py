@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Submission reports - per-state, per-zipcode and per-day counts and the latest
+submissions, computed in Postgres (see the read-side aggregates in
+supabase_schema.sql) so only the summary rows cross the wire.
+
+    uv run python report.py state --since 2026-01-01
+    uv run python report.py zipcode --refresh
+    uv run python report.py day --state California
+    uv run python report.py recent --limit 20 --json
+"""
+
+import argparse
+import asyncio
+import json
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import supabase_backend
+
+COLUMNS = {
+    "state": ["state", "submissions", "zipcodes", "coi_required"],
+    "zipcode": ["zipcode", "state", "submissions"],
+    "day": ["day", "submissions"],
+    "recent": ["created_at", "zipcode", "community_name"],
+}
+
+
+async def fetch(args) -> list[dict]:
+    if args.refresh:
+        await supabase_backend.refresh_stats()
+    if args.report == "state":
+        return await supabase_backend.counts_by_state(args.since, args.until, args.include_duplicates)
+    if args.report == "zipcode":
+        return await supabase_backend.counts_by_zipcode(args.since, args.until, args.include_duplicates)
+    if args.report == "day":
+        return await supabase_backend.counts_by_day(
+            args.since, args.until, args.zipcode, args.state, args.include_duplicates
+        )
+    return await supabase_backend.recent_submissions(args.limit, args.zipcode)
+
+
+def format_table(rows: list[dict], columns: list[str]) -> str:
+    cells = [["" if row.get(c) is None else str(row[c]) for c in columns] for row in rows]
+    widths = [max([len(c)] + [len(r[i]) for r in cells]) for i, c in enumerate(columns)]
+    lines = ["  ".join(c.ljust(w) for c, w in zip(columns, widths)).rstrip()]
+    lines += ["  ".join(v.ljust(w) for v, w in zip(r, widths)).rstrip() for r in cells]
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize submissions using server-side aggregates")
+    parser.add_argument("report", choices=sorted(COLUMNS))
+    parser.add_argument("--since", help="Only days on or after this ISO date")
+    parser.add_argument("--until", help="Only days before this ISO date")
+    parser.add_argument("--zipcode", help="day/recent: limit to one zipcode")
+    parser.add_argument("--state", help="day: limit to one state (full name)")
+    parser.add_argument("--limit", type=int, default=50, help="recent: number of submissions")
+    parser.add_argument("--include-duplicates", action="store_true", help="Count rows flagged as duplicates")
+    parser.add_argument("--refresh", action="store_true", help="Refresh the materialized counts first")
+    parser.add_argument("--json", action="store_true", help="Print raw JSON rows")
+    args = parser.parse_args()
+
+    rows = asyncio.run(fetch(args))
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print(format_table(rows, COLUMNS[args.report]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Session store - per-call form state that survives a worker restart.
+
+Every recorded answer and geocode result is appended to a per-call event log;
+a caller reconnecting with the same call_id gets the log replayed into a fresh
+FormFiller and picks up at the question they were on. Writes are single-row
+appends (no read-modify-write of a snapshot), so the cost per turn stays in
+the microseconds.
+
+Backends:
+- "memory": in-process only, for development and tests
+- "sqlite": a local WAL-mode SQLite file (SESSION_DB_PATH), memory-mapped for reads
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+
+from loguru import logger
+
+import fastjson
+
+SESSION_STORE = os.getenv("SESSION_STORE", "memory")
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.db")
+
+# Sessions that never finish (declined consent, hangups, failed saves) are
+# pruned once their last event is older than the TTL: when the store opens and
+# then at most every PRUNE_INTERVAL_SECONDS, on the next append.
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", str(24 * 3600)))
+PRUNE_INTERVAL_SECONDS = 600
+
+
+@dataclass
+class SessionState:
+    answers: dict = field(default_factory=dict)
+    current_index: int = 0
+    geo_data: dict = field(default_factory=dict)
+
+    def apply(self, kind: str, payload: dict) -> None:
+        if kind == "answer":
+            self.answers[payload["id"]] = payload["value"]
+            self.current_index = payload["index"]
+        elif kind == "answers":
+            self.answers.update(payload["answers"])
+            self.current_index = payload["index"]
+        elif kind == "geo":
+            self.geo_data.update(payload)
+
+
+class MemorySessionStore:
+    def __init__(self, ttl: float = SESSION_TTL_SECONDS):
+        self._events: dict[str, list[tuple[str, dict]]] = {}
+        self._touched: dict[str, float] = {}
+        self._ttl = ttl
+        self._last_prune = time.time()
+
+    def append(self, call_id: str, kind: str, payload: dict) -> None:
+        now = time.time()
+        self._events.setdefault(call_id, []).append((kind, payload))
+        self._touched[call_id] = now
+        if now - self._last_prune >= PRUNE_INTERVAL_SECONDS:
+            self.prune(now)
+
+    def prune(self, now: float | None = None) -> int:
+        """Drop sessions idle for longer than the TTL. Returns the number dropped."""
+        now = time.time() if now is None else now
+        self._last_prune = now
+        stale = [call_id for call_id, touched in self._touched.items() if touched < now - self._ttl]
+        for call_id in stale:
+            self.finish(call_id)
+        if stale:
+            logger.info(f"Pruned {len(stale)} stale sessions")
+        return len(stale)
+
+    def load(self, call_id: str) -> SessionState | None:
+        events = self._events.get(call_id)
+        if not events:
+            return None
+        state = SessionState()
+        for kind, payload in events:
+            state.apply(kind, payload)
+        return state
+
+    def finish(self, call_id: str) -> None:
+        self._events.pop(call_id, None)
+        self._touched.pop(call_id, None)
+
+
+class SqliteSessionStore:
+    """Append-only event log in SQLite (WAL, synchronous=NORMAL: commits don't fsync)."""
+
+    def __init__(self, path: str = SESSION_DB_PATH, ttl: float = SESSION_TTL_SECONDS):
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._db.execute("pragma journal_mode=wal")
+        self._db.execute("pragma synchronous=normal")
+        self._db.execute("pragma mmap_size=67108864")
+        self._db.execute(
+            "create table if not exists session_events ("
+            " call_id text not null, kind text not null, payload text not null, created_at real not null)"
+        )
+        self._db.execute("create index if not exists session_events_call on session_events (call_id)")
+        self._ttl = ttl
+        self.prune()
+
+    def append(self, call_id: str, kind: str, payload: dict) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "insert into session_events values (?, ?, ?, ?)",
+                (call_id, kind, fastjson.dumps_str(payload), now),
+            )
+        if now - self._last_prune >= PRUNE_INTERVAL_SECONDS:
+            self.prune(now)
+
+    def prune(self, now: float | None = None) -> int:
+        """Drop sessions idle for longer than the TTL. Returns the number of events dropped."""
+        now = time.time() if now is None else now
+        self._last_prune = now
+        with self._lock:
+            pruned = self._db.execute(
+                "delete from session_events where call_id in ("
+                " select call_id from session_events group by call_id having max(created_at) < ?)",
+                (now - self._ttl,),
+            ).rowcount
+        if pruned:
+            logger.info(f"Pruned {pruned} stale session events")
+        return pruned
+
+    def load(self, call_id: str) -> SessionState | None:
+        with self._lock:
+            rows = self._db.execute(
+                "select kind, payload from session_events where call_id = ? order by rowid", (call_id,)
+            ).fetchall()
+        if not rows:
+            return None
+        state = SessionState()
+        for kind, payload in rows:
+            state.apply(kind, fastjson.loads(payload))
+        return state
+
+    def finish(self, call_id: str) -> None:
+        with self._lock:
+            self._db.execute("delete from session_events where call_id = ?", (call_id,))
+
+
+class Session:
+    """One call's handle on the store."""
+
+    def __init__(self, store, call_id: str):
+        self.store = store
+        self.call_id = call_id
+
+    def record_answer(self, question_id: str, value, current_index: int) -> None:
+        self.store.append(self.call_id, "answer", {"id": question_id, "value": value, "index": current_index})
+
+    def record_answers(self, answers: dict, current_index: int) -> None:
+        self.store.append(self.call_id, "answers", {"answers": answers, "index": current_index})
+
+    def record_geo(self, geo_data: dict) -> None:
+        self.store.append(self.call_id, "geo", geo_data)
+
+    def load(self) -> SessionState | None:
+        return self.store.load(self.call_id)
+
+    def finish(self) -> None:
+        """Drop the log once the submission is saved so the call can't be resumed twice."""
+        self.store.finish(self.call_id)
+
+
+_STORE = None
+
+
+def get_store():
+    """The process-wide session store selected by SESSION_STORE."""
+    global _STORE
+    if _STORE is None:
+        if SESSION_STORE == "sqlite":
+            _STORE = SqliteSessionStore(SESSION_DB_PATH)
+        else:
+            _STORE = MemorySessionStore()
+    return _STORE
+
+
+def open_session(call_id: str) -> Session:
+    return Session(get_store(), call_id)
@@ -0,0 +1,327 @@
+"""
+Spatial index - in-process grid index over submission geometries.
+
+Answers bbox, radius and polygon-overlap queries ("which communities overlap
+this one", "all COIs within 2 miles of this point") without pulling and
+scanning every row's geojson / all_coordinates.
+"""
+
+import asyncio
+import json
+import math
+from typing import Iterable
+
+from loguru import logger
+
+from geocoding import _haversine_miles
+
+# ~0.7 miles per cell at US latitudes — a 2 mile radius touches ~50 cells
+DEFAULT_CELL_SIZE_DEG = 0.01
+
+# Geometries spanning more cells than this are kept in a short overflow list
+# instead of being registered in every cell they touch.
+MAX_CELLS_PER_ENTRY = 4096
+
+MILES_PER_DEG_LAT = 69.0
+
+
+def _extract_ring(geometry) -> list[tuple[float, float]]:
+    """Return [(lng, lat), ...] from a GeoJSON Feature/Polygon/Point or a list of coordinate dicts."""
+    if not geometry:
+        return []
+    if isinstance(geometry, str):
+        try:
+            geometry = json.loads(geometry)
+        except json.JSONDecodeError:
+            return []
+
+    if isinstance(geometry, list):
+        return [(float(c["lng"]), float(c["lat"])) for c in geometry if "lat" in c and "lng" in c]
+
+    if geometry.get("type") == "Feature":
+        geometry = geometry.get("geometry") or {}
+
+    gtype = geometry.get("type")
+    coords = geometry.get("coordinates") or []
+    if gtype == "Polygon" and coords:
+        return [(float(x), float(y)) for x, y in coords[0]]
+    if gtype == "Point" and coords:
+        return [(float(coords[0]), float(coords[1]))]
+    return []
+
+
+def _is_polygon(ring: list[tuple[float, float]]) -> bool:
+    """Closed rings are polygons; anything else is treated as a bare point set."""
+    return len(ring) >= 4 and ring[0] == ring[-1]
+
+
+def _point_in_ring(lng: float, lat: float, ring: list[tuple[float, float]]) -> bool:
+    """Ray-casting point-in-polygon test."""
+    inside = False
+    j = len(ring) - 1
+    for i in range(len(ring)):
+        xi, yi = ring[i]
+        xj, yj = ring[j]
+        if (yi > lat) != (yj > lat) and lng < (xj - xi) * (lat - yi) / (yj - yi) + xi:
+            inside = not inside
+        j = i
+    return inside
+
+
+def _segments_cross(a1, a2, b1, b2) -> bool:
+    """True if segment a1-a2 intersects segment b1-b2."""
+
+    def orient(p, q, r):
+        return (q[0] - p[0]) * (r[1] - p[1]) - (q[1] - p[1]) * (r[0] - p[0])
+
+    d1 = orient(b1, b2, a1)
+    d2 = orient(b1, b2, a2)
+    d3 = orient(a1, a2, b1)
+    d4 = orient(a1, a2, b2)
+    return (d1 > 0) != (d2 > 0) and (d3 > 0) != (d4 > 0)
+
+
+def _rings_intersect(a: list[tuple[float, float]], b: list[tuple[float, float]]) -> bool:
+    """True if two rings (or point sets) share any area, vertex containment or edge crossing."""
+    a_poly, b_poly = _is_polygon(a), _is_polygon(b)
+    if a_poly and any(_point_in_ring(x, y, a) for x, y in b):
+        return True
+    if b_poly and any(_point_in_ring(x, y, b) for x, y in a):
+        return True
+    if not (a_poly and b_poly):
+        return False
+    for i in range(len(a) - 1):
+        for j in range(len(b) - 1):
+            if _segments_cross(a[i], a[i + 1], b[j], b[j + 1]):
+                return True
+    return False
+
+
+def _distance_to_ring_miles(lng: float, lat: float, ring: list[tuple[float, float]]) -> float:
+    """Distance in miles from a point to a polygon (0 if inside) or to the nearest point of a point set."""
+    if not _is_polygon(ring):
+        return min(_haversine_miles(lat, lng, y, x) for x, y in ring)
+    if _point_in_ring(lng, lat, ring):
+        return 0.0
+
+    # Local equirectangular projection around the query point
+    kx = MILES_PER_DEG_LAT * math.cos(math.radians(lat))
+    ky = MILES_PER_DEG_LAT
+    pts = [((x - lng) * kx, (y - lat) * ky) for x, y in ring]
+
+    best = math.inf
+    for (x1, y1), (x2, y2) in zip(pts, pts[1:]):
+        dx, dy = x2 - x1, y2 - y1
+        seg_len_sq = dx * dx + dy * dy
+        t = 0.0 if seg_len_sq == 0 else max(0.0, min(1.0, -(x1 * dx + y1 * dy) / seg_len_sq))
+        px, py = x1 + t * dx, y1 + t * dy
+        best = min(best, math.hypot(px, py))
+    return best
+
+
+class SubmissionIndex:
+    """Uniform lat/lng grid index mapping cells to submission ids.
+
+    Each entry keeps its bounding box and ring so that candidate hits from the
+    grid can be refined exactly. Inserts and removals are O(cells touched),
+    so the index can be updated on every save_submission.
+    """
+
+    def __init__(self, cell_size_deg: float = DEFAULT_CELL_SIZE_DEG):
+        self.cell_size = cell_size_deg
+        self._cells: dict[tuple[int, int], set[str]] = {}
+        self._entries: dict[str, tuple[tuple[float, float, float, float], list[tuple[float, float]]]] = {}
+        self._oversized: set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, submission_id: str) -> bool:
+        return submission_id in self._entries
+
+    def _cell_range(self, bbox: tuple[float, float, float, float]):
+        min_lng, min_lat, max_lng, max_lat = bbox
+        x0 = math.floor(min_lng / self.cell_size)
+        y0 = math.floor(min_lat / self.cell_size)
+        x1 = math.floor(max_lng / self.cell_size)
+        y1 = math.floor(max_lat / self.cell_size)
+        return x0, y0, x1, y1
+
+    def add(self, submission_id: str, geometry) -> bool:
+        """Index (or re-index) a submission. Returns False if it has no usable geometry."""
+        ring = _extract_ring(geometry)
+        if not ring:
+            return False
+
+        self.remove(submission_id)
+
+        lngs = [p[0] for p in ring]
+        lats = [p[1] for p in ring]
+        bbox = (min(lngs), min(lats), max(lngs), max(lats))
+        self._entries[submission_id] = (bbox, ring)
+
+        x0, y0, x1, y1 = self._cell_range(bbox)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > MAX_CELLS_PER_ENTRY:
+            self._oversized.add(submission_id)
+            return True
+
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                self._cells.setdefault((x, y), set()).add(submission_id)
+        return True
+
+    def remove(self, submission_id: str) -> None:
+        """Drop a submission from the index if present."""
+        entry = self._entries.pop(submission_id, None)
+        if entry is None:
+            return
+        if submission_id in self._oversized:
+            self._oversized.discard(submission_id)
+            return
+
+        x0, y0, x1, y1 = self._cell_range(entry[0])
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                bucket = self._cells.get((x, y))
+                if bucket is not None:
+                    bucket.discard(submission_id)
+                    if not bucket:
+                        del self._cells[(x, y)]
+
+    def _candidates(self, bbox: tuple[float, float, float, float]) -> set[str]:
+        x0, y0, x1, y1 = self._cell_range(bbox)
+        found = set(self._oversized)
+        cells = self._cells
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(cells):
+            # Large boxes (low-zoom tiles, statewide queries): walk the occupied
+            # cells instead of every empty cell in the box
+            for (x, y), bucket in cells.items():
+                if x0 <= x <= x1 and y0 <= y <= y1:
+                    found.update(bucket)
+        else:
+            for x in range(x0, x1 + 1):
+                for y in range(y0, y1 + 1):
+                    bucket = cells.get((x, y))
+                    if bucket:
+                        found.update(bucket)
+
+        min_lng, min_lat, max_lng, max_lat = bbox
+        hits = set()
+        for sid in found:
+            b = self._entries[sid][0]
+            if b[0] <= max_lng and b[2] >= min_lng and b[1] <= max_lat and b[3] >= min_lat:
+                hits.add(sid)
+        return hits
+
+    def query_bbox(self, min_lng: float, min_lat: float, max_lng: float, max_lat: float) -> list[str]:
+        """Ids of submissions whose bounding box intersects the given box."""
+        return sorted(self._candidates((min_lng, min_lat, max_lng, max_lat)))
+
+    def query_radius(self, lat: float, lng: float, miles: float) -> list[str]:
+        """Ids of submissions within `miles` of a point, nearest first."""
+        dlat = miles / MILES_PER_DEG_LAT
+        dlng = miles / (MILES_PER_DEG_LAT * max(math.cos(math.radians(lat)), 1e-6))
+        candidates = self._candidates((lng - dlng, lat - dlat, lng + dlng, lat + dlat))
+
+        hits = []
+        for sid in candidates:
+            dist = _distance_to_ring_miles(lng, lat, self._entries[sid][1])
+            if dist <= miles:
+                hits.append((dist, sid))
+        hits.sort()
+        return [sid for _, sid in hits]
+
+    def query_polygon(self, geometry) -> list[str]:
+        """Ids of submissions whose geometry intersects the given polygon."""
+        ring = _extract_ring(geometry)
+        if not ring:
+            return []
+        lngs = [p[0] for p in ring]
+        lats = [p[1] for p in ring]
+        candidates = self._candidates((min(lngs), min(lats), max(lngs), max(lats)))
+        return sorted(sid for sid in candidates if _rings_intersect(ring, self._entries[sid][1]))
+
+    def overlapping(self, submission_id: str) -> list[str]:
+        """Ids of other submissions overlapping an indexed submission."""
+        entry = self._entries.get(submission_id)
+        if entry is None:
+            return []
+        return [sid for sid in self.query_polygon({"type": "Polygon", "coordinates": [entry[1]]}) if sid != submission_id]
+
+    def add_rows(self, rows: Iterable[dict]) -> int:
+        """Index submission rows as returned by Supabase. Returns the number indexed."""
+        count = 0
+        for row in rows:
+            if self.add(row["id"], row.get("geojson") or row.get("all_coordinates")):
+                count += 1
+        return count
+
+
+# Process-wide index, populated by load_index() and kept current by save_submission
+_INDEX: SubmissionIndex | None = None
+_LOAD_LOCK: asyncio.Lock | None = None
+_LOAD_TASK: asyncio.Task | None = None
+# Saves made while load_index() pages through the table, applied once it finishes
+_PENDING: dict[str, object] | None = None
+
+
+def current_index() -> SubmissionIndex | None:
+    """The loaded process-wide index, or None if load_index() hasn't run."""
+    return _INDEX
+
+
+def add_submission(submission_id: str, geometry) -> None:
+    """Index a saved submission in the process-wide index, or queue it while the index loads."""
+    if _INDEX is not None:
+        _INDEX.add(submission_id, geometry)
+    elif _PENDING is not None:
+        _PENDING[submission_id] = geometry
+
+
+async def load_index(cell_size_deg: float = DEFAULT_CELL_SIZE_DEG) -> SubmissionIndex:
+    """Build the process-wide index from the submissions table.
+
+    Submissions saved while the pages load (add_submission) are applied at the end.
+    """
+    global _INDEX, _PENDING
+    from supabase_backend import iter_submissions
+
+    index = SubmissionIndex(cell_size_deg)
+    total = 0
+    _PENDING = {}
+    try:
+        async for page in iter_submissions(select="id,created_at,geojson,all_coordinates"):
+            total += index.add_rows(page)
+        for submission_id, geometry in _PENDING.items():
+            index.add(submission_id, geometry)
+    finally:
+        _PENDING = None
+
+    _INDEX = index
+    logger.info(f"Spatial index loaded with {total} submissions ({len(index._cells)} cells)")
+    return index
+
+
+async def ensure_loaded() -> SubmissionIndex | None:
+    """Load the process-wide index once. Safe to call per call; returns None if the load fails."""
+    global _LOAD_LOCK
+    if _INDEX is not None:
+        return _INDEX
+    if _LOAD_LOCK is None:
+        _LOAD_LOCK = asyncio.Lock()
+
+    async with _LOAD_LOCK:
+        if _INDEX is not None:
+            return _INDEX
+        try:
+            return await load_index()
+        except Exception as e:
+            logger.error(f"Spatial index load failed: {e}")
+            return None
+
+
+def start_loading() -> None:
+    """Kick off ensure_loaded() in the background if the index isn't loaded yet."""
+    global _LOAD_TASK
+    if _INDEX is None and (_LOAD_TASK is None or _LOAD_TASK.done()):
+        _LOAD_TASK = asyncio.get_running_loop().create_task(ensure_loaded())
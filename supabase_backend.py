@@ -4,19 +4,60 @@ Supabase backend - saves completed community of interest form submissions to Sup
 Replaces the Notion backend with Supabase for persistent storage.
 """
 
-import json
+import asyncio
 import math
 import os
-from typing import Annotated
+from typing import Annotated, AsyncIterator
 
 import httpx
 from loguru import logger
 
+import dedup
+import fastjson
+import geocells
+import map_render
+import overload
+import spatial_index
+from geocoding import GeoPoint, as_points
 from line.llm_agent import ToolEnv, loopback_tool
 
 SUPABASE_URL = os.getenv("SUPABASE_URL", "")
 SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY", "")
 
+# "google" stores a Static Maps URL; "local" renders map images ourselves (map_render.py)
+# and needs the MAP_IMAGE_BUCKET storage bucket
+MAP_RENDERER = os.getenv("MAP_RENDERER", "google")
+
+# "flag" marks likely duplicates via duplicate_of, "merge" also folds a repeat call
+# from the same phone into the earlier row, "off" disables the check
+DEDUP_MODE = os.getenv("DEDUP_MODE", "flag")
+MERGE_THRESHOLD = 0.85
+
+# The materialized counts behind counts_by_* are refreshed this long after a
+# save, so all saves in the window share one refresh, and none runs if the view
+# was refreshed in the meantime; 0 disables it (e.g. when pg_cron runs
+# refresh_submission_stats(), see supabase_schema.sql)
+STATS_REFRESH_SECONDS = float(os.getenv("STATS_REFRESH_SECONDS", "300"))
+
+# The materialized view behind counts_by_* (refresh_submission_stats() takes its name)
+STATS_VIEW = "submission_daily_counts"
+
+# "on" writes the PostGIS geom/centroid columns (migrations/001_postgis.sql)
+POSTGIS_MODE = os.getenv("POSTGIS_MODE", "off")
+
+# "split" after migrations/002_split_submissions.sql: lean partitioned submissions
+# table plus submission_geo, written through RPCs and read via submissions_full
+SUBMISSIONS_LAYOUT = os.getenv("SUBMISSIONS_LAYOUT", "single")
+
+# "postgrest" writes over the Supabase REST API; "postgres" writes over a pooled
+# asyncpg connection to DATABASE_URL (pg_backend.py). Reads always use PostgREST.
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "postgrest")
+
+# Columns that live in submission_geo in the split layout
+GEO_PAYLOAD_COLUMNS = frozenset(
+    {"all_coordinates", "geojson", "cover_gh5", "cover_gh6", "cover_gh7", "geom", "centroid"}
+)
+
 
 def _headers() -> dict:
     return {
@@ -27,32 +68,31 @@ def _headers() -> dict:
     }
 
 
-def _build_geojson(answers: dict) -> dict | None:
-    """Build a GeoJSON Feature dict from the collected coordinates."""
-    coords_str = answers.get("all_coordinates", "")
-    if not coords_str:
-        return None
-
-    try:
-        if isinstance(coords_str, str):
-            coordinates = json.loads(coords_str)
-        else:
-            coordinates = coords_str
+def _read_table(select: str) -> str:
+    """Table or view to read `select` from: lean reads skip the geo join."""
+    if SUBMISSIONS_LAYOUT != "split":
+        return "submissions"
+    if select == "*" or any(col.strip() in GEO_PAYLOAD_COLUMNS for col in select.split(",")):
+        return "submissions_full"
+    return "submissions"
 
-        if not coordinates or len(coordinates) < 3:
-            return None
 
-        # Sort by angle from center to form proper polygon
-        center_lat = sum(c["lat"] for c in coordinates) / len(coordinates)
-        center_lng = sum(c["lng"] for c in coordinates) / len(coordinates)
+def _polygon_order(points: list[GeoPoint]) -> list[GeoPoint]:
+    """Points sorted by angle around their center, so they trace a simple polygon."""
+    center_lat = sum(p.lat for p in points) / len(points)
+    center_lng = sum(p.lng for p in points) / len(points)
+    return sorted(points, key=lambda p: math.atan2(p.lat - center_lat, p.lng - center_lng))
 
-        def angle(c):
-            return math.atan2(c["lat"] - center_lat, c["lng"] - center_lng)
 
-        sorted_coords = sorted(coordinates, key=angle)
+def _build_geojson(answers: dict, points: list[GeoPoint] | None = None) -> dict | None:
+    """Build a GeoJSON Feature dict from the collected coordinates."""
+    try:
+        points = as_points(answers.get("all_coordinates")) if points is None else points
+        if len(points) < 3:
+            return None
 
         # Build GeoJSON Feature with polygon (closed ring)
-        ring = [[c["lng"], c["lat"]] for c in sorted_coords]
+        ring = [[p.lng, p.lat] for p in _polygon_order(points)]
         ring.append(ring[0])
 
         return {
@@ -72,19 +112,26 @@ def _build_geojson(answers: dict) -> dict | None:
         return None
 
 
-def _generate_static_map_url(answers: dict) -> str | None:
-    """Generate a Google Maps Static API URL that renders a filled polygon image."""
-    try:
-        coords_str = answers.get("all_coordinates", "")
-        if not coords_str:
-            return None
+def _postgis_columns(points: list[GeoPoint], geojson: dict | None) -> dict:
+    """geom/centroid as EWKT, which PostgREST casts straight into the geometry columns."""
+    if POSTGIS_MODE != "on":
+        return {}
+    columns: dict = {"geom": None, "centroid": None}
+    if points:
+        lat = sum(p.lat for p in points) / len(points)
+        lng = sum(p.lng for p in points) / len(points)
+        columns["centroid"] = f"SRID=4326;POINT({lng} {lat})"
+    if geojson:
+        ring = geojson["geometry"]["coordinates"][0]
+        columns["geom"] = "SRID=4326;POLYGON((" + ",".join(f"{x} {y}" for x, y in ring) + "))"
+    return columns
 
-        if isinstance(coords_str, str):
-            coordinates = json.loads(coords_str)
-        else:
-            coordinates = coords_str
 
-        if not coordinates or len(coordinates) < 3:
+def _generate_static_map_url(answers: dict, points: list[GeoPoint] | None = None) -> str | None:
+    """Generate a Google Maps Static API URL that renders a filled polygon image."""
+    try:
+        points = as_points(answers.get("all_coordinates")) if points is None else points
+        if len(points) < 3:
             return None
 
         api_key = os.getenv("GOOGLE_MAPS_API_KEY", "")
@@ -92,17 +139,8 @@ def _generate_static_map_url(answers: dict) -> str | None:
             logger.warning("GOOGLE_MAPS_API_KEY not set, skipping map image")
             return None
 
-        # Sort coordinates by angle from center to form a proper polygon
-        center_lat = sum(c["lat"] for c in coordinates) / len(coordinates)
-        center_lng = sum(c["lng"] for c in coordinates) / len(coordinates)
-
-        def angle(c):
-            return math.atan2(c["lat"] - center_lat, c["lng"] - center_lng)
-
-        sorted_coords = sorted(coordinates, key=angle)
-
         # Build path param
-        path_parts = [f"{c['lat']},{c['lng']}" for c in sorted_coords]
+        path_parts = [f"{p.lat},{p.lng}" for p in _polygon_order(points)]
         path_parts.append(path_parts[0])
         path_str = "|".join(path_parts)
 
@@ -121,24 +159,25 @@ def _generate_static_map_url(answers: dict) -> str | None:
         return None
 
 
+def _map_image_url(answers: dict, coordinates: list[dict] | None, points: list[GeoPoint] | None = None) -> str | None:
+    """URL stored in map_image_url for the configured renderer."""
+    if MAP_RENDERER == "google":
+        return _generate_static_map_url(answers, points)
+    return map_render.map_image_url(coordinates)
+
+
 async def save_submission(answers: dict) -> str:
     """Save a completed form submission to Supabase. Returns status message."""
     try:
-        if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
+        if STORAGE_BACKEND != "postgres" and (not SUPABASE_URL or not SUPABASE_SERVICE_KEY):
             return "Error: SUPABASE_URL and SUPABASE_SERVICE_KEY must be set in environment"
 
-        # Parse coordinates from string to JSON if needed
-        all_coordinates = answers.get("all_coordinates", "")
-        if isinstance(all_coordinates, str) and all_coordinates:
-            try:
-                all_coordinates = json.loads(all_coordinates)
-            except json.JSONDecodeError:
-                all_coordinates = None
-        elif not all_coordinates:
-            all_coordinates = None
+        # Storage boundary: GeoPoints become the stored dicts once, and the row is encoded once by httpx
+        points = as_points(answers.get("all_coordinates"))
+        all_coordinates = [p.to_dict() for p in points] or None
 
-        geojson = _build_geojson(answers)
-        map_url = _generate_static_map_url(answers)
+        geojson = _build_geojson(answers, points)
+        map_url = _map_image_url(answers, all_coordinates, points)
 
         row = {
             "caller_name": answers.get("caller_name", "Unknown"),
@@ -160,30 +199,375 @@ async def save_submission(answers: dict) -> str:
             "all_coordinates": all_coordinates,
             "geojson": geojson,
             "map_image_url": map_url,
+            **geocells.cell_columns(all_coordinates, geojson),
+            **_postgis_columns(points, geojson),
         }
 
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            resp = await client.post(
-                f"{SUPABASE_URL}/rest/v1/submissions",
-                headers=_headers(),
-                json=row,
+        dedup_index = dedup.current_index() if DEDUP_MODE != "off" else None
+        fingerprint = dedup.fingerprint(row) if DEDUP_MODE != "off" else None
+        duplicate = dedup_index.best_duplicate(fingerprint) if dedup_index is not None else None
+        if duplicate:
+            logger.info(
+                f"Likely duplicate of {duplicate.submission_id} "
+                f"(score {duplicate.score}: {', '.join(duplicate.reasons)})"
             )
 
-            if resp.status_code in (200, 201):
-                data = resp.json()
-                row_id = data[0]["id"] if data else "unknown"
-                logger.info(f"Saved submission to Supabase: {row_id}")
-                return f"Saved successfully (ID: {row_id})"
-            else:
-                error = resp.text
-                logger.error(f"Supabase API error: {resp.status_code} {error}")
-                return f"Failed to save: {error}"
+        if (
+            duplicate
+            and DEDUP_MODE == "merge"
+            and duplicate.score >= MERGE_THRESHOLD
+            and "phone" in duplicate.reasons
+        ):
+            return await _merge_submission(duplicate.submission_id, row)
+
+        if duplicate:
+            row["duplicate_of"] = duplicate.submission_id
+            row["duplicate_score"] = duplicate.score
+
+        try:
+            row_id = await _insert_submission(row)
+        except RuntimeError as e:
+            return f"Failed to save: {e}"
+        logger.info(f"Saved submission to Supabase: {row_id}")
+        schedule_stats_refresh()
+
+        if map_url and MAP_RENDERER != "google":
+            # Write-behind: the URL is content-addressed, so render after replying
+            map_render.schedule_render(all_coordinates, _map_failure_handler(row_id))
+
+        if row_id is None:
+            return "Saved successfully (ID: unknown)"
+        spatial_index.add_submission(row_id, geojson or all_coordinates)
+        if fingerprint is not None:
+            dedup.add_submission(row_id, fingerprint)
+        return f"Saved successfully (ID: {row_id})"
 
     except Exception as e:
         logger.error(f"Error saving to Supabase: {e}")
         return f"Error saving: {e}"
 
 
+async def _insert_submission(row: dict) -> str | None:
+    """Insert one submission row through the configured backend and return its id.
+
+    Raises RuntimeError carrying the API error if the insert is rejected.
+    """
+    if STORAGE_BACKEND == "postgres":
+        import pg_backend
+
+        return await pg_backend.insert_submission(row)
+
+    async with httpx.AsyncClient(timeout=15.0) as client:
+        if SUBMISSIONS_LAYOUT == "split":
+            # One transaction across submissions and submission_geo
+            resp = await client.post(
+                f"{SUPABASE_URL}/rest/v1/rpc/insert_submission",
+                headers=_headers(),
+                content=fastjson.dumps({"submission": row}),
+            )
+        else:
+            resp = await client.post(
+                f"{SUPABASE_URL}/rest/v1/submissions",
+                headers=_headers(),
+                content=fastjson.dumps(row),
+            )
+    if resp.status_code not in (200, 201):
+        logger.error(f"Supabase API error: {resp.status_code} {resp.text}")
+        raise RuntimeError(resp.text)
+    data = fastjson.loads(resp.content)
+    return data[0]["id"] if data else None
+
+
+async def _update_submission(submission_id: str, row: dict) -> None:
+    """Overwrite the supplied columns of one submission. Raises RuntimeError like _insert_submission."""
+    if STORAGE_BACKEND == "postgres":
+        import pg_backend
+
+        await pg_backend.update_submission(submission_id, row)
+        return
+
+    async with httpx.AsyncClient(timeout=15.0) as client:
+        if SUBMISSIONS_LAYOUT == "split":
+            resp = await client.post(
+                f"{SUPABASE_URL}/rest/v1/rpc/update_submissions",
+                headers=_headers(),
+                content=fastjson.dumps({"patches": [{"id": submission_id, **row}]}),
+            )
+        else:
+            resp = await client.patch(
+                f"{SUPABASE_URL}/rest/v1/submissions",
+                headers=_headers(),
+                params={"id": f"eq.{submission_id}"},
+                content=fastjson.dumps(row),
+            )
+    if resp.status_code not in (200, 204):
+        logger.error(f"Supabase API error: {resp.status_code} {resp.text}")
+        raise RuntimeError(resp.text)
+
+
+def _map_failure_handler(submission_id: str | None) -> map_render.OnFailure | None:
+    """Clears a row's map_image_url if its write-behind render never gets stored."""
+    if submission_id is None:
+        return None
+
+    async def clear():
+        await _update_submission(submission_id, {"map_image_url": None})
+        logger.warning(f"Cleared map_image_url of {submission_id} after its render failed")
+
+    return clear
+
+
+async def _merge_submission(submission_id: str, row: dict) -> str:
+    """Overwrite an earlier submission from the same caller with the new answers."""
+    try:
+        await _update_submission(submission_id, row)
+    except RuntimeError as e:
+        return f"Failed to save: {e}"
+
+    logger.info(f"Merged submission into earlier duplicate: {submission_id}")
+    schedule_stats_refresh()
+    if row["map_image_url"] and MAP_RENDERER != "google":
+        map_render.schedule_render(row["all_coordinates"], _map_failure_handler(submission_id))
+    spatial_index.add_submission(submission_id, row["geojson"] or row["all_coordinates"])
+    dedup.add_submission(submission_id, dedup.fingerprint(row))
+    return f"Saved successfully (ID: {submission_id}, merged with an earlier submission from this caller)"
+
+
+async def iter_submissions(
+    select: str = "*",
+    page_size: int = 1000,
+    after: tuple[str, str] | None = None,
+    filters: dict | None = None,
+) -> AsyncIterator[list[dict]]:
+    """Page through the submissions table in (created_at, id) order.
+
+    Uses keyset pagination so each page is an indexed range scan regardless of
+    how deep into the table we are. `after` resumes after a (created_at, id)
+    pair; `filters` are extra PostgREST query params (e.g. {"zipcode": "eq.94110"}).
+    Yields one list of rows per page.
+    """
+    if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
+        raise RuntimeError("SUPABASE_URL and SUPABASE_SERVICE_KEY must be set in environment")
+
+    # Keyset columns must be present in every page to compute the next cursor
+    if select != "*":
+        cols = select.split(",")
+        select = ",".join(["created_at", "id"] + [c for c in cols if c not in ("created_at", "id")])
+    table = _read_table(select)
+
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        while True:
+            params = {
+                "select": select,
+                "order": "created_at.asc,id.asc",
+                "limit": str(page_size),
+                **(filters or {}),
+            }
+            if after:
+                created_at, row_id = after
+                params["or"] = f'(created_at.gt."{created_at}",and(created_at.eq."{created_at}",id.gt.{row_id}))'
+
+            resp = await client.get(
+                f"{SUPABASE_URL}/rest/v1/{table}",
+                headers=_headers(),
+                params=params,
+            )
+            if resp.status_code != 200:
+                raise RuntimeError(f"Supabase query error: {resp.status_code} {resp.text}")
+
+            rows = fastjson.loads(resp.content)
+            if not rows:
+                return
+            yield rows
+
+            if len(rows) < page_size:
+                return
+            after = (rows[-1]["created_at"], rows[-1]["id"])
+
+
+async def bulk_upsert_submissions(rows: list[dict]) -> int:
+    """Upsert a batch of (partial) submission rows keyed by id in one request.
+
+    Every row must carry the same set of keys. Only the supplied columns are
+    updated on existing rows. Returns the number of rows sent. In the split
+    layout rows go through update_submissions(), which only updates existing rows.
+    """
+    if not rows:
+        return 0
+    if STORAGE_BACKEND == "postgres":
+        import pg_backend
+
+        return await pg_backend.bulk_update_submissions(rows)
+    if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
+        raise RuntimeError("SUPABASE_URL and SUPABASE_SERVICE_KEY must be set in environment")
+
+    headers = _headers()
+    headers["Prefer"] = "resolution=merge-duplicates,return=minimal"
+
+    async with httpx.AsyncClient(timeout=60.0) as client:
+        if SUBMISSIONS_LAYOUT == "split":
+            resp = await client.post(
+                f"{SUPABASE_URL}/rest/v1/rpc/update_submissions",
+                headers=headers,
+                content=fastjson.dumps({"patches": rows}),
+            )
+        else:
+            resp = await client.post(
+                f"{SUPABASE_URL}/rest/v1/submissions",
+                headers=headers,
+                params={"on_conflict": "id"},
+                content=fastjson.dumps(rows),
+            )
+    if resp.status_code not in (200, 201, 204):
+        raise RuntimeError(f"Supabase bulk upsert error: {resp.status_code} {resp.text}")
+    return len(rows)
+
+
+async def replace_submission_census(submission_ids: list[str], rows: list[dict]) -> int:
+    """Replace all census rows of these submissions (migrations/003_submission_census.sql).
+
+    Returns the number of rows stored.
+    """
+    if not submission_ids:
+        return 0
+    if STORAGE_BACKEND == "postgres":
+        import pg_backend
+
+        return await pg_backend.replace_submission_census(submission_ids, rows)
+    return await _rpc("replace_submission_census", {"submission_ids": submission_ids, "census": rows})
+
+
+# ============================================================
+# Read-side queries (server-side aggregates, see supabase_schema.sql)
+# ============================================================
+
+
+async def _rpc(name: str, params: dict | None = None):
+    """Call a Postgres function through PostgREST (POST /rest/v1/rpc/<name>).
+
+    None-valued params are omitted so the function's SQL default applies.
+    Returns the decoded response (a list of rows for set-returning functions).
+    """
+    if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
+        raise RuntimeError("SUPABASE_URL and SUPABASE_SERVICE_KEY must be set in environment")
+
+    body = {k: v for k, v in (params or {}).items() if v is not None}
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        resp = await client.post(
+            f"{SUPABASE_URL}/rest/v1/rpc/{name}",
+            headers=_headers(),
+            content=fastjson.dumps(body),
+        )
+    if resp.status_code not in (200, 204):
+        raise RuntimeError(f"Supabase RPC {name} error: {resp.status_code} {resp.text}")
+    return fastjson.loads(resp.content) if resp.content else None
+
+
+async def counts_by_zipcode(since: str | None = None, until: str | None = None, include_duplicates: bool = False) -> list[dict]:
+    """[{zipcode, state, submissions}], largest first. since/until are ISO dates (until exclusive).
+
+    Counts lag saves until the next refresh_stats() (see STATS_REFRESH_SECONDS).
+    """
+    return await _rpc(
+        "submission_counts_by_zipcode",
+        {"since": since, "until": until, "include_duplicates": include_duplicates},
+    )
+
+
+async def counts_by_state(since: str | None = None, until: str | None = None, include_duplicates: bool = False) -> list[dict]:
+    """[{state, submissions, zipcodes, coi_required, notes}], largest first.
+
+    Counts lag saves until the next refresh_stats() (see STATS_REFRESH_SECONDS).
+    """
+    return await _rpc(
+        "submission_counts_by_state",
+        {"since": since, "until": until, "include_duplicates": include_duplicates},
+    )
+
+
+async def counts_by_day(
+    since: str | None = None,
+    until: str | None = None,
+    zipcode: str | None = None,
+    state: str | None = None,
+    include_duplicates: bool = False,
+) -> list[dict]:
+    """[{day, submissions}] in date order, optionally for one zipcode or state.
+
+    Counts lag saves until the next refresh_stats() (see STATS_REFRESH_SECONDS).
+    """
+    return await _rpc(
+        "submission_counts_by_day",
+        {
+            "since": since,
+            "until": until,
+            "zip": zipcode,
+            "state_name": state,
+            "include_duplicates": include_duplicates,
+        },
+    )
+
+
+async def recent_submissions(limit: int = 50, zipcode: str | None = None) -> list[dict]:
+    """The latest submissions without contact details or geometry (at most 1000)."""
+    return await _rpc("recent_submissions", {"n": limit, "zip": zipcode})
+
+
+async def submissions_intersecting(geometry: dict, max_rows: int = 1000) -> list[dict]:
+    """Submissions whose polygon overlaps a GeoJSON geometry (needs the PostGIS migration)."""
+    return await _rpc("submissions_intersecting", {"geometry": geometry, "max_rows": max_rows})
+
+
+async def submissions_containing(lat: float, lng: float, max_rows: int = 1000) -> list[dict]:
+    """Submissions whose polygon contains the point (needs the PostGIS migration)."""
+    return await _rpc("submissions_containing", {"lat": lat, "lng": lng, "max_rows": max_rows})
+
+
+async def submissions_within(lat: float, lng: float, meters: float, max_rows: int = 1000) -> list[dict]:
+    """Submissions centered within `meters` of the point, nearest first, with distance_m."""
+    return await _rpc("submissions_within", {"lat": lat, "lng": lng, "meters": meters, "max_rows": max_rows})
+
+
+async def refresh_stats(view: str = STATS_VIEW, min_age: float = 0.0) -> bool:
+    """Rebuild a materialized stats view the counts_by_* queries read from.
+
+    Skipped (returns False) if the view was refreshed less than `min_age`
+    seconds ago, by this process or any other.
+    """
+    if STORAGE_BACKEND == "postgres":
+        import pg_backend
+
+        pool = await pg_backend.get_pool()
+        return await pool.fetchval("select refresh_submission_stats($1, $2)", view, min_age)
+    return bool(await _rpc("refresh_submission_stats", {"view_name": view, "min_age_seconds": min_age}))
+
+
+_STATS_REFRESH: dict[str, asyncio.Task] = {}
+
+
+def schedule_stats_refresh(view: str = STATS_VIEW) -> None:
+    """Refresh `view` STATS_REFRESH_SECONDS from now, unless one is already pending.
+
+    The refresh is skipped if the view was refreshed since (e.g. by another
+    agent process or pg_cron), as that refresh already includes the save.
+    """
+    if STATS_REFRESH_SECONDS <= 0:
+        return
+    loop = asyncio.get_running_loop()
+    pending = _STATS_REFRESH.get(view)
+    if pending is not None and not pending.done() and pending.get_loop() is loop:
+        return
+
+    async def _run():
+        await asyncio.sleep(STATS_REFRESH_SECONDS)
+        try:
+            await refresh_stats(view, min_age=STATS_REFRESH_SECONDS)
+        except Exception as e:
+            logger.warning(f"Refreshing {view} failed: {e}")
+
+    _STATS_REFRESH[view] = loop.create_task(_run())
+
+
 # ============================================================
 # Redistricting criteria lookup (replaces Notion DB query)
 # ============================================================
@@ -256,7 +640,7 @@ async def _lookup_coi_required(state: str) -> dict | None:
             logger.error(f"Supabase query error: {resp.status_code} {resp.text}")
             return None
 
-        data = resp.json()
+        data = fastjson.loads(resp.content)
         if not data:
             return None
 
@@ -268,6 +652,22 @@ async def _lookup_coi_required(state: str) -> dict | None:
         }
 
 
+async def list_redistricting_criteria() -> list[dict]:
+    """Every row of redistricting_criteria (one per state)."""
+    if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
+        raise RuntimeError("SUPABASE_URL and SUPABASE_SERVICE_KEY must be set in environment")
+
+    async with httpx.AsyncClient(timeout=15.0) as client:
+        resp = await client.get(
+            f"{SUPABASE_URL}/rest/v1/redistricting_criteria",
+            headers=_headers(),
+            params={"select": "state,coi_required,notes", "order": "state.asc"},
+        )
+    if resp.status_code != 200:
+        raise RuntimeError(f"Supabase query error: {resp.status_code} {resp.text}")
+    return fastjson.loads(resp.content)
+
+
 @loopback_tool(is_background=True)
 async def check_coi_requirement(
     ctx: ToolEnv,
@@ -298,7 +698,7 @@ async def check_coi_requirement(
             f"in redistricting for this state, but the caller's input is still valuable."
         )
 
-    if result["notes"]:
+    if result["notes"] and not overload.degraded(overload.BRIEF_REPLIES):
         msg += f" Notes: {result['notes']}"
 
     yield msg
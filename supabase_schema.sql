@@ -1,8 +1,8 @@
 -- Supabase schema for Redistricting Agent
 -- Run this in the Supabase SQL Editor to set up your tables.
 
--- Enable PostGIS for geographic data (optional but recommended)
--- create extension if not exists postgis;
+-- PostGIS (optional but recommended): after this file, run
+-- migrations/001_postgis.sql and set POSTGIS_MODE=on for the agent.
 
 -- ============================================================
 -- Table: submissions
@@ -35,9 +35,33 @@ create table if not exists submissions (
   geocoded_landmarks text,
   all_coordinates jsonb,       -- array of {lat, lng, formatted_address}
   geojson jsonb,               -- GeoJSON Feature with polygon
-  map_image_url text           -- Google Static Maps URL
+  map_image_url text,          -- Rendered map image (Storage URL) or Google Static Maps URL
+
+  -- Geohash cells (see geocells.py) for indexed area aggregation
+  centroid_geohash text,       -- precision 9 geohash of the point centroid
+  centroid_gh5 text,
+  centroid_gh6 text,
+  centroid_gh7 text,
+  cover_gh5 text[],            -- cells covered by the polygon at each resolution
+  cover_gh6 text[],
+  cover_gh7 text[],
+
+  -- Duplicate detection (see dedup.py)
+  duplicate_of uuid references submissions (id) on delete set null,
+  duplicate_score real
 );
 
+-- Migration for tables created before the geohash columns existed
+alter table submissions add column if not exists centroid_geohash text;
+alter table submissions add column if not exists centroid_gh5 text;
+alter table submissions add column if not exists centroid_gh6 text;
+alter table submissions add column if not exists centroid_gh7 text;
+alter table submissions add column if not exists cover_gh5 text[];
+alter table submissions add column if not exists cover_gh6 text[];
+alter table submissions add column if not exists cover_gh7 text[];
+alter table submissions add column if not exists duplicate_of uuid references submissions (id) on delete set null;
+alter table submissions add column if not exists duplicate_score real;
+
 -- ============================================================
 -- Table: redistricting_criteria
 -- Lookup table: whether each state requires COI in redistricting
@@ -79,9 +103,272 @@ create policy "Service update redistricting_criteria"
   on redistricting_criteria for update
   using (true);
 
+-- ============================================================
+-- Storage: rendered map images (see map_render.py)
+-- Public bucket; objects are named by geometry hash so identical
+-- submissions share one image.
+-- ============================================================
+insert into storage.buckets (id, name, public)
+values ('map-images', 'map-images', true)
+on conflict (id) do nothing;
+
 -- ============================================================
 -- Indexes
 -- ============================================================
 create index if not exists idx_submissions_zipcode on submissions (zipcode);
 create index if not exists idx_submissions_created_at on submissions (created_at desc);
 create index if not exists idx_redistricting_criteria_state on redistricting_criteria (state);
+
+-- Geohash aggregation: GROUP BY centroid_ghN is an index scan, and
+-- "which submissions cover cell X" uses the GIN indexes (cover_ghN @> array['9q8yy'])
+create index if not exists idx_submissions_centroid_gh5 on submissions (centroid_gh5);
+create index if not exists idx_submissions_centroid_gh6 on submissions (centroid_gh6);
+create index if not exists idx_submissions_centroid_gh7 on submissions (centroid_gh7);
+create index if not exists idx_submissions_centroid_geohash on submissions (centroid_geohash text_pattern_ops);
+create index if not exists idx_submissions_cover_gh5 on submissions using gin (cover_gh5);
+create index if not exists idx_submissions_cover_gh6 on submissions using gin (cover_gh6);
+create index if not exists idx_submissions_cover_gh7 on submissions using gin (cover_gh7);
+
+-- Aggregations can skip flagged duplicates with "where duplicate_of is null"
+create index if not exists idx_submissions_duplicate_of on submissions (duplicate_of) where duplicate_of is not null;
+
+-- ============================================================
+-- Read-side aggregates, called over PostgREST RPC
+-- (POST /rest/v1/rpc/<function>; see supabase_backend.py)
+-- Reports and the dashboard use these instead of pulling every row.
+-- Counts are served from a materialized view, so they lag new saves until
+-- refresh_submission_stats() runs: the agent calls it a few minutes after
+-- saves (STATS_REFRESH_SECONDS, skipped if the view was refreshed since), and
+-- with pg_cron enabled it also runs every 5 minutes (scheduled below).
+-- ============================================================
+
+-- Zipcode prefix ranges -> state (same table as supabase_backend._init_zip_to_state)
+create table if not exists zip_prefix_states (
+  prefix_start text primary key,
+  prefix_end text not null,
+  state text not null
+);
+
+insert into zip_prefix_states (prefix_start, prefix_end, state) values
+  ('005', '009', 'Puerto Rico'),
+  ('010', '027', 'Massachusetts'),
+  ('028', '029', 'Rhode Island'),
+  ('030', '038', 'New Hampshire'),
+  ('039', '049', 'Maine'),
+  ('050', '059', 'Vermont'),
+  ('060', '069', 'Connecticut'),
+  ('070', '089', 'New Jersey'),
+  ('100', '149', 'New York'),
+  ('150', '196', 'Pennsylvania'),
+  ('197', '199', 'Delaware'),
+  ('200', '205', 'District of Columbia'),
+  ('206', '219', 'Maryland'),
+  ('220', '246', 'Virginia'),
+  ('247', '268', 'West Virginia'),
+  ('270', '289', 'North Carolina'),
+  ('290', '299', 'South Carolina'),
+  ('300', '319', 'Georgia'),
+  ('320', '349', 'Florida'),
+  ('350', '369', 'Alabama'),
+  ('370', '385', 'Tennessee'),
+  ('386', '397', 'Mississippi'),
+  ('400', '427', 'Kentucky'),
+  ('430', '459', 'Ohio'),
+  ('460', '479', 'Indiana'),
+  ('480', '499', 'Michigan'),
+  ('500', '528', 'Iowa'),
+  ('530', '549', 'Wisconsin'),
+  ('550', '567', 'Minnesota'),
+  ('570', '577', 'South Dakota'),
+  ('580', '588', 'North Dakota'),
+  ('590', '599', 'Montana'),
+  ('600', '629', 'Illinois'),
+  ('630', '658', 'Missouri'),
+  ('660', '679', 'Kansas'),
+  ('680', '693', 'Nebraska'),
+  ('700', '714', 'Louisiana'),
+  ('716', '729', 'Arkansas'),
+  ('730', '749', 'Oklahoma'),
+  ('750', '799', 'Texas'),
+  ('800', '816', 'Colorado'),
+  ('820', '831', 'Wyoming'),
+  ('832', '838', 'Idaho'),
+  ('840', '847', 'Utah'),
+  ('850', '865', 'Arizona'),
+  ('870', '884', 'New Mexico'),
+  ('889', '898', 'Nevada'),
+  ('900', '961', 'California'),
+  ('962', '966', 'Military'),
+  ('967', '968', 'Hawaii'),
+  ('970', '979', 'Oregon'),
+  ('980', '994', 'Washington'),
+  ('995', '999', 'Alaska')
+on conflict (prefix_start) do nothing;
+
+alter table zip_prefix_states enable row level security;
+
+create policy "Public read zip_prefix_states"
+  on zip_prefix_states for select
+  using (true);
+
+create or replace function zip_state(zip text)
+returns text
+language sql stable
+as $$
+  select z.state
+  from zip_prefix_states z,
+    lateral (select left(regexp_replace(coalesce(zip, ''), '[^0-9]', '', 'g'), 3) as prefix) p
+  where length(p.prefix) = 3 and p.prefix between z.prefix_start and z.prefix_end
+  limit 1
+$$;
+
+-- One row per (UTC day, zipcode); all count functions roll this up
+create materialized view if not exists submission_daily_counts as
+select
+  (created_at at time zone 'utc')::date as day,
+  coalesce(zipcode, '') as zipcode,
+  coalesce(zip_state(zipcode), 'Unknown') as state,
+  count(*) as submissions,
+  count(*) filter (where duplicate_of is null) as unique_submissions
+from submissions
+group by 1, 2, 3;
+
+-- Required for refresh ... concurrently
+create unique index if not exists idx_submission_daily_counts on submission_daily_counts (day, zipcode);
+
+-- When each stats view was last refreshed, so agents, report.py and pg_cron
+-- don't rebuild the same view back to back
+create table if not exists submission_stats_refreshes (
+  view_name text primary key,
+  refreshed_at timestamptz not null
+);
+
+alter table submission_stats_refreshes enable row level security;
+
+-- Rebuilds one stats view unless it was refreshed less than min_age_seconds
+-- ago (returns false then). Refreshes of a view are serialized, so a caller
+-- that waited for another's refresh sees it and skips its own.
+drop function if exists refresh_submission_stats();
+create or replace function refresh_submission_stats(
+  view_name text default 'submission_daily_counts',
+  min_age_seconds double precision default 0
+)
+returns boolean
+language plpgsql security definer
+set search_path = public
+as $$
+begin
+  if view_name not in ('submission_daily_counts') then
+    raise exception 'unknown stats view %', view_name;
+  end if;
+  perform pg_advisory_xact_lock(hashtext('refresh_submission_stats:' || view_name));
+  if exists (
+    select 1 from submission_stats_refreshes r
+    where r.view_name = refresh_submission_stats.view_name
+      and r.refreshed_at > clock_timestamp() - make_interval(secs => min_age_seconds)
+  ) then
+    return false;
+  end if;
+  execute format('refresh materialized view concurrently %I', view_name);
+  insert into submission_stats_refreshes values (view_name, clock_timestamp())
+  on conflict on constraint submission_stats_refreshes_pkey do update set refreshed_at = excluded.refreshed_at;
+  return true;
+end;
+$$;
+
+revoke execute on function refresh_submission_stats(text, double precision) from public, anon, authenticated;
+
+-- Periodic refresh when pg_cron is available (Supabase: Database -> Extensions ->
+-- pg_cron, then re-run this block). Re-running updates the existing job.
+do $$
+begin
+  if exists (select 1 from pg_extension where extname = 'pg_cron') then
+    perform cron.schedule('refresh-submission-stats', '*/5 * * * *', 'select refresh_submission_stats()');
+  end if;
+end;
+$$;
+
+-- Counts exclude flagged duplicates unless include_duplicates is set.
+-- since/until are inclusive/exclusive UTC dates. Counts are as of the last
+-- refresh_submission_stats(), so the newest saves may be missing.
+create or replace function submission_counts_by_zipcode(
+  since date default null,
+  until date default null,
+  include_duplicates boolean default false
+)
+returns table (zipcode text, state text, submissions bigint)
+language sql stable
+as $$
+  select c.zipcode, c.state,
+    sum(case when include_duplicates then c.submissions else c.unique_submissions end)::bigint as n
+  from submission_daily_counts c
+  where (since is null or c.day >= since) and (until is null or c.day < until)
+  group by c.zipcode, c.state
+  having sum(case when include_duplicates then c.submissions else c.unique_submissions end) > 0
+  order by n desc, c.zipcode
+$$;
+
+create or replace function submission_counts_by_state(
+  since date default null,
+  until date default null,
+  include_duplicates boolean default false
+)
+returns table (state text, submissions bigint, zipcodes bigint, coi_required boolean, notes text)
+language sql stable
+as $$
+  select c.state,
+    sum(case when include_duplicates then c.submissions else c.unique_submissions end)::bigint as n,
+    count(distinct c.zipcode) filter (where include_duplicates or c.unique_submissions > 0),
+    coalesce(r.coi_required, false),
+    r.notes
+  from submission_daily_counts c
+  left join redistricting_criteria r on r.state = c.state
+  where (since is null or c.day >= since) and (until is null or c.day < until)
+  group by c.state, r.coi_required, r.notes
+  having sum(case when include_duplicates then c.submissions else c.unique_submissions end) > 0
+  order by n desc, c.state
+$$;
+
+create or replace function submission_counts_by_day(
+  since date default null,
+  until date default null,
+  zip text default null,
+  state_name text default null,
+  include_duplicates boolean default false
+)
+returns table (day date, submissions bigint)
+language sql stable
+as $$
+  select c.day,
+    sum(case when include_duplicates then c.submissions else c.unique_submissions end)::bigint
+  from submission_daily_counts c
+  where (since is null or c.day >= since) and (until is null or c.day < until)
+    and (zip is null or c.zipcode = zip)
+    and (state_name is null or c.state = state_name)
+  group by c.day
+  order by c.day
+$$;
+
+-- Latest submissions without the contact and geometry columns, straight from
+-- the table (uses idx_submissions_created_at, so it is never stale)
+create or replace function recent_submissions(n integer default 50, zip text default null)
+returns table (
+  id uuid,
+  created_at timestamptz,
+  zipcode text,
+  community_name text,
+  community_description text,
+  geographic_summary text,
+  primary_address text,
+  map_image_url text,
+  duplicate_of uuid
+)
+language sql stable
+as $$
+  select s.id, s.created_at, s.zipcode, s.community_name, s.community_description,
+    s.geographic_summary, s.primary_address, s.map_image_url, s.duplicate_of
+  from submissions s
+  where zip is null or s.zipcode = zip
+  order by s.created_at desc
+  limit least(greatest(n, 1), 1000)
+$$;
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test COI aggregation: linking overlapping submissions with similar text (and
+not blank ones), polygon rasterization, outline tracing with holes, and the
+consensus boundary. Needs numpy; no API keys.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+
+from aggregate import aggregate, cluster, rasterize, signatures, text_similarity, trace
+
+
+def _row(i: int, lng: float, lat: float, half: float = 0.01, name: str = "", description: str = "") -> dict:
+    ring = [[lng - half, lat - half], [lng + half, lat - half], [lng + half, lat + half], [lng - half, lat + half], [lng - half, lat - half]]
+    return {
+        "id": f"sub-{i}",
+        "community_name": name,
+        "community_description": description,
+        "geojson": {"type": "Feature", "geometry": {"type": "Polygon", "coordinates": [ring]}},
+    }
+
+
+def test_blank_text_matches_nothing():
+    sigs = signatures(["", "", "Mission District Latino families and churches"])
+    assert text_similarity(sigs, 0, np.array([1, 2])).tolist() == [0.0, 0.0]
+    assert text_similarity(sigs, 2, np.array([2])).tolist() == [1.0]
+
+    # Squares overlapping by 40%: geometry alone isn't enough to link them
+    blank = [_row(i, -122.42 + i * 0.012, 37.76) for i in range(3)]
+    assert cluster(blank, min_size=2) == []
+    print("✅ blank text never counts as similar")
+
+
+def test_cluster():
+    text = "Mission District, Latino families, churches, murals and taquerias along 24th St"
+    rows = [_row(i, -122.42 + i * 0.002, 37.76, name="Mission District", description=text) for i in range(4)]
+    rows.append(_row(9, -122.50, 37.75, name="Outer Sunset", description="Surfers and fog by Ocean Beach"))
+    clusters = cluster(rows, min_size=2)
+    assert len(clusters) == 1
+    assert sorted(m.id for m in clusters[0].members) == ["sub-0", "sub-1", "sub-2", "sub-3"]
+    assert clusters[0].names[0] == ("mission district", 4)
+
+    collection = aggregate(rows, level=0.5, min_size=2)
+    feature = collection["features"][0]
+    assert feature["properties"]["submissions"] == 4 and feature["properties"]["peak_agreement"] == 1.0
+    assert feature["geometry"]["type"] == "MultiPolygon"
+    print("✅ overlapping similar submissions cluster into one consensus boundary")
+
+
+def test_rasterize():
+    # A 4x4-cell square on a 10x10 grid of unit cells
+    ring = [(2.0, 3.0), (6.0, 3.0), (6.0, 7.0), (2.0, 7.0), (2.0, 3.0)]
+    mask = rasterize(ring, (0.0, 0.0), (1.0, 1.0), (10, 10))
+    assert mask.sum() == 16
+    assert mask[3:7, 2:6].all()
+
+    triangle = [(0.0, 0.0), (10.0, 0.0), (0.0, 10.0), (0.0, 0.0)]
+    assert 40 <= rasterize(triangle, (0.0, 0.0), (1.0, 1.0), (10, 10)).sum() <= 60
+    print("✅ rasterize")
+
+
+def test_trace():
+    mask = np.zeros((5, 5), dtype=bool)
+    mask[:, :] = True
+    mask[2, 2] = False
+    polygons = trace(mask)
+    assert len(polygons) == 1
+    exterior, hole = polygons[0]
+    assert sorted(exterior[:-1]) == [(0, 0), (0, 5), (5, 0), (5, 5)]
+    assert sorted(hole[:-1]) == [(2, 2), (2, 3), (3, 2), (3, 3)]
+
+    two = np.zeros((3, 5), dtype=bool)
+    two[1, 0] = two[1, 4] = True
+    assert len(trace(two)) == 2
+    print("✅ trace outlines with holes")
+
+
+if __name__ == "__main__":
+    test_blank_text_matches_nothing()
+    test_cluster()
+    test_rasterize()
+    test_trace()
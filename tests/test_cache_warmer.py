@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Test the geocode cache warmer: mining mentions per zip, planning lookups, and
+warming a cache within a request budget against a simulated API. No API key needed.
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import httpx
+
+import cache_warmer
+import quota
+from geocoding import GeocodeCache, GeocodePipeline
+
+ROWS = [
+    {
+        "zipcode": "94110",
+        "address": "24th and Mission",
+        "key_places": "Dolores Park, Mission St",
+        "community_boundaries": "Market St",
+        "geocoded_landmarks": "Dolores Park (Dolores Park, San Francisco, CA 94114, USA); Market St (Market St, San Francisco, CA, USA)",
+    },
+    {"zipcode": "94110", "address": "24th and Mission", "key_places": "Dolores Park", "community_boundaries": ""},
+    {"zipcode": "94103", "address": "", "key_places": "Civic Center Plaza", "community_boundaries": ""},
+]
+
+
+async def _pages():
+    yield ROWS[:2]
+    yield ROWS[2:]
+
+
+def test_mine_and_plan():
+    counts = cache_warmer.mentions(ROWS[0])
+    assert counts["Dolores Park"] == cache_warmer.GEOCODED_WEIGHT + cache_warmer.MENTION_WEIGHT
+    assert counts["24th and Mission"] == cache_warmer.MENTION_WEIGHT
+
+    by_zip = asyncio.run(cache_warmer.mine(_pages()))
+    assert by_zip["94110"]["Dolores Park"] == 5
+    assert by_zip["94110"]["24th and Mission"] == 2
+    assert set(by_zip) == {"94110", "94103"}
+
+    lookups = cache_warmer.plan(by_zip, top=2, zipcodes=["85001"])
+    assert lookups[:3] == [("85001", None), ("94110", None), ("94103", None)]
+    assert lookups[3] == ("94110", "Dolores Park")
+    assert sum(1 for z, q in lookups if z == "94110" and q) == 2
+    print("✅ mentions mined per zip and planned most-mentioned first")
+
+
+def fake_api() -> httpx.MockTransport:
+    def handler(request: httpx.Request) -> httpx.Response:
+        geometry = {
+            "location": {"lat": 37.76, "lng": -122.42},
+            "location_type": "GEOMETRIC_CENTER",
+            "viewport": {"northeast": {"lat": 37.77, "lng": -122.40}, "southwest": {"lat": 37.74, "lng": -122.43}},
+        }
+        result = {"geometry": geometry, "formatted_address": request.url.params["address"]}
+        return httpx.Response(200, json={"status": "OK", "results": [result]})
+
+    return httpx.MockTransport(handler)
+
+
+async def _warm(budget, lookups=None, concurrency=8):
+    cache = GeocodeCache()
+    lane = quota.QuotaScheduler(rate=1000, concurrency=10, calls=lambda: 0).lane(quota.PREFETCH, budget=budget)
+    pipeline = GeocodePipeline(cache=cache, limiter=lane, transport=fake_api())
+    lookups = lookups or [("94110", None), ("94110", "Dolores Park"), ("94110", "24th and Mission")]
+    first = await cache_warmer.warm(lookups, pipeline, concurrency)
+    second = await cache_warmer.warm(lookups, pipeline, concurrency)
+    await pipeline.aclose()
+    return cache, first, second
+
+
+def test_warm():
+    cache_warmer.geocoding.GOOGLE_MAPS_API_KEY = cache_warmer.geocoding.GOOGLE_MAPS_API_KEY or "test-key"
+    cache, first, second = asyncio.run(_warm(budget=None))
+    assert first["resolved"] == 3 and first["api_requests"] == 3
+    assert cache.get("Dolores Park, 94110")[0]
+    assert second["already_cached"] == 3 and second["api_requests"] == 0
+
+    _, limited, _ = asyncio.run(_warm(budget=1))
+    assert limited["api_requests"] == 1 and limited["over_budget"] == 2
+
+    # Lookups queued behind the semaphore when the budget runs out count as over budget too
+    zips = [("94110", None), ("94103", None), ("94107", None)]
+    _, queued, _ = asyncio.run(_warm(budget=2, lookups=zips, concurrency=1))
+    assert queued["api_requests"] == 2 and queued["resolved"] == 2
+    assert queued["over_budget"] == 1 and queued["unresolved"] == 0
+    print("✅ cache warmed within budget; warm entries cost nothing")
+
+
+if __name__ == "__main__":
+    test_mine_and_plan()
+    test_warm()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test the per-call supervisor: geocoding is cancelled at hangup, a consented
+save runs to completion, and per-tool deadlines are enforced. No API key needed.
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import call_supervisor
+import metrics
+from call_supervisor import CallHungUp, CallSupervisor
+from line.events import CallEnded
+
+
+async def _hangup():
+    supervisor = CallSupervisor("test-call")
+    finished = []
+
+    async def slow_geocode():
+        await asyncio.sleep(10)
+        finished.append("geocode")
+
+    async def slow_save():
+        await asyncio.sleep(0.05)
+        finished.append("save")
+        return "Saved successfully (ID: 1)"
+
+    async def geocode_tool():
+        try:
+            await supervisor.run("geocode_community", slow_geocode())
+        except CallHungUp:
+            return "hung up"
+
+    geocode = asyncio.create_task(geocode_tool())
+    save = asyncio.create_task(supervisor.run("save_submission_tool", slow_save(), essential=True))
+    await asyncio.sleep(0.01)
+
+    class Agent:
+        async def process(self, env, event):
+            yield "cleanup"
+
+    outputs = [out async for out in supervisor.wrap(Agent())(None, CallEnded())]
+    assert outputs == ["cleanup"]
+    assert await geocode == "hung up"
+    assert await save == "Saved successfully (ID: 1)"
+    assert finished == ["save"]
+
+    # Non-essential work started after the hangup never runs
+    try:
+        await supervisor.run("geocode_community", slow_geocode())
+        raise AssertionError("expected CallHungUp")
+    except CallHungUp:
+        pass
+
+
+def test_hangup():
+    metrics.reset()
+    asyncio.run(_hangup())
+    assert metrics.get("tool_cancelled_geocode_community") == 2
+    assert metrics.get("tool_finished_after_hangup_save_submission_tool") == 1
+    print("✅ geocoding cancelled at hangup, consented save finished")
+
+
+async def _deadline():
+    supervisor = CallSupervisor("test-call")
+    try:
+        await supervisor.run("geocode_community", asyncio.sleep(10))
+        raise AssertionError("expected TimeoutError")
+    except TimeoutError:
+        pass
+
+
+def test_deadline():
+    metrics.reset()
+    saved = call_supervisor.TOOL_DEADLINES["geocode_community"]
+    call_supervisor.TOOL_DEADLINES["geocode_community"] = 0.05
+    try:
+        asyncio.run(_deadline())
+    finally:
+        call_supervisor.TOOL_DEADLINES["geocode_community"] = saved
+    assert metrics.get("tool_deadline_exceeded") == 1
+    print("✅ per-tool deadline enforced")
+
+
+if __name__ == "__main__":
+    test_hangup()
+    test_deadline()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Test census intersection: area weights of a submission polygon over a grid of
+synthetic tracts (with a hole), point location for sparse submissions, and the
+.npz layer cache. Needs numpy; no database or TIGER files.
+"""
+
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import census
+
+
+def _square(x0, y0, size):
+    return [[x0, y0], [x0 + size, y0], [x0 + size, y0 + size], [x0, y0 + size], [x0, y0]]
+
+
+def _tracts() -> dict:
+    """A 4x4 grid of 0.01-degree tracts; tract 0000 has a hole in its lower-left quarter."""
+    features = []
+    for i in range(4):
+        for j in range(4):
+            rings = [_square(-122.0 + i * 0.01, 37.0 + j * 0.01, 0.01)]
+            if (i, j) == (0, 0):
+                rings.append(_square(-122.0, 37.0, 0.005)[::-1])
+            features.append({
+                "type": "Feature",
+                "properties": {"GEOID": f"{i:02d}{j:02d}"},
+                "geometry": {"type": "Polygon", "coordinates": rings},
+            })
+    return {"type": "FeatureCollection", "features": features}
+
+
+def _layer() -> census.Layer:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "tracts.geojson"
+        path.write_text(json.dumps(_tracts()))
+        return census.Layer.read("tract", path)
+
+
+def test_area_weights():
+    layer = _layer()
+    assert len(layer) == 16
+
+    # Square covering tracts 0000, 0100, 0001, 0101 half each way: a quarter of each
+    ring = [tuple(p) for p in _square(-121.995, 37.005, 0.01)]
+    shares = {layer.ids[f]: (o, fa) for f, o, fa in layer.intersect(ring)}
+    assert set(shares) == {"0000", "0100", "0001", "0101"}, shares
+    for geoid in ("0100", "0001", "0101"):
+        overlap, feature_area = shares[geoid]
+        assert abs(overlap - 0.25e-4) < 1e-10 and abs(feature_area - 1e-4) < 1e-10
+    # Tract 0000 loses its hole from both the feature and the overlap
+    overlap, feature_area = shares["0000"]
+    assert abs(feature_area - 0.75e-4) < 1e-10
+    assert abs(overlap - 0.25e-4) < 1e-10
+    print("✅ Area overlaps of a polygon spanning four tracts (one with a hole)")
+
+
+def test_concave_polygon():
+    layer = _layer()
+    # An L-shape across six tracts: the fan triangles must add up exactly
+    ring = [(-122.0, 37.0), (-121.97, 37.0), (-121.97, 37.01), (-121.99, 37.01), (-121.99, 37.03), (-122.0, 37.03), (-122.0, 37.0)]
+    found = {layer.ids[f]: o for f, o, _ in layer.intersect(ring)}
+    assert set(found) == {"0000", "0100", "0200", "0001", "0002"}, found
+    assert abs(found["0000"] - 0.75e-4) < 1e-10  # minus the hole
+    assert abs(sum(found.values()) - 4.75e-4) < 1e-10
+    # The same shapes drawn clockwise
+    assert {layer.ids[f]: o for f, o, _ in layer.intersect(ring[::-1])}.keys() == found.keys()
+    square = [tuple(p) for p in _square(-121.995, 37.005, 0.02)[::-1]]
+    assert abs(sum(o for _, o, _ in layer.intersect(square)) - 4e-4) < 1e-10
+    print("✅ Concave and clockwise polygon overlaps sum to their area")
+
+
+def test_census_rows():
+    layer = _layer()
+    rows = [
+        {"id": "a", "geojson": {"type": "Polygon", "coordinates": [_square(-121.985, 37.015, 0.01)]}},
+        {"id": "b", "geojson": None, "all_coordinates": [{"lat": 37.025, "lng": -121.975}, {"lat": 37.035, "lng": -121.965}]},
+        {"id": "c", "geojson": None, "all_coordinates": [{"lat": 37.0025, "lng": -121.9975}]},  # in the hole
+    ]
+    out = census.census_rows([layer], rows)
+    a = [r for r in out if r["submission_id"] == "a"]
+    assert len(a) == 4 and all(r["method"] == "area" for r in a)
+    assert abs(sum(r["submission_share"] for r in a) - 1.0) < 1e-6
+    assert all(abs(r["feature_share"] - 0.25) < 1e-6 for r in a)
+    assert a[0]["overlap_sq_miles"] > 0
+
+    b = sorted((r["geoid"], r["submission_share"]) for r in out if r["submission_id"] == "b")
+    assert b == [("0202", 0.5), ("0303", 0.5)], b
+    assert not [r for r in out if r["submission_id"] == "c"]
+    print("✅ Census rows for polygon and point submissions")
+
+
+def test_npz_cache():
+    layer = _layer()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "tract.npz"
+        layer.save(path)
+        loaded = census.Layer.load("tract", path)
+    assert list(loaded.ids) == list(layer.ids)
+    ring = [tuple(p) for p in _square(-121.995, 37.005, 0.01)]
+    assert loaded.intersect(ring) == layer.intersect(ring)
+    print("✅ Packed layer round-trips through .npz")
+
+
+def test_locate():
+    layer = _layer()
+    lng = [-121.995, -121.9975, -121.965, -121.9, -121.985, -122.5]
+    lat = [37.005, 37.0025, 37.035, 37.0, 37.015, 37.0]
+    found = [layer.ids[f] if f >= 0 else None for f in layer.locate(lng, lat)]
+    assert found == ["0000", None, "0303", None, "0101", None], found
+    print("✅ Points located in one batch, holes and off-grid points excluded")
+
+
+if __name__ == "__main__":
+    test_area_weights()
+    test_concave_polygon()
+    test_census_rows()
+    test_locate()
+    test_npz_cache()
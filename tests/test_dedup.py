@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Test duplicate detection: repeat callers, near-identical neighbor submissions,
+unrelated submissions, saves during the background load, and lookup latency.
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import dedup
+from dedup import DedupIndex, fingerprint, normalize_phone
+
+# Generous bound for one lookup among 20k submissions (about 0.1 ms on a laptop)
+MAX_LOOKUP_MS = 10.0
+
+MISSION = {
+    "caller_name": "Lauren James",
+    "phone_number": "(555) 010-0000",
+    "community_name": "Mission District",
+    "community_description": "Majority Latino, lots of churches and family owned businesses",
+    "key_places": "Mission Dolores Park, the school next to it, Mission St, 24th and Mission",
+    "community_boundaries": "Bernal, SOMA, Hayes, Castro are neighboring. Market St is also a barrier",
+    "cultural_interests": "Predominant Latino, immigration concerns, affordable housing, public transit",
+    "cover_gh6": ["9q8yy1", "9q8yy3", "9q8yy4"],
+}
+
+SUNSET = {
+    "caller_name": "Sam Lee",
+    "phone_number": "555-222-3333",
+    "community_name": "Outer Sunset",
+    "community_description": "Surfers, foggy beach neighborhood with many Chinese American families",
+    "key_places": "Ocean Beach, Judah St, Golden Gate Park",
+    "community_boundaries": "Lincoln Way to Sloat, 19th Avenue to the Great Highway",
+    "cover_gh6": ["9q8yt1", "9q8yt2"],
+}
+
+
+def test_phone_normalization():
+    assert normalize_phone("+1 (555) 010-0000") == normalize_phone("555.010.0000") == "5550100000"
+    assert normalize_phone("skipped") == ""
+    print("✅ phone normalization")
+
+
+def test_repeat_caller_and_neighbor():
+    index = DedupIndex()
+    index.add("mission", fingerprint(MISSION))
+    index.add("sunset", fingerprint(SUNSET))
+
+    # Same caller phones in again with slightly different wording
+    repeat = dict(MISSION, phone_number="555-010-0000", community_description="Majority Latino, lots of churches")
+    match = index.best_duplicate(fingerprint(repeat))
+    assert match and match.submission_id == "mission" and "phone" in match.reasons
+
+    # A neighbor describes the same community almost word for word
+    neighbor = dict(MISSION, caller_name="Ana Ruiz", phone_number="555-999-1234")
+    match = index.best_duplicate(fingerprint(neighbor))
+    assert match and match.submission_id == "mission" and "phone" not in match.reasons
+
+    # Same wording but somewhere else entirely isn't a duplicate on its own
+    elsewhere = dict(neighbor, cover_gh6=["9q8yv0"])
+    assert index.best_duplicate(fingerprint(elsewhere)) is None
+
+    # Unrelated community from a different caller
+    other = dict(SUNSET, caller_name="Pat Kim", phone_number="555-444-5555", cover_gh6=["9q8yv0"])
+    other["community_description"] = "Quiet residential blocks near the zoo"
+    assert index.best_duplicate(fingerprint(other)) is None
+    print("✅ repeat caller / neighbor / unrelated")
+
+
+async def _load_with_saves():
+    import supabase_backend
+
+    async def pages(select, **kwargs):
+        yield [dict(SUNSET, id="sunset")]
+        dedup.add_submission("mission", fingerprint(MISSION))  # saved mid-load
+        yield []
+
+    original = supabase_backend.iter_submissions
+    supabase_backend.iter_submissions = pages
+    dedup._INDEX = None
+    try:
+        return await dedup.ensure_loaded()
+    finally:
+        supabase_backend.iter_submissions = original
+        dedup._INDEX = None
+
+
+def test_saves_during_load():
+    index = asyncio.run(_load_with_saves())
+    assert len(index) == 2
+    repeat = dict(MISSION, community_description="Latino neighborhood with churches near Dolores Park")
+    assert index.best_duplicate(fingerprint(repeat)).submission_id == "mission"
+    assert dedup._PENDING is None
+    print("✅ submissions saved during the background load are indexed")
+
+
+def test_lookup_latency():
+    index = DedupIndex()
+    for i in range(20_000):
+        row = dict(SUNSET, phone_number=f"555{i:07d}", caller_name=f"caller {i}")
+        row["community_description"] = f"neighborhood {i} with corner store {i % 97} and park {i % 31}"
+        index.add(str(i), fingerprint(row))
+
+    fp = fingerprint(MISSION)
+    n = 1000
+    start = time.perf_counter()
+    for _ in range(n):
+        index.find(fp)
+    per_lookup_ms = (time.perf_counter() - start) / n * 1000
+    assert per_lookup_ms < MAX_LOOKUP_MS, f"{per_lookup_ms:.3f} ms per lookup"
+    print(f"✅ dedup lookup over {len(index)} submissions: {per_lookup_ms:.3f} ms")
+
+
+if __name__ == "__main__":
+    test_phone_normalization()
+    test_repeat_caller_and_neighbor()
+    test_saves_during_load()
+    test_lookup_latency()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Test the streaming export: resuming an interrupted NDJSON/GeoJSON export from
+its checkpoint (discarding output written after it) and typed Parquet columns.
+No API keys needed.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import export
+
+
+def _row(i: int) -> dict:
+    lat, lng = 37.75 + i * 0.01, -122.42
+    ring = [[lng, lat], [lng + 0.01, lat], [lng + 0.01, lat + 0.01], [lng, lat + 0.01], [lng, lat]]
+    return {
+        "id": f"00000000-0000-0000-0000-{i:012d}",
+        "created_at": f"2026-01-01T12:00:{i:02d}.12345+00:00",
+        "phone_number": "+14155550100",
+        "consent": True,
+        "community_name": f"Community {i}",
+        "all_coordinates": [{"lat": lat, "lng": lng}],
+        "geojson": {"type": "Feature", "geometry": {"type": "Polygon", "coordinates": [ring]}},
+        "cover_gh5": ["9q8yy"],
+        "duplicate_score": None if i % 2 else 0.5,
+    }
+
+
+ROWS = [_row(i) for i in range(10)]
+
+
+def _fake_stream(fail_after_pages: int | None = None):
+    """Stand-in for export.stream_rows over ROWS that can die mid-export."""
+
+    async def stream_rows(filters, after, page_size):
+        start = 0
+        if after:
+            start = next(i for i, r in enumerate(ROWS) if [r["created_at"], r["id"]] == list(after)) + 1
+        for n, i in enumerate(range(start, len(ROWS), page_size)):
+            if fail_after_pages is not None and n == fail_after_pages:
+                raise ConnectionError("connection dropped")
+            yield ROWS[i:i + page_size]
+
+    return stream_rows
+
+
+def _run(out: Path, fmt: str, fail_after_pages: int | None = None) -> int:
+    export.stream_rows = _fake_stream(fail_after_pages)
+    return asyncio.run(export.export(out, fmt, {}, page_size=3))
+
+
+def _interrupt(out: Path, fmt: str) -> None:
+    try:
+        _run(out, fmt, fail_after_pages=2)
+    except ConnectionError:
+        pass
+    else:
+        raise AssertionError("export should have been interrupted")
+    assert export._checkpoint_path(out).exists()
+
+
+def test_ndjson_resume():
+    original = export.stream_rows
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            out = Path(tmp) / "out.ndjson"
+            _interrupt(out, "ndjson")
+            # Simulate a page that was half-written when the process died
+            with open(out, "a") as fh:
+                fh.write('{"id": "partial')
+
+            assert _run(out, "ndjson") == len(ROWS)
+            lines = out.read_text().splitlines()
+            assert [json.loads(line)["id"] for line in lines] == [r["id"] for r in ROWS]
+            assert "phone_number" not in json.loads(lines[0])
+            assert not export._checkpoint_path(out).exists()
+    finally:
+        export.stream_rows = original
+    print("✅ NDJSON export resumes and truncates past the checkpoint")
+
+
+def test_geojson_resume():
+    original = export.stream_rows
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            out = Path(tmp) / "out.geojson"
+            _interrupt(out, "geojson")
+            with open(out, "a") as fh:
+                fh.write(',\n{"type": "Feat')
+
+            assert _run(out, "geojson") == len(ROWS)
+            collection = json.loads(out.read_text())
+            assert [f["id"] for f in collection["features"]] == [r["id"] for r in ROWS]
+            assert collection["features"][0]["geometry"]["type"] == "Polygon"
+    finally:
+        export.stream_rows = original
+    print("✅ GeoJSON export resumes into one valid FeatureCollection")
+
+
+def test_parquet_types():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("⏭️  pyarrow not installed")
+        return
+
+    original = export.stream_rows
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            out = Path(tmp) / "out.parquet"
+            assert _run(out, "parquet") == len(ROWS)
+            table = pq.read_table(str(out.with_name("out-00000.parquet")))
+            schema = table.schema
+            assert schema.field("created_at").type == pa.timestamp("us", tz="UTC")
+            assert schema.field("consent").type == pa.bool_()
+            assert schema.field("duplicate_score").type == pa.float64()
+            assert schema.field("cover_gh5").type == pa.list_(pa.string())
+            assert schema.field("community_name").type == pa.string()
+
+            rows = table.to_pylist()
+            assert len(rows) == len(ROWS)
+            assert rows[0]["duplicate_score"] == 0.5 and rows[1]["duplicate_score"] is None
+            assert json.loads(rows[0]["geojson"])["geometry"]["type"] == "Polygon"
+    finally:
+        export.stream_rows = original
+    print("✅ Parquet columns keep their types")
+
+
+if __name__ == "__main__":
+    test_ndjson_resume()
+    test_geojson_resume()
+    test_parquet_types()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Test the JSON backends: whichever of orjson, msgspec and the stdlib is forced
+with FASTJSON_BACKEND, GeoPoints and other values encode to the same bytes.
+No API key needed.
+"""
+
+import importlib
+import os
+import sys
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import fastjson
+from geocoding import GeoPoint
+
+PAYLOAD = {
+    "primary": GeoPoint(37.76, -122.42, "2401 Mission St", score=0.9),
+    "points": [GeoPoint(37.75, -122.41, "Dolores Park", score=0.8)],
+    "day": date(2026, 1, 2),
+    "text": "Café",
+    "n": 3,
+}
+
+EXPECTED = (
+    '{"primary":{"lat":37.76,"lng":-122.42,"formatted_address":"2401 Mission St"},'
+    '"points":[{"lat":37.75,"lng":-122.41,"formatted_address":"Dolores Park"}],'
+    '"day":"2026-01-02","text":"Café","n":3}'
+).encode()
+
+
+def _with_backend(name: str):
+    os.environ["FASTJSON_BACKEND"] = name
+    try:
+        return importlib.reload(fastjson)
+    finally:
+        del os.environ["FASTJSON_BACKEND"]
+
+
+def test_backends():
+    tried = []
+    try:
+        for name in ("orjson", "msgspec", "json"):
+            module = _with_backend(name)
+            if module.BACKEND != name:
+                continue  # not installed
+            tried.append(name)
+            assert module.dumps(PAYLOAD) == EXPECTED, (name, module.dumps(PAYLOAD))
+            assert module.loads(module.dumps_str({"a": [1, 2.5, None]})) == {"a": [1, 2.5, None]}
+    finally:
+        importlib.reload(fastjson)
+    assert "json" in tried
+    print(f"✅ Same bytes from every installed backend ({', '.join(tried)}); GeoPoint goes through to_dict()")
+
+
+if __name__ == "__main__":
+    test_backends()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Test geohash cells: encoding against known geohashes, cell bounds and sizes,
+and polygon/point covers at each stored precision. No API key needed.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import geocells
+
+
+def _square(x0, y0, size):
+    return {"type": "Polygon", "coordinates": [[[x0, y0], [x0 + size, y0], [x0 + size, y0 + size], [x0, y0 + size], [x0, y0]]]}
+
+
+def test_encode():
+    assert geocells.encode(37.7749, -122.4194, 7) == "9q8yyk8"
+    assert geocells.encode(37.7749, -122.4194) == "9q8yyk8yt"
+    assert geocells.encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    assert geocells.encode(-33.8688, 151.2093, 5) == "r3gx2"
+    print("✅ Points encode to their known geohashes")
+
+
+def test_bounds():
+    min_lng, min_lat, max_lng, max_lat = geocells.bounds("9q8yyk8")
+    assert min_lng <= -122.4194 <= max_lng and min_lat <= 37.7749 <= max_lat
+    width, height = geocells.cell_size(7)
+    assert abs((max_lng - min_lng) - width) < 1e-12 and abs((max_lat - min_lat) - height) < 1e-12
+    assert geocells.cell_size(5) == (360.0 / 2**13, 180.0 / 2**12)
+    assert geocells.cell_size(6) == (360.0 / 2**15, 180.0 / 2**15)
+    print("✅ Cell bounds contain the encoded point and match the cell size")
+
+
+def test_cover_neighborhood():
+    # A ~3km neighborhood in the Mission gets a cover at every stored precision
+    polygon = _square(-122.43, 37.75, 0.03)
+    sizes = {p: len(geocells.cover(polygon, p)) for p in geocells.COVER_PRECISIONS}
+    assert sizes == {5: 1, 6: 18, 7: 529}, sizes
+    cells = geocells.cover(polygon, 7)
+    assert cells == sorted(cells) and all(len(c) == 7 for c in cells)
+    assert geocells.encode(37.765, -122.415, 7) in cells  # interior
+    assert geocells.encode(37.79, -122.415, 7) not in cells  # outside
+
+    columns = geocells.cell_columns([{"lat": 37.765, "lng": -122.415}], polygon)
+    assert all(columns[f"cover_gh{p}"] for p in geocells.COVER_PRECISIONS)
+    assert columns["centroid_gh7"] == columns["centroid_geohash"][:7]
+    print("✅ Neighborhood covers: 1 gh5, 18 gh6 and 529 gh7 cells")
+
+
+def test_cover_limits():
+    # A ~10km square is too big for gh7 but still covered coarser
+    polygon = _square(-122.45, 37.70, 0.1)
+    assert geocells.cover(polygon, 7) == []
+    assert len(geocells.cover(polygon, 6)) == 190
+    assert geocells.cover(_square(-122.43, 37.75, 0.03), 7, max_cells=100) == []
+
+    # Fewer than three points: the cells containing them
+    points = [{"lat": 37.7749, "lng": -122.4194}, {"lat": 37.765, "lng": -122.415}]
+    assert geocells.cover(points, 7) == sorted({"9q8yyk8", geocells.encode(37.765, -122.415, 7)})
+    assert geocells.cell_columns([], None)["cover_gh7"] is None
+    print("✅ Oversized covers are skipped per precision; points cover their own cells")
+
+
+if __name__ == "__main__":
+    test_encode()
+    test_bounds()
+    test_cover_neighborhood()
+    test_cover_limits()
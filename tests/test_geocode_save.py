@@ -5,7 +5,6 @@ Verifies that landmarks, coordinates, GeoJSON, and polygon map all save correctl
 """
 
 import asyncio
-import json
 import os
 import sys
 
@@ -14,8 +13,7 @@ from dotenv import load_dotenv
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 load_dotenv(os.path.join(os.path.dirname(__file__), "..", ".env"))
 
-import httpx
-from geocoding import _geocode, _center_point, _bounding_box_area_sq_miles
+from geocoding import _bounding_box_area_sq_miles, get_pipeline
 from supabase_backend import save_submission
 
 
@@ -29,27 +27,14 @@ async def test_geocode_and_save():
 
     # 1. Geocode
     print("1. Geocoding landmarks...")
-    all_points = []
-    geocoded_landmarks = []
-
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        primary = await _geocode(client, f"{address}, {zip_code}")
-        if primary:
-            all_points.append(primary)
-            print(f"   Primary: {primary['formatted_address']}")
-
-        for landmark in boundary_description.split(", "):
-            geo = await _geocode(client, f"{landmark}, {zip_code}")
-            if geo:
-                all_points.append(geo)
-                geocoded_landmarks.append(f"{landmark} ({geo['formatted_address']})")
-                print(f"   Landmark: {landmark} -> {geo['formatted_address']}")
-
-        for place in key_places.split(", "):
-            geo = await _geocode(client, f"{place}, {zip_code}")
-            if geo:
-                all_points.append(geo)
-                print(f"   Place: {place} -> {geo['formatted_address']}")
+    result = await get_pipeline().geocode(address, zip_code, boundary_description, key_places)
+    all_points = result.points
+    geocoded_landmarks = result.landmarks
+    primary = result.primary
+    if primary:
+        print(f"   Primary: {primary.formatted_address}")
+    for landmark in geocoded_landmarks:
+        print(f"   Landmark: {landmark}")
 
     if not all_points:
         print("   ❌ No points geocoded!")
@@ -57,18 +42,10 @@ async def test_geocode_and_save():
 
     # 2. Build geo data
     print(f"\n2. Building geo data ({len(all_points)} points)...")
-    center = _center_point(all_points)
+    geo_data = result.geo_data()
     area = _bounding_box_area_sq_miles(all_points)
-    coords = [{"lat": p["lat"], "lng": p["lng"], "formatted_address": p["formatted_address"]} for p in all_points]
-
-    summary_parts = []
-    if primary:
-        summary_parts.append(f"Centered around {primary['formatted_address']}")
-    if area > 0:
-        summary_parts.append(f"roughly {area} square miles")
-    if geocoded_landmarks:
-        summary_parts.append(f"bounded by {', '.join(geocoded_landmarks[:4])}")
-    geographic_summary = " — ".join(summary_parts)
+    coords = geo_data["all_coordinates"]
+    geographic_summary = geo_data["geographic_summary"]
 
     print(f"   Summary: {geographic_summary}")
     print(f"   Coordinates: {len(coords)} points")
@@ -90,10 +67,7 @@ async def test_geocode_and_save():
         "other_considerations": "skipped",
         "phone_number": "555-0000",
         # Geo data (what the closure would provide)
-        "geographic_summary": geographic_summary,
-        "primary_address": primary["formatted_address"] if primary else "",
-        "geocoded_landmarks": "; ".join(geocoded_landmarks),
-        "all_coordinates": json.dumps(coords),
+        **geo_data,
     }
 
     result = await save_submission(answers)
@@ -4,7 +4,6 @@ Quick test script for geocoding functionality without the full voice agent.
 """
 
 import asyncio
-import os
 import sys
 from pathlib import Path
 from dotenv import load_dotenv
@@ -16,7 +15,7 @@ load_dotenv(project_root / ".env")
 
 from geocoding import geocode_community
 # Access the actual function from the decorated tool
-geocode_fn = geocode_community.fn
+geocode_fn = geocode_community.func
 
 async def test_geocoding():
     """Test the geocoding tool with sample data."""
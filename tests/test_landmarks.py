@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Test landmark extraction from verbal boundary descriptions and key place lists.
+No API key needed.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from landmarks import _Trie, extract, queries
+
+
+def test_filler_is_stripped():
+    result = queries("Bernal, SOMA, Hayes, Castro are neighboring. Market St is also a barrier", 6)
+    assert result == ["Market St", "Bernal", "SOMA", "Hayes", "Castro"], result
+    print("✅ filler stripped")
+
+
+def test_intersections_and_unresolvable_fragments():
+    result = queries("Mission Dolores Park, the school next to it, Mission St, 24th and Mission", 4)
+    assert result[0] == "24th and Mission", result
+    assert "Mission Dolores Park" in result and "Mission St" in result
+    assert not any("school" in q for q in result), result
+    print("✅ intersections ranked first, 'next to it' dropped")
+
+
+def test_between_and_directions():
+    result = queries("between Cesar Chavez and 16th St, from Valencia St. to Potrero Ave; also the Embarcadero", 6)
+    assert set(result) == {"Cesar Chavez", "16th St", "Valencia St", "Potrero Ave", "the Embarcadero"}, result
+    assert queries("the bay to the east, Golden Gate Park to the north", 6) == ["Golden Gate Park"]
+    print("✅ between spans and directions")
+
+
+def test_gazetteer():
+    gazetteer = _Trie(["Bernal Heights", "Excelsior"])
+    found = extract("out past bernal heights and the excelsior", gazetteer)
+    assert [lm.text for lm in found if lm.kind == "gazetteer"] == ["Bernal Heights", "Excelsior"], found
+    print("✅ gazetteer matches")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing landmark extraction\n")
+    test_filler_is_stripped()
+    test_intersections_and_unresolvable_fragments()
+    test_between_and_directions()
+    test_gazetteer()
+    print("\n🎉 All landmark tests passed")
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Test the local analytics mirror: incremental pages, derived columns, the
+prebuilt reports and full resyncs, against a temporary SQLite file. No API keys needed.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import local_mirror
+from local_mirror import QUERIES, Mirror, keyword_frequencies
+
+
+def _row(i: int, zipcode: str, description: str, size: float = 0.01, duplicate_of: str | None = None) -> dict:
+    lat, lng = 37.75, -122.42
+    ring = [[lng, lat], [lng + size, lat], [lng + size, lat + size], [lng, lat + size], [lng, lat]]
+    return {
+        "id": f"00000000-0000-0000-0000-{i:012d}",
+        "created_at": f"2026-0{1 + i % 3}-1{i % 10}T12:00:00+00:00",
+        "zipcode": zipcode,
+        "community_name": f"Community {i}",
+        "community_description": description,
+        "all_coordinates": [{"lat": lat, "lng": lng}, {"lat": lat + size, "lng": lng + size}],
+        "geojson": {"type": "Feature", "geometry": {"type": "Polygon", "coordinates": [ring]}},
+        "duplicate_of": duplicate_of,
+    }
+
+
+def test_mirror_reports():
+    with tempfile.TemporaryDirectory() as tmp:
+        mirror = Mirror(Path(tmp) / "mirror.sqlite")
+        assert mirror.watermark is None
+
+        mirror.add_page([
+            _row(1, "94110", "Latino families, churches and taquerias"),
+            _row(2, "94110", "Churches, murals and small businesses"),
+        ])
+        mirror.add_page([
+            _row(3, "10001", "Garment district workers", size=0.05),
+            _row(4, "94110", "Churches again", duplicate_of="00000000-0000-0000-0000-000000000001"),
+        ])
+        assert mirror.watermark == ("2026-02-14T12:00:00+00:00", "00000000-0000-0000-0000-000000000004")
+
+        # Re-mirroring a row replaces it instead of duplicating it
+        mirror.add_page([_row(2, "94110", "Churches, murals and small businesses")])
+        mirror.replace_criteria([{"state": "California", "coi_required": True, "notes": ""}])
+
+        by_state = {r["state"]: r for r in mirror.query(QUERIES["counts_by_state"])}
+        assert by_state["California"]["submissions"] == 2
+        assert by_state["California"]["coi_required"] == 1
+        assert by_state["New York"]["submissions"] == 1
+
+        by_zip = mirror.query(QUERIES["counts_by_zipcode"])
+        assert by_zip[0] == {"zipcode": "94110", "state": "California", "submissions": 2}
+
+        area = {r["state"]: r for r in mirror.query(QUERIES["area_by_state"])}
+        # 0.01° square at 37.75°N is about 0.69 x 0.55 miles
+        assert 0.35 < area["California"]["avg_sq_miles"] < 0.4, area
+
+        buckets = [r["bucket"] for r in mirror.query(QUERIES["area_distribution"])]
+        assert buckets == ["0.25-1 sq mi", "4-16 sq mi"], buckets
+
+        for name, sql in QUERIES.items():
+            mirror.query(sql)
+
+        words = {r["word"]: r for r in keyword_frequencies(mirror, "community_description")}
+        assert words["churches"]["count"] == 2  # the duplicate's "Churches again" is excluded
+        assert "and" not in words
+        mirror.close()
+    print("✅ mirror pages, watermark, derived columns and reports")
+
+
+def _source(pages: list[list[dict]], fail_after: int | None = None):
+    async def iter_submissions(select, page_size, after=None):
+        for i, page in enumerate(pages):
+            if i == fail_after:
+                raise ConnectionError("PostgREST went away")
+            yield page
+
+    async def list_redistricting_criteria():
+        return []
+
+    local_mirror.iter_submissions = iter_submissions
+    local_mirror.list_redistricting_criteria = list_redistricting_criteria
+
+
+def test_full_resync():
+    original = local_mirror.iter_submissions, local_mirror.list_redistricting_criteria
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            mirror = Mirror(Path(tmp) / "mirror.sqlite")
+            mirror.add_page([_row(1, "94110", "Murals"), _row(2, "94110", "Churches")])
+
+            def ids():
+                return [r["id"][-1] for r in mirror.query("select id from submissions order by id")]
+
+            # A resync that fails partway leaves the old rows and watermark in place
+            _source([[_row(3, "10001", "Garment district")], [_row(4, "10001", "Chelsea")]], fail_after=1)
+            try:
+                asyncio.run(local_mirror.sync(mirror, full=True))
+                raise AssertionError("sync should have failed")
+            except ConnectionError:
+                pass
+            assert ids() == ["1", "2"]
+            assert mirror.watermark[1].endswith("2")
+
+            # A finished one replaces them, dropping rows gone from the source
+            _source([[_row(2, "94110", "Churches, updated")], [_row(3, "10001", "Garment district")]])
+            assert asyncio.run(local_mirror.sync(mirror, full=True)) == 2
+            assert ids() == ["2", "3"]
+            assert mirror.query("select community_description from submissions where id like '%2'") == [
+                {"community_description": "Churches, updated"}
+            ]
+            assert mirror.watermark[1].endswith("3")
+            assert not mirror.query("select name from sqlite_master where name = 'submissions_staging'")
+            mirror.close()
+    finally:
+        local_mirror.iter_submissions, local_mirror.list_redistricting_criteria = original
+    print("✅ full resync swaps in staged rows, and a failed one keeps the old mirror")
+
+
+if __name__ == "__main__":
+    test_mirror_reports()
+    test_full_resync()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Test write-behind map renders: failed renders are retried, the failure hook
+runs once every attempt has failed, and renders work across event loops.
+No API keys or storage bucket needed.
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import map_render
+
+SQUARE = [{"lat": 37.75, "lng": -122.42}, {"lat": 37.75, "lng": -122.41}, {"lat": 37.76, "lng": -122.41}]
+
+
+async def _scheduled(fail_times: int) -> tuple[int, list[str]]:
+    attempts = 0
+    cleared = []
+
+    async def flaky_render(coordinates):
+        nonlocal attempts
+        attempts += 1
+        if attempts <= fail_times:
+            raise RuntimeError("storage unavailable")
+
+    async def on_failure():
+        cleared.append("sub-1")
+
+    real, map_render.ensure_rendered = map_render.ensure_rendered, flaky_render
+    delay, map_render.RENDER_RETRY_SECONDS = map_render.RENDER_RETRY_SECONDS, 0.001
+    try:
+        map_render.schedule_render(SQUARE, on_failure)
+        await map_render.drain()
+    finally:
+        map_render.ensure_rendered = real
+        map_render.RENDER_RETRY_SECONDS = delay
+    return attempts, cleared
+
+
+def test_retry_then_clear():
+    attempts, cleared = asyncio.run(_scheduled(fail_times=1))
+    assert attempts == 2 and cleared == []
+
+    attempts, cleared = asyncio.run(_scheduled(fail_times=map_render.RENDER_ATTEMPTS))
+    assert attempts == map_render.RENDER_ATTEMPTS and cleared == ["sub-1"]
+    print("✅ failed renders retried; URL cleared after the last attempt")
+
+
+def test_slots_per_loop():
+    async def slots():
+        async with map_render._slots():
+            return map_render._slots()
+
+    first = asyncio.run(slots())
+    second = asyncio.run(slots())
+    assert first is not second
+    print("✅ render semaphore recreated for each event loop")
+
+
+if __name__ == "__main__":
+    test_retry_then_clear()
+    test_slots_per_loop()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test overload control: degradation steps up with pressure, recovers one level
+at a time after a calm period, and defers map renders meanwhile. No API key needed.
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import map_render
+import metrics
+import overload
+from geocoding import RateLimiter
+from overload import BRIEF_REPLIES, DEFER_MAPS, NORMAL, ZIP_ONLY, OverloadController
+
+SQUARE = [{"lat": 0, "lng": 0}, {"lat": 0, "lng": 1}, {"lat": 1, "lng": 1}]
+
+
+def test_levels():
+    metrics.reset()
+    controller = OverloadController()
+    calls = overload.MAX_CALLS
+
+    assert controller.update(calls // 2, 0, 0, now=0) == NORMAL
+    assert controller.update(calls, 0, 0, now=1) == DEFER_MAPS
+    assert controller.update(0, overload.MAX_GEOCODE_QUEUE * 2, 0, now=2) == ZIP_ONLY
+    assert metrics.get("overload_entered_zip_only") == 1
+
+    # Still above the recovery margin: no step down however long it lasts
+    assert controller.update(0, 0, overload.MAX_LOOP_LAG_MS * 1.9, now=100) == ZIP_ONLY
+
+    # Calm: one level per RECOVERY_SECONDS
+    assert controller.update(0, 0, 0, now=200) == ZIP_ONLY
+    assert controller.update(0, 0, 0, now=200 + overload.RECOVERY_SECONDS) == BRIEF_REPLIES
+    assert controller.update(0, 0, 0, now=200 + 2 * overload.RECOVERY_SECONDS) == DEFER_MAPS
+    assert controller.update(0, 0, 0, now=200 + 3 * overload.RECOVERY_SECONDS) == NORMAL
+    assert metrics.get("overload_transitions") == 5
+    assert metrics.snapshot()["overload_level"] == NORMAL
+    print("✅ steps up with pressure, recovers one level at a time")
+
+
+async def _deferred_renders():
+    rendered = []
+
+    async def fake_render(coordinates):
+        rendered.append(coordinates)
+
+    real, map_render.ensure_rendered = map_render.ensure_rendered, fake_render
+    try:
+        controller = OverloadController()
+        controller.update(overload.MAX_CALLS, 0, 0, now=0)
+        map_render.schedule_render(SQUARE)
+        await map_render.drain()
+        assert rendered == [] and len(map_render._deferred) == 1
+
+        controller.update(0, 0, 0, now=1)
+        controller.update(0, 0, 0, now=1 + overload.RECOVERY_SECONDS)
+        await map_render.drain()
+        assert rendered == [SQUARE] and not map_render._deferred
+    finally:
+        map_render.ensure_rendered = real
+
+
+def test_deferred_renders():
+    asyncio.run(_deferred_renders())
+    print("✅ map renders held under overload and released on recovery")
+
+
+async def _queue_depth():
+    limiter = RateLimiter(rate=1000, concurrency=1)
+    assert await limiter.acquire()
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0.01)
+    assert limiter.waiting == 1
+    limiter.release()
+    assert await waiter
+    assert limiter.waiting == 0
+
+
+def test_queue_depth():
+    asyncio.run(_queue_depth())
+    print("✅ rate limiter reports its queue depth")
+
+
+if __name__ == "__main__":
+    test_levels()
+    test_deferred_renders()
+    test_queue_depth()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Test the direct Postgres backend. The EWKB encoding runs anywhere; the write
+tests need TEST_DATABASE_URL pointing at a scratch database (they drop and
+recreate the submissions table there from supabase_schema.sql), e.g.
+
+    docker run -d -p 5432:5432 -e POSTGRES_PASSWORD=pg postgres:16
+    TEST_DATABASE_URL=postgresql://postgres:pg@localhost:5432/postgres uv run python tests/test_pg_backend.py
+"""
+
+import asyncio
+import os
+import re
+import struct
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import pg_backend
+import supabase_backend
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL", "")
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), "..", "supabase_schema.sql")
+
+
+def test_ewkb():
+    point = pg_backend.ewkb("SRID=4326;POINT(-122.42 37.75)")
+    assert struct.unpack("<BIIdd", point) == (1, 0x20000001, 4326, -122.42, 37.75)
+
+    polygon = pg_backend.ewkb("SRID=4326;POLYGON((0 0,1 0,1 1,0 0))")
+    assert struct.unpack("<BIIII", polygon[:17]) == (1, 0x20000003, 4326, 1, 4)
+    assert struct.unpack("<8d", polygon[17:]) == (0, 0, 1, 0, 1, 1, 0, 0)
+    print("✅ EWKT -> EWKB")
+
+
+def _submissions_ddl() -> str:
+    sql = open(SCHEMA_PATH, encoding="utf-8").read()
+    table = re.search(r"create table if not exists submissions \(.*?\n\);", sql, re.S).group(0)
+    return "drop table if exists submissions cascade;\n" + table
+
+
+def _row(name: str, **extra) -> dict:
+    points = [{"lat": 37.75, "lng": -122.42}, {"lat": 37.76, "lng": -122.41}, {"lat": 37.74, "lng": -122.40}]
+    return {
+        "caller_name": name,
+        "consent": True,
+        "zipcode": "94110",
+        "community_name": "Mission District",
+        "all_coordinates": points,
+        "geojson": None,
+        "cover_gh5": ["9q8yy"],
+        **extra,
+    }
+
+
+async def _roundtrip():
+    supabase_backend.SUBMISSIONS_LAYOUT = "single"
+    pg_backend.DATABASE_URL = TEST_DATABASE_URL
+    pool = await pg_backend.get_pool()
+    await pool.execute(_submissions_ddl())
+
+    row_id = await pg_backend.insert_submission(_row("single"))
+    stored = await pool.fetchrow("select caller_name, all_coordinates, cover_gh5 from submissions where id = $1", row_id)
+    assert stored["caller_name"] == "single"
+    assert stored["all_coordinates"][1]["lng"] == -122.41
+    assert stored["cover_gh5"] == ["9q8yy"]
+
+    await pg_backend.update_submission(row_id, {"community_name": "The Mission"})
+    assert await pool.fetchval("select community_name from submissions where id = $1", row_id) == "The Mission"
+
+    loaded = await pg_backend.copy_submissions([_row(f"copy-{i}") for i in range(1000)])
+    assert loaded == 1000
+    assert await pool.fetchval("select count(*) from submissions where caller_name like 'copy-%'") == 1000
+
+    ids = [str(r["id"]) for r in await pool.fetch("select id from submissions where caller_name like 'copy-%' limit 10")]
+    updated = await pg_backend.bulk_update_submissions([{"id": i, "zipcode": "94103", "geojson": {"n": 1}} for i in ids])
+    assert updated == 10
+    assert await pool.fetchval("select count(*) from submissions where zipcode = '94103' and geojson->>'n' = '1'") == 10
+
+    await pool.execute("drop table submissions cascade")
+    await pg_backend.close_pool()
+
+
+def test_roundtrip():
+    if not TEST_DATABASE_URL or pg_backend.asyncpg is None:
+        print("⏭️  skipped write tests (set TEST_DATABASE_URL and install asyncpg)")
+        return
+    asyncio.run(_roundtrip())
+    print("✅ prepared insert, update, COPY load and COPY-staged bulk update")
+
+
+if __name__ == "__main__":
+    test_ewkb()
+    test_roundtrip()
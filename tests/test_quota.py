@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Test the shared quota scheduler: live lookups jump queued batch work, and the
+batch rate follows time of day and calls in progress. No API key needed.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import quota
+from quota import BATCH, LIVE, PREFETCH, QuotaScheduler
+
+
+async def _preemption():
+    scheduler = QuotaScheduler(rate=1000, concurrency=1, calls=lambda: 0)
+    order = []
+
+    async def request(priority, name):
+        await scheduler.acquire(priority)
+        order.append(name)
+        await asyncio.sleep(0.001)
+        scheduler.release()
+
+    await scheduler.acquire(LIVE)  # hold the only slot while the queue builds up
+    batch = [asyncio.create_task(request(BATCH, f"batch-{i}")) for i in range(3)]
+    await asyncio.sleep(0.01)
+    live = [asyncio.create_task(request(PREFETCH, "prefetch")), asyncio.create_task(request(LIVE, "live"))]
+    await asyncio.sleep(0.01)
+    assert scheduler.waiting == 5
+    scheduler.release()
+    await asyncio.gather(*batch, *live)
+    assert order[:2] == ["live", "prefetch"], order
+    assert order[2:] == ["batch-0", "batch-1", "batch-2"]
+
+
+def test_preemption():
+    asyncio.run(_preemption())
+    print("✅ live and prefetch requests jump queued batch work")
+
+
+def test_batch_rate():
+    calls = 0
+    scheduler = QuotaScheduler(rate=50, concurrency=10, calls=lambda: calls)
+    quota.QUOTA_NIGHT_HOURS = "22-6"
+    assert quota.is_night(datetime(2026, 1, 1, 23)) and quota.is_night(datetime(2026, 1, 1, 5))
+    assert not quota.is_night(datetime(2026, 1, 1, 12))
+
+    quota.QUOTA_NIGHT_HOURS = "0-24"
+    assert scheduler.batch_rate() == 50
+    quota.QUOTA_NIGHT_HOURS = "0-0"
+    assert scheduler.batch_rate() == 50 * quota.BATCH_DAY_SHARE
+    calls = 4
+    assert scheduler.batch_rate() == 50 - 4 * quota.LIVE_QPS_PER_CALL
+    calls = 100
+    assert scheduler.batch_rate() == 50 * quota.BATCH_MIN_SHARE
+    print("✅ batch rate: full at night, shared by day, backs off during calls")
+
+
+async def _budget():
+    lane = QuotaScheduler(rate=1000, concurrency=5, calls=lambda: 0).lane(BATCH, budget=2)
+    assert await lane.acquire() and await lane.acquire()
+    assert not await lane.acquire()
+    lane.release()
+    lane.release()
+
+
+def test_budget():
+    asyncio.run(_budget())
+    print("✅ lane budget")
+
+
+async def _shared_bucket():
+    # Two schedulers stand in for an agent and a batch process on one state file;
+    # the batch job's own --qps is far above QUOTA_QPS but the shared bucket isn't.
+    agent = QuotaScheduler(rate=20, concurrency=100, calls=lambda: 0, shared=True)
+    batch = QuotaScheduler(rate=1000, concurrency=100, calls=lambda: 0, shared=True)
+    granted = 0
+
+    async def drain(scheduler, priority, until):
+        nonlocal granted
+        while time.monotonic() < until:
+            await scheduler.acquire(priority)
+            scheduler.release()
+            granted += 1
+
+    quota.QUOTA_NIGHT_HOURS = "0-24"
+    until = time.monotonic() + 1.0
+    await asyncio.gather(drain(agent, LIVE, until), drain(batch, BATCH, until))
+    return granted
+
+
+def test_shared_bucket():
+    saved = quota.QUOTA_STATE_PATH, quota._HEARTBEAT_DB, quota.QUOTA_QPS
+    with tempfile.TemporaryDirectory() as tmp:
+        quota.QUOTA_STATE_PATH, quota._HEARTBEAT_DB = os.path.join(tmp, "quota.db"), None
+        quota.QUOTA_QPS = 20
+        try:
+            granted = asyncio.run(_shared_bucket())
+            # One second of QUOTA_QPS refill plus the initial burst, not one budget per process.
+            assert granted <= 20 * 2 + 2, granted
+
+            with quota._heartbeat_db() as db:
+                db.execute("delete from quota_bucket")
+            assert quota.take_shared_token(10) == 0
+            assert quota.take_shared_token(10, reserve=9) > 0  # 9 left, all held for live calls
+            assert quota.take_shared_token(10) == 0
+        finally:
+            quota._HEARTBEAT_DB.close()
+            quota.QUOTA_STATE_PATH, quota._HEARTBEAT_DB, quota.QUOTA_QPS = saved
+    print("✅ processes sharing QUOTA_STATE_PATH share one token bucket")
+
+
+if __name__ == "__main__":
+    test_preemption()
+    test_batch_rate()
+    test_budget()
+    test_shared_bucket()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Test the batch re-geocode job against a simulated API: failed lookups are not
+cached and never overwrite stored geometry, and a run whose request budget is
+smaller than a page still writes the rows it can afford and moves its checkpoint.
+No API key needed.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import httpx
+
+import geocoding
+import quota
+import regeocode
+from geocoding import GeocodeCache, GeocodePipeline
+
+
+def fake_api() -> httpx.MockTransport:
+    """Everything resolves near the Mission, except addresses mentioning FAIL."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        address = request.url.params["address"]
+        if "FAIL" in address:
+            return httpx.Response(200, json={"status": "OVER_QUERY_LIMIT", "results": []})
+        if "Nowhere" in address:
+            return httpx.Response(200, json={"status": "ZERO_RESULTS", "results": []})
+        offset = (sum(map(ord, address)) % 100) / 10000
+        geometry = {
+            "location": {"lat": 37.76 + offset, "lng": -122.42 + offset},
+            "location_type": "ROOFTOP",
+            "viewport": {"northeast": {"lat": 37.77, "lng": -122.40}, "southwest": {"lat": 37.74, "lng": -122.43}},
+        }
+        return httpx.Response(200, json={"status": "OK", "results": [{"geometry": geometry, "formatted_address": address}]})
+
+    return httpx.MockTransport(handler)
+
+
+def _row(i: int, boundaries: str, stored_points: int = 0) -> dict:
+    return {
+        "id": f"00000000-0000-0000-0000-{i:012d}",
+        "created_at": f"2026-01-01T12:00:{i:02d}+00:00",
+        "zipcode": "94110",
+        "address": f"{i} Mission St",
+        "community_boundaries": boundaries,
+        "key_places": "",
+        "all_coordinates": [{"lat": 37.76, "lng": -122.42, "formatted_address": ""}] * stored_points or None,
+    }
+
+
+def test_failed_lookups_not_cached():
+    geocoding.GOOGLE_MAPS_API_KEY = geocoding.GOOGLE_MAPS_API_KEY or "test-key"
+
+    async def go():
+        cache = GeocodeCache()
+        lane = quota.QuotaScheduler(rate=1000, concurrency=10, calls=lambda: 0).lane(quota.BATCH)
+        pipeline = GeocodePipeline(cache=cache, limiter=lane, transport=fake_api())
+        result = await pipeline.geocode("24th and Mission", "94110", "Valencia St to FAIL Park to Nowhere Park", "")
+        await pipeline.aclose()
+        return cache, result
+
+    cache, result = asyncio.run(go())
+    assert result.failed_lookups == 1
+    assert cache.get("FAIL Park, 94110") == (False, None)
+    assert cache.get("Nowhere Park, 94110") == (True, None)
+    assert cache.get("Valencia St, 94110")[0]
+    print("✅ only OK and ZERO_RESULTS responses are cached")
+
+
+def _run_job(rows: list[dict], checkpoint: Path, budget: int | None) -> tuple[dict, list[dict]]:
+    written = []
+
+    async def pages(select, page_size, after, filters):
+        start = 0
+        if after:
+            start = next(i for i, r in enumerate(rows) if [r["created_at"], r["id"]] == list(after)) + 1
+        if rows[start:]:
+            yield rows[start:]
+
+    async def upsert(updates):
+        written.extend(updates)
+        return len(updates)
+
+    saved = regeocode.iter_submissions, regeocode.bulk_upsert_submissions, regeocode.GeocodePipeline, regeocode.MAP_RENDERER
+    cache = GeocodeCache()
+    regeocode.iter_submissions = pages
+    regeocode.bulk_upsert_submissions = upsert
+    regeocode.GeocodePipeline = lambda **kw: GeocodePipeline(cache=cache, transport=fake_api(), **kw)
+    regeocode.MAP_RENDERER = "google"
+    try:
+        stats = asyncio.run(regeocode.run({}, checkpoint, None, False, 1000, 1, budget, 100))
+    finally:
+        regeocode.iter_submissions, regeocode.bulk_upsert_submissions, regeocode.GeocodePipeline, regeocode.MAP_RENDERER = saved
+    return stats, written
+
+
+def test_failed_lookups_keep_stored_geometry():
+    geocoding.GOOGLE_MAPS_API_KEY = geocoding.GOOGLE_MAPS_API_KEY or "test-key"
+    with tempfile.TemporaryDirectory() as tmp:
+        rows = [_row(1, "FAIL Ave and FAIL Blvd", stored_points=3), _row(2, "Valencia St")]
+        stats, written = _run_job(rows, Path(tmp) / "checkpoint.json", budget=None)
+        assert stats["finished"] and stats["kept"] == 1
+        assert [w["id"] for w in written] == [rows[1]["id"]]
+    print("✅ failed lookups never overwrite stored geometry")
+
+
+def test_budget_progress():
+    geocoding.GOOGLE_MAPS_API_KEY = geocoding.GOOGLE_MAPS_API_KEY or "test-key"
+    with tempfile.TemporaryDirectory() as tmp:
+        checkpoint = Path(tmp) / "checkpoint.json"
+        rows = [_row(i, "Valencia St to Dolores Park to Mission Playground") for i in range(1, 4)]
+
+        # Every row can need 5 requests, so the page needs more than the budget
+        assert regeocode.lookups_needed(rows[0]) == 5
+        stats, written = _run_job(rows, checkpoint, budget=12)
+        assert not stats["finished"]
+        assert stats["processed"] == 2 and stats["api_requests"] <= 12
+        assert [w["id"] for w in written] == [r["id"] for r in rows[:2]]
+        assert json.loads(checkpoint.read_text())["after"][1] == rows[1]["id"]
+
+        stats, written = _run_job(rows, checkpoint, budget=None)
+        assert stats["finished"] and stats["processed"] == len(rows)
+        assert not checkpoint.exists()
+    print("✅ a budget smaller than a page still makes progress")
+
+
+if __name__ == "__main__":
+    test_failed_lookups_not_cached()
+    test_failed_lookups_keep_stored_geometry()
+    test_budget_progress()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Test the in-process spatial index: bbox, radius and overlap queries, incremental
+updates, saves during the background load, and query latency at 100k submissions.
+"""
+
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import spatial_index
+from spatial_index import SubmissionIndex
+
+# Generous bound for a 2-mile radius query at 100k submissions (about 0.2 ms on a laptop)
+MAX_QUERY_MS = 10.0
+
+
+def _square(lng: float, lat: float, half: float) -> dict:
+    ring = [
+        [lng - half, lat - half],
+        [lng + half, lat - half],
+        [lng + half, lat + half],
+        [lng - half, lat + half],
+        [lng - half, lat - half],
+    ]
+    return {"type": "Feature", "geometry": {"type": "Polygon", "coordinates": [ring]}}
+
+
+def test_queries():
+    index = SubmissionIndex()
+    index.add("mission", _square(-122.415, 37.76, 0.01))
+    index.add("bernal", _square(-122.41, 37.745, 0.008))
+    index.add("sunset", _square(-122.49, 37.75, 0.01))
+    index.add("points", [{"lat": 37.7599, "lng": -122.4148}, {"lat": 37.761, "lng": -122.416}])
+
+    assert index.overlapping("mission") == ["bernal", "points"]
+    assert index.query_bbox(-122.5, 37.74, -122.48, 37.76) == ["sunset"]
+
+    near = index.query_radius(37.76, -122.415, 2.0)
+    assert near[0] in ("mission", "points")
+    assert "sunset" not in near
+    assert "sunset" in index.query_radius(37.76, -122.415, 5.0)
+
+    # Incremental update: moving a submission re-indexes it
+    index.add("sunset", _square(-122.415, 37.76, 0.002))
+    assert "sunset" in index.overlapping("mission")
+    index.remove("sunset")
+    assert "sunset" not in index.overlapping("mission")
+    print("✅ bbox / radius / overlap queries")
+
+
+def test_large_bbox():
+    # A statewide box has far more cells than the index has occupied cells,
+    # so the query walks the occupied cells instead
+    index = SubmissionIndex()
+    index.add("mission", _square(-122.415, 37.76, 0.01))
+    index.add("la", _square(-118.25, 34.05, 0.01))
+    assert index.query_bbox(-125.0, 32.0, -114.0, 42.0) == ["la", "mission"]
+    assert index.query_bbox(-125.0, 36.0, -114.0, 42.0) == ["mission"]
+    assert index.query_bbox(-100.0, 36.0, -90.0, 42.0) == []
+    print("✅ large bbox queries")
+
+
+async def _load_with_saves():
+    import supabase_backend
+
+    async def pages(select, **kwargs):
+        yield [{"id": "mission", "geojson": _square(-122.415, 37.76, 0.01)}]
+        # Saved while the load is still paging: one new row, one re-saved row
+        spatial_index.add_submission("bernal", _square(-122.41, 37.745, 0.008))
+        spatial_index.add_submission("mission", _square(-122.49, 37.75, 0.01))
+        yield [{"id": "sunset", "geojson": _square(-122.49, 37.75, 0.01)}]
+
+    original = supabase_backend.iter_submissions
+    supabase_backend.iter_submissions = pages
+    spatial_index._INDEX = None
+    try:
+        index = await spatial_index.load_index()
+        spatial_index.add_submission("castro", _square(-122.435, 37.76, 0.005))
+    finally:
+        supabase_backend.iter_submissions = original
+        spatial_index._INDEX = None
+    return index
+
+
+def test_saves_during_load():
+    index = asyncio.run(_load_with_saves())
+    assert sorted(index._entries) == ["bernal", "castro", "mission", "sunset"]
+    assert index.query_bbox(-122.5, 37.74, -122.48, 37.76) == ["mission", "sunset"]
+    assert spatial_index._PENDING is None
+    print("✅ submissions saved during the background load are indexed")
+
+
+def test_latency_100k():
+    rng = random.Random(7)
+    index = SubmissionIndex()
+    for i in range(100_000):
+        lng = rng.uniform(-124.0, -114.0)
+        lat = rng.uniform(32.5, 42.0)
+        index.add(str(i), _square(lng, lat, rng.uniform(0.002, 0.02)))
+
+    n = 1000
+    start = time.perf_counter()
+    for _ in range(n):
+        index.query_radius(rng.uniform(33, 41), rng.uniform(-123, -115), 2.0)
+    per_query_ms = (time.perf_counter() - start) / n * 1000
+    assert per_query_ms < MAX_QUERY_MS, f"{per_query_ms:.3f} ms per query"
+    print(f"✅ radius query over {len(index)} submissions: {per_query_ms:.3f} ms")
+
+
+if __name__ == "__main__":
+    test_queries()
+    test_large_bbox()
+    test_saves_during_load()
+    test_latency_100k()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Test the Supabase backend against a stubbed PostgREST: PostGIS EWKT columns,
+the counts_* readers and the debounced stats refresh. No database needed.
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import httpx
+
+import supabase_backend
+from geocoding import GeoPoint
+
+POINTS = [GeoPoint(37.75, -122.42), GeoPoint(37.75, -122.41), GeoPoint(37.76, -122.41)]
+GEOJSON = {
+    "type": "Feature",
+    "geometry": {"type": "Polygon", "coordinates": [[[-122.42, 37.75], [-122.41, 37.75], [-122.41, 37.76], [-122.42, 37.75]]]},
+}
+
+
+def test_postgis_columns():
+    mode = supabase_backend.POSTGIS_MODE
+    try:
+        supabase_backend.POSTGIS_MODE = "off"
+        assert supabase_backend._postgis_columns(POINTS, GEOJSON) == {}
+
+        supabase_backend.POSTGIS_MODE = "on"
+        columns = supabase_backend._postgis_columns(POINTS, GEOJSON)
+        lng, lat = columns["centroid"].removeprefix("SRID=4326;POINT(").removesuffix(")").split()
+        assert abs(float(lng) + 122.413333) < 1e-5 and abs(float(lat) - 37.753333) < 1e-5
+        assert columns["geom"] == "SRID=4326;POLYGON((-122.42 37.75,-122.41 37.75,-122.41 37.76,-122.42 37.75))"
+        # Points but no polygon: a centroid only, with geom cleared
+        assert supabase_backend._postgis_columns(POINTS[:1], None) == {
+            "geom": None, "centroid": "SRID=4326;POINT(-122.42 37.75)"
+        }
+        assert supabase_backend._postgis_columns([], None) == {"geom": None, "centroid": None}
+    finally:
+        supabase_backend.POSTGIS_MODE = mode
+    print("✅ PostGIS geom/centroid written as EWKT (lng lat order, closed ring)")
+
+
+class PostgREST:
+    """Records RPC calls and answers them with canned rows, in place of Supabase."""
+
+    def __init__(self, rows=None, status: int = 200):
+        self.calls: list[tuple[str, dict]] = []
+        self.rows = rows
+        self.status = status
+
+    def __enter__(self):
+        def client(**kwargs):
+            return httpx.AsyncClient(transport=httpx.MockTransport(self._handle), **kwargs)
+
+        self._saved = supabase_backend.SUPABASE_URL, supabase_backend.SUPABASE_SERVICE_KEY
+        supabase_backend.httpx = _HttpxWith(client)
+        supabase_backend.SUPABASE_URL, supabase_backend.SUPABASE_SERVICE_KEY = "http://supabase.test", "test-key"
+        return self
+
+    def __exit__(self, *exc):
+        supabase_backend.httpx = httpx
+        supabase_backend.SUPABASE_URL, supabase_backend.SUPABASE_SERVICE_KEY = self._saved
+
+    def _handle(self, request: httpx.Request) -> httpx.Response:
+        assert request.headers["apikey"] == "test-key"
+        self.calls.append((request.url.path.removeprefix("/rest/v1/rpc/"), json.loads(request.content)))
+        return httpx.Response(self.status, json=self.rows)
+
+
+class _HttpxWith:
+    """The httpx module with AsyncClient swapped for a stub factory."""
+
+    def __init__(self, client):
+        self.AsyncClient = client
+
+    def __getattr__(self, name):
+        return getattr(httpx, name)
+
+
+def test_counts():
+    rows = [{"zipcode": "94110", "state": "California", "submissions": 3}]
+    with PostgREST(rows) as api:
+        assert asyncio.run(supabase_backend.counts_by_zipcode(since="2026-01-01")) == rows
+        asyncio.run(supabase_backend.counts_by_state(until="2026-02-01", include_duplicates=True))
+        asyncio.run(supabase_backend.counts_by_day(zipcode="94110", state="California"))
+    assert api.calls == [
+        ("submission_counts_by_zipcode", {"since": "2026-01-01", "include_duplicates": False}),
+        ("submission_counts_by_state", {"until": "2026-02-01", "include_duplicates": True}),
+        ("submission_counts_by_day", {"zip": "94110", "state_name": "California", "include_duplicates": False}),
+    ]
+
+    with PostgREST({"message": "boom"}, status=500):
+        try:
+            asyncio.run(supabase_backend.counts_by_day())
+        except RuntimeError as e:
+            assert "submission_counts_by_day" in str(e) and "500" in str(e)
+        else:
+            raise AssertionError("RPC errors must raise")
+    print("✅ counts_* call their SQL functions with only the given filters")
+
+
+async def _saves(n: int):
+    for _ in range(n):
+        supabase_backend.schedule_stats_refresh()
+        await asyncio.sleep(0.001)
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*(t for t in supabase_backend._STATS_REFRESH.values() if t.get_loop() is loop))
+
+
+def test_stats_refresh():
+    delay = supabase_backend.STATS_REFRESH_SECONDS
+    supabase_backend.STATS_REFRESH_SECONDS = 0.05
+    try:
+        with PostgREST(True) as api:
+            asyncio.run(_saves(5))  # one refresh for the whole window
+            asyncio.run(_saves(2))  # and one for the next
+            assert asyncio.run(supabase_backend.refresh_stats()) is True  # report.py --refresh
+        refresh = ("refresh_submission_stats", {"view_name": "submission_daily_counts", "min_age_seconds": 0.05})
+        forced = ("refresh_submission_stats", {"view_name": "submission_daily_counts", "min_age_seconds": 0.0})
+        assert api.calls == [refresh, refresh, forced], api.calls
+
+        supabase_backend.STATS_REFRESH_SECONDS = 0
+        with PostgREST(True) as api:
+            asyncio.run(_saves(1))
+        assert api.calls == []
+    finally:
+        supabase_backend.STATS_REFRESH_SECONDS = delay
+    print("✅ Stats refresh debounced per view, skipped when refreshed since")
+
+
+if __name__ == "__main__":
+    test_postgis_columns()
+    test_counts()
+    test_stats_refresh()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Test the tile server's store: clustered and simplified tiles, cache
+invalidation, not caching tiles rendered across a change, and resyncing rows
+changed or deleted upstream. No API keys needed.
+"""
+
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import tile_server
+from tile_server import TileStore, lnglat_to_tile_px, simplify
+
+
+def _row(i: int, lng: float, lat: float, half: float = 0.005, name: str = "") -> dict:
+    ring = [[lng - half, lat - half], [lng + half, lat - half], [lng + half, lat + half], [lng - half, lat + half], [lng - half, lat - half]]
+    return {
+        "id": f"sub-{i}",
+        "created_at": f"2026-01-01T12:00:{i:02d}+00:00",
+        "community_name": name or f"Community {i}",
+        "zipcode": "94110",
+        "geojson": {"type": "Feature", "geometry": {"type": "Polygon", "coordinates": [ring]}},
+    }
+
+
+def _tile(lng: float, lat: float, z: int) -> tuple[int, int, int]:
+    px, py = lnglat_to_tile_px(lng, lat, z)
+    return z, int(px // tile_server.TILE_SIZE_PX), int(py // tile_server.TILE_SIZE_PX)
+
+
+def test_render():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = TileStore(Path(tmp))
+        store.add_rows([_row(1, -122.415, 37.76), _row(2, -122.414, 37.761), _row(3, -118.25, 34.05)])
+
+        # Low zooms: the two Mission rows cluster, LA stays on its own
+        low = store.render(*_tile(-122.415, 37.76, 4))
+        counts = sorted(f["properties"].get("count", 1) for f in low["features"])
+        assert counts == [1, 2], counts
+
+        # The whole world at the lowest zoom only touches occupied cells
+        world = [store.render(tile_server.MIN_ZOOM, x, y) for x in range(4) for y in range(4)]
+        assert sum(f["properties"].get("count", 1) for t in world for f in t["features"]) == 3
+
+        high = store.render(*_tile(-122.415, 37.76, 15))
+        shapes = {f["properties"]["id"]: f["geometry"]["type"] for f in high["features"]}
+        assert shapes == {"sub-1": "Polygon", "sub-2": "Polygon"}
+
+        ring = [(0.0, 0.0), (1.0, 0.0001), (2.0, 0.0), (2.0, 2.0), (0.0, 2.0), (0.0, 0.0)]
+        assert (1.0, 0.0001) not in simplify(ring, 0.01)
+    print("✅ clustered and simplified tiles")
+
+
+def test_cache_invalidation():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = TileStore(Path(tmp))
+        store.add_rows([_row(1, -122.415, 37.76)])
+        z, x, y = _tile(-122.415, 37.76, 12)
+        store.get_tile(z, x, y)
+        path = Path(tmp) / str(z) / str(x) / f"{y}.json"
+        assert path.exists()
+
+        store.add_rows([_row(1, -122.415, 37.76)])  # unchanged: cached tile survives
+        assert path.exists()
+
+        store.add_rows([_row(1, -122.415, 37.76, name="Renamed")])
+        assert not path.exists()
+        body = json.loads(store.get_tile(z, x, y))
+        assert body["features"][0]["properties"]["community_name"] == "Renamed"
+    print("✅ changed rows invalidate their cached tiles")
+
+
+def test_no_stale_cache_after_concurrent_change():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = TileStore(Path(tmp))
+        store.add_rows([_row(1, -122.415, 37.76)])
+        z, x, y = _tile(-122.415, 37.76, 12)
+
+        render = store.render
+
+        def render_then_change(*args):
+            # A save lands while this tile is being rendered
+            collection = render(*args)
+            store.add_rows([_row(1, -122.415, 37.76, name="Renamed")])
+            return collection
+
+        store.render = render_then_change
+        stale = json.loads(store.get_tile(z, x, y))
+        store.render = render
+        assert stale["features"][0]["properties"]["community_name"] == "Community 1"
+        assert not (Path(tmp) / str(z) / str(x) / f"{y}.json").exists()
+
+        fresh = json.loads(store.get_tile(z, x, y))
+        assert fresh["features"][0]["properties"]["community_name"] == "Renamed"
+    print("✅ tiles rendered across a change aren't cached")
+
+
+def test_resync():
+    import asyncio
+
+    upstream = [_row(1, -122.415, 37.76), _row(2, -118.25, 34.05)]
+
+    async def pages(select, after=None):
+        rows = [r for r in upstream if after is None or (r["created_at"], r["id"]) > tuple(after)]
+        if rows:
+            yield rows
+
+    import supabase_backend
+
+    original = supabase_backend.iter_submissions
+    supabase_backend.iter_submissions = pages
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = TileStore(Path(tmp))
+            assert asyncio.run(tile_server.refresh(store)) == 2
+
+            # Re-geocoding moves row 1 without changing created_at; row 2 is deleted
+            upstream[:] = [_row(1, -122.40, 37.78)]
+            assert asyncio.run(tile_server.refresh(store)) == 0
+            assert asyncio.run(tile_server.resync(store)) == 2
+            assert store.index.query_radius(37.78, -122.40, 0.5) == ["sub-1"]
+            assert "sub-2" not in store.index
+    finally:
+        supabase_backend.iter_submissions = original
+    print("✅ resync picks up rows changed in place and deleted rows")
+
+
+if __name__ == "__main__":
+    test_render()
+    test_cache_invalidation()
+    test_no_stale_cache_after_concurrent_change()
+    test_resync()
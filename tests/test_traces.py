@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Test call tracing: PII scrubbing, recording tool invocations with their HTTP
+exchanges, and replaying a scrubbed trace offline. No API keys or network needed.
+"""
+
+import asyncio
+import json
+import os
+import sys
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import httpx
+from line.llm_agent import ToolEnv, loopback_tool
+
+import traces
+from call_supervisor import CallSupervisor
+from geocoding import GEOCODE_URL as GOOGLE_GEOCODE_URL, GeocodeCache, GeocodePipeline
+
+GEOCODE_URL = "https://maps.example.com/geocode/json"
+
+
+async def _fake_network(transport, request: httpx.Request) -> httpx.Response:
+    """Stands in for the real transport while recording: echoes the address query."""
+    await asyncio.sleep(0.01)
+    address = request.url.params.get("address", "")
+    body = json.dumps({"formatted_address": f"{address}, CA", "location": [37.75, -122.41]}).encode()
+    return httpx.Response(200, headers={"content-type": "application/json"}, stream=httpx.ByteStream(body))
+
+
+def _build(trace: traces.CallTrace):
+    supervisor = CallSupervisor(trace.call_id)
+    answers = []
+
+    @loopback_tool
+    async def record_answer(ctx: ToolEnv, answer: str):
+        """Record an answer."""
+        answers.append(answer)
+        return f"Recorded {answer}; {len(answers)} so far"
+
+    @loopback_tool(is_background=True)
+    async def geocode_community(ctx: ToolEnv, address: str, zip_code: str):
+        """Geocode the community."""
+        yield "Looking it up..."
+
+        async def lookup():
+            async with httpx.AsyncClient() as client:
+                response = await client.get(GEOCODE_URL, params={"address": f"{address}, {zip_code}", "key": "secret-key"})
+            return response.json()["formatted_address"]
+
+        yield f"Found {await supervisor.run('geocode_community', lookup())}"
+
+    return trace.instrument([record_answer, geocode_community]), supervisor
+
+
+async def _record() -> dict:
+    traces.install()
+    real, traces._original_handle = traces._original_handle, _fake_network
+    try:
+        trace = traces.CallTrace("call-1")
+        tools, supervisor = _build(trace)
+        record_answer, geocode = tools
+        for answer in ("Lauren James", "94110", "2401 Mission St"):
+            async for _ in record_answer.func(None, answer=answer):
+                pass
+        async for _ in geocode.func(None, address="2401 Mission St", zip_code="94110"):
+            pass
+        await supervisor.end()
+    finally:
+        traces._original_handle = real
+    trace.duration = trace.now()
+    answers = {"caller_name": "Lauren James", "zipcode": "94110", "address": "2401 Mission St", "phone_number": "415-555-0134"}
+    return traces.Scrubber(traces.DEFAULT_SCRUB_RULES, trace._pii_values(answers))(trace.to_dict())
+
+
+def test_scrubber():
+    scrub = traces.Scrubber(traces.DEFAULT_SCRUB_RULES, [("caller_name", "Lauren James"), ("consent", True), ("address", "no")])
+    data = scrub({
+        "args": {"answer": "lauren james"},
+        "outputs": [[0.1, "Thanks Lauren James, call me at (415) 555-0134 or lj@example.org"]],
+        "url": "https://maps.example.com/geocode/json?address=Lauren+James%2C+94110&key=abc",
+        "coords": "37.7599, -122.4148",
+    })
+    name = data["args"]["answer"]
+    assert name.startswith("caller_name-") and name in data["outputs"][0][1]
+    assert "555" not in data["outputs"][0][1] and "lj@" not in data["outputs"][0][1]
+    assert "key=" not in data["url"] and name in data["url"]
+    assert data["coords"] == "37.76, -122.41"
+    # A new trace gets a new salt
+    other = traces.Scrubber(traces.DEFAULT_SCRUB_RULES, [("caller_name", "Lauren James")])
+    assert other.text("Lauren James") != name
+    print("✅ Caller details pseudonymized consistently, secrets dropped, coordinates rounded")
+
+
+def test_record():
+    recorded = asyncio.run(_record())
+    tools = recorded["tools"]
+    assert [t["tool"] for t in tools] == ["record_answer"] * 3 + ["geocode_community"]
+    assert tools[3]["background"] and len(tools[3]["outputs"]) == 2 and tools[3]["duration"] >= 0.01
+    assert "Lauren" not in str(recorded) and "2401" not in str(recorded) and "secret-key" not in str(recorded)
+
+    (exchange,) = recorded["http"]
+    assert exchange["tool_id"] == 3 and exchange["status"] == 200
+    address = tools[3]["args"]["address"]
+    assert address.startswith("address-") and address in exchange["url"] and address in exchange["body"]
+    print("✅ Tool invocations and their HTTP exchange recorded and scrubbed")
+
+
+def test_replay():
+    recorded = asyncio.run(_record())
+    replayed = asyncio.run(traces.replay(recorded, _build, speed=0))
+    assert replayed["unmatched_http"] == []
+    assert [t["outputs"][-1][1] for t in replayed["tools"]] == [t["outputs"][-1][1] for t in recorded["tools"]]
+
+    rows = {row["tool"]: row for row in traces.compare([(recorded, replayed)])}
+    assert rows["record_answer"]["calls"] == 3 and rows["record_answer"]["changed_output"] == 0
+    assert rows["geocode_community"]["diverged"] == 0 and rows["geocode_community"]["changed_output"] == 0
+
+    # Recorded response times are kept at speed 1
+    paced = asyncio.run(traces.replay(recorded, _build, speed=1))
+    assert paced["tools"][3]["duration"] >= recorded["http"][0]["duration"]
+
+    # An unrecorded request fails locally instead of reaching the network
+    recorded["http"][0]["url"] = GEOCODE_URL + "?address=elsewhere"
+    offline = asyncio.run(traces.replay(recorded, _build, speed=0))
+    assert len(offline["unmatched_http"]) == 1
+    rows = {row["tool"]: row for row in traces.compare([(recorded, offline)])}
+    assert rows["geocode_community"]["changed_output"] == 1
+    print("✅ Replay serves recorded responses offline and matches the recorded outputs")
+
+
+async def _request_after_replay(recorded: dict) -> int:
+    await traces.replay(recorded, _build, speed=0)
+    real, traces._original_handle = traces._original_handle, _fake_network
+    try:
+        async with httpx.AsyncClient() as client:
+            response = await client.get(GEOCODE_URL, params={"address": "Mission St"})
+    finally:
+        traces._original_handle = real
+    return response.status_code
+
+
+def test_offline_scope():
+    recorded = asyncio.run(_record())
+    assert asyncio.run(_request_after_replay(recorded)) == 200
+    print("✅ Requests outside a trace go out again once a replay has finished")
+
+
+async def _fake_google(transport, request: httpx.Request) -> httpx.Response:
+    """Google geocode responses: the 94110 zip, one street address, nothing else."""
+    address = request.url.params.get("address", "")
+    if address == "94110, USA":
+        viewport = {"northeast": {"lat": 37.77, "lng": -122.4}, "southwest": {"lat": 37.73, "lng": -122.43}}
+        results = [{"formatted_address": "San Francisco, CA 94110, USA", "geometry": {
+            "location": {"lat": 37.75, "lng": -122.41}, "location_type": "APPROXIMATE", "viewport": viewport}}]
+    elif address.startswith("2401 Mission St"):
+        results = [{"formatted_address": "2401 Mission St, San Francisco, CA 94110, USA", "geometry": {
+            "location": {"lat": 37.76, "lng": -122.42}, "location_type": "ROOFTOP"}}]
+    else:
+        results = []
+    body = json.dumps({"status": "OK" if results else "ZERO_RESULTS", "results": results}).encode()
+    return httpx.Response(200, headers={"content-type": "application/json"}, stream=httpx.ByteStream(body))
+
+
+def _build_geocoder(trace: traces.CallTrace, pipeline: GeocodePipeline):
+    """A call's geocode tool as main.build_call makes it, on the given pipeline."""
+    supervisor = CallSupervisor(trace.call_id)
+
+    @loopback_tool(is_background=True)
+    async def geocode_community(ctx: ToolEnv, address: str, zip_code: str):
+        """Geocode the community."""
+        result = await supervisor.run("geocode_community", pipeline.geocode(address, zip_code, "", ""))
+        yield result.reply()
+
+    return trace.instrument([geocode_community]), supervisor
+
+
+def _seeded_pipeline(trace: traces.CallTrace) -> GeocodePipeline:
+    """As replay.py does: a pipeline of the replay's own, seeded with the recording's cache hits."""
+    cache = GeocodeCache()
+    for query, result in trace.player.cached:
+        cache.put(query, result)
+    return GeocodePipeline(cache=cache)
+
+
+async def _record_pipeline() -> dict:
+    traces.install()
+    real, traces._original_handle = traces._original_handle, _fake_google
+    # A long-lived process: the zip centroid is already in the pipeline's cache
+    pipeline = GeocodePipeline(cache=GeocodeCache())
+    try:
+        await pipeline.geocode_zip("94110")
+        trace = traces.CallTrace("call-2")
+        (geocode,), supervisor = _build_geocoder(trace, pipeline)
+        async for _ in geocode.func(None, address="2401 Mission St", zip_code="94110"):
+            pass
+        await supervisor.end()
+    finally:
+        traces._original_handle = real
+        await pipeline.aclose()
+    trace.duration = trace.now()
+    answers = {"address": "2401 Mission St", "zipcode": "94110"}
+    return traces.Scrubber(traces.DEFAULT_SCRUB_RULES, trace._pii_values(answers))(trace.to_dict())
+
+
+async def _replay_pipeline(recorded: dict) -> dict:
+    pipelines = []
+
+    def build(trace):
+        pipelines.append(_seeded_pipeline(trace))
+        return _build_geocoder(trace, pipelines[-1])
+
+    try:
+        return await traces.replay(recorded, build, speed=0)
+    finally:
+        for pipeline in pipelines:
+            await pipeline.aclose()
+
+
+def test_replay_cache_hits():
+    recorded = asyncio.run(_record_pipeline())
+    assert [entry["query"] for entry in recorded["cache"]] == ["94110, USA"]
+    assert [urlsplit(e["url"]).path for e in recorded["http"]] == [urlsplit(GOOGLE_GEOCODE_URL).path]
+    replayed = asyncio.run(_replay_pipeline(recorded))
+    assert replayed["unmatched_http"] == []
+    assert replayed["tools"][0]["outputs"] and replayed["tools"][0]["error"] is None
+    assert replayed["tools"][0]["outputs"][-1][1] == recorded["tools"][0]["outputs"][-1][1]
+    # The replay's own trace records the seeded hit, and the next replay starts just as cold
+    assert [entry["query"] for entry in replayed["cache"]] == ["94110, USA"]
+    again = asyncio.run(_replay_pipeline(recorded))
+    assert again["unmatched_http"] == [] and again["tools"][0]["outputs"][-1][1] == replayed["tools"][0]["outputs"][-1][1]
+    print("✅ Replay answers the recording's cache hits from a fresh pipeline of its own")
+
+
+if __name__ == "__main__":
+    test_scrubber()
+    test_record()
+    test_replay()
+    test_offline_scope()
+    test_replay_cache_hits()
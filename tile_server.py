@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""
+Tile server - serves submission geometries to the dashboard map as tiles.
+
+Instead of the browser downloading every submission's full geojson and
+all_coordinates, the map requests /tiles/{z}/{x}/{y}.json for the tiles on
+screen. Low zooms get clustered centroid points; higher zooms get polygons
+simplified (Douglas-Peucker) to about one pixel at that zoom, with coordinates
+rounded to match. Rendered tiles are cached on disk and the tiles touched by
+new submissions are invalidated as they are picked up. New rows are polled by
+created_at; a periodic full resync picks up rows changed in place (re-geocoding,
+duplicate merges) and deleted ones.
+
+    TILE_CACHE_DIR=.tile_cache PORT=8081 uv run python tile_server.py
+
+If mapbox-vector-tile is installed, /tiles/{z}/{x}/{y}.mvt serves the same
+features as Mapbox Vector Tiles.
+"""
+
+import asyncio
+import json
+import math
+import os
+import re
+import shutil
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from dotenv import load_dotenv
+from loguru import logger
+
+load_dotenv()
+
+from spatial_index import SubmissionIndex, _extract_ring, _is_polygon
+
+TILE_CACHE_DIR = Path(os.getenv("TILE_CACHE_DIR", ".tile_cache"))
+REFRESH_SECONDS = float(os.getenv("TILE_REFRESH_SECONDS", "30"))
+RESYNC_SECONDS = float(os.getenv("TILE_RESYNC_SECONDS", "3600"))
+
+MIN_ZOOM = 2
+MAX_ZOOM = 18
+
+# At or below this zoom, tiles carry clustered centroid points instead of polygons
+CLUSTER_MAX_ZOOM = 10
+CLUSTER_CELL_PX = 48
+TILE_SIZE_PX = 256
+
+# Past this many tiles at one zoom, invalidation drops the whole zoom level instead
+MAX_INVALIDATE_TILES = 4096
+
+# Zooms at which simplified geometries are precomputed; a request uses the
+# nearest precomputed level at or above its zoom.
+SIMPLIFY_ZOOMS = (11, 13, 15, 18)
+
+TILE_COLUMNS = "id,created_at,community_name,zipcode,geojson,all_coordinates"
+
+_TILE_PATH = re.compile(r"^/tiles/(\d+)/(\d+)/(\d+)\.(json|mvt)$")
+
+
+def tile_bounds(z: int, x: int, y: int) -> tuple[float, float, float, float]:
+    """(min_lng, min_lat, max_lng, max_lat) of a Web Mercator tile."""
+    n = 2**z
+
+    def lat(row: int) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y)
+
+
+def lnglat_to_tile_px(lng: float, lat: float, z: int) -> tuple[float, float]:
+    """Global pixel coordinates of a point at zoom z."""
+    n = 2**z * TILE_SIZE_PX
+    lat_rad = math.radians(max(min(lat, 85.0511), -85.0511))
+    px = (lng + 180.0) / 360.0 * n
+    py = (1 - math.log(math.tan(lat_rad) + 1 / math.cos(lat_rad)) / math.pi) / 2 * n
+    return px, py
+
+
+def tolerance_deg(z: int) -> float:
+    """Roughly one pixel at zoom z, in degrees."""
+    return 360.0 / (TILE_SIZE_PX * 2**z)
+
+
+def decimals_for_zoom(z: int) -> int:
+    """Coordinate precision that still resolves a pixel at zoom z."""
+    return max(2, min(6, math.ceil(math.log10(1 / tolerance_deg(z)))))
+
+
+def simplify(ring: list[tuple[float, float]], tolerance: float) -> list[tuple[float, float]]:
+    """Douglas-Peucker simplification of a closed ring, keeping it a valid polygon."""
+    if len(ring) <= 4:
+        return ring
+
+    keep = [False] * len(ring)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(ring) - 1)]
+    while stack:
+        start, end = stack.pop()
+        (x1, y1), (x2, y2) = ring[start], ring[end]
+        dx, dy = x2 - x1, y2 - y1
+        norm = math.hypot(dx, dy)
+        best, best_i = 0.0, -1
+        for i in range(start + 1, end):
+            px, py = ring[i]
+            if norm == 0:
+                dist = math.hypot(px - x1, py - y1)
+            else:
+                dist = abs(dy * px - dx * py + x2 * y1 - y2 * x1) / norm
+            if dist > best:
+                best, best_i = dist, i
+        if best > tolerance and best_i > 0:
+            keep[best_i] = True
+            stack.append((start, best_i))
+            stack.append((best_i, end))
+
+    simplified = [p for p, k in zip(ring, keep) if k]
+    if len(simplified) < 4:
+        # Collapsed below a triangle: keep the two farthest-apart vertices from the first
+        far = sorted(range(1, len(ring) - 1), key=lambda i: -math.hypot(ring[i][0] - ring[0][0], ring[i][1] - ring[0][1]))[:2]
+        simplified = [ring[0]] + [ring[i] for i in sorted(far)] + [ring[0]]
+    return simplified
+
+
+class TileStore:
+    """In-memory geometries plus an on-disk cache of rendered tiles."""
+
+    def __init__(self, cache_dir: Path = TILE_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.index = SubmissionIndex()
+        self.watermark: tuple[str, str] | None = None
+        self._features: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        # Bumped on every change; a tile rendered under an older generation isn't cached
+        self._generation = 0
+
+    def add_rows(self, rows: list[dict]) -> int:
+        """Add or replace submissions and invalidate cached tiles they touch.
+
+        Returns the number of rows that changed what the tiles show.
+        """
+        changed = 0
+        for row in rows:
+            geometry = row.get("geojson") or row.get("all_coordinates")
+            ring = _extract_ring(geometry)
+            if not ring:
+                changed += self.remove(row["id"])
+                continue
+
+            lngs = [p[0] for p in ring]
+            lats = [p[1] for p in ring]
+            feature = {
+                "properties": {
+                    "id": row["id"],
+                    "community_name": row.get("community_name") or "",
+                    "zipcode": row.get("zipcode") or "",
+                },
+                "centroid": (sum(lngs) / len(lngs), sum(lats) / len(lats)),
+                "bbox": (min(lngs), min(lats), max(lngs), max(lats)),
+                "simplified": {},
+            }
+            if _is_polygon(ring):
+                for z in SIMPLIFY_ZOOMS:
+                    feature["simplified"][z] = simplify(ring, tolerance_deg(z))
+
+            with self._lock:
+                old = self._features.get(row["id"])
+                if old == feature:
+                    continue
+                self._features[row["id"]] = feature
+                self.index.add(row["id"], geometry)
+                self._generation += 1
+            if old:
+                self.invalidate(old["bbox"])
+            self.invalidate(feature["bbox"])
+            changed += 1
+
+        if rows:
+            last = (rows[-1]["created_at"], rows[-1]["id"])
+            if self.watermark is None or last > self.watermark:
+                self.watermark = last
+        return changed
+
+    def remove(self, submission_id: str) -> bool:
+        """Drop a submission and invalidate the tiles it was on. Returns False if it wasn't loaded."""
+        with self._lock:
+            old = self._features.pop(submission_id, None)
+            if old is None:
+                return False
+            self.index.remove(submission_id)
+            self._generation += 1
+        self.invalidate(old["bbox"])
+        return True
+
+    def retain(self, ids: set[str]) -> int:
+        """Drop every submission not in `ids` (deleted upstream). Returns the number dropped."""
+        with self._lock:
+            gone = [sid for sid in self._features if sid not in ids]
+        return sum(self.remove(sid) for sid in gone)
+
+    def invalidate(self, bbox: tuple[float, float, float, float]) -> None:
+        """Delete cached tiles intersecting a bbox at every zoom."""
+        if not self.cache_dir.exists():
+            return
+        min_lng, min_lat, max_lng, max_lat = bbox
+        for z in range(MIN_ZOOM, MAX_ZOOM + 1):
+            x0, y0 = (int(v // TILE_SIZE_PX) for v in lnglat_to_tile_px(min_lng, max_lat, z))
+            x1, y1 = (int(v // TILE_SIZE_PX) for v in lnglat_to_tile_px(max_lng, min_lat, z))
+            if (x1 - x0 + 1) * (y1 - y0 + 1) > MAX_INVALIDATE_TILES:
+                shutil.rmtree(self.cache_dir / str(z), ignore_errors=True)
+                continue
+            for x in range(x0, x1 + 1):
+                for y in range(y0, y1 + 1):
+                    for ext in ("json", "mvt"):
+                        (self.cache_dir / str(z) / str(x) / f"{y}.{ext}").unlink(missing_ok=True)
+
+    def clear_cache(self) -> None:
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def _features_in(self, bounds: tuple[float, float, float, float]) -> list[dict]:
+        # The index walks occupied cells for large (low-zoom) boxes, so the lock is held briefly
+        with self._lock:
+            return [self._features[sid] for sid in self.index.query_bbox(*bounds)]
+
+    def _clustered(self, z: int, features: list[dict]) -> list[dict]:
+        cells: dict[tuple[int, int], list[dict]] = {}
+        for f in features:
+            px, py = lnglat_to_tile_px(*f["centroid"], z)
+            cells.setdefault((int(px // CLUSTER_CELL_PX), int(py // CLUSTER_CELL_PX)), []).append(f)
+
+        decimals = decimals_for_zoom(z)
+        out = []
+        for members in cells.values():
+            lng = sum(m["centroid"][0] for m in members) / len(members)
+            lat = sum(m["centroid"][1] for m in members) / len(members)
+            if len(members) == 1:
+                properties = dict(members[0]["properties"])
+            else:
+                properties = {"cluster": True, "count": len(members)}
+            out.append({
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [round(lng, decimals), round(lat, decimals)]},
+                "properties": properties,
+            })
+        return out
+
+    def _shapes(self, z: int, features: list[dict]) -> list[dict]:
+        level = next((lz for lz in SIMPLIFY_ZOOMS if lz >= z), SIMPLIFY_ZOOMS[-1])
+        decimals = decimals_for_zoom(z)
+        out = []
+        for f in features:
+            ring = f["simplified"].get(level)
+            if ring:
+                geometry = {"type": "Polygon", "coordinates": [[[round(x, decimals), round(y, decimals)] for x, y in ring]]}
+            else:
+                lng, lat = f["centroid"]
+                geometry = {"type": "Point", "coordinates": [round(lng, decimals), round(lat, decimals)]}
+            out.append({"type": "Feature", "geometry": geometry, "properties": f["properties"]})
+        return out
+
+    def render(self, z: int, x: int, y: int) -> dict:
+        """Build the FeatureCollection for one tile."""
+        bounds = tile_bounds(z, x, y)
+        features = self._features_in(bounds)
+        if z <= CLUSTER_MAX_ZOOM:
+            # Cluster on centroids that fall in this tile so each cluster appears once
+            min_lng, min_lat, max_lng, max_lat = bounds
+            features = [
+                f for f in features
+                if min_lng <= f["centroid"][0] < max_lng and min_lat <= f["centroid"][1] < max_lat
+            ]
+            return {"type": "FeatureCollection", "features": self._clustered(z, features)}
+        return {"type": "FeatureCollection", "features": self._shapes(z, features)}
+
+    def _encode_mvt(self, z: int, x: int, y: int, collection: dict) -> bytes:
+        import mapbox_vector_tile
+
+        def wkt(geometry: dict) -> str:
+            if geometry["type"] == "Point":
+                lng, lat = geometry["coordinates"]
+                return f"POINT ({lng} {lat})"
+            ring = ", ".join(f"{lng} {lat}" for lng, lat in geometry["coordinates"][0])
+            return f"POLYGON (({ring}))"
+
+        layer = {
+            "name": "submissions",
+            "features": [{"geometry": wkt(f["geometry"]), "properties": f["properties"]} for f in collection["features"]],
+        }
+        return mapbox_vector_tile.encode([layer], quantize_bounds=tile_bounds(z, x, y))
+
+    def get_tile(self, z: int, x: int, y: int, fmt: str = "json") -> bytes:
+        """Return the encoded tile, from the disk cache when possible."""
+        path = self.cache_dir / str(z) / str(x) / f"{y}.{fmt}"
+        if path.exists():
+            return path.read_bytes()
+
+        generation = self._generation
+        collection = self.render(z, x, y)
+        if fmt == "mvt":
+            body = self._encode_mvt(z, x, y, collection)
+        else:
+            body = json.dumps(collection, separators=(",", ":")).encode()
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{fmt}.tmp{threading.get_ident()}")
+        tmp.write_bytes(body)
+        with self._lock:
+            # Rows that changed mid-render may already have been invalidated;
+            # serve this tile but don't cache it
+            if generation == self._generation:
+                tmp.replace(path)
+                return body
+        tmp.unlink(missing_ok=True)
+        return body
+
+
+async def refresh(store: TileStore) -> int:
+    """Pull submissions newer than the store's watermark. Returns the number added."""
+    from supabase_backend import iter_submissions
+
+    added = 0
+    async for page in iter_submissions(select=TILE_COLUMNS, after=store.watermark):
+        store.add_rows(page)
+        added += len(page)
+    return added
+
+
+async def resync(store: TileStore) -> int:
+    """Reload every submission, applying rows changed in place and dropping deleted ones.
+
+    Returns the number of submissions whose tiles changed.
+    """
+    from supabase_backend import iter_submissions
+
+    seen: set[str] = set()
+    changed = 0
+    async for page in iter_submissions(select=TILE_COLUMNS):
+        seen.update(row["id"] for row in page)
+        changed += store.add_rows(page)
+    return changed + store.retain(seen)
+
+
+def _poll_forever(store: TileStore) -> None:
+    last_resync = time.monotonic()
+    while True:
+        time.sleep(REFRESH_SECONDS)
+        try:
+            if time.monotonic() - last_resync >= RESYNC_SECONDS:
+                changed = asyncio.run(resync(store))
+                last_resync = time.monotonic()
+                if changed:
+                    logger.info(f"Tile resync updated {changed} submissions")
+            added = asyncio.run(refresh(store))
+            if added:
+                logger.info(f"Tile store picked up {added} new submissions")
+        except Exception as e:
+            logger.error(f"Tile refresh failed: {e}")
+
+
+def make_handler(store: TileStore):
+    class TileHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/health":
+                self._send(200, b'{"ok":true}', "application/json")
+                return
+
+            match = _TILE_PATH.match(self.path.split("?")[0])
+            if not match:
+                self._send(404, b"not found", "text/plain")
+                return
+
+            z, x, y = (int(v) for v in match.groups()[:3])
+            fmt = match.group(4)
+            if not MIN_ZOOM <= z <= MAX_ZOOM or not (0 <= x < 2**z and 0 <= y < 2**z):
+                self._send(400, b"tile out of range", "text/plain")
+                return
+
+            try:
+                body = store.get_tile(z, x, y, fmt)
+            except ImportError:
+                self._send(501, b"mvt requires mapbox-vector-tile", "text/plain")
+                return
+
+            content_type = "application/vnd.mapbox-vector-tile" if fmt == "mvt" else "application/json"
+            self._send(200, body, content_type)
+
+        def _send(self, status: int, body: bytes, content_type: str):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.send_header("Cache-Control", f"public, max-age={int(REFRESH_SECONDS)}")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return TileHandler
+
+
+def main():
+    store = TileStore()
+    # Cached tiles may predate rows added while the server was down
+    store.clear_cache()
+    total = asyncio.run(refresh(store))
+    logger.info(f"Tile store loaded {total} submissions")
+
+    threading.Thread(target=_poll_forever, args=(store,), daemon=True).start()
+
+    port = int(os.getenv("PORT", "8081"))
+    server = ThreadingHTTPServer(("0.0.0.0", port), make_handler(store))
+    print(f"Serving tiles on http://localhost:{port}/tiles/{{z}}/{{x}}/{{y}}.json")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,572 @@
+"""
+Call traces - opt-in recording of real calls, and replaying them against the
+current code to compare latency and output between releases.
+
+With TRACE_DIR set, each call (or a TRACE_SAMPLE_RATE share of calls) writes
+TRACE_DIR/<call_id>.json when it ends. The file records every tool invocation
+with its arguments, outputs and timing, plus every external HTTP request the
+tools made and the response, and every lookup the geocode cache answered
+instead (see record_cache_hit). The LLM's own traffic is not recorded (see
+TRACE_SKIP_HOSTS).
+
+Caller details are pseudonymized before the file is written, using the rules
+in TRACE_SCRUB_RULES (a YAML file shaped like DEFAULT_SCRUB_RULES). The values
+of the listed form answers and tool arguments, and anything matching the
+listed patterns, are replaced everywhere in the trace by a token such as
+address-3f9a1c2e. The same value always gets the same token within a trace, so
+a replayed lookup still finds its recorded response. Coordinates are rounded to
+coordinate_decimals places (about a kilometre at 2), so a geocoded address
+does not lead back to the caller's home. Secret query parameters (API keys)
+are dropped.
+
+replay() calls the recorded tools in their original order and spacing, or
+`speed` times faster. HTTP responses come from the trace and nothing goes out
+to the network, and the recorded cache hits seed the replay's own geocode
+cache (Player.cached); while replay() runs, requests made outside a traced tool
+fail instead of going out. The result is a new trace, and compare() lines two traces up
+call by call (see replay.py).
+"""
+
+import asyncio
+import base64
+import contextvars
+import dataclasses
+import hashlib
+import json
+import os
+import random
+import re
+import secrets
+import time
+from collections.abc import Callable
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import httpx
+import yaml
+from line.events import CallEnded
+from loguru import logger
+
+import metrics
+
+# Directory for call traces; unset disables recording
+TRACE_DIR = os.getenv("TRACE_DIR", "")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+
+# YAML file overriding DEFAULT_SCRUB_RULES
+TRACE_SCRUB_RULES = os.getenv("TRACE_SCRUB_RULES", "")
+
+# Comma-separated hosts never recorded (the LLM provider's API)
+TRACE_SKIP_HOSTS = os.getenv("TRACE_SKIP_HOSTS", "api.anthropic.com,api.openai.com")
+
+DEFAULT_SCRUB_RULES = {
+    # Form answers and tool arguments whose values are pseudonymized wherever they appear
+    "fields": [
+        "caller_name",
+        "phone_number",
+        "address",
+        "community_description",
+        "cultural_interests",
+        "economic_interests",
+        "community_activities",
+        "other_considerations",
+    ],
+    # Regexes pseudonymized wherever they match (label: pattern)
+    "patterns": {
+        "phone": r"(?<![\w.])(?:\+?1[\s.-]?)?\(?\d{3}\)?[\s.-]\d{3}[\s.-]\d{4}(?!\d)",
+        "email": r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+",
+        "street": r"\b\d{1,6}\s+(?:[A-Z][\w.]*\s+){1,4}(?:St|Street|Ave|Avenue|Blvd|Rd|Road|Dr|Drive|Ln|Lane|Way|Ct|Court|Pl|Place)\b",
+    },
+    # Decimal places kept in coordinates (2: about 1 km); null keeps them exact
+    "coordinate_decimals": 2,
+    # Query parameters dropped from recorded URLs
+    "secret_params": ["key", "apikey", "token", "access_token"],
+}
+
+# Shorter field values ("no", "CA") are left alone rather than replaced all over the trace
+MIN_FIELD_LENGTH = 3
+
+# Request bodies above this size are recorded as a length only
+MAX_REQUEST_BODY = 64 * 1024
+
+TRACE_VERSION = 1
+
+metrics.describe("traces_recorded", "Call traces written to TRACE_DIR")
+metrics.describe("trace_write_failed", "Call traces that could not be written")
+
+
+def load_scrub_rules() -> dict:
+    if not TRACE_SCRUB_RULES:
+        return DEFAULT_SCRUB_RULES
+    with open(TRACE_SCRUB_RULES) as f:
+        return {**DEFAULT_SCRUB_RULES, **(yaml.safe_load(f) or {})}
+
+
+# The trace and tool invocation the running code belongs to; HTTP is attributed through this
+_CURRENT: contextvars.ContextVar[tuple["CallTrace", int] | None] = contextvars.ContextVar("call_trace", default=None)
+
+
+# ============================================================
+# Recording
+# ============================================================
+
+
+class CallTrace:
+    """Tool invocations and HTTP exchanges of one call.
+
+    With a player the trace is a replay: HTTP is answered from the player
+    instead of the network.
+    """
+
+    def __init__(self, call_id: str, player: "Player | None" = None):
+        self.call_id = call_id
+        self.player = player
+        self.recorded_at = datetime.now(timezone.utc).isoformat()
+        self.tools: list[dict] = []
+        self.http: list[dict] = []
+        self.cache: list[dict] = []
+        self.duration: float | None = None
+        self._started = time.monotonic()
+
+    def now(self) -> float:
+        return round(time.monotonic() - self._started, 4)
+
+    def instrument(self, tools: list) -> list:
+        """Copies of the tools that record each invocation in this trace."""
+        return [dataclasses.replace(tool, func=self._traced(tool)) for tool in tools]
+
+    def _traced(self, tool) -> Callable:
+        func, trace = tool.func, self
+
+        async def traced(ctx, **args):
+            record = {
+                "id": len(trace.tools),
+                "tool": tool.name,
+                "background": tool.is_background,
+                "t": trace.now(),
+                "args": args,
+                "outputs": [],  # [seconds since start, text]
+                "duration": None,
+                "error": None,
+            }
+            trace.tools.append(record)
+            token = _CURRENT.set((trace, record["id"]))
+            started = time.monotonic()
+            try:
+                async for value in _iterate(func(ctx, **args)):
+                    record["outputs"].append([round(time.monotonic() - started, 4), _text(value)])
+                    yield value
+            except asyncio.CancelledError:
+                record["error"] = "cancelled"
+                raise
+            except Exception as e:
+                record["error"] = f"{type(e).__name__}: {e}"
+                raise
+            finally:
+                record["duration"] = round(time.monotonic() - started, 4)
+                try:
+                    _CURRENT.reset(token)
+                except ValueError:
+                    pass  # finished in a different context than it started in
+
+        return traced
+
+    def to_dict(self) -> dict:
+        return {
+            "version": TRACE_VERSION,
+            "call_id": self.call_id,
+            "recorded_at": self.recorded_at,
+            "duration": self.duration if self.duration is not None else self.now(),
+            "tools": self.tools,
+            "http": self.http,
+            "cache": self.cache,
+        }
+
+    def wrap(self, process, answers: Callable[[], dict]):
+        """An agent process that writes the trace once CallEnded has been handled.
+
+        `answers` returns the form answers at that point, for scrubbing.
+        """
+
+        async def traced(env, event):
+            async for output in process(env, event):
+                yield output
+            if isinstance(event, CallEnded):
+                await self.save(answers())
+
+        return traced
+
+    async def save(self, answers: dict) -> Path | None:
+        self.duration = self.now()
+        path = Path(TRACE_DIR) / f"{_file_name(self.call_id)}.json"
+        try:
+            data = Scrubber(load_scrub_rules(), self._pii_values(answers))(self.to_dict())
+            await asyncio.to_thread(_write_json, path, data)
+        except (OSError, yaml.YAMLError, re.error) as e:
+            metrics.incr("trace_write_failed")
+            logger.error(f"[{self.call_id}] Could not write call trace: {e}")
+            return None
+        metrics.incr("traces_recorded")
+        logger.info(f"[{self.call_id}] Wrote call trace {path}")
+        return path
+
+    def _pii_values(self, answers: dict) -> list[tuple[str, object]]:
+        return [*answers.items(), *((k, v) for record in self.tools for k, v in record["args"].items())]
+
+
+def _file_name(call_id: str) -> str:
+    return re.sub(r"[^\w.-]", "_", call_id)
+
+
+def _write_json(path: Path, data: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, indent=1))
+
+
+async def _iterate(result):
+    """Yield a tool's outputs whether it returned a value, an awaitable or an async generator."""
+    if hasattr(result, "__aiter__"):
+        async for value in result:
+            yield value
+    elif asyncio.iscoroutine(result) or hasattr(result, "__await__"):
+        yield await result
+    else:
+        yield result
+
+
+def _text(value) -> str:
+    return value if isinstance(value, str) else repr(value)
+
+
+def record_cache_hit(query: str, result) -> None:
+    """Note a lookup answered from a cache inside a traced tool, so a replay can answer it the same way.
+
+    The result is stored as JSON text so it is scrubbed like a response body.
+    """
+    current = _CURRENT.get()
+    if current is None:
+        return
+    trace, tool_id = current
+    trace.cache.append({"tool_id": tool_id, "t": trace.now(), "query": query, "result": json.dumps(result)})
+
+
+def start(call_id: str) -> CallTrace | None:
+    """A trace for a new call, or None when recording is off or the call isn't sampled."""
+    if not TRACE_DIR or random.random() >= TRACE_SAMPLE_RATE:
+        return None
+    install()
+    return CallTrace(call_id)
+
+
+# ============================================================
+# HTTP capture
+# ============================================================
+
+_original_handle = None
+# Set while replay() runs: requests outside a trace fail instead of going out
+_OFFLINE: contextvars.ContextVar[bool] = contextvars.ContextVar("trace_offline", default=False)
+
+
+def install() -> None:
+    """Route httpx's default transport through the trace hook (idempotent).
+
+    Every AsyncClient in the process goes through it; requests made outside a
+    traced tool invocation pass straight through.
+    """
+    global _original_handle
+    if _original_handle is None:
+        _original_handle = httpx.AsyncHTTPTransport.handle_async_request
+        httpx.AsyncHTTPTransport.handle_async_request = _handle
+
+
+def _skip_hosts() -> set[str]:
+    return {h.strip() for h in TRACE_SKIP_HOSTS.split(",") if h.strip()}
+
+
+async def _handle(transport, request: httpx.Request) -> httpx.Response:
+    current = _CURRENT.get()
+    if current is None or request.url.host in _skip_hosts():
+        if _OFFLINE.get():
+            return httpx.Response(599, json={"error": "replay: request made outside a traced tool"})
+        return await _original_handle(transport, request)
+
+    trace, tool_id = current
+    if trace.player is not None:
+        return await trace.player.respond(request)
+
+    t, started = trace.now(), time.monotonic()
+    response = await _original_handle(transport, request)
+    try:
+        raw = b"".join([chunk async for chunk in response.aiter_raw()])
+    finally:
+        await response.aclose()
+    decoded = httpx.Response(response.status_code, headers=response.headers, content=raw)
+    trace.http.append({
+        "tool_id": tool_id,
+        "t": t,
+        "method": request.method,
+        "url": _clean_url(str(request.url)),
+        "request_body": _request_body(request),
+        "status": response.status_code,
+        "content_type": response.headers.get("content-type", ""),
+        **_body(decoded.content),
+        "duration": round(time.monotonic() - started, 4),
+    })
+    return httpx.Response(response.status_code, headers=response.headers, content=raw, extensions=response.extensions)
+
+
+def _request_body(request: httpx.Request) -> str | None:
+    content = request.content
+    if not content:
+        return None
+    if len(content) > MAX_REQUEST_BODY:
+        return f"<{len(content)} bytes>"
+    try:
+        return content.decode()
+    except UnicodeDecodeError:
+        return f"<{len(content)} bytes>"
+
+
+def _body(content: bytes) -> dict:
+    try:
+        return {"body": content.decode()}
+    except UnicodeDecodeError:
+        return {"body_base64": base64.b64encode(content).decode()}
+
+
+def _clean_url(url: str, secret_params: list[str] | None = None) -> str:
+    """The URL without secret query parameters, its query re-encoded canonically."""
+    secret = set(secret_params or load_scrub_rules()["secret_params"])
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in secret]
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ""))
+
+
+# ============================================================
+# PII scrubbing
+# ============================================================
+
+
+class Scrubber:
+    """Replaces caller details in a trace with salted tokens, consistently within the trace."""
+
+    def __init__(self, rules: dict, values: list[tuple[str, object]]):
+        self._salt = secrets.token_hex(16)
+        self._secret_params = list(rules.get("secret_params") or [])
+        fields = set(rules.get("fields") or [])
+        found = {
+            (name, value.strip())
+            for name, value in values
+            if name in fields and isinstance(value, str) and len(value.strip()) >= MIN_FIELD_LENGTH
+        }
+        # Longest first, so "24th and Mission St" goes before "Mission St"
+        self._values = [
+            (re.compile(rf"(?<!\w){re.escape(value)}(?!\w)", re.IGNORECASE), self.token(name, value))
+            for name, value in sorted(found, key=lambda nv: -len(nv[1]))
+        ]
+        self._patterns = [(label, re.compile(p)) for label, p in (rules.get("patterns") or {}).items()]
+        self._decimals = rules.get("coordinate_decimals")
+        self._coordinate = (
+            None
+            if self._decimals is None
+            else re.compile(rf"(?<![\w.])-?\d{{1,3}}\.\d{{{self._decimals + 1},}}(?![\w.])")
+        )
+
+    def token(self, label: str, value: str) -> str:
+        digest = hashlib.sha256(f"{self._salt}:{value.strip().lower()}".encode()).hexdigest()
+        return f"{label}-{digest[:8]}"
+
+    def text(self, s: str) -> str:
+        for pattern, token in self._values:
+            s = pattern.sub(token, s)
+        for label, pattern in self._patterns:
+            s = pattern.sub(lambda m, label=label: self.token(label, m.group()), s)
+        if self._coordinate is not None:
+            s = self._coordinate.sub(self._round, s)
+        return s
+
+    def _round(self, match: re.Match) -> str:
+        value = float(match.group())
+        # Shortest form, as the JSON of a rounded cache hit re-encodes it on replay
+        return str(round(value, self._decimals)) if abs(value) <= 180 else match.group()
+
+    def url(self, url: str) -> str:
+        """Scrub query values decoded, so the token is found however the value was encoded."""
+        parts = urlsplit(url)
+        query = [(k, self.text(v)) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in self._secret_params]
+        return urlunsplit((parts.scheme, parts.netloc, self.text(parts.path), urlencode(query), ""))
+
+    def __call__(self, data):
+        if isinstance(data, dict):
+            return {
+                k: self.url(v) if k == "url" and isinstance(v, str) else v if k == "body_base64" else self(v)
+                for k, v in data.items()
+            }
+        if isinstance(data, list):
+            return [self(v) for v in data]
+        if isinstance(data, str):
+            return self.text(data)
+        return data
+
+
+# ============================================================
+# Replay
+# ============================================================
+
+
+def _match_key(method: str, url: str) -> str:
+    """Requests match on method, path and query, whatever host the environment points at."""
+    parts = urlsplit(_clean_url(url))
+    return f"{method} {parts.path}?{urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))}"
+
+
+class Player:
+    """Serves a trace's recorded HTTP responses, in recorded order per request.
+
+    A request seen more often than recorded gets the last recorded response; a
+    request the trace never saw gets a 599 and is counted in `unmatched`.
+    `speed` scales the recorded response times (0: respond immediately).
+    `cached` holds the (query, result) lookups the recording answered from its
+    geocode cache, for seeding the replay's cache.
+    """
+
+    def __init__(self, http: list[dict], speed: float = 1.0, cache: list[dict] | None = None):
+        self.speed = speed
+        self.cached = [(entry["query"], json.loads(entry["result"])) for entry in cache or []]
+        self.unmatched: list[str] = []
+        self._recorded: dict[str, list[dict]] = {}
+        self._served: dict[str, int] = {}
+        for exchange in http:
+            self._recorded.setdefault(_match_key(exchange["method"], exchange["url"]), []).append(exchange)
+
+    async def respond(self, request: httpx.Request) -> httpx.Response:
+        key = _match_key(request.method, str(request.url))
+        recorded = self._recorded.get(key)
+        if not recorded:
+            self.unmatched.append(key)
+            logger.warning(f"Replay: no recorded response for {key}")
+            return httpx.Response(599, json={"error": "replay: request not in trace"})
+        served = self._served.get(key, 0)
+        self._served[key] = served + 1
+        exchange = recorded[min(served, len(recorded) - 1)]
+        if self.speed:
+            await asyncio.sleep(exchange["duration"] / self.speed)
+        if "body_base64" in exchange:
+            content = base64.b64decode(exchange["body_base64"])
+        else:
+            content = exchange.get("body", "").encode()
+        headers = {"content-type": exchange["content_type"]} if exchange.get("content_type") else {}
+        return httpx.Response(exchange["status"], headers=headers, content=content)
+
+
+async def _pace(started: float, t: float, speed: float) -> None:
+    if speed:
+        await asyncio.sleep(max(0.0, started + t / speed - time.monotonic()))
+
+
+async def _drain(run) -> None:
+    try:
+        async for _ in run:
+            pass
+    except Exception as e:
+        logger.warning(f"Replay: tool failed: {e}")  # recorded in the trace by the instrumented tool
+
+
+async def replay(recorded: dict, build: Callable[["CallTrace"], tuple[list, object]], speed: float = 1.0) -> dict:
+    """Re-run a recorded call's tool invocations against the current code.
+
+    `build(trace)` returns the call's instrumented tools and its supervisor (see
+    replay.replay), with a fresh geocode cache seeded from `trace.player.cached`.
+    Tools start at their recorded offsets divided by `speed` (0: back to back).
+    Foreground tools are awaited and background ones overlap, as they do in a
+    call. The call ends at its recorded length, or once the background work
+    that completed in the recording has completed.
+    Returns the replay's own trace.
+    """
+    install()
+    offline = _OFFLINE.set(True)
+    try:
+        return await _replay(recorded, build, speed)
+    finally:
+        _OFFLINE.reset(offline)
+
+
+async def _replay(recorded: dict, build: Callable[["CallTrace"], tuple[list, object]], speed: float) -> dict:
+    player = Player(recorded["http"], speed, recorded.get("cache"))
+    trace = CallTrace(f"replay-{recorded['call_id']}", player=player)
+    tools, supervisor = build(trace)
+    by_name = {tool.name: tool for tool in tools}
+    background = []
+    started = time.monotonic()
+
+    for record in sorted(recorded["tools"], key=lambda r: (r["t"], r["id"])):
+        await _pace(started, record["t"], speed)
+        tool = by_name.get(record["tool"])
+        if tool is None:
+            logger.warning(f"Replay: {record['tool']} is no longer a tool, skipping it")
+            continue
+        run = _drain(tool.func(None, **record["args"]))
+        if tool.is_background:
+            background.append((asyncio.ensure_future(run), record["error"] != "cancelled"))
+        else:
+            await run
+
+    # Work that finished before the hangup in the recording finishes here too
+    await asyncio.gather(*(task for task, finished in background if finished))
+    await _pace(started, recorded["duration"], speed)
+    await supervisor.end()
+    await asyncio.gather(*(task for task, _ in background))
+    trace.duration = trace.now()
+    return {
+        **trace.to_dict(),
+        "replay_of": recorded["call_id"],
+        "speed": speed,
+        "unmatched_http": trace.player.unmatched,
+    }
+
+
+# ============================================================
+# Comparison
+# ============================================================
+
+
+def _percentile(values: list[float], q: float) -> float | None:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def compare(pairs: list[tuple[dict, dict]]) -> list[dict]:
+    """Per-tool latency and output changes between (before, after) traces of the same calls.
+
+    Invocations are lined up by position; an invocation of a different tool
+    (or a missing one) counts as diverged.
+    """
+    tools: dict[str, dict] = {}
+    for before, after in pairs:
+        later = after["tools"]
+        for i, a in enumerate(before["tools"]):
+            row = tools.setdefault(a["tool"], {"before": [], "after": [], "calls": 0, "changed_output": 0, "diverged": 0})
+            row["calls"] += 1
+            row["before"].append(a["duration"] or 0.0)
+            b = later[i] if i < len(later) else None
+            if b is None or b["tool"] != a["tool"]:
+                row["diverged"] += 1
+                continue
+            row["after"].append(b["duration"] or 0.0)
+            if [o[1] for o in a["outputs"]] != [o[1] for o in b["outputs"]] or a["error"] != b["error"]:
+                row["changed_output"] += 1
+
+    rows = []
+    for name, row in sorted(tools.items()):
+        summary = {"tool": name, "calls": row["calls"]}
+        for side in ("before", "after"):
+            for q in (0.5, 0.95):
+                value = _percentile(row[side], q)
+                summary[f"{side}_p{int(q * 100)}_ms"] = None if value is None else round(value * 1000)
+        summary["changed_output"] = row["changed_output"]
+        summary["diverged"] = row["diverged"]
+        rows.append(summary)
+    return rows
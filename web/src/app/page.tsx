@@ -1,12 +1,12 @@
-import { getSupabase, Submission } from "@/lib/supabase";
+import { getSupabase, LIST_COLUMNS, Submission, SUBMISSIONS_SOURCE, TILE_URL } from "@/lib/supabase";
 import { Dashboard } from "@/components/Dashboard";
 
 export const dynamic = "force-dynamic";
 
 async function getSubmissions(): Promise<Submission[]> {
   const { data, error } = await getSupabase()
-    .from("submissions")
-    .select("*")
+    .from(SUBMISSIONS_SOURCE)
+    .select(TILE_URL ? LIST_COLUMNS : "*")
     .order("created_at", { ascending: false });
 
   if (error) {
@@ -14,7 +14,7 @@ async function getSubmissions(): Promise<Submission[]> {
     return [];
   }
 
-  return data as Submission[];
+  return data as unknown as Submission[];
 }
 
 export default async function Home() {
@@ -3,7 +3,48 @@
 import { useEffect, useRef } from "react";
 import L from "leaflet";
 import "leaflet/dist/leaflet.css";
-import { Submission } from "@/lib/supabase";
+import { Submission, TILE_URL } from "@/lib/supabase";
+
+const TILE_SIZE = 256;
+
+type TileFeature = GeoJSON.Feature<
+  GeoJSON.Point | GeoJSON.Polygon,
+  { id?: string; community_name?: string; cluster?: boolean; count?: number }
+>;
+
+function visibleTileKeys(map: L.Map): string[] {
+  const z = Math.round(map.getZoom());
+  const px = map.getPixelBounds();
+  const max = 2 ** z - 1;
+  const x0 = Math.max(0, Math.floor(px.min!.x / TILE_SIZE));
+  const y0 = Math.max(0, Math.floor(px.min!.y / TILE_SIZE));
+  const x1 = Math.min(max, Math.floor(px.max!.x / TILE_SIZE));
+  const y1 = Math.min(max, Math.floor(px.max!.y / TILE_SIZE));
+  const keys: string[] = [];
+  for (let x = x0; x <= x1; x++) {
+    for (let y = y0; y <= y1; y++) keys.push(`${z}/${x}/${y}`);
+  }
+  return keys;
+}
+
+function tileStyle(id: string | undefined, selectedId: string | undefined) {
+  const isSelected = !!id && selectedId === id;
+  return {
+    color: isSelected ? "#2563eb" : "#4285F4",
+    weight: isSelected ? 3 : 2,
+    fillColor: isSelected ? "#2563eb" : "#4285F4",
+    fillOpacity: isSelected ? 0.3 : 0.15,
+  };
+}
+
+function restyleTile(layer: L.GeoJSON, selectedId: string | undefined) {
+  layer.eachLayer((l) => {
+    const f = (l as L.Path & { feature?: TileFeature }).feature;
+    if (!f || f.properties.cluster) return;
+    const style = tileStyle(f.properties.id, selectedId);
+    (l as L.Path).setStyle(f.geometry.type === "Point" ? { ...style, fillOpacity: 0.5 } : style);
+  });
+}
 
 export default function MapInner({
   submissions,
@@ -16,6 +57,10 @@ export default function MapInner({
 }) {
   const mapRef = useRef<L.Map | null>(null);
   const containerRef = useRef<HTMLDivElement>(null);
+  // Tile layers on screen and the selection they are styled for, shared with the
+  // selection effect so changing the selection restyles instead of refetching
+  const tileLayers = useRef(new Map<string, L.GeoJSON>());
+  const selectedId = useRef<string | undefined>(undefined);
 
   useEffect(() => {
     if (!containerRef.current || mapRef.current) return;
@@ -34,9 +79,81 @@ export default function MapInner({
     };
   }, []);
 
+  // Tile mode: only fetch geometry for the tiles currently on screen
+  useEffect(() => {
+    const map = mapRef.current;
+    if (!map || !TILE_URL) return;
+
+    const byId = new Map(submissions.map((s) => [s.id, s]));
+    const loaded = tileLayers.current;
+    let cancelled = false;
+
+    const styleFor = (id?: string) => tileStyle(id, selectedId.current);
+
+    const sync = () => {
+      const wanted = new Set(visibleTileKeys(map));
+      loaded.forEach((layer, key) => {
+        if (!wanted.has(key)) {
+          map.removeLayer(layer);
+          loaded.delete(key);
+        }
+      });
+
+      wanted.forEach(async (key) => {
+        if (loaded.has(key)) return;
+        const resp = await fetch(`${TILE_URL}/tiles/${key}.json`);
+        if (!resp.ok || cancelled) return;
+        const collection = (await resp.json()) as GeoJSON.FeatureCollection;
+        if (cancelled || !visibleTileKeys(map).includes(key) || loaded.has(key)) return;
+
+        const layer = L.geoJSON(collection, {
+          style: (f) => styleFor((f as TileFeature | undefined)?.properties.id),
+          pointToLayer: (f: TileFeature, latlng) =>
+            f.properties.cluster
+              ? L.circleMarker(latlng, {
+                  radius: Math.min(28, 8 + Math.sqrt(f.properties.count ?? 1) * 2),
+                  ...styleFor(),
+                  fillOpacity: 0.5,
+                }).bindTooltip(String(f.properties.count))
+              : L.circleMarker(latlng, { radius: 7, ...styleFor(f.properties.id), fillOpacity: 0.5 }),
+          onEachFeature: (f: TileFeature, l) => {
+            l.on("click", (e: L.LeafletMouseEvent) => {
+              if (f.properties.cluster) {
+                map.setView(e.latlng, map.getZoom() + 2);
+                return;
+              }
+              const s = f.properties.id ? byId.get(f.properties.id) : undefined;
+              if (s) onSelect(s);
+            });
+            if (!f.properties.cluster) {
+              l.bindPopup(`<strong>${f.properties.community_name || "Unnamed"}</strong>`);
+            }
+          },
+        }).addTo(map);
+        loaded.set(key, layer);
+      });
+    };
+
+    sync();
+    map.on("moveend", sync);
+    return () => {
+      cancelled = true;
+      map.off("moveend", sync);
+      loaded.forEach((layer) => map.removeLayer(layer));
+      loaded.clear();
+    };
+  }, [submissions, onSelect]);
+
+  // Tile mode: restyle the loaded tiles when the selection changes
+  useEffect(() => {
+    selectedId.current = selected?.id;
+    if (!TILE_URL) return;
+    tileLayers.current.forEach((layer) => restyleTile(layer, selectedId.current));
+  }, [selected]);
+
   useEffect(() => {
     const map = mapRef.current;
-    if (!map) return;
+    if (!map || TILE_URL) return;
 
     // Clear existing layers (except tile layer)
     map.eachLayer((layer) => {
@@ -16,6 +16,39 @@ export function getSupabase(): SupabaseClient {
   return _supabase;
 }
 
+// When the tile server is configured the map fetches geometry per tile, so
+// list queries can skip the heavy geo columns.
+export const TILE_URL = process.env.NEXT_PUBLIC_TILE_URL;
+
+// With the split layout (migrations/002_split_submissions.sql) geometry lives in
+// submission_geo; full rows are read through the submissions_full view.
+export const SUBMISSIONS_SOURCE =
+  process.env.NEXT_PUBLIC_SUBMISSIONS_LAYOUT === "split" && !TILE_URL
+    ? "submissions_full"
+    : "submissions";
+
+export const LIST_COLUMNS = [
+  "id",
+  "created_at",
+  "caller_name",
+  "phone_number",
+  "consent",
+  "zipcode",
+  "address",
+  "community_name",
+  "community_description",
+  "key_places",
+  "community_boundaries",
+  "cultural_interests",
+  "economic_interests",
+  "community_activities",
+  "other_considerations",
+  "geographic_summary",
+  "primary_address",
+  "geocoded_landmarks",
+  "map_image_url",
+].join(",");
+
 export type Submission = {
   id: string;
   created_at: string;